@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Benchmark concurrent jobs: thread-per-job executor vs async run_async.
+
+Runs N cancel jobs that each hit a verification-code page, park on an OTP
+for a while, then finish. Chrome, input devices and screen capture are
+replaced with in-process fakes (short sleeps standing in for GUI work),
+and the VLM with a fake that sleeps --vlm-ms per call, so this measures
+only how the executor's waiting is scheduled.
+
+  threads  the pre-async server: each job is VLMExecutor.run() on the
+           loop's default thread pool, pinning a thread for the whole
+           job, OTP wait included. Jobs beyond the pool size queue.
+  async    each job is a run_async() task on one loop. GUI sections use
+           the GUI threads, VLM calls a worker thread while in flight;
+           settle and OTP waits hold no thread.
+
+Usage:
+    python agent/bin/bench_concurrency.py
+    python agent/bin/bench_concurrency.py --jobs 64 --otp 5 --vlm-ms 800
+
+Options:
+    --jobs        Concurrent jobs, default 32
+    --otp         Seconds each job waits for its OTP, default 3
+    --vlm-ms      Fake VLM latency per call in ms, default 300
+    --gui-ms      Fake duration of each GUI action in ms, default 20
+    --mode        threads, async or both (default: both)
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+_PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+_AGENT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:] = [p for p in sys.path if os.path.normpath(p) != _AGENT_DIR]
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+# Scripted VLM answers: code page -> signed in -> click -> done
+_SCRIPT = (
+    {'page_type': 'email_code_single', 'code_point': [400, 300],
+     'button_point': [400, 400]},
+    {'page_type': 'signed_in'},
+    {'state': 'account', 'action': 'click', 'completed': False,
+     'billing_end_date': None, 'target_description': 'Cancel button',
+     'click_point': [200, 225]},
+    {'state': 'confirmation', 'action': 'done', 'completed': True,
+     'billing_end_date': '2026-12-01'},
+)
+
+
+def _frames(count: int) -> list[bytes]:
+    """Distinct small PNGs so stuck detection never fires."""
+    from PIL import Image
+
+    frames = []
+    for i in range(count):
+        img = Image.new('RGB', (1280, 900), (40 * i % 256, 90, 160))
+        buf = io.BytesIO()
+        img.save(buf, format='PNG')
+        frames.append(buf.getvalue())
+    return frames
+
+
+class _FakeVLM:
+    """Sleeps vlm_ms per call and returns the scripted answer for the job."""
+
+    _max_image_width = 960
+    _normalized_coords = False
+    _coord_yx = False
+    _coord_square_pad = False
+    cache_identity = 'bench'
+
+    def __init__(self, vlm_ms: float) -> None:
+        self._delay = vlm_ms / 1000
+        self._step = 0
+
+    def analyze(self, page, prompt, **kwargs):
+        time.sleep(self._delay)
+        response = _SCRIPT[min(self._step, len(_SCRIPT) - 1)]
+        self._step += 1
+        return dict(response), 1.0
+
+
+def _install_fakes(gui_ms: float) -> None:
+    """Replace Chrome, input and capture in agent.vlm_executor's namespace."""
+    from agent import vlm_executor as vx
+    from agent.screenshot import Frame
+
+    gui = gui_ms / 1000
+    pngs = _frames(len(_SCRIPT))
+    counters: dict[int, int] = {}
+    pids = iter(range(10_000, 1_000_000))
+
+    def create_session():
+        time.sleep(gui)
+        pid = next(pids)
+        return SimpleNamespace(pid=pid, window_id=pid,
+                               bounds={'x': 0, 'y': 0, 'width': 1280, 'height': 900})
+
+    def capture_frame(window_id):
+        time.sleep(gui)
+        n = counters.get(window_id, 0)
+        counters[window_id] = n + 1
+        return Frame(pngs[n % len(pngs)])
+
+    def gui_action(*args, **kwargs):
+        time.sleep(gui)
+
+    vx.browser.create_session = create_session
+    vx.browser.navigate = lambda session, url, fast=False, settle=None: time.sleep(gui)
+    vx.browser.get_session_window = lambda session: session.bounds
+    vx.browser.close_session = gui_action
+    vx.browser.zoom_out = gui_action
+    vx.ss.capture_frame = capture_frame
+    vx.mouse.click = gui_action
+    vx.mouse.move_to = gui_action
+    vx.mouse.position = lambda: (200, 225)
+    vx.keyboard.hotkey = gui_action
+    vx.keyboard.press_key = gui_action
+    vx.keyboard.type_text = gui_action
+    vx.scroll_mod.scroll = gui_action
+    vx.player.play = gui_action
+    vx.focus_window_by_pid = lambda pid: None
+    vx._clipboard_copy = lambda text: None
+    vx.coords.image_to_screen = lambda x, y, bounds, chrome_offset=0: (x, y)
+
+
+async def _run(mode: str, args) -> dict:
+    from agent.vlm_executor import VLMExecutor
+
+    loop = asyncio.get_running_loop()
+
+    async def otp_callback(job_id, service):
+        await asyncio.sleep(args.otp)
+        return '123456'
+
+    def executor():
+        return VLMExecutor(_FakeVLM(args.vlm_ms), otp_callback=otp_callback, loop=loop,
+                           settle_delay=0.2, settle_mode='fixed', frame_reuse=False,
+                           debug=False)
+
+    peak = threading.active_count()
+    done = asyncio.Event()
+
+    async def sample():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.02)
+
+    sampler = asyncio.create_task(sample())
+    creds = {'email': 'bench@example.com', 'pass': 'x'}
+    t0 = time.monotonic()
+    if mode == 'threads':
+        jobs = [loop.run_in_executor(None, executor().run, 'netflix', 'cancel',
+                                     dict(creds), f'job-{i}')
+                for i in range(args.jobs)]
+    else:
+        jobs = [executor().run_async('netflix', 'cancel', dict(creds), f'job-{i}')
+                for i in range(args.jobs)]
+    results = await asyncio.gather(*jobs)
+    wall = time.monotonic() - t0
+    done.set()
+    await sampler
+
+    return {
+        'wall_s': wall,
+        'ok': sum(r.success for r in results),
+        'peak_threads': peak,
+        'jobs_per_min': len(results) / wall * 60,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark concurrent executor jobs')
+    parser.add_argument('--jobs', type=int, default=32, help='Concurrent jobs (default: 32)')
+    parser.add_argument('--otp', type=float, default=3.0, help='OTP wait per job in s (default: 3)')
+    parser.add_argument('--vlm-ms', type=float, default=300, help='Fake VLM latency (default: 300)')
+    parser.add_argument('--gui-ms', type=float, default=20, help='Fake GUI action time (default: 20)')
+    parser.add_argument('--mode', choices=('threads', 'async', 'both'), default='both')
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.ERROR)
+    _install_fakes(args.gui_ms)
+
+    print(f'jobs={args.jobs} otp={args.otp:.1f}s vlm={args.vlm_ms:.0f}ms '
+          f'gui={args.gui_ms:.0f}ms default-pool={min(32, (os.cpu_count() or 1) + 4)} threads')
+    modes = ('threads', 'async') if args.mode == 'both' else (args.mode,)
+    for mode in modes:
+        stats = asyncio.run(_run(mode, args))
+        print(f'{mode:>7}: wall {stats["wall_s"]:6.1f} s  {stats["jobs_per_min"]:6.1f} jobs/min  '
+              f'peak threads {stats["peak_threads"]:4d}  ok {stats["ok"]}/{args.jobs}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Microbenchmark: humanized input planning cost, and CPU work under gui_lock.
+
+Compares, per operation, the time to compute the humanized event
+sequence three ways:
+
+  legacy   the pre-plan pipeline (humanize.bezier_curve, apply_jitter,
+           apply_overshoot, velocity_profile, per-key typing_delay),
+           which used to run while gui_lock was held
+  python   the plan API with its pure-Python fallback
+  numpy    the plan API with NumPy-vectorized paths (if installed;
+           paths under plan.NUMPY_MIN_POINTS points stay pure Python)
+
+and the CPU time a replay spends inside the lock once the plan exists
+(sleeps and event posting replaced with no-ops). Before plans, the lock
+covered the legacy column plus the physical input; now it covers the
+replay column plus the physical input.
+
+Usage:
+    python agent/bin/bench_input_plan.py
+    python agent/bin/bench_input_plan.py --repeat 5000
+
+Options:
+    --repeat      Iterations per measurement, default 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+_PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+_AGENT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:] = [p for p in sys.path if os.path.normpath(p) != _AGENT_DIR]
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+_TEXT = 'jane.doe+streaming@example.com'
+_MOVES = {'move 80px': (80, 40), 'move 900px': (900, 500)}
+
+
+def _legacy_move(dx: float, dy: float) -> None:
+    """The old mouse.move_to computation, without posting events."""
+    from agent.input import humanize
+
+    start, target = (100.0, 100.0), (100.0 + dx, 100.0 + dy)
+    distance = (dx * dx + dy * dy) ** 0.5
+    n_points = humanize.num_waypoints(distance)
+    duration = humanize.movement_duration(distance)
+    points = humanize.bezier_curve(start, target, num_points=n_points)
+    points = humanize.apply_jitter(points, magnitude=0.15 + distance * 0.00025)
+    points = humanize.apply_overshoot(points, target, probability=0.12)
+    humanize.velocity_profile(len(points), base_delay=duration / len(points))
+
+
+def _legacy_type(text: str) -> None:
+    """The old keyboard.type_text computation, without posting events."""
+    from agent.input import humanize
+
+    prev = ''
+    for action in humanize.typo_generator(text, accuracy='average'):
+        char = action.get('char') or action['wrong']
+        humanize.typing_delay('medium', char, prev)
+        random.uniform(0.04, 0.10)  # hold time drawn per key
+        prev = char
+
+
+def _per_op_us(fn, repeat: int) -> float:
+    """Median of 5 batches after a warm-up, microseconds per call."""
+    for _ in range(max(1, repeat // 10)):
+        fn()
+    batches = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        batches.append((time.perf_counter() - t0) / repeat * 1e6)
+    return statistics.median(batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark input plan generation')
+    parser.add_argument('--repeat', type=int, default=2000,
+                        help='Iterations per measurement (default: 2000)')
+    args = parser.parse_args()
+
+    from agent.input import keyboard, mouse, player
+    from agent.input import plan as plan_mod
+
+    has_numpy = plan_mod.np is not None
+    numpy = plan_mod.np
+
+    def plan_move(dx, dy):
+        return lambda: mouse.plan_move(100 + dx, 100 + dy, start=(100.0, 100.0))
+
+    # name -> (legacy, planner, uses cursor paths)
+    cases = {name: (lambda dx=dx, dy=dy: _legacy_move(dx, dy), plan_move(dx, dy), True)
+             for name, (dx, dy) in _MOVES.items()}
+    cases[f'type {len(_TEXT)} chars'] = (
+        lambda: _legacy_type(_TEXT),
+        lambda: keyboard.plan_type(_TEXT, speed='medium', accuracy='average'),
+        False,
+    )
+
+    # Replay with no-op ops and sleeps: the CPU left inside the lock
+    player._ops = {op: (lambda *a: None) for op in (
+        'move', 'warp', 'down', 'up', 'key_down', 'key_up',
+        'unicode_down', 'unicode_up', 'scroll', 'wait')}
+    mouse.position = lambda: (100.0, 100.0)
+    no_sleep = lambda s: None  # noqa: E731
+
+    print(f'repeat={args.repeat}  numpy={"yes " + numpy.__version__ if has_numpy else "no"}')
+    print(f'{"operation":<18} {"legacy us":>10} {"python us":>10} {"numpy us":>10} '
+          f'{"replay us":>10} {"input ms":>9}')
+    for name, (legacy, planner, uses_paths) in cases.items():
+        legacy_us = _per_op_us(legacy, args.repeat)
+        numpy_us = _per_op_us(planner, args.repeat) if has_numpy and uses_paths else None
+        plan_mod.np = None
+        python_us = _per_op_us(planner, args.repeat)
+        plan_mod.np = numpy
+        sample = planner()
+        replay_us = _per_op_us(lambda: player.play(sample, sleep=no_sleep), args.repeat)
+        numpy_col = f'{numpy_us:>10.1f}' if numpy_us is not None else f'{"-":>10}'
+        print(f'{name:<18} {legacy_us:>10.1f} {python_us:>10.1f} {numpy_col} '
+              f'{replay_us:>10.1f} {sample.duration * 1000:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Benchmark the per-step screenshot pipeline: legacy base64 chain vs Frame.
+
+Replays the capture -> dimensions -> crop -> resize/encode -> stuck-hash
+(-> debug trace) work that VLMExecutor does on every step, for N concurrent
+jobs, against a synthetic Retina-sized Chrome screenshot. No Chrome, no
+screencapture, no VLM: this measures only the CPU and allocation cost of
+moving one frame through the pipeline.
+
+  legacy  capture_to_base64, png_dimensions, crop_browser_chrome (decode +
+          PNG re-encode), _resize_if_needed (decode + JPEG encode), MD5 of a
+          base64 prefix. Three decodes, two encodes, several base64 copies.
+  frame   Frame(raw), .size, .crop_top(), .encode(), .digest. One decode,
+          one JPEG encode.
+
+Usage:
+    python agent/bin/bench_pipeline.py
+    python agent/bin/bench_pipeline.py --jobs 3 --steps 20 --trace
+
+Options:
+    --jobs        Concurrent jobs (threads), default 3
+    --steps       Steps per job, default 15
+    --width       Logical window width, default 1280
+    --height      Logical window height, default 900
+    --scale       Display scale (2.0 = Retina), default 2.0
+    --max-width   VLM_MAX_WIDTH, default 960
+    --trace       Include debug-trace artifact extraction per step
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+_PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+_AGENT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:] = [p for p in sys.path if os.path.normpath(p) != _AGENT_DIR]
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+
+def _synthetic_screenshot(width: int, height: int) -> bytes:
+    """Build a PNG that compresses like a real page (blocks, text, noise)."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(1234)
+    img = Image.new('RGB', (width, height), (250, 250, 250))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, width, int(height * 0.1)], fill=(222, 225, 230))
+    for _ in range(120):
+        x = rng.randint(0, width - 40)
+        y = rng.randint(0, height - 20)
+        color = tuple(rng.randint(0, 255) for _ in range(3))
+        draw.rectangle([x, y, x + rng.randint(20, 400), y + rng.randint(10, 120)], fill=color)
+    for row in range(0, height, 36):
+        draw.text((40, row), 'Manage membership  Cancel  Account  ' * 4, fill=(20, 20, 20))
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def _legacy_step(raw: bytes, chrome_px: int, max_width: int, trace: bool) -> None:
+    """The pre-Frame executor step, inlined from the old helpers."""
+    from PIL import Image
+
+    # capture_to_base64
+    raw_b64 = base64.b64encode(raw).decode('ascii')
+    # png_dimensions
+    base64.b64decode(raw_b64[:200])
+    # crop_browser_chrome: decode, crop, PNG re-encode, base64
+    img = Image.open(io.BytesIO(base64.b64decode(raw_b64)))
+    cropped = img.crop((0, chrome_px, img.width, img.height))
+    buf = io.BytesIO()
+    cropped.save(buf, format='PNG')
+    page_b64 = base64.b64encode(buf.getvalue()).decode('ascii')
+    # VLMClient._resize_if_needed: decode again, resize, JPEG, base64
+    img = Image.open(io.BytesIO(base64.b64decode(page_b64)))
+    if img.width > max_width:
+        scale = img.width / max_width
+        img = img.resize((max_width, int(img.height / scale)), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.convert('RGB').save(buf, format='JPEG', quality=85)
+    sent_b64 = base64.b64encode(buf.getvalue()).decode('ascii')
+    # _StuckDetector
+    hashlib.md5(page_b64[:10000].encode()).hexdigest()
+    # DebugTrace.save_step artifacts
+    if trace:
+        base64.b64decode(page_b64)
+        base64.b64decode(sent_b64)
+
+
+def _frame_step(raw: bytes, chrome_px: int, max_width: int, trace: bool) -> None:
+    """The Frame-based executor step."""
+    from agent.screenshot import Frame
+
+    frame = Frame(raw)
+    frame.size
+    page = frame.crop_top(chrome_px)
+    encoded = page.encode(max_width)
+    page.digest
+    if trace:
+        page.png
+        encoded.data
+
+
+def _run_concurrent(step_fn, raw: bytes, args, chrome_px: int) -> dict:
+    """Run step_fn on args.jobs threads; return CPU/wall per step."""
+    cpu_totals: list[float] = []
+    lock = threading.Lock()
+    start = threading.Barrier(args.jobs)
+
+    def job() -> None:
+        start.wait()
+        c0 = time.thread_time()
+        for _ in range(args.steps):
+            step_fn(raw, chrome_px, args.max_width, args.trace)
+        with lock:
+            cpu_totals.append(time.thread_time() - c0)
+
+    threads = [threading.Thread(target=job) for _ in range(args.jobs)]
+    w0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - w0
+
+    steps = args.jobs * args.steps
+    return {
+        'cpu_ms_per_step': sum(cpu_totals) / steps * 1000,
+        'wall_ms_per_step': wall / args.steps * 1000,
+        'steps_per_sec': steps / wall,
+    }
+
+
+def _python_allocations(step_fn, raw: bytes, args, chrome_px: int) -> dict:
+    """Python-heap bytes allocated by one step (tracemalloc).
+
+    PIL pixel buffers live in C and are not counted; this captures the
+    base64 strings and encoded byte copies the pipeline creates.
+    """
+    step_fn(raw, chrome_px, args.max_width, args.trace)  # warm imports
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    step_fn(raw, chrome_px, args.max_width, args.trace)
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size for stat in snapshot.statistics('filename'))
+    return {'peak_kb': (peak - base) / 1024, 'retained_kb': total / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the screenshot pipeline')
+    parser.add_argument('--jobs', type=int, default=3, help='Concurrent jobs (default: 3)')
+    parser.add_argument('--steps', type=int, default=15, help='Steps per job (default: 15)')
+    parser.add_argument('--width', type=int, default=1280, help='Logical window width')
+    parser.add_argument('--height', type=int, default=900, help='Logical window height')
+    parser.add_argument('--scale', type=float, default=2.0, help='Display scale (default: 2.0)')
+    parser.add_argument('--max-width', type=int, default=960, help='VLM_MAX_WIDTH (default: 960)')
+    parser.add_argument('--trace', action='store_true', help='Include debug trace artifacts')
+    args = parser.parse_args()
+
+    raw = _synthetic_screenshot(int(args.width * args.scale), int(args.height * args.scale))
+    chrome_px = int(int(os.environ.get('CHROME_HEIGHT', '88')) * args.scale)
+    print(f'frame: {int(args.width * args.scale)}x{int(args.height * args.scale)} '
+          f'PNG {len(raw) / 1024:.0f} KB, jobs={args.jobs} steps/job={args.steps} '
+          f'trace={args.trace}')
+
+    results = {}
+    for name, fn in (('legacy', _legacy_step), ('frame', _frame_step)):
+        stats = _run_concurrent(fn, raw, args, chrome_px)
+        stats.update(_python_allocations(fn, raw, args, chrome_px))
+        results[name] = stats
+        print(f'{name:>7}: cpu {stats["cpu_ms_per_step"]:7.1f} ms/step  '
+              f'wall {stats["wall_ms_per_step"]:7.1f} ms/step  '
+              f'{stats["steps_per_sec"]:5.1f} steps/s  '
+              f'py-alloc peak {stats["peak_kb"]:7.0f} KB')
+
+    legacy, frame = results['legacy'], results['frame']
+    print(f'savings: cpu {1 - frame["cpu_ms_per_step"] / legacy["cpu_ms_per_step"]:.0%}  '
+          f'py-alloc peak {1 - frame["peak_kb"] / max(legacy["peak_kb"], 1e-9):.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Benchmark end-to-end job throughput on the simulated desktop.
+
+Runs --jobs full VLMExecutor jobs (--concurrency at a time) against the
+simulated desktop (agent.desktop_sim) and the fake VLM endpoint
+(agent.trace_replay.FakeVLMServer). Jobs sign in, go to the account
+page and click through the cancel or resume flow. Chrome launch,
+captures and page loads take modelled time, and input is replayed with
+its humanized timing under the real gui_lock. So the numbers show how
+the executor shares the one mouse and keyboard between concurrent jobs.
+Runs anywhere, Linux included.
+
+Reports jobs/hour; job duration; per-phase step latency (p50/p95 and
+where the time went); gui_lock contention (utilization = time held /
+wall time, and wait per acquisition); and the simulator's counters. A
+click that lands outside its target (missed_clicks) means input went to
+the wrong window or page.
+
+Usage:
+    python agent/bin/bench_sim.py
+    python agent/bin/bench_sim.py --jobs 32 --concurrency 8 --vlm-ms 900
+    python agent/bin/bench_sim.py --script flows/netflix.json --settle adaptive
+
+Options:
+    --jobs          Total jobs, default 16
+    --concurrency   Jobs in flight, default 4
+    --service       Service (default: netflix)
+    --action        cancel or resume (default: cancel)
+    --script        Sim script JSON (default: the built-in drawn flow)
+    --vlm-ms        Fake VLM latency per call in ms, default 800
+    --launch-ms     Chrome launch time in ms, default 1500
+    --capture-ms    Window capture time in ms, default 40
+    --time-scale    Multiplies every simulated duration, default 1
+    --settle        fixed or adaptive (default: SETTLE_MODE)
+    --settle-delay  Fixed-mode settle in s (default: SETTLE_DELAY)
+    --json          Print the summary as JSON
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+_AGENT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:] = [p for p in sys.path if os.path.normpath(p) != _AGENT_DIR]
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+_STEP_PARTS = ('gui_wait_ms', 'action_ms', 'settle_ms', 'capture_ms', 'vlm_ms')
+
+
+def _pct(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile (None for no values)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * pct // 100) - 1)]
+
+
+def _summarize(results: list, durations: list[float], wall_s: float, sim, gui: dict) -> dict:
+    ok = sum(r.success for r in results)
+    phases: dict[str, dict] = {}
+    for result in results:
+        for record in result.step_results:
+            row = phases.setdefault(record.get('phase', '?'), {'totals': []})
+            row['totals'].append(record.get('total_ms', 0))
+            for part in _STEP_PARTS:
+                row.setdefault(part, []).append(record.get(part, 0))
+    by_phase = {}
+    for phase, row in phases.items():
+        n = len(row['totals'])
+        by_phase[phase] = {
+            'steps': n,
+            'p50_ms': _pct(row['totals'], 50),
+            'p95_ms': _pct(row['totals'], 95),
+            **{f'mean_{part}': round(sum(row.get(part, [])) / n) for part in _STEP_PARTS},
+        }
+
+    hold_ms = sum(r.get('gui_hold_ms', 0) for res in results for r in res.step_results)
+    acquisitions = sum(s['acquisitions'] for s in gui['by_priority'].values())
+    wait_s = sum(s['wait']['mean_s'] * s['acquisitions'] for s in gui['by_priority'].values())
+    return {
+        'jobs': len(results),
+        'ok': ok,
+        'errors': sorted({r.error_message for r in results if not r.success}),
+        'wall_s': round(wall_s, 1),
+        'jobs_per_hour': round(ok / wall_s * 3600, 1) if wall_s else 0.0,
+        'job_p50_s': _pct(durations, 50),
+        'job_p95_s': _pct(durations, 95),
+        'phases': by_phase,
+        'gui': {
+            'utilization': round(hold_ms / 1000 / wall_s, 3) if wall_s else 0.0,
+            'acquisitions': acquisitions,
+            'mean_wait_ms': round(wait_s / acquisitions * 1000, 1) if acquisitions else 0.0,
+            'max_wait_ms': round(max((s['wait']['max_s'] for s in gui['by_priority'].values()),
+                                     default=0.0) * 1000, 1),
+        },
+        'sim': dict(sim.stats),
+    }
+
+
+def _print_summary(summary: dict) -> None:
+    print(f'{summary["ok"]}/{summary["jobs"]} jobs ok in {summary["wall_s"]:.1f}s: '
+          f'{summary["jobs_per_hour"]:.0f} jobs/hour, job p50 {summary["job_p50_s"]:.1f}s '
+          f'p95 {summary["job_p95_s"]:.1f}s')
+    for error in summary['errors']:
+        print(f'  failed: {error}')
+    print(f'\n{"phase":<8} {"steps":>5} {"p50 ms":>7} {"p95 ms":>7} {"gui wait":>8} '
+          f'{"action":>7} {"settle":>7} {"capture":>7} {"vlm":>7}  (means, ms)')
+    for phase, row in summary['phases'].items():
+        print(f'{phase:<8} {row["steps"]:>5} {row["p50_ms"]:>7.0f} {row["p95_ms"]:>7.0f} '
+              f'{row["mean_gui_wait_ms"]:>8} {row["mean_action_ms"]:>7} '
+              f'{row["mean_settle_ms"]:>7} {row["mean_capture_ms"]:>7} {row["mean_vlm_ms"]:>7}')
+    gui = summary['gui']
+    print(f'\ngui_lock: {gui["utilization"]:.0%} utilized, {gui["acquisitions"]} acquisitions, '
+          f'wait mean {gui["mean_wait_ms"]:.0f} ms, max {gui["max_wait_ms"]:.0f} ms')
+    print('sim: ' + ', '.join(f'{k}={v}' for k, v in sorted(summary['sim'].items())))
+
+
+async def _run(args, vlm, sim) -> dict:
+    from agent.gui_lock import gui_lock
+    from agent.vlm_executor import VLMExecutor
+
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(args.concurrency)
+    durations: list[float] = []
+
+    async def job(i: int):
+        async with slots:
+            executor = VLMExecutor(vlm, loop=loop, settle_mode=args.settle,
+                                   settle_delay=args.settle_delay, debug=False)
+            t0 = time.monotonic()
+            result = await executor.run_async(
+                args.service, args.action,
+                {'email': f'bench{i}@example.com', 'pass': 'correct horse'}, f'sim-{i}')
+            durations.append(time.monotonic() - t0)
+            return result
+
+    t0 = time.monotonic()
+    results = await asyncio.gather(*(job(i) for i in range(args.jobs)))
+    wall_s = time.monotonic() - t0
+    return _summarize(results, durations, wall_s, sim, gui_lock.stats())
+
+
+def main():
+    try:
+        from dotenv import load_dotenv
+        ub_dir = Path.home() / '.unsaltedbutter'
+        for name, override in (('shared.env', False), ('agent.env', True)):
+            if (ub_dir / name).exists():
+                load_dotenv(str(ub_dir / name), override=override)
+    except ImportError:
+        pass  # dotenv not installed, rely on shell env
+
+    parser = argparse.ArgumentParser(description='Benchmark jobs on the simulated desktop')
+    parser.add_argument('--jobs', type=int, default=16, help='Total jobs (default: 16)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Jobs in flight (default: 4)')
+    parser.add_argument('--service', default='netflix')
+    parser.add_argument('--action', choices=('cancel', 'resume'), default='cancel')
+    parser.add_argument('--script', default=None, help='Sim script JSON')
+    parser.add_argument('--vlm-ms', type=float, default=800, help='Fake VLM latency (default: 800)')
+    parser.add_argument('--launch-ms', type=float, default=1500, help='Chrome launch (default: 1500)')
+    parser.add_argument('--capture-ms', type=float, default=40, help='Capture time (default: 40)')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help='Multiplies simulated durations (default: 1)')
+    parser.add_argument('--settle', choices=('fixed', 'adaptive'), default=None)
+    parser.add_argument('--settle-delay', type=float, default=None)
+    parser.add_argument('--json', action='store_true', help='Print summary as JSON')
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.ERROR)
+
+    from agent import vlm_executor
+    from agent.config import get_vlm_config
+    from agent.desktop_sim import SimDesktop, SimScript, demo_script, sim_vlm_steps
+    from agent.recording.vlm_client import VLMClient
+    from agent.trace_replay import FakeVLMServer
+
+    script = SimScript.load(args.script) if args.script else demo_script(args.service)
+    sim = SimDesktop(script, launch_ms=args.launch_ms, capture_ms=args.capture_ms,
+                     time_scale=args.time_scale)
+    vlm_executor.set_desktop(sim.desktop())
+
+    cfg = get_vlm_config()
+    print(f'{args.jobs} {args.service} {args.action} jobs, concurrency {args.concurrency}, '
+          f'vlm {args.vlm_ms:.0f} ms, time scale {args.time_scale:g}', file=sys.stderr)
+    with FakeVLMServer(sim_vlm_steps(script, args.service), latency_ms=args.vlm_ms,
+                       coord_normalize=cfg['coord_normalize'],
+                       coord_yx=cfg['coord_yx']) as fake:
+        with VLMClient(base_url=fake.url, api_key='none', model='sim', stream=False,
+                       coord_square_pad=False) as vlm:
+            summary = asyncio.run(_run(args, vlm, sim))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        _print_summary(summary)
+    sys.exit(0 if summary['ok'] == summary['jobs'] else 1)
+
+
+if __name__ == '__main__':
+    main()
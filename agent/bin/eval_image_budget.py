@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Evaluate VLM image budgets against stored debug-trace frames.
+
+Replays the full-resolution page (step_NNN.png) and prompt
+(step_NNN_prompt.txt) of each traced VLM step at several image budgets
+and compares every answer with the response recorded in step_NNN.json.
+Reads job trace archives ({job_id}.zip) and loose trace folders alike.
+Reports, per phase and budget, how often the answer agrees with the
+recorded one, latency, prompt tokens and payload size, so the
+VLM_IMAGE_BUDGETS table can be set from data.
+
+The recorded response is the reference: it was produced at the budget in
+force when the trace was written. Traces are only kept for failed jobs
+unless AGENT_DEBUG_KEEP_ALL=1 was set, so collect a representative set
+first. Steps served from the reuse tracker or response cache, or resolved
+by the two-tier triage pass, are skipped.
+
+Agreement:
+  sign-in         same page_type, and every point present in both within
+                  --tolerance pixels (original page space)
+  cancel/resume   same action, and for clicks, click_point within
+                  --tolerance pixels
+
+Usage:
+    python agent/bin/eval_image_budget.py ~/.unsaltedbutter/debug
+    python agent/bin/eval_image_budget.py TRACE_DIR --budgets 512/q70,640,960,960/webp/gray --phase sign-in
+
+Options:
+    --budgets     Comma-separated budgets 'width[/qNN][/webp][/gray]'
+                  (default: 512,640,768,960,1280)
+    --phase       Only steps of this phase
+    --tolerance   Max point distance in original pixels (default: 24)
+    --limit       Max steps to replay (default: all)
+    --json        Print the summary as JSON
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+_AGENT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:] = [p for p in sys.path if os.path.normpath(p) != _AGENT_DIR]
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+
+def _evaluate(vlm, budget: str, steps: list, tolerance: float) -> list[dict]:
+    """Replay steps at one budget; one result row per step."""
+    from agent.trace_replay import replay_step
+
+    rows = []
+    for step in steps:
+        row = replay_step(vlm, step, tolerance)
+        if row['error']:
+            print(f'  {step.id} @ {budget}: {row["error"]} error', file=sys.stderr)
+        rows.append(row)
+    return rows
+
+
+def _summarize(budget: str, rows: list[dict]) -> list[dict]:
+    summary = []
+    for phase in sorted({r['phase'] for r in rows}):
+        group = [r for r in rows if r['phase'] == phase]
+        timed = [r for r in group if r['error'] is None]
+        tokens = [r['prompt_tokens'] for r in timed if r['prompt_tokens']]
+        summary.append({
+            'phase': phase,
+            'budget': budget,
+            'steps': len(group),
+            'agreement': sum(r['ok'] for r in group) / len(group),
+            'errors': len(group) - len(timed),
+            'mean_ms': statistics.fmean(r['ms'] for r in timed) if timed else None,
+            'p50_ms': statistics.median(r['ms'] for r in timed) if timed else None,
+            'prompt_tokens': statistics.fmean(tokens) if tokens else None,
+            'kb': statistics.fmean(r['kb'] for r in timed) if timed else None,
+        })
+    return summary
+
+
+def _fmt(value, spec: str) -> str:
+    return format(value, spec) if value is not None else '-'
+
+
+def main():
+    try:
+        from dotenv import load_dotenv
+        ub_dir = Path.home() / '.unsaltedbutter'
+        for name, override in (('shared.env', False), ('agent.env', True)):
+            if (ub_dir / name).exists():
+                load_dotenv(str(ub_dir / name), override=override)
+    except ImportError:
+        pass  # dotenv not installed, rely on shell env
+
+    parser = argparse.ArgumentParser(description='Evaluate VLM image budgets on debug traces')
+    parser.add_argument('traces', nargs='+', help='Job trace archive(s)/folder(s) or the debug dir')
+    parser.add_argument('--budgets', default='512,640,768,960,1280',
+                        help='Comma-separated budgets (default: 512,640,768,960,1280)')
+    parser.add_argument('--phase', default=None, help='Only steps of this phase')
+    parser.add_argument('--tolerance', type=float, default=24.0,
+                        help='Max point distance in original pixels (default: 24)')
+    parser.add_argument('--limit', type=int, default=0, help='Max steps to replay')
+    parser.add_argument('--json', action='store_true', help='Print summary as JSON')
+    args = parser.parse_args()
+
+    from agent.config import get_vlm_config
+    from agent.recording.image_budget import parse_budget
+    from agent.recording.vlm_client import VLMClient
+
+    from agent.trace_replay import load_steps
+    from agent.trace_store import trace_paths
+
+    steps = [s for t in trace_paths(args.traces)
+             for s in load_steps(t, args.phase, image='full')]
+    if args.limit:
+        steps = steps[:args.limit]
+    if not steps:
+        print('No replayable steps found (need step_NNN.png, _prompt.txt and a VLM response)')
+        sys.exit(1)
+
+    cfg = get_vlm_config()
+    if not cfg['url']:
+        print('ERROR: VLM_URL is not set')
+        sys.exit(1)
+    budgets = [b.strip() for b in args.budgets.split(',') if b.strip()]
+    for b in budgets:
+        parse_budget(b, cfg['max_width'])  # fail fast on typos
+
+    print(f'{len(steps)} steps, budgets: {", ".join(budgets)}', file=sys.stderr)
+    summary = []
+    for budget in budgets:
+        with VLMClient(base_url=cfg['url'].split(',')[0], api_key=cfg['key'],
+                       model=cfg['model'], image_budgets=f'*:*={budget}') as vlm:
+            summary.extend(_summarize(budget, _evaluate(vlm, budget, steps, args.tolerance)))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f'{"phase":<10} {"budget":<16} {"steps":>5} {"agree":>6} {"err":>4} '
+          f'{"mean ms":>8} {"p50 ms":>8} {"tokens":>7} {"KB":>6}')
+    for row in sorted(summary, key=lambda r: (r['phase'], r['budget'])):
+        print(f'{row["phase"]:<10} {row["budget"]:<16} {row["steps"]:>5} '
+              f'{row["agreement"]:>6.0%} {row["errors"]:>4} '
+              f'{_fmt(row["mean_ms"], ">8.0f")} {_fmt(row["p50_ms"], ">8.0f")} '
+              f'{_fmt(row["prompt_tokens"], ">7.0f")} {_fmt(row["kb"], ">6.1f")}')
+
+
+if __name__ == '__main__':
+    main()
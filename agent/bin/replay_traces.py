@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Replay stored debug traces against a VLM endpoint: accuracy and throughput.
+
+Sends each traced VLM step (the image and prompt recorded in the trace)
+to an OpenAI-compatible endpoint, with the current VLM_* settings or
+command-line overrides, and compares every answer with the response the
+production model gave. Reports p50/p95 latency, throughput, tokens,
+parse failures and agreement, overall and per phase. With the --min-* /
+--max-* thresholds it exits 1 on a regression (request errors always
+fail the run), so it can gate a model, prompt or VLM_MAX_WIDTH /
+VLM_COORD_* change before rollout.
+
+--image sent replays the JPEG the VLM received (exactly what production
+saw); --image full re-encodes the chrome-cropped page through the client,
+which is what a VLM_MAX_WIDTH or image-budget change needs.
+
+--fake starts a local fake endpoint that answers with the recorded
+responses (matched by perceptual hash, coordinates mapped to the sent
+image), so the harness itself runs in CI without a model. Agreement
+should then be 100%; --fake-latency-ms simulates model time for
+concurrency runs. The fake does not stream and does not model
+VLM_COORD_SQUARE_PAD.
+
+Agreement:
+  sign-in         same page_type, and every point present in both within
+                  --tolerance pixels (original page space)
+  cancel/resume   same action, and for clicks, click_point within
+                  --tolerance pixels
+
+Usage:
+    python agent/bin/replay_traces.py ~/.unsaltedbutter/debug
+    python agent/bin/replay_traces.py TRACES --url http://studio:8080 --model qwen3-vl --concurrency 4
+    python agent/bin/replay_traces.py TRACES --image full --max-width 768 --min-agreement 0.95
+    python agent/bin/replay_traces.py TRACES --fake --concurrency 8 --fake-latency-ms 400
+
+Options:
+    --image              sent (default) or full
+    --phase              Only steps of this phase
+    --limit              Max steps to replay (default: all)
+    --concurrency        Requests in flight (default: 1)
+    --tolerance          Max point distance in original pixels (default: 24)
+    --url/--model/--key  Endpoint overrides (default: VLM_URL/VLM_MODEL/VLM_KEY;
+                         the first URL if VLM_URL lists several)
+    --max-width          VLM_MAX_WIDTH override
+    --fake               Replay against the bundled fake endpoint
+    --fake-latency-ms    Fake endpoint delay per request (default: 0)
+    --min-agreement      Fail below this agreement (0-1)
+    --max-p95-ms         Fail above this p95 latency
+    --max-parse-failures Fail above this many parse failures
+    --json               Print the summary as JSON
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+_AGENT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:] = [p for p in sys.path if os.path.normpath(p) != _AGENT_DIR]
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+
+def _fmt(value, spec: str) -> str:
+    return format(value, spec) if value is not None else format('-', spec.split('.')[0])
+
+
+def _print_table(summary: dict) -> None:
+    print(f'{"phase":<10} {"steps":>5} {"agree":>6} {"parse":>5} {"err":>4} '
+          f'{"p50 ms":>8} {"p95 ms":>8} {"in tok":>7} {"out tok":>7}')
+    rows = [(p, s) for p, s in summary['phases'].items()] + [('all', summary)]
+    for phase, row in rows:
+        print(f'{phase:<10} {row["steps"]:>5} {row["agreement"]:>6.0%} '
+              f'{row["parse_failures"]:>5} {row["errors"]:>4} '
+              f'{_fmt(row["p50_ms"], ">8.0f")} {_fmt(row["p95_ms"], ">8.0f")} '
+              f'{_fmt(row["prompt_tokens"], ">7.0f")} '
+              f'{_fmt(row["completion_tokens"], ">7.0f")}')
+    if summary.get('wall_s'):
+        print(f'{summary["steps"]} steps in {summary["wall_s"]:.1f}s '
+              f'({summary["steps_per_s"]:.2f} steps/s)')
+
+
+def _gate(summary: dict, args) -> list[str]:
+    """Threshold violations, as messages."""
+    failures = []
+    if args.min_agreement is not None and summary['agreement'] < args.min_agreement:
+        failures.append(f'agreement {summary["agreement"]:.1%} < {args.min_agreement:.1%}')
+    if (args.max_p95_ms is not None and summary['p95_ms'] is not None
+            and summary['p95_ms'] > args.max_p95_ms):
+        failures.append(f'p95 {summary["p95_ms"]:.0f} ms > {args.max_p95_ms:.0f} ms')
+    if (args.max_parse_failures is not None
+            and summary['parse_failures'] > args.max_parse_failures):
+        failures.append(f'{summary["parse_failures"]} parse failures > {args.max_parse_failures}')
+    if summary['errors']:
+        failures.append(f'{summary["errors"]} request errors')
+    return failures
+
+
+def main():
+    try:
+        from dotenv import load_dotenv
+        ub_dir = Path.home() / '.unsaltedbutter'
+        for name, override in (('shared.env', False), ('agent.env', True)):
+            if (ub_dir / name).exists():
+                load_dotenv(str(ub_dir / name), override=override)
+    except ImportError:
+        pass  # dotenv not installed, rely on shell env
+
+    parser = argparse.ArgumentParser(description='Replay debug traces against a VLM endpoint')
+    parser.add_argument('traces', nargs='+', help='Job trace archive(s)/folder(s) or the debug dir')
+    parser.add_argument('--image', choices=('sent', 'full'), default='sent',
+                        help='Replay the sent JPEG or the full page (default: sent)')
+    parser.add_argument('--phase', default=None, help='Only steps of this phase')
+    parser.add_argument('--limit', type=int, default=0, help='Max steps to replay')
+    parser.add_argument('--concurrency', type=int, default=1, help='Requests in flight')
+    parser.add_argument('--tolerance', type=float, default=24.0,
+                        help='Max point distance in original pixels (default: 24)')
+    parser.add_argument('--url', default=None, help='Endpoint (default: VLM_URL)')
+    parser.add_argument('--model', default=None, help='Model (default: VLM_MODEL)')
+    parser.add_argument('--key', default=None, help='API key (default: VLM_KEY)')
+    parser.add_argument('--max-width', type=int, default=None, help='VLM_MAX_WIDTH override')
+    parser.add_argument('--fake', action='store_true', help='Use the bundled fake endpoint')
+    parser.add_argument('--fake-latency-ms', type=float, default=0.0,
+                        help='Fake endpoint delay per request')
+    parser.add_argument('--min-agreement', type=float, default=None)
+    parser.add_argument('--max-p95-ms', type=float, default=None)
+    parser.add_argument('--max-parse-failures', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='Print summary as JSON')
+    args = parser.parse_args()
+
+    from agent.config import get_vlm_config
+    from agent.recording.vlm_client import VLMClient
+    from agent.trace_replay import FakeVLMServer, load_steps, replay, summarize
+    from agent.trace_store import trace_paths
+
+    steps = [s for t in trace_paths(args.traces)
+             for s in load_steps(t, args.phase, image=args.image)]
+    if args.limit:
+        steps = steps[:args.limit]
+    if not steps:
+        print(f'No replayable steps found (need the {args.image} image, '
+              f'_prompt.txt and a VLM response)')
+        sys.exit(1)
+
+    cfg = get_vlm_config()
+    fake = None
+    if args.fake:
+        fake = FakeVLMServer(steps, latency_ms=args.fake_latency_ms,
+                             coord_normalize=cfg['coord_normalize'],
+                             coord_yx=cfg['coord_yx'])
+        url = fake.start()
+    else:
+        url = args.url or cfg['url'].split(',')[0]
+    if not url:
+        print('ERROR: VLM_URL is not set (or pass --url / --fake)')
+        sys.exit(1)
+
+    print(f'{len(steps)} steps against {url}, concurrency {args.concurrency}',
+          file=sys.stderr)
+    try:
+        with VLMClient(base_url=url, api_key=args.key or cfg['key'] or 'none',
+                       model=args.model or cfg['model'] or 'fake',
+                       max_image_width=args.max_width,
+                       stream=False if fake else None) as vlm:
+            rows, wall_s = replay(vlm, steps, args.concurrency, args.tolerance)
+    finally:
+        if fake is not None:
+            fake.stop()
+
+    for row in rows:
+        if row['error']:
+            print(f'  {row["id"]}: {row["error"]}: {row["message"]}', file=sys.stderr)
+
+    summary = summarize(rows, wall_s)
+    if args.json:
+        print(json.dumps({**summary, 'steps_detail': rows}, indent=2))
+    else:
+        _print_table(summary)
+
+    failures = _gate(summary, args)
+    for failure in failures:
+        print(f'FAIL: {failure}', file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,14 @@ Launch Chrome with fresh temp profiles, manage the process,
 navigate, and tear down after. No headless, no webdriver,
 no automation flags.
 
+Each session's profile is cloned from a template profile
+(new_profile_dir). CHROME_PROFILE_TEMPLATE may point at a profile
+Chrome has already initialized once, so new profiles skip first-run
+setup; without it a template holding only our Preferences is built on
+first use. Cookies, logins, history and caches are never copied, so
+every session still starts signed out. Warm pooling and background
+teardown live in agent.session_pool.
+
 GUI-touching operations (focus, resize, keyboard/clipboard) are
 serialized via gui_lock so multiple concurrent jobs don't
 interleave physical input.
@@ -12,6 +20,7 @@ interleave physical input.
 
 from __future__ import annotations
 
+import atexit
 import json
 import os
 import random
@@ -19,12 +28,15 @@ import shutil
 import signal
 import subprocess
 import tempfile
+import threading
 import time
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Callable
 
-from agent.gui_lock import gui_lock
+from agent.gui_lock import GuiPriority, gui_lock, gui_priority
 from agent.input import keyboard, mouse, window
+from agent.input.window_registry import window_registry
 
 CHROME_PATH = '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
 
@@ -36,6 +48,16 @@ CHROME_ARGS = [
     '--disable-notifications',
 ]
 
+# Never cloned from a template profile: per-run locks, caches and
+# anything that would carry a signed-in state into a new session.
+_TEMPLATE_IGNORE = shutil.ignore_patterns(
+    'Singleton*', 'lockfile', '*Cache*', 'Crashpad', 'Sessions',
+    'Cookies*', 'Login Data*', 'History*', 'Web Data*', 'Current *', 'Last *',
+)
+
+_template_dir: str | None = None
+_template_lock = threading.Lock()
+
 
 @dataclass
 class BrowserSession:
@@ -76,19 +98,39 @@ def _write_chrome_prefs(profile_dir: str) -> None:
         json.dump(prefs, f)
 
 
-def create_session(width: int = 1280, height: int = 900) -> BrowserSession:
-    """
-    Launch Chrome with a fresh temp profile.
-
-    Creates a disposable profile dir, launches Chrome to about:blank,
-    waits for the window to appear, resizes it, and returns the session.
+def profile_template() -> str:
+    """Path of the profile new sessions are cloned from.
 
-    The focus + resize portion acquires the GUI lock to avoid interleaving
-    with other concurrent jobs' GUI actions.
+    CHROME_PROFILE_TEMPLATE if set; otherwise a temp dir holding just
+    our Chrome preferences, built once per process and removed at exit.
     """
-    profile_dir = tempfile.mkdtemp(prefix='ub-chrome-')
-    _write_chrome_prefs(profile_dir)
+    global _template_dir
+    configured = os.environ.get('CHROME_PROFILE_TEMPLATE', '').strip()
+    if configured:
+        return os.path.expanduser(configured)
+    with _template_lock:
+        if _template_dir is None or not os.path.isdir(_template_dir):
+            _template_dir = tempfile.mkdtemp(prefix='ub-chrome-template-')
+            _write_chrome_prefs(_template_dir)
+            atexit.register(shutil.rmtree, _template_dir, ignore_errors=True)
+        return _template_dir
+
+
+def new_profile_dir(prefix: str = 'ub-chrome-') -> str:
+    """Create a disposable profile dir cloned from profile_template()."""
+    profile_dir = tempfile.mkdtemp(prefix=prefix)
+    shutil.copytree(profile_template(), profile_dir,
+                    ignore=_TEMPLATE_IGNORE, dirs_exist_ok=True)
+    return profile_dir
+
+
+def launch_chrome(profile_dir: str, timeout: float = 10.0) -> BrowserSession:
+    """
+    Start Chrome on profile_dir at about:blank and wait for its window.
 
+    No GUI input. On timeout the process is killed, profile_dir removed,
+    and RuntimeError raised.
+    """
     cmd = [CHROME_PATH, f'--user-data-dir={profile_dir}'] + CHROME_ARGS + ['about:blank']
     process = subprocess.Popen(
         cmd,
@@ -96,15 +138,15 @@ def create_session(width: int = 1280, height: int = 900) -> BrowserSession:
         stderr=subprocess.DEVNULL,
     )
 
-    # Poll for the Chrome window to appear (up to 10s), scoped to this PID
-    win_info = _wait_for_window('Google Chrome', pid=process.pid, timeout=10.0)
+    # Poll for the Chrome window to appear, scoped to this PID
+    win_info = _wait_for_window('Google Chrome', pid=process.pid, timeout=timeout)
     if win_info is None:
         # Chrome didn't produce a window; kill and clean up
         process.kill()
         shutil.rmtree(profile_dir, ignore_errors=True)
-        raise RuntimeError('Chrome launched but no window appeared within 10s')
+        raise RuntimeError(f'Chrome launched but no window appeared within {timeout:.0f}s')
 
-    session = BrowserSession(
+    return BrowserSession(
         pid=process.pid,
         process=process,
         profile_dir=profile_dir,
@@ -117,18 +159,34 @@ def create_session(width: int = 1280, height: int = 900) -> BrowserSession:
         },
     )
 
+
+def create_session(width: int = 1280, height: int = 900) -> BrowserSession:
+    """
+    Launch Chrome with a fresh temp profile.
+
+    Clones a disposable profile dir from the template, launches Chrome
+    to about:blank, waits for the window to appear, resizes it, and
+    returns the session.
+
+    The focus + resize portion acquires the GUI lock to avoid interleaving
+    with other concurrent jobs' GUI actions.
+    """
+    session = launch_chrome(new_profile_dir())
+
     # Focus and resize: needs the GUI lock (mouse drag for resize)
-    with gui_lock:
-        window.focus_window_by_pid(process.pid)
+    with gui_priority(GuiPriority.NAVIGATE), gui_lock:
+        window.focus_window_by_pid(session.pid)
         time.sleep(0.05)
         window.resize_window_by_drag('Google Chrome', width, height, fast=True)
         time.sleep(0.2)
 
-        # Zoom happens after account page navigation (4 steps to 67%).
-        # Not here: Chrome resets zoom when navigating away from about:blank.
+    # Zoom happens after account page navigation (4 steps to 67%).
+    # Not here: Chrome resets zoom when navigating away from about:blank.
 
-        # Park cursor at a random spot inside the window so every session
-        # doesn't start from the lower-left resize corner.
+    # Park cursor at a random spot inside the window so every session
+    # doesn't start from the lower-left resize corner. Purely cosmetic,
+    # so it yields to other jobs' input.
+    with gui_priority(GuiPriority.COSMETIC), gui_lock:
         rx = session.bounds['x'] + random.randint(200, max(width - 200, 300))
         ry = session.bounds['y'] + random.randint(150, max(height - 200, 250))
         mouse.move_to(rx, ry, fast=True)
@@ -141,7 +199,7 @@ def create_session(width: int = 1280, height: int = 900) -> BrowserSession:
 
 def zoom_out(session: BrowserSession, steps: int = 2) -> None:
     """Zoom out the browser by pressing Cmd+minus `steps` times."""
-    with gui_lock:
+    with gui_priority(GuiPriority.NAVIGATE), gui_lock:
         window.focus_window_by_pid(session.pid)
         for i in range(steps):
             keyboard.hotkey('command', '-')
@@ -156,6 +214,7 @@ def close_session(session: BrowserSession) -> None:
     Always removes the profile directory.
     """
     _kill_pid(session.pid)
+    window_registry.forget(session.pid)
     shutil.rmtree(session.profile_dir, ignore_errors=True)
 
 
@@ -181,7 +240,12 @@ def _kill_pid(pid: int) -> None:
         pass
 
 
-def navigate(session: BrowserSession, url: str, fast: bool = False) -> None:
+def navigate(
+    session: BrowserSession,
+    url: str,
+    fast: bool = False,
+    settle: Callable[[], object] | None = None,
+) -> None:
     """
     Navigate Chrome to a URL using keyboard shortcuts.
 
@@ -189,8 +253,10 @@ def navigate(session: BrowserSession, url: str, fast: bool = False) -> None:
     the GUI lock. The page load wait runs outside the lock.
 
     fast: minimal timing (for initial navigation before human behavior matters)
+    settle: optional callable that waits for the page to load (e.g. the
+        executor's adaptive settle). Replaces the fixed post-Enter sleep.
     """
-    with gui_lock:
+    with gui_priority(GuiPriority.NAVIGATE), gui_lock:
         window.focus_window_by_pid(session.pid)
         time.sleep(0.05 if fast else 0.3)
 
@@ -208,17 +274,21 @@ def navigate(session: BrowserSession, url: str, fast: bool = False) -> None:
         keyboard.press_key('enter')
 
     # Wait for page to start loading (outside lock: no GUI needed)
-    time.sleep(2.0 if fast else 2.5)
+    if settle is not None:
+        settle()
+    else:
+        time.sleep(2.0 if fast else 2.5)
 
 
 def get_session_window(session: BrowserSession) -> dict:
     """
     Re-fetch Chrome's window bounds and update the session.
-    Uses the session PID to find the correct Chrome instance.
+    Refreshes the session's tracked window by id; all of the PID's
+    windows are only enumerated if that window is gone.
 
     Returns the current bounds dict: {x, y, width, height}.
     """
-    win_info = window.get_window_bounds('Google Chrome', pid=session.pid)
+    win_info = window_registry.lookup(session.pid, session.window_id)
     if win_info is None:
         raise RuntimeError(f'Chrome window not found for PID {session.pid}')
 
@@ -236,10 +306,4 @@ def _wait_for_window(
     app_name: str, pid: int | None = None, timeout: float = 10.0,
 ) -> dict | None:
     """Poll for a window to appear. Returns window info or None on timeout."""
-    deadline = time.monotonic() + timeout
-    while time.monotonic() < deadline:
-        windows = window.list_windows(app_name, pid=pid)
-        if windows:
-            return windows[0]
-        time.sleep(0.5)
-    return None
+    return window_registry.wait_for_window(app_name, pid=pid, timeout=timeout)
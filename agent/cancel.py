@@ -0,0 +1,123 @@
+"""Cooperative cancellation for a running job.
+
+POST /abort cancels the job's asyncio task, which stops the executor at
+its next await. Work already handed to a thread can't be interrupted
+that way: a VLM request would keep the backend busy until it finishes
+generating. A CancelToken reaches into those threads. The executor checks
+it at every phase boundary and inside long GUI sections, races its
+awaits (settle delays, VLM calls, OTP waits) against it, and the VLM
+client closes an in-flight streamed response (or stops waiting on a
+non-streamed one) when it fires.
+
+A token is thread-safe: cancel() may be called from any thread (the
+server's loop, a CLI signal handler) and the executor sees it within one
+poll of whatever it is waiting on.
+
+Usage:
+    token = CancelToken()
+    task = asyncio.create_task(executor.run_async(..., cancel=token))
+    ...
+    token.cancel('aborted')   # run_async returns a failed result promptly
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, TypeVar
+
+log = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class JobCancelled(Exception):
+    """The job's CancelToken fired."""
+
+
+class CancelToken:
+    """Thread-safe, one-shot cancellation flag with callbacks."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self.reason = ''
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = 'aborted') -> bool:
+        """Fire the token. Returns False if it had already fired."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as exc:
+                log.debug('Cancel callback failed: %s', exc)
+        return True
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise JobCancelled(self.reason)
+
+    def on_cancel(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Call fn (on the cancelling thread) when the token fires.
+
+        Runs fn at once if it already has. Returns a function that
+        unregisters fn.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return lambda: self._remove(fn)
+        fn()
+        return lambda: None
+
+    def _remove(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+    async def wait_for(self, aw: Awaitable[T]) -> T:
+        """Await aw unless the token fires first.
+
+        On cancellation the awaitable is cancelled (a thread behind
+        asyncio.to_thread keeps running to completion, unobserved) and
+        JobCancelled is raised.
+        """
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(aw)
+        if self.cancelled:
+            task.cancel()
+            raise JobCancelled(self.reason)
+        fired = loop.create_future()
+
+        def _wake() -> None:
+            loop.call_soon_threadsafe(
+                lambda: fired.done() or fired.set_result(None))
+
+        remove = self.on_cancel(_wake)
+        try:
+            await asyncio.wait({task, fired}, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            task.cancel()
+            raise
+        finally:
+            remove()
+            fired.cancel()
+        if not task.done():
+            task.cancel()
+            raise JobCancelled(self.reason)
+        return task.result()
+
+    async def sleep(self, seconds: float) -> None:
+        """asyncio.sleep that ends early (with JobCancelled) on cancel."""
+        await self.wait_for(asyncio.sleep(seconds))
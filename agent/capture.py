@@ -0,0 +1,306 @@
+"""
+Window capture backends.
+
+screenshot.capture_frame() and capture_thumbnail() delegate here. A
+backend turns a CGWindowID into a Frame at a requested scale:
+
+  QuartzCapture        in-process CGWindowListCreateImage. The pixel
+                       buffer becomes the Frame's image directly: no
+                       subprocess, no temp file, no PNG encode/decode.
+                       Captures at 1x (nominal) resolution when asked for
+                       a scale of 1 or less, instead of grabbing the full
+                       Retina bitmap only for the VLM client to shrink it.
+  ScreencaptureCapture `screencapture -l` into a temp PNG, the original
+                       path. Used when CAPTURE_BACKEND=screencapture, and
+                       for any capture the in-process backend can't make
+                       (API missing, screen-recording permission denied).
+  FakeCapture          deterministic synthetic windows for tests and
+                       non-macOS runs.
+
+Scale is image pixels per screen point: 2.0 is full Retina, 1.0 one
+pixel per point. Each captured Frame carries its scale (so the chrome
+crop needs no display-scale lookup) and a capture record with the
+backend, latency and bytes read, which the executor adds to each step's
+diagnostics.
+
+Configuration (read per capture; dotenv loads after import):
+  CAPTURE_BACKEND  quartz (default) or screencapture
+  CAPTURE_SCALE    pixels per screen point to capture at (default 0 =
+                   the display's native scale). 1 quarters the pixel
+                   count on Retina; the VLM gets at most
+                   VLM_MAX_IMAGE_WIDTH pixels either way.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import time
+from typing import TYPE_CHECKING, Protocol
+
+from agent.screenshot import Frame, capture_window
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+log = logging.getLogger(__name__)
+
+
+class CaptureBackend(Protocol):
+    """Turns a window id into a Frame."""
+
+    name: str
+
+    def capture(self, window_id: int, scale: float | None = None) -> Frame:
+        """Capture the window at scale pixels per point (None: native).
+
+        Sets frame.capture['bytes'] to the bytes read from the capture
+        source. Raises RuntimeError if the window can't be captured.
+        """
+
+    def thumbnail(self, window_id: int, width: int) -> Image.Image:
+        """A small grayscale capture for change detection."""
+
+
+def _resize(img: Image.Image, factor: float) -> Image.Image:
+    from PIL import Image
+
+    size = (max(1, round(img.width * factor)), max(1, round(img.height * factor)))
+    return img.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+
+def _gray_thumbnail(img: Image.Image, width: int) -> Image.Image:
+    img = img.convert('L')
+    img.thumbnail((width, img.height))
+    return img
+
+
+# ---------------------------------------------------------------------------
+# screencapture subprocess
+# ---------------------------------------------------------------------------
+
+class ScreencaptureCapture:
+    """`screencapture -l` into a temp file (always native resolution)."""
+
+    name = 'screencapture'
+
+    def capture(self, window_id, scale=None):
+        tmp_fd, tmp_path = tempfile.mkstemp(suffix='.png', prefix='ub-cap-')
+        os.close(tmp_fd)
+        try:
+            capture_window(window_id, tmp_path)
+            with open(tmp_path, 'rb') as f:
+                png = f.read()
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        frame = Frame(png)
+        if scale:
+            native = _native_scale()
+            if scale < native:
+                frame = Frame(image=_resize(frame.image, scale / native), scale=scale)
+            else:
+                frame.scale = native
+        frame.capture = {'bytes': len(png)}
+        return frame
+
+    def thumbnail(self, window_id, width):
+        # JPEG decoded in draft mode (libjpeg DCT scaling): only a
+        # fraction of the pixels are ever decoded.
+        from PIL import Image
+
+        tmp_fd, tmp_path = tempfile.mkstemp(suffix='.jpg', prefix='ub-thumb-')
+        os.close(tmp_fd)
+        try:
+            capture_window(window_id, tmp_path, fmt='jpg')
+            img = Image.open(tmp_path)
+            img.draft('L', (width, max(1, img.height * width // max(img.width, 1))))
+            return _gray_thumbnail(img, width)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+# ---------------------------------------------------------------------------
+# In-process Quartz
+# ---------------------------------------------------------------------------
+
+class QuartzCapture:
+    """CGWindowListCreateImage straight into a PIL image."""
+
+    name = 'quartz'
+
+    def _grab(self, window_id: int, nominal: bool) -> tuple[Image.Image, int]:
+        """(image, buffer bytes) of one window without its shadow."""
+        import Quartz
+        from PIL import Image
+
+        options = Quartz.kCGWindowImageBoundsIgnoreFraming
+        options |= (Quartz.kCGWindowImageNominalResolution if nominal
+                    else Quartz.kCGWindowImageBestResolution)
+        cg_image = Quartz.CGWindowListCreateImage(
+            Quartz.CGRectNull, Quartz.kCGWindowListOptionIncludingWindow,
+            window_id, options,
+        )
+        if cg_image is None:
+            raise RuntimeError(f'CGWindowListCreateImage returned nothing for window {window_id}')
+        width = Quartz.CGImageGetWidth(cg_image)
+        height = Quartz.CGImageGetHeight(cg_image)
+        if not width or not height:
+            raise RuntimeError(f'window {window_id} captured as an empty image')
+        stride = Quartz.CGImageGetBytesPerRow(cg_image)
+        data = bytes(Quartz.CGDataProviderCopyData(Quartz.CGImageGetDataProvider(cg_image)))
+        # Window images are 32-bit little-endian premultiplied-first: BGRA in memory
+        img = Image.frombuffer('RGBA', (width, height), data, 'raw', 'BGRA', stride, 1)
+        return img, len(data)
+
+    def capture(self, window_id, scale=None):
+        native = _native_scale()
+        if not scale or scale >= native:
+            img, nbytes = self._grab(window_id, nominal=False)
+            scale = native
+        elif scale <= 1.0:
+            img, nbytes = self._grab(window_id, nominal=True)
+            if scale < 1.0:
+                img = _resize(img, scale)
+        else:
+            img, nbytes = self._grab(window_id, nominal=False)
+            img = _resize(img, scale / native)
+        frame = Frame(image=img, scale=scale)
+        frame.capture = {'bytes': nbytes}
+        return frame
+
+    def thumbnail(self, window_id, width):
+        img, _ = self._grab(window_id, nominal=True)
+        return _gray_thumbnail(img, width)
+
+
+# ---------------------------------------------------------------------------
+# Fake
+# ---------------------------------------------------------------------------
+
+class FakeCapture:
+    """Deterministic synthetic window captures.
+
+    Each window is a size in screen points and a page number; the same
+    (window, page, scale) always renders the same pixels, and bumping
+    page changes them. calls counts capture() and thumbnail() calls.
+    """
+
+    name = 'fake'
+
+    def __init__(self, size: tuple[int, int] = (1280, 800), native_scale: float = 2.0) -> None:
+        self.size = size
+        self.native_scale = native_scale
+        self.pages: dict[int, int] = {}
+        self.calls = {'capture': 0, 'thumbnail': 0}
+
+    def render(self, window_id: int, scale: float) -> Image.Image:
+        from PIL import Image, ImageDraw
+
+        width = max(1, round(self.size[0] * scale))
+        height = max(1, round(self.size[1] * scale))
+        page = self.pages.get(window_id, 0)
+        img = Image.new('RGB', (width, height), (240, 240, 240))
+        draw = ImageDraw.Draw(img)
+        # Chrome bar, then a few page-dependent blocks
+        draw.rectangle((0, 0, width, round(88 * scale)), fill=(60, 60, 60))
+        for i in range(4):
+            top = round((120 + i * 150) * scale)
+            left = round(((page * 97 + i * 53) % 600 + 40) * scale)
+            shade = (page * 31 + i * 67) % 200
+            draw.rectangle((left, top, left + round(300 * scale), top + round(90 * scale)),
+                           fill=(shade, 90, 200 - shade))
+        return img
+
+    def capture(self, window_id, scale=None):
+        self.calls['capture'] += 1
+        scale = min(scale or self.native_scale, self.native_scale)
+        img = self.render(window_id, scale)
+        frame = Frame(image=img, scale=scale)
+        frame.capture = {'bytes': img.width * img.height * 4}
+        return frame
+
+    def thumbnail(self, window_id, width):
+        self.calls['thumbnail'] += 1
+        return _gray_thumbnail(self.render(window_id, 1.0), width)
+
+
+# ---------------------------------------------------------------------------
+# Selection
+# ---------------------------------------------------------------------------
+
+_backend: CaptureBackend | None = None
+_quartz = QuartzCapture()
+_fallback = ScreencaptureCapture()
+_quartz_unavailable = False
+
+
+def set_backend(backend: CaptureBackend | None) -> None:
+    """Use backend for all captures (None: choose from CAPTURE_BACKEND)."""
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> CaptureBackend:
+    if _backend is not None:
+        return _backend
+    if os.environ.get('CAPTURE_BACKEND', 'quartz') == 'screencapture' or _quartz_unavailable:
+        return _fallback
+    return _quartz
+
+
+def capture_scale() -> float | None:
+    """CAPTURE_SCALE, or None for the native scale."""
+    scale = float(os.environ.get('CAPTURE_SCALE', '0') or 0)
+    return scale if scale > 0 else None
+
+
+def _native_scale() -> float:
+    from agent.input.window_registry import window_registry
+    return window_registry.display_scale()
+
+
+def _with_fallback(method: str, window_id: int, *args):
+    """Call method on the backend; retry on screencapture if Quartz fails."""
+    global _quartz_unavailable
+    backend = get_backend()
+    try:
+        return backend, getattr(backend, method)(window_id, *args)
+    except (RuntimeError, AttributeError, ImportError, ValueError) as exc:
+        if backend is not _quartz:
+            raise
+        if isinstance(exc, (AttributeError, ImportError)):
+            # The API is gone (pyobjc / macOS version): stop trying it
+            _quartz_unavailable = True
+            log.warning('In-process capture unavailable (%s); using screencapture', exc)
+        else:
+            log.debug('In-process capture of window %d failed (%s); using screencapture',
+                      window_id, exc)
+        return _fallback, getattr(_fallback, method)(window_id, *args)
+
+
+def capture_frame(window_id: int, scale: float | None = None) -> Frame:
+    """Capture a window as a Frame, at scale or CAPTURE_SCALE.
+
+    frame.capture records {backend, ms, bytes, scale, size}.
+    """
+    if scale is None:
+        scale = capture_scale()
+    t0 = time.perf_counter()
+    backend, frame = _with_fallback('capture', window_id, scale)
+    frame.capture = {
+        'backend': backend.name,
+        'ms': round((time.perf_counter() - t0) * 1000, 1),
+        'bytes': (frame.capture or {}).get('bytes'),
+        'scale': frame.scale,
+        'size': list(frame.size),
+    }
+    return frame
+
+
+def capture_thumbnail(window_id: int, width: int = 160) -> Image.Image:
+    """Small grayscale capture for the settle detector."""
+    return _with_fallback('thumbnail', window_id, width)[1]
@@ -7,6 +7,9 @@ from pathlib import Path
 
 AGENT_PORT = int(os.getenv('AGENT_PORT', '8421'))
 MAX_CONCURRENT_AGENT_JOBS = int(os.getenv('MAX_CONCURRENT_AGENT_JOBS', '3'))
+# Jobs that may hold a parked Chrome session (waiting for a user's OTP or
+# credential) without using an execution slot. Bounded by memory, not GUI.
+MAX_PARKED_AGENT_JOBS = int(os.getenv('MAX_PARKED_AGENT_JOBS', '6'))
 
 # --- VLM (production executor) ---
 # WARNING: These module-level constants are read at import time, BEFORE
@@ -39,6 +42,10 @@ def get_vlm_config() -> dict:
         'coord_normalize': _bool('VLM_COORD_NORMALIZE', 'true'),
         'coord_yx': _bool('VLM_COORD_YX', ''),
         'coord_square_pad': _bool('VLM_COORD_SQUARE_PAD', ''),
+        'stream': _bool('VLM_STREAM', ''),
+        'response_format': os.environ.get('VLM_RESPONSE_FORMAT', '').strip().lower(),
+        'request_layout': os.environ.get('VLM_REQUEST_LAYOUT', 'legacy').strip().lower(),
+        'cache_hints': os.environ.get('VLM_CACHE_HINTS', 'cache_prompt').strip(),
     }
 
 SERVICE_URLS: dict[str, str] = {
@@ -2,7 +2,29 @@
 
 On each VLM step, saves the screenshot (PNG) and VLM response (JSON) to
 ~/.unsaltedbutter/debug/{job_id}/. On success the folder is deleted. On
-failure it persists for operator review. Old folders are pruned on startup.
+failure it persists for operator review. Old folders are pruned and
+archives evicted on startup, then at most hourly as traces are written.
+
+With ring_size > 0 the trace is a flight recorder: save_step only keeps
+the step in memory as compact bytes (the full-resolution PNG, encoded on
+a background writer thread unless the capture already has one, the JPEG
+sent to the VLM, response, prompt, diagnostics), the last ring_size
+steps of them up to a byte cap, and nothing touches disk until flush()
+after a failure. The steps are then rendered (bbox overlays) on the
+writer thread into one deduplicated archive per job, {job_id}.zip,
+indexed in index.db (see agent.trace_store); the writer also evicts old
+archives once the directory exceeds its disk budget. Successful jobs drop
+the buffer and any PNG encodes still queued. With AGENT_DEBUG_KEEP_ALL set
+every step is handed to the writer as it is recorded instead, so kept
+traces stay complete.
+
+Configuration (see get_debug_trace_config):
+  AGENT_DEBUG_RING_STEPS  steps the flight recorder keeps (default 20;
+                          0 = write every step as loose files, synchronously)
+  AGENT_DEBUG_RING_MB     memory cap for the flight recorder's steps
+                          (default 32); older steps are dropped first
+  AGENT_DEBUG_KEEP_ALL    keep traces of successful jobs too
+  AGENT_DEBUG_MAX_MB      disk budget for trace archives (default 2048)
 """
 
 from __future__ import annotations
@@ -12,22 +34,147 @@ import json
 import logging
 import os
 import shutil
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+from agent.trace_store import ARCHIVE_SUFFIX, FILE_KINDS, TraceStore
 
 log = logging.getLogger(__name__)
 
+if TYPE_CHECKING:
+    from agent.screenshot import Frame
+
 DEFAULT_DEBUG_DIR = os.path.expanduser('~/.unsaltedbutter/debug')
 DEFAULT_MAX_AGE_DAYS = 14
+MAINTAIN_INTERVAL_SECONDS = 3600
+
+
+def get_debug_trace_config() -> dict:
+    """Read debug trace configuration from os.environ at call time."""
+    keep_all = os.environ.get('AGENT_DEBUG_KEEP_ALL', '0')
+    return {
+        'ring_steps': max(0, int(os.environ.get('AGENT_DEBUG_RING_STEPS', '20'))),
+        'ring_bytes': int(float(os.environ.get('AGENT_DEBUG_RING_MB', '32')) * 1024 * 1024),
+        'keep_all': bool(keep_all) and keep_all != '0',
+        'max_bytes': int(float(os.environ.get('AGENT_DEBUG_MAX_MB', '2048')) * 1024 * 1024),
+    }
+
+
+def _image_bytes(screenshot: str | bytes | Future | Frame) -> bytes:
+    """Raw image bytes of a Frame, a base64 string, raw bytes or a pending encode."""
+    if isinstance(screenshot, bytes):
+        return screenshot
+    if isinstance(screenshot, str):
+        return base64.b64decode(screenshot)
+    if isinstance(screenshot, Future):
+        return screenshot.result()
+    return screenshot.png
+
+
+def _encode_png(image) -> bytes:
+    """PNG bytes of a PIL image (run on the writer thread)."""
+    import io
+
+    buf = io.BytesIO()
+    image.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+@dataclass
+class _TraceStep:
+    """One recorded step, held in memory until it is written."""
+
+    step: int
+    screenshot: str | bytes | Future | Frame | None
+    vlm_response: dict | None
+    phase: str
+    scale_factor: float
+    diagnostics: dict | None
+    sent_image: str | bytes  # base64, or raw bytes once compacted
+    prompt: str
+    timestamp: float
+
+    @property
+    def nbytes(self) -> int:
+        """Image bytes held by a compacted step (a PNG once encoded)."""
+        screenshot = self.screenshot
+        if isinstance(screenshot, Future):
+            done = screenshot.done() and not screenshot.cancelled()
+            screenshot = screenshot.result() if done and not screenshot.exception() else b''
+        return len(screenshot or b'') + len(self.sent_image)
+
+    def compact(self) -> _TraceStep:
+        """This step with its images as bytes and no Frame reference.
+
+        A Frame holds the decoded full-resolution image. Keeps the
+        capture PNG when the frame has one; a derived frame (the chrome
+        crop) or an in-process capture has none, so its image is
+        encoded to PNG on the writer thread and the step holds that
+        pending encode until it resolves to bytes.
+        """
+        sent = self.sent_image
+        if not isinstance(sent, bytes):
+            sent = base64.b64decode(sent) if isinstance(sent, str) and sent else b''
+        screenshot = self.screenshot
+        if isinstance(screenshot, str):
+            screenshot = base64.b64decode(screenshot)
+        elif screenshot is not None and not isinstance(screenshot, (bytes, Future)):
+            screenshot = (screenshot.captured_png
+                          or _writer().submit(_encode_png, screenshot.image))
+        return replace(self, screenshot=screenshot, sent_image=sent)
+
+
+_writer_lock = threading.Lock()
+_writer_pool: ThreadPoolExecutor | None = None
+# base dir -> time.monotonic() of its last maintain(), under _writer_lock
+_last_maintain: dict[str, float] = {}
+
+
+def _writer() -> ThreadPoolExecutor:
+    """The shared trace writer thread (created on first use).
+
+    A single worker keeps disk writes ordered and off the executor's
+    event loop. Its thread is joined at interpreter exit, so traces
+    queued by a failing job are still written during shutdown.
+    """
+    global _writer_pool
+    with _writer_lock:
+        if _writer_pool is None:
+            _writer_pool = ThreadPoolExecutor(max_workers=1,
+                                              thread_name_prefix='debug-trace')
+        return _writer_pool
+
+
+_stores: dict[str, TraceStore] = {}
+
+
+def get_trace_store(base_dir: str | None = None) -> TraceStore:
+    """The shared TraceStore for a debug directory (opened on first use)."""
+    key = os.path.abspath(base_dir or DEFAULT_DEBUG_DIR)
+    with _writer_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = TraceStore(
+                key, max_bytes=get_debug_trace_config()['max_bytes'],
+                max_age_days=DEFAULT_MAX_AGE_DAYS,
+            )
+        return store
 
 
 def _draw_bbox_overlay(
-    screenshot_b64: str,
+    screenshot: str | bytes | Frame,
     vlm_response: dict,
     scale_factor: float,
 ) -> bytes | None:
     """Draw bounding box rectangles onto a copy of the screenshot.
 
+    Accepts a base64 string, raw image bytes or a Frame (reuses its
+    decoded image).
     Returns PNG bytes, or None if no boxes found or drawing fails.
     """
     from PIL import Image, ImageDraw, ImageFont  # lazy import
@@ -59,8 +206,10 @@ def _draw_bbox_overlay(
         return None
 
     try:
-        png_bytes = base64.b64decode(screenshot_b64)
-        img = Image.open(io.BytesIO(png_bytes)).convert('RGB')
+        if isinstance(screenshot, (str, bytes)):
+            img = Image.open(io.BytesIO(_image_bytes(screenshot))).convert('RGB')
+        else:
+            img = screenshot.image.convert('RGB')  # convert() always copies
         draw = ImageDraw.Draw(img)
 
         try:
@@ -103,9 +252,17 @@ class DebugTrace:
     """Per-job debug trace writer.
 
     Args:
-        job_id: Job identifier (used as folder name).
+        job_id: Job identifier (used as folder and archive name).
         base_dir: Parent directory for all debug folders.
         enabled: When False, all operations are no-ops.
+        metadata: Job metadata saved with step 0.
+        ring_size: When > 0, run as a flight recorder keeping the last
+            ring_size steps in memory until flush(), which archives them
+            in the TraceStore. 0 writes each step as loose files inside
+            save_step.
+        keep_all: Keep successful traces. Defaults to AGENT_DEBUG_KEEP_ALL.
+        ring_bytes: Image bytes the flight recorder may hold; the oldest
+            steps are dropped beyond it. Defaults to AGENT_DEBUG_RING_MB.
     """
 
     def __init__(
@@ -114,24 +271,49 @@ class DebugTrace:
         base_dir: str | None = None,
         enabled: bool = True,
         metadata: dict | None = None,
+        ring_size: int = 0,
+        keep_all: bool | None = None,
+        ring_bytes: int | None = None,
     ) -> None:
         self.job_id = job_id
         self.enabled = enabled
         self._metadata = metadata or {}
-        resolved_dir = base_dir or DEFAULT_DEBUG_DIR
-        self._dir = Path(resolved_dir) / job_id if job_id else None
-
-        if self.enabled and self._dir:
+        self._base_dir = base_dir or DEFAULT_DEBUG_DIR
+        self._dir = Path(self._base_dir) / job_id if job_id else None
+        self.ring_size = ring_size
+        config = get_debug_trace_config()
+        self._keep_all = config['keep_all'] if keep_all is None else keep_all
+        self.ring_bytes = config['ring_bytes'] if ring_bytes is None else ring_bytes
+        self._ring: deque[_TraceStep] = deque()
+        self._dropped = 0
+        self._archived = False  # steps handed to the store
+        self._finished = False
+
+        # A flight recorder writes an archive, and only when it must
+        if self.enabled and self._dir and not self.buffered:
             self._dir.mkdir(parents=True, exist_ok=True)
+            DebugTrace.maintain_if_due(self._base_dir)
 
     @property
     def trace_dir(self) -> Path | None:
         return self._dir
 
+    @property
+    def archive_path(self) -> Path | None:
+        """Where a flight recorder's archive is written."""
+        if not self._dir:
+            return None
+        return self._dir.with_name(self._dir.name + ARCHIVE_SUFFIX)
+
+    @property
+    def buffered(self) -> bool:
+        """True if save_step only records in memory (flight recorder)."""
+        return self.ring_size > 0
+
     def save_step(
         self,
         step: int,
-        screenshot_b64: str,
+        screenshot: str | Frame,
         vlm_response: dict | None,
         phase: str = '',
         scale_factor: float = 0.0,
@@ -141,11 +323,15 @@ class DebugTrace:
     ) -> None:
         """Save a single step's screenshot and VLM response.
 
+        In flight-recorder mode this only records the step and returns
+        without any I/O; a frame without PNG bytes is encoded on the
+        writer thread.
+
         Args:
             step: Zero-based step/iteration number.
-            screenshot_b64: Base64-encoded PNG screenshot (chrome-cropped,
-                pre-resize). Saved as step_NNN.png for full-resolution
-                forensics.
+            screenshot: Frame or base64-encoded PNG screenshot
+                (chrome-cropped, pre-resize). Saved as step_NNN.png for
+                full-resolution forensics.
             vlm_response: The VLM response dict (bounding boxes, actions, etc.).
                 Never contains actual credential values.
             phase: Label like 'sign-in', 'cancel', 'resume'.
@@ -162,77 +348,175 @@ class DebugTrace:
         if not self.enabled or not self._dir:
             return
 
-        prefix = f'step_{step:03d}'
+        record = _TraceStep(
+            step=step,
+            screenshot=screenshot,
+            vlm_response=dict(vlm_response) if vlm_response is not None else None,
+            phase=phase,
+            scale_factor=scale_factor,
+            diagnostics=diagnostics,
+            sent_image=sent_image_b64,
+            prompt=prompt,
+            timestamp=time.time(),
+        )
+        if not self.buffered:
+            self._write_step(record)
+        elif self._keep_all:
+            self._archive([record])
+        else:
+            self._ring.append(record.compact())
+            # Always keep the newest step, however large. A PNG still
+            # being encoded counts once it is done.
+            while len(self._ring) > 1 and (
+                    len(self._ring) > self.ring_size
+                    or sum(r.nbytes for r in self._ring) > self.ring_bytes):
+                self._drop(self._ring.popleft())
+
+    def _drop(self, record: _TraceStep, count: bool = True) -> None:
+        """Forget a buffered step, skipping its PNG encode if still queued."""
+        if isinstance(record.screenshot, Future):
+            record.screenshot.cancel()
+        if count:
+            self._dropped += 1
+
+    def flush(self, error: str = '') -> Future | None:
+        """Archive the buffered steps in the background (job failed).
+
+        Returns the writer's future, or None if there was nothing to
+        write. A no-op after cleanup_success().
+        """
+        if self._finished or not self.buffered:
+            return None
+        self._finished = True
+        records = list(self._ring)
+        self._ring.clear()
+        if self._dropped:
+            log.info('Debug trace for job %s: archiving last %d steps (%d older dropped)',
+                     self.job_id, len(records), self._dropped)
+        if records:
+            self._archive(records)
+        if not self._archived:
+            return None
+        return _writer().submit(self._finish, 'failed', error)
+
+    def _archive(self, records: list[_TraceStep]) -> Future:
+        if not self._archived:
+            DebugTrace.maintain_if_due(self._base_dir)
+        self._archived = True
+        return _writer().submit(self._store_steps, records)
+
+    def _store_steps(self, records: list[_TraceStep]) -> None:
+        try:
+            store = get_trace_store(self._base_dir)
+            store.write_steps(self.job_id, [self._step_files(r) for r in records],
+                              self._metadata)
+        except Exception as exc:
+            log.warning('Failed to archive debug trace for job %s: %s', self.job_id, exc)
 
-        # Save screenshot as PNG (full-res, chrome-cropped)
+    def _finish(self, outcome: str, error: str) -> None:
         try:
-            png_path = self._dir / f'{prefix}.png'
-            png_bytes = base64.b64decode(screenshot_b64)
-            png_path.write_bytes(png_bytes)
+            store = get_trace_store(self._base_dir)
+            store.finish_job(self.job_id, outcome, error)
+            store.evict()
         except Exception as exc:
-            log.debug('Failed to save debug screenshot step %d: %s', step, exc)
+            log.warning('Failed to index debug trace for job %s: %s', self.job_id, exc)
 
-        # Save the actual image sent to VLM (post-resize JPEG)
-        if sent_image_b64:
+    def _step_files(self, record: _TraceStep) -> tuple[dict, dict[str, bytes]]:
+        """A step's JSON metadata and its files by kind.
+
+        Renders the screenshot PNG and the bbox overlay; any file that
+        fails is left out.
+        """
+        step = record.step
+        screenshot = record.screenshot
+        vlm_response = record.vlm_response
+        sent_image = record.sent_image
+        files: dict[str, bytes] = {}
+
+        # Screenshot as PNG (full-res, chrome-cropped); a compacted step
+        # may have only its sent image
+        if screenshot is not None:
             try:
-                sent_path = self._dir / f'{prefix}_sent.jpg'
-                sent_bytes = base64.b64decode(sent_image_b64)
-                sent_path.write_bytes(sent_bytes)
+                files['png'] = _image_bytes(screenshot)
             except Exception as exc:
-                log.debug('Failed to save sent image step %d: %s', step, exc)
+                log.debug('Failed to save debug screenshot step %d: %s', step, exc)
 
-        # Save the prompt sent to VLM
-        if prompt:
+        # The actual image sent to VLM (post-resize JPEG)
+        if sent_image:
             try:
-                prompt_path = self._dir / f'{prefix}_prompt.txt'
-                prompt_path.write_text(prompt)
+                files['sent'] = _image_bytes(sent_image)
             except Exception as exc:
-                log.debug('Failed to save prompt step %d: %s', step, exc)
-
-        # Save VLM response as JSON
-        try:
-            meta = {
-                'step': step,
-                'phase': phase,
-                'timestamp': time.time(),
-            }
-            if step == 0 and self._metadata:
-                meta['job_metadata'] = self._metadata
-            if vlm_response is not None:
-                meta['vlm_response'] = vlm_response
-            if diagnostics is not None:
-                meta['diagnostics'] = diagnostics
-            json_path = self._dir / f'{prefix}.json'
-            json_path.write_text(json.dumps(meta, indent=2, default=str))
-        except Exception as exc:
-            log.debug('Failed to save debug metadata step %d: %s', step, exc)
+                log.debug('Failed to save sent image step %d: %s', step, exc)
 
-        # Save bbox overlay (drawn on VLM-sent image when available)
-        if scale_factor > 0.0 and vlm_response is not None:
-            if sent_image_b64:
+        # The prompt sent to VLM
+        if record.prompt:
+            files['prompt'] = record.prompt.encode()
+
+        meta = {
+            'step': step,
+            'phase': record.phase,
+            'timestamp': record.timestamp,
+        }
+        if step == 0 and self._metadata:
+            meta['job_metadata'] = self._metadata
+        if vlm_response is not None:
+            meta['vlm_response'] = vlm_response
+        if record.diagnostics is not None:
+            meta['diagnostics'] = record.diagnostics
+
+        # Bbox overlay (drawn on VLM-sent image when available)
+        if record.scale_factor > 0.0 and vlm_response is not None:
+            if sent_image:
                 # Draw on the actual image the VLM saw (boxes are in sent-image space)
                 overlay_bytes = _draw_bbox_overlay(
-                    sent_image_b64, vlm_response, 1.0,
+                    sent_image, vlm_response, 1.0,
                 )
             else:
                 # Fallback: draw on original with scale_factor
                 overlay_bytes = _draw_bbox_overlay(
-                    screenshot_b64, vlm_response, scale_factor,
+                    screenshot, vlm_response, record.scale_factor,
                 )
             if overlay_bytes:
-                overlay_path = self._dir / f'{prefix}_overlay.png'
-                overlay_path.write_bytes(overlay_bytes)
+                files['overlay'] = overlay_bytes
+        return meta, files
+
+    def _write_step(self, record: _TraceStep) -> None:
+        """Write one step as loose files in the job folder."""
+        meta, files = self._step_files(record)
+        prefix = f'step_{record.step:03d}'
+        for suffix, (kind, _) in FILE_KINDS.items():
+            if kind not in files:
+                continue
+            try:
+                (self._dir / f'{prefix}{suffix}').write_bytes(files[kind])
+            except Exception as exc:
+                log.debug('Failed to save %s step %d: %s', kind, record.step, exc)
+        try:
+            json_path = self._dir / f'{prefix}.json'
+            json_path.write_text(json.dumps(meta, indent=2, default=str))
+        except Exception as exc:
+            log.debug('Failed to save debug metadata step %d: %s', record.step, exc)
 
     def cleanup_success(self) -> None:
-        """Delete the trace folder (job succeeded, no forensics needed).
+        """Delete the trace (job succeeded, no forensics needed).
 
         When AGENT_DEBUG_KEEP_ALL=1 is set, successful traces are preserved
         so operators can periodically audit why some jobs take too many steps.
+        A flight recorder drops its buffer; it has archived nothing unless
+        keep_all, in which case its steps are already queued.
         """
+        if self.buffered:
+            while self._ring:
+                self._drop(self._ring.popleft(), count=False)
+            if not self._finished and self._archived:
+                log.info('Keeping debug trace for successful job %s (AGENT_DEBUG_KEEP_ALL)',
+                         self.job_id)
+                _writer().submit(self._finish, 'success', '')
+            self._finished = True
+            return
         if not self._dir or not self._dir.exists():
             return
-        keep_all = os.environ.get('AGENT_DEBUG_KEEP_ALL', '0')
-        if keep_all and keep_all != '0':
+        if self._keep_all:
             log.info('Keeping debug trace for successful job %s (AGENT_DEBUG_KEEP_ALL)',
                      self.job_id)
             return
@@ -242,6 +526,36 @@ class DebugTrace:
         except Exception as exc:
             log.warning('Failed to delete debug trace %s: %s', self._dir, exc)
 
+    @staticmethod
+    def drain(timeout: float | None = None) -> None:
+        """Block until every queued trace write has finished."""
+        _writer().submit(lambda: None).result(timeout)
+
+    @staticmethod
+    def maintain(base_dir: str | None = None) -> Future:
+        """Evict archives over budget and prune old folders, in the background."""
+        with _writer_lock:
+            _last_maintain[base_dir or DEFAULT_DEBUG_DIR] = time.monotonic()
+
+        def run() -> None:
+            if not Path(base_dir or DEFAULT_DEBUG_DIR).exists():
+                return
+            try:
+                DebugTrace.prune_old(base_dir)
+                get_trace_store(base_dir).evict()
+            except Exception as exc:
+                log.warning('Debug trace maintenance failed: %s', exc)
+        return _writer().submit(run)
+
+    @staticmethod
+    def maintain_if_due(base_dir: str | None = None) -> Future | None:
+        """maintain(), unless it ran for base_dir in the last MAINTAIN_INTERVAL_SECONDS."""
+        with _writer_lock:
+            last = _last_maintain.get(base_dir or DEFAULT_DEBUG_DIR)
+        if last is not None and time.monotonic() - last < MAINTAIN_INTERVAL_SECONDS:
+            return None
+        return DebugTrace.maintain(base_dir)
+
     @staticmethod
     def prune_old(
         base_dir: str | None = None,
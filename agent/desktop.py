@@ -0,0 +1,87 @@
+"""
+The machine VLMExecutor drives: browser, capture, input, focus, clipboard.
+
+The executor reaches the desktop only through a handful of module-level
+names (browser, ss, mouse, keyboard, scroll_mod, player,
+focus_window_by_pid, focus_window, _clipboard_copy). A Desktop bundles
+one implementation of each; agent.vlm_executor.set_desktop() points
+those names at it, process-wide, the way window_registry.set_backend()
+swaps the window server.
+
+  macos()                  Chrome, Quartz/pyautogui input, the capture
+                           backend and pbcopy. The default.
+  agent.desktop_sim        scripted pages, simulated input and page-load
+                           latency; runs anywhere (benchmarks, Linux CI).
+
+Each field is a module or object with the functions the executor calls
+on the macOS module it replaces:
+
+  browser    create_session, navigate, get_session_window, close_session,
+             zoom_out
+  screenshot capture_frame, capture_thumbnail
+  mouse      click, move_to, position, plan_click, plan_move
+  keyboard   hotkey, press_key, type_text, plan_type
+  scroll     scroll, plan_scroll
+  player     play
+
+Coordinate math (agent.input.coords), gui_lock and the chrome crop are
+pure Python and shared by every desktop. The warm session pool
+(agent.session_pool) launches real Chrome and is macOS-only.
+"""
+
+from __future__ import annotations
+
+import logging
+import subprocess
+from dataclasses import dataclass
+from typing import Any, Callable
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Desktop:
+    """One implementation of everything VLMExecutor touches outside Python."""
+
+    name: str
+    browser: Any
+    screenshot: Any
+    mouse: Any
+    keyboard: Any
+    scroll: Any
+    player: Any
+    focus_window_by_pid: Callable[[int], bool]
+    focus_window: Callable[[str], bool]
+    clipboard_copy: Callable[[str], None]
+
+
+def clipboard_copy(text: str) -> None:
+    """Copy text to the macOS clipboard via pbcopy."""
+    try:
+        subprocess.run(
+            ['pbcopy'],
+            input=text.encode(),
+            check=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        log.warning('pbcopy failed: %s', exc)
+
+
+def macos() -> Desktop:
+    """The production desktop: real Chrome, input devices and screen."""
+    from agent import browser, screenshot
+    from agent.input import keyboard, mouse, player, scroll, window
+
+    return Desktop(
+        name='macos',
+        browser=browser,
+        screenshot=screenshot,
+        mouse=mouse,
+        keyboard=keyboard,
+        scroll=scroll,
+        player=player,
+        focus_window_by_pid=window.focus_window_by_pid,
+        focus_window=window.focus_window,
+        clipboard_copy=clipboard_copy,
+    )
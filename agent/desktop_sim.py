@@ -0,0 +1,689 @@
+"""
+Simulated desktop: scripted pages instead of Chrome, for benchmarks and CI.
+
+A SimScript is a state machine over page screenshots. Each page lists
+target regions (page pixels, below the browser chrome) that lead to
+another page or focus a form field when clicked, keys that submit it,
+how long it takes to load, and the answer a VLM should give on it for
+each prompt phase. Navigating to a URL opens the page the script maps
+it to. sim_vlm_steps() turns the answers into steps for
+agent.trace_replay.FakeVLMServer, so a whole job runs against a local
+fake endpoint.
+
+SimDesktop implements agent.desktop on one shared simulated screen:
+every session's window sits at the same place, input goes to the
+focused window and the cursor is shared, so input made outside gui_lock
+would land in the wrong job's window just as on the Mac (counted in
+stats as missed clicks). Input plans are the real humanized ones
+(agent.input plan_*) replayed with their delays, so gui_lock hold times
+match production; Chrome launch, capture and page loads sleep for
+modelled durations. Until a page has loaded, captures show the script's
+'loading' page with a moving spinner, so adaptive settle waits it out
+and a too-early capture gets the spinner answer. time_scale multiplies
+every simulated duration (0 for tests).
+
+Script JSON (image paths are relative to the script; pages without an
+image are drawn from their title and regions):
+
+    {
+      "size": [1280, 812],
+      "scale": 1.0,
+      "start": "blank",
+      "urls": {"https://www.netflix.com/": "login",
+               "https://www.netflix.com/account": "account"},
+      "pages": {
+        "login": {
+          "image": "login.png",
+          "load_ms": 900,
+          "regions": [{"bbox": [440, 300, 840, 350], "field": "email"},
+                      {"bbox": [440, 470, 840, 520], "to": "home"}],
+          "keys": {"enter": "home"},
+          "answers": {"sign-in": {"page_type": "user_pass", ...}}
+        }
+      }
+    }
+
+size is the page in image pixels (window height minus the chrome);
+scale is image pixels per screen point (2.0 for Retina recordings). A
+URL opens the page of the longest key it contains.
+"""
+
+from __future__ import annotations
+
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from agent.browser import BrowserSession
+from agent.config import ACCOUNT_URLS, SERVICE_URLS
+from agent.desktop import Desktop
+from agent.gui_lock import GuiPriority, gui_lock, gui_priority
+from agent.input import keyboard as _keyboard
+from agent.input import mouse as _mouse
+from agent.input import player as _player
+from agent.input import scroll as _scroll
+from agent.input.plan import InputPlan
+from agent.screenshot import Frame
+
+log = logging.getLogger(__name__)
+
+# Page shown (with a spinner) while another page loads
+LOADING_PAGE = 'loading'
+
+_MODIFIERS = frozenset({'command', 'shift', 'option', 'control', 'capslock', 'fn',
+                        'right_shift', 'right_option', 'right_control'})
+
+
+def _key_names() -> dict[int, str]:
+    """macOS keycode -> the first name agent.input.keyboard gives it."""
+    names: dict[int, str] = {}
+    for name, code in _keyboard._KEYCODES.items():
+        names.setdefault(code, name)
+    return names
+
+
+_KEY_NAMES = _key_names()
+_SHIFTED = {base: shifted for shifted, base in _keyboard._SHIFT_CHARS.items()}
+
+
+def key_name(key: str) -> str:
+    """Canonical name of a key ('enter' and 'return' are one key)."""
+    code = _keyboard._KEYCODES.get(key.lower())
+    return _KEY_NAMES[code] if code is not None else key.lower()
+
+
+# ---------------------------------------------------------------------------
+# Script
+# ---------------------------------------------------------------------------
+
+@dataclass
+class SimRegion:
+    """A clickable area: focuses form field `field` and/or opens page `to`."""
+
+    bbox: tuple[int, int, int, int]
+    to: str | None = None
+    field: str | None = None
+    label: str = ''
+
+    def contains(self, x: float, y: float) -> bool:
+        x1, y1, x2, y2 = self.bbox
+        return x1 <= x <= x2 and y1 <= y <= y2
+
+
+@dataclass
+class SimPage:
+    """One scripted page: screenshot, transitions, load time, VLM answers."""
+
+    name: str
+    image: Image.Image
+    load_ms: float = 800.0
+    regions: list[SimRegion] = field(default_factory=list)
+    keys: dict[str, str] = field(default_factory=dict)
+    answers: dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def fields(self) -> list[str]:
+        """Form fields in tab order."""
+        return [r.field for r in self.regions if r.field]
+
+
+@dataclass
+class SimScript:
+    pages: dict[str, SimPage]
+    urls: dict[str, str]
+    start: str
+    size: tuple[int, int]
+    scale: float = 1.0
+
+    def page_for(self, url: str) -> SimPage:
+        """The page url opens: the longest matching URL key, else start."""
+        for key in sorted(self.urls, key=len, reverse=True):
+            if key in url:
+                return self.pages[self.urls[key]]
+        log.warning('Sim: no page for %s, staying on %s', url, self.start)
+        return self.pages[self.start]
+
+    @classmethod
+    def from_dict(cls, data: dict, base_dir: str | Path | None = None) -> SimScript:
+        """Build a script from its JSON form (see module docstring)."""
+        size = tuple(data.get('size', (1280, 812)))
+        pages = {}
+        for name, spec in data['pages'].items():
+            regions = [SimRegion(bbox=tuple(r['bbox']), to=r.get('to'),
+                                 field=r.get('field'), label=r.get('label', ''))
+                       for r in spec.get('regions', [])]
+            if spec.get('image'):
+                path = Path(base_dir or '.') / spec['image']
+                image = Image.open(path).convert('RGB')
+            else:
+                image = _draw_page(name, spec.get('title', name), regions, size)
+            pages[name] = SimPage(
+                name=name, image=image,
+                load_ms=float(spec.get('load_ms', 800)),
+                regions=regions,
+                keys={key_name(k): v for k, v in spec.get('keys', {}).items()},
+                answers=dict(spec.get('answers', {})),
+            )
+        targets = {r.to for p in pages.values() for r in p.regions if r.to}
+        targets |= {to for p in pages.values() for to in p.keys.values()}
+        targets |= set(data.get('urls', {}).values()) | {data['start']}
+        missing = targets - pages.keys()
+        if missing:
+            raise ValueError(f'Script refers to unknown pages: {sorted(missing)}')
+        return cls(pages=pages, urls=dict(data.get('urls', {})), start=data['start'],
+                   size=(int(size[0]), int(size[1])), scale=float(data.get('scale', 1.0)))
+
+    @classmethod
+    def load(cls, path: str | Path) -> SimScript:
+        """Read a script JSON file; images resolve relative to it."""
+        path = Path(path)
+        return cls.from_dict(json.loads(path.read_text()), base_dir=path.parent)
+
+
+def _draw_page(name: str, title: str, regions: list[SimRegion],
+               size: tuple[int, int]) -> Image.Image:
+    """Draw a stand-in screenshot: title, regions and a per-page layout.
+
+    The blocks are seeded by the page name so every page has its own
+    perceptual hash (the fake VLM endpoint matches pages by dhash).
+    """
+    rnd = random.Random(zlib.crc32(name.encode()))
+    img = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, size[0], 60], fill=(rnd.randrange(256), 40, 60))
+    for _ in range(5):
+        x = rnd.randrange(0, size[0] - 240)
+        y = rnd.randrange(80, size[1] - 140)
+        shade = rnd.randrange(60, 200)
+        draw.rectangle([x, y, x + 240, y + 140], fill=(shade, shade, shade))
+    draw.text((40, 80), title, fill='black')
+    for region in regions:
+        fill = (250, 250, 250) if region.field else (200, 30, 40)
+        draw.rectangle(region.bbox, fill=fill, outline='black', width=2)
+        draw.text((region.bbox[0] + 10, region.bbox[1] + 10),
+                  region.label or region.field or region.to or '', fill='black')
+    return img
+
+
+def demo_script(service: str = 'netflix') -> SimScript:
+    """A drawn sign-in, cancel and resume flow at service's real URLs.
+
+    Sign-in is an email/password form submitted with Enter; the account
+    page leads to a cancel and a resume confirmation, each ending on a
+    done page with a billing date.
+    """
+    def click(target: str, point: list[int]) -> dict:
+        return {'action': 'click', 'completed': False, 'billing_end_date': None,
+                'target_description': f'{target} button', 'click_point': point}
+
+    done = {'state': 'confirmation', 'action': 'done', 'completed': True,
+            'billing_end_date': '2026-12-01'}
+    wait = {'state': 'loading', 'action': 'wait'}
+    pages = {
+        'blank': {'title': 'New Tab', 'load_ms': 0},
+        LOADING_PAGE: {
+            'title': '', 'load_ms': 0,
+            'answers': {'sign-in': {'page_type': 'spinner'},
+                        'cancel': wait, 'resume': wait},
+        },
+        'login': {
+            'title': f'{service}: Sign In', 'load_ms': 1200,
+            'regions': [
+                {'bbox': [440, 300, 840, 350], 'field': 'email'},
+                {'bbox': [440, 380, 840, 430], 'field': 'password'},
+                {'bbox': [440, 470, 840, 520], 'to': 'home', 'label': 'Sign In'},
+            ],
+            'keys': {'enter': 'home'},
+            'answers': {'sign-in': {'page_type': 'user_pass', 'email_point': [640, 325],
+                                    'password_point': [640, 405],
+                                    'button_point': [640, 495]}},
+        },
+        'home': {
+            'title': f'{service}: Home', 'load_ms': 1500,
+            'regions': [{'bbox': [1120, 10, 1240, 50], 'to': 'account',
+                         'label': 'Account'}],
+            'answers': {'sign-in': {'page_type': 'signed_in'},
+                        'cancel': {'state': 'home', **click('Account', [1180, 30])},
+                        'resume': {'state': 'home', **click('Account', [1180, 30])}},
+        },
+        'account': {
+            'title': f'{service}: Account', 'load_ms': 1000,
+            'regions': [
+                {'bbox': [500, 395, 780, 445], 'to': 'cancel_confirm',
+                 'label': 'Cancel Membership'},
+                {'bbox': [500, 495, 780, 545], 'to': 'resume_confirm',
+                 'label': 'Restart Membership'},
+            ],
+            'answers': {'cancel': {'state': 'account', **click('Cancel Membership', [640, 420])},
+                        'resume': {'state': 'account', **click('Restart Membership', [640, 520])}},
+        },
+        'cancel_confirm': {
+            'title': 'Cancel your membership?', 'load_ms': 800,
+            'regions': [{'bbox': [480, 575, 800, 625], 'to': 'cancelled',
+                         'label': 'Finish Cancellation'}],
+            'answers': {'cancel': {'state': 'confirm',
+                                   **click('Finish Cancellation', [640, 600])}},
+        },
+        'cancelled': {'title': 'Membership cancelled', 'load_ms': 800,
+                      'answers': {'cancel': done}},
+        'resume_confirm': {
+            'title': 'Restart your membership?', 'load_ms': 800,
+            'regions': [{'bbox': [480, 575, 800, 625], 'to': 'resumed',
+                         'label': 'Restart'}],
+            'answers': {'resume': {'state': 'confirm', **click('Restart', [640, 600])}},
+        },
+        'resumed': {'title': 'Welcome back', 'load_ms': 800,
+                    'answers': {'resume': done}},
+    }
+    urls = {SERVICE_URLS[service]: 'login'}
+    if service in ACCOUNT_URLS:
+        urls[ACCOUNT_URLS[service]] = 'account'
+    return SimScript.from_dict({'size': [1280, 812], 'start': 'blank',
+                                'urls': urls, 'pages': pages})
+
+
+def sim_vlm_steps(script: SimScript, service: str, plan_tier: str = '') -> list:
+    """The script's answers as steps for agent.trace_replay.FakeVLMServer.
+
+    Each step carries its phase's real prompt, so the endpoint tells
+    phases apart on the same page.
+    """
+    from agent.recording.prompts import (
+        build_cancel_prompt, build_resume_prompt, build_signin_prompt,
+    )
+    from agent.trace_replay import ReplayStep
+
+    prompts = {'sign-in': build_signin_prompt(service),
+               'cancel': build_cancel_prompt(service),
+               'resume': build_resume_prompt(service, plan_tier)}
+    steps = []
+    for page in script.pages.values():
+        if not page.answers:
+            continue
+        buf = io.BytesIO()
+        page.image.save(buf, format='PNG')
+        for phase, answer in page.answers.items():
+            steps.append(ReplayStep(
+                id=f'{page.name}/{phase}', service=service, phase=phase,
+                image=buf.getvalue(), prompt=prompts.get(phase, ''),
+                reference=answer, scale=1.0, image_scale=1.0,
+            ))
+    return steps
+
+
+# ---------------------------------------------------------------------------
+# Desktop
+# ---------------------------------------------------------------------------
+
+@dataclass
+class SimWindow:
+    """One simulated Chrome window and what has been done to it.
+
+    history lists the pages opened; submitted the form fields each page
+    held when it was left.
+    """
+
+    pid: int
+    window_id: int
+    bounds: dict
+    page: SimPage
+    url: str = 'about:blank'
+    ready_at: float = 0.0
+    focused_field: str | None = None
+    select_all: bool = False
+    fields: dict[str, str] = field(default_factory=dict)
+    history: list[str] = field(default_factory=list)
+    submitted: list[tuple[str, dict]] = field(default_factory=list)
+    closed: bool = False
+
+
+class SimDesktop:
+    """agent.desktop implementation on a simulated screen (see module docstring).
+
+    One object serves every role (browser, screenshot, mouse, keyboard,
+    scroll, player); desktop() bundles it for
+    agent.vlm_executor.set_desktop().
+
+    Args:
+        script: The pages to serve.
+        launch_ms: Chrome launch time per session.
+        capture_ms: Window capture time (the caller holds gui_lock).
+        time_scale: Multiplies every simulated duration, input delays
+            included (0: instant).
+        seed: Seeds the page-load jitter (+-20%).
+    """
+
+    def __init__(
+        self,
+        script: SimScript,
+        launch_ms: float = 1500.0,
+        capture_ms: float = 40.0,
+        time_scale: float = 1.0,
+        seed: int | None = None,
+    ) -> None:
+        self.script = script
+        self.launch_ms = launch_ms
+        self.capture_ms = capture_ms
+        self.time_scale = time_scale
+        self.windows: dict[int, SimWindow] = {}
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1000)
+        self._focused: SimWindow | None = None
+        self._cursor = (0.0, 0.0)
+        self._clipboard = ''
+        self._renders: dict[tuple[str, int], Image.Image] = {}
+
+    def desktop(self) -> Desktop:
+        return Desktop(
+            name='sim', browser=self, screenshot=self, mouse=self, keyboard=self,
+            scroll=self, player=self, focus_window_by_pid=self.focus_window_by_pid,
+            focus_window=self.focus_window, clipboard_copy=self.clipboard_copy,
+        )
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    @property
+    def chrome_px(self) -> int:
+        """Browser chrome height in image pixels (CHROME_HEIGHT points)."""
+        return int(int(os.environ.get('CHROME_HEIGHT', '88')) * self.script.scale)
+
+    def _window(self, window_id: int) -> SimWindow:
+        win = self.windows.get(window_id)
+        if win is None or win.closed:
+            raise RuntimeError(f'Chrome window not found: {window_id}')
+        return win
+
+    def _open(self, win: SimWindow, page: SimPage) -> None:
+        """Start loading page in win. Caller holds self._lock."""
+        jitter = self._rng.uniform(0.8, 1.2)
+        if win.fields:
+            win.submitted.append((win.page.name, win.fields))
+        win.page = page
+        win.ready_at = time.monotonic() + page.load_ms / 1000 * jitter * self.time_scale
+        win.focused_field = None
+        win.select_all = False
+        win.fields = {}
+        win.history.append(page.name)
+        self.stats['page_loads'] += 1
+
+    # -- browser -----------------------------------------------------------
+
+    def create_session(self, width: int = 1280, height: int = 900) -> BrowserSession:
+        """Launch a window on the start page (window size comes from the script)."""
+        self._sleep(self.launch_ms / 1000)
+        w, h = self.script.size
+        scale = self.script.scale
+        with self._lock:
+            wid = next(self._ids)
+            bounds = {'x': 0, 'y': 0, 'width': w / scale,
+                      'height': (h + self.chrome_px) / scale}
+            win = SimWindow(pid=wid, window_id=wid, bounds=bounds,
+                            page=self.script.pages[self.script.start])
+            win.history.append(win.page.name)
+            self.windows[wid] = win
+            self.stats['launches'] += 1
+        with gui_priority(GuiPriority.NAVIGATE), gui_lock:
+            self.focus_window_by_pid(wid)
+            self._sleep(0.25)
+        return BrowserSession(pid=wid, process=None, profile_dir='', window_id=wid,
+                              bounds=dict(bounds))
+
+    def navigate(self, session: BrowserSession, url: str, fast: bool = False,
+                 settle=None) -> None:
+        """Cmd+L, paste, Enter (timed like agent.browser.navigate), then load."""
+        with gui_priority(GuiPriority.NAVIGATE), gui_lock:
+            self.focus_window_by_pid(session.pid)
+            self._sleep(0.25 if fast else 0.85)
+            with self._lock:
+                win = self._window(session.window_id)
+                win.url = url
+                self._open(win, self.script.page_for(url))
+                self.stats['navigations'] += 1
+        if settle is not None:
+            settle()
+        else:
+            self._sleep(2.0 if fast else 2.5)
+
+    def get_session_window(self, session: BrowserSession) -> dict:
+        with self._lock:
+            session.bounds = dict(self._window(session.window_id).bounds)
+        return session.bounds
+
+    def zoom_out(self, session: BrowserSession, steps: int = 2) -> None:
+        with gui_priority(GuiPriority.NAVIGATE), gui_lock:
+            self.focus_window_by_pid(session.pid)
+            self._sleep(0.2 * steps)
+
+    def close_session(self, session: BrowserSession) -> None:
+        with self._lock:
+            win = self.windows.get(session.window_id)
+            if win is not None:
+                win.closed = True
+                if self._focused is win:
+                    self._focused = None
+
+    # -- screen ------------------------------------------------------------
+
+    def _render(self, win: SimWindow) -> Image.Image:
+        """Chrome strip over the page, or over the spinner while loading."""
+        loading = time.monotonic() < win.ready_at
+        page = win.page
+        spinner = -1
+        if loading:
+            page = self.script.pages.get(LOADING_PAGE, win.page)
+            spinner = int(time.monotonic() * 8) % 8
+        key = (page.name, spinner)
+        with self._lock:
+            img = self._renders.get(key)
+        if img is not None:
+            return img
+        chrome = self.chrome_px
+        img = Image.new('RGB', (page.image.width, page.image.height + chrome), 'white')
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([0, 0, img.width, chrome - 1], fill=(222, 225, 230))
+        draw.rectangle([120, chrome // 2 - 14, img.width - 120, chrome // 2 + 14],
+                       fill='white')
+        img.paste(page.image, (0, chrome))
+        if spinner >= 0:
+            cx, cy = img.width // 2, chrome + page.image.height // 2
+            angle = spinner * math.pi / 4
+            x, y = cx + 24 * math.cos(angle), cy + 24 * math.sin(angle)
+            draw.ellipse([x - 6, y - 6, x + 6, y + 6], fill=(80, 80, 80))
+        with self._lock:
+            self._renders[key] = img
+        return img
+
+    def capture_frame(self, window_id: int) -> Frame:
+        t0 = time.monotonic()
+        self._sleep(self.capture_ms / 1000)
+        with self._lock:
+            win = self._window(window_id)
+            self.stats['captures'] += 1
+        frame = Frame(image=self._render(win), scale=self.script.scale)
+        frame.capture = {'backend': 'sim', 'ms': round((time.monotonic() - t0) * 1000, 1),
+                         'bytes': 0, 'scale': self.script.scale, 'size': frame.size}
+        return frame
+
+    def capture_thumbnail(self, window_id: int, width: int = 160) -> Image.Image:
+        with self._lock:
+            win = self._window(window_id)
+        img = self._render(win)
+        return img.convert('L').resize((width, max(1, img.height * width // img.width)))
+
+    # -- window focus and clipboard ------------------------------------------
+
+    def focus_window_by_pid(self, pid: int) -> bool:
+        with self._lock:
+            win = self.windows.get(pid)
+            if win is None or win.closed:
+                return False
+            self._focused = win
+        return True
+
+    def focus_window(self, app_name: str) -> bool:
+        """Another app comes to the front: Chrome windows lose input."""
+        with self._lock:
+            self._focused = None
+        return True
+
+    def clipboard_copy(self, text: str) -> None:
+        with self._lock:
+            self._clipboard = text
+
+    # -- input -------------------------------------------------------------
+
+    def position(self) -> tuple[float, float]:
+        with self._lock:
+            return self._cursor
+
+    def plan_move(self, x: float, y: float, fast: bool = False,
+                  start: tuple[float, float] | None = None) -> InputPlan:
+        return _mouse.plan_move(x, y, fast=fast,
+                                start=start if start is not None else self.position())
+
+    def plan_click(self, x: float | None = None, y: float | None = None,
+                   button: str = 'left', fast: bool = False,
+                   start: tuple[float, float] | None = None) -> InputPlan:
+        return _mouse.plan_click(x, y, button=button, fast=fast,
+                                 start=start if start is not None else self.position())
+
+    def click(self, x: int | None = None, y: int | None = None,
+              button: str = 'left', fast: bool = False) -> None:
+        self.play(self.plan_click(x, y, button=button, fast=fast))
+
+    def move_to(self, x: int, y: int, fast: bool = False) -> None:
+        self.play(self.plan_move(x, y, fast=fast))
+
+    def plan_type(self, text: str, speed: str = 'medium',
+                  accuracy: str = 'high') -> InputPlan:
+        return _keyboard.plan_type(text, speed=speed, accuracy=accuracy)
+
+    def type_text(self, text: str, speed: str = 'medium', accuracy: str = 'high') -> None:
+        self.play(self.plan_type(text, speed=speed, accuracy=accuracy))
+
+    def press_key(self, key: str) -> None:
+        self._sleep(0.1)
+        with self._lock:
+            self._key(key_name(key))
+
+    def hotkey(self, *keys: str) -> None:
+        """Cmd+A selects the field, Cmd+V pastes; other combinations do nothing."""
+        self._sleep(0.05 * len(keys) + 0.1)
+        names = [key_name(k) for k in keys]
+        if 'command' not in names:
+            return
+        with self._lock:
+            win = self._focused
+            if win is None or win.focused_field is None:
+                return
+            if 'a' in names:
+                win.select_all = True
+            elif 'v' in names:
+                self._type(win, self._clipboard)
+
+    def plan_scroll(self, direction: str, amount: int = 3) -> InputPlan:
+        return _scroll.plan_scroll(direction, amount)
+
+    def scroll(self, direction: str, amount: int = 3) -> None:
+        self.play(self.plan_scroll(direction, amount))
+
+    def play(self, plan: InputPlan, sleep=None) -> None:
+        """Replay plan's events on the simulated screen, with their delays."""
+        sleep = sleep or self._sleep
+        if plan.start is not None:
+            plan = _player.anchor(plan, self.position())
+        for delay, op, args in plan.events:
+            if delay > 0:
+                sleep(delay)
+            with self._lock:
+                self._event(op, args)
+
+    # -- event handling (caller holds self._lock) ----------------------------
+
+    def _event(self, op: str, args: tuple) -> None:
+        if op in ('move', 'warp'):
+            self._cursor = (args[0], args[1])
+        elif op == 'up':
+            self._click(*self._cursor)
+        elif op == 'key_down':
+            keycode, flags = args
+            name = _KEY_NAMES.get(keycode, '')
+            if name in _MODIFIERS:
+                return
+            if len(name) == 1:
+                if flags & _keyboard._kCGEventFlagShift:
+                    name = name.upper() if name.isalpha() else _SHIFTED.get(name, name)
+                if self._focused is not None:
+                    self._type(self._focused, name)
+            else:
+                self._key(name)
+        elif op == 'unicode_down':
+            if self._focused is not None:
+                self._type(self._focused, args[0])
+        elif op == 'scroll':
+            self.stats['scrolls'] += 1
+
+    def _click(self, x: float, y: float) -> None:
+        self.stats['clicks'] += 1
+        win = self._focused
+        if win is None:
+            self.stats['missed_clicks'] += 1
+            return
+        b = win.bounds
+        if not (b['x'] <= x <= b['x'] + b['width'] and b['y'] <= y <= b['y'] + b['height']):
+            self.stats['missed_clicks'] += 1
+            return
+        if time.monotonic() < win.ready_at:
+            self.stats['clicks_while_loading'] += 1
+            return
+        scale = self.script.scale
+        px = (x - b['x']) * scale
+        py = (y - b['y']) * scale - self.chrome_px
+        region = next((r for r in win.page.regions if r.contains(px, py)), None)
+        win.focused_field = region.field if region else None
+        win.select_all = False
+        if region is None:
+            self.stats['missed_clicks'] += 1
+        elif region.to:
+            self._open(win, self.script.pages[region.to])
+
+    def _type(self, win: SimWindow, text: str) -> None:
+        if win.focused_field is None:
+            return
+        current = '' if win.select_all else win.fields.get(win.focused_field, '')
+        win.fields[win.focused_field] = current + text
+        win.select_all = False
+
+    def _key(self, name: str) -> None:
+        self.stats['keys'] += 1
+        win = self._focused
+        if win is None or time.monotonic() < win.ready_at:
+            return
+        if name == 'tab':
+            order = win.page.fields
+            if order:
+                i = order.index(win.focused_field) + 1 if win.focused_field in order else 0
+                win.focused_field = order[i % len(order)]
+        elif name == 'backspace':
+            if win.focused_field is not None:
+                value = win.fields.get(win.focused_field, '')
+                win.fields[win.focused_field] = '' if win.select_all else value[:-1]
+                win.select_all = False
+        elif name in win.page.keys:
+            self._open(win, self.script.pages[win.page.keys[name]])
@@ -0,0 +1,383 @@
+"""Learned flow replay: repeat verified action sequences without the VLM.
+
+Most cancel and resume flows for a service are the same clicks on the
+same pages every time. When a job succeeds, the pages it acted on (by
+perceptual hash) and the response it acted on for each are stored as a
+flow for (service, action, plan tier), with coordinates normalized to
+the page size. A flow seen succeeding min_successes times is verified.
+Later jobs replay it: at each step, if the captured page matches the
+flow's next page, the stored response is used in place of an
+inference. The first page that doesn't match hands the job back to the
+normal VLM loop for good.
+
+Some steps are always left to the VLM: the final 'done' (completion
+must be read off the page, with its billing date), responses with text
+to type or a billing date, and responses containing a credential. A
+flow keeps those as open steps, and the VLM answers them. Loading pages
+('wait', spinner) are never stored. If the VLM answers one where the
+flow expected a real page, replay carries on at the next capture.
+
+Several variants can coexist per key (e.g. with and without a cookie
+banner). Replay follows every variant that still agrees with the pages
+seen so far and takes the answer of the most successful one. A replayed
+job that fails counts against its flow. Flows that fail as often as
+they succeed stop being replayed.
+
+Opt-in. Configuration (read at call time via get_flow_replay_config()):
+  FLOW_REPLAY                'true' to enable (default off)
+  FLOW_REPLAY_PATH           SQLite file (default ~/.unsaltedbutter/flows.db)
+  FLOW_REPLAY_DISTANCE       max Hamming bits for a page match (default 6)
+  FLOW_REPLAY_MIN_SUCCESSES  successful jobs before a flow is replayed
+                             (default 2)
+  FLOW_REPLAY_MAX_FLOWS      stored flows, least recently used evicted
+                             (default 500)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from agent.frame_tracker import hamming, is_passive
+from agent.vlm_cache import _UNCACHEABLE_FIELDS
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS flows (
+    id         INTEGER PRIMARY KEY,
+    service    TEXT NOT NULL,
+    action     TEXT NOT NULL,
+    plan_tier  TEXT NOT NULL,
+    steps      TEXT NOT NULL,
+    successes  INTEGER NOT NULL DEFAULT 0,
+    failures   INTEGER NOT NULL DEFAULT 0,
+    replays    INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_flows_key ON flows(service, action, plan_tier);
+"""
+
+
+def get_flow_replay_config() -> dict:
+    """Read flow replay configuration from os.environ at call time."""
+    return {
+        'enabled': os.environ.get('FLOW_REPLAY', '').lower() in ('1', 'true', 'yes'),
+        'path': os.path.expanduser(os.environ.get(
+            'FLOW_REPLAY_PATH', '~/.unsaltedbutter/flows.db',
+        )),
+        'max_distance': int(os.environ.get('FLOW_REPLAY_DISTANCE', '6')),
+        'min_successes': int(os.environ.get('FLOW_REPLAY_MIN_SUCCESSES', '2')),
+        'max_flows': int(os.environ.get('FLOW_REPLAY_MAX_FLOWS', '500')),
+    }
+
+
+@dataclass
+class FlowStep:
+    """One step of a flow: the page acted on and what to do there.
+
+    response has its coordinates as fractions of the page size; None
+    means the VLM decides this step.
+    """
+
+    phase: str
+    phash: int
+    response: dict | None
+
+    def to_dict(self) -> dict:
+        return {'phase': self.phase, 'phash': f'{self.phash:x}', 'response': self.response}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> FlowStep:
+        return cls(data['phase'], int(data['phash'], 16), data['response'])
+
+
+@dataclass
+class Flow:
+    id: int
+    steps: list[FlowStep]
+    successes: int
+    failures: int
+
+
+def _scale_points(obj, sx: float, sy: float):
+    """Scale [x, y] points and [x1, y1, x2, y2] boxes in a response."""
+    if isinstance(obj, list):
+        return [_scale_points(v, sx, sy) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    out = {}
+    for key, val in obj.items():
+        is_coords = (isinstance(val, list) and val
+                     and all(isinstance(v, (int, float)) for v in val)
+                     and (len(val) == 4 or (len(val) == 2
+                                            and (key == 'point' or key.endswith('_point')))))
+        if is_coords:
+            out[key] = [round(v * (sx if i % 2 == 0 else sy), 5) for i, v in enumerate(val)]
+        else:
+            out[key] = _scale_points(val, sx, sy)
+    return out
+
+
+def replayable(label: str, response: dict, secrets: tuple[str, ...] = ()) -> bool:
+    """True if a later job may act on this response without asking the VLM."""
+    if response.get('action') == 'done' or response.get('completed'):
+        return False
+    if any(response.get(f) for f in _UNCACHEABLE_FIELDS):
+        return False
+    data = json.dumps(response)
+    return not any(s and len(s) >= 3 and s in data for s in secrets)
+
+
+def _same_steps(a: list[FlowStep], b: list[FlowStep], max_distance: int) -> bool:
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if (x.phase != y.phase or hamming(x.phash, y.phash) > max_distance
+                or (x.response is None) != (y.response is None)):
+            return False
+        if x.response is not None and x.response.get('action') != y.response.get('action'):
+            return False
+    return True
+
+
+class FlowStore:
+    """SQLite store of learned flows, shared by all jobs in the agent.
+
+    Thread-safe: executors on different threads share one instance.
+
+    Args:
+        path: SQLite file (':memory:' for tests).
+        max_distance: Max Hamming distance between page hashes for a match.
+        min_successes: Successful jobs before a flow is replayed.
+        max_flows: Row cap before least-recently-used eviction.
+    """
+
+    def __init__(
+        self,
+        path: str = ':memory:',
+        max_distance: int = 6,
+        min_successes: int = 2,
+        max_flows: int = 500,
+    ) -> None:
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.max_distance = max_distance
+        self.min_successes = min_successes
+        self.max_flows = max_flows
+        self._stats = {'jobs': 0, 'replayed_jobs': 0, 'lookups': 0, 'hits': 0,
+                       'divergences': 0, 'recorded': 0, 'evictions': 0}
+
+    @classmethod
+    def from_env(cls) -> FlowStore | None:
+        """Build a store from FLOW_REPLAY_* env vars, or None if disabled."""
+        cfg = get_flow_replay_config()
+        if not cfg['enabled']:
+            return None
+        return cls(cfg['path'], cfg['max_distance'], cfg['min_successes'],
+                   cfg['max_flows'])
+
+    def flows(self, service: str, action: str, plan_tier: str = '') -> list[Flow]:
+        """Verified flows for this key, most successful first."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, steps, successes, failures FROM flows'
+                ' WHERE service = ? AND action = ? AND plan_tier = ?'
+                ' AND successes >= ? AND failures < successes'
+                ' ORDER BY successes - failures DESC, last_used DESC',
+                (service, action, plan_tier, self.min_successes),
+            ).fetchall()
+        return [Flow(row_id, [FlowStep.from_dict(s) for s in json.loads(steps)], ok, bad)
+                for row_id, steps, ok, bad in rows]
+
+    def record(self, service: str, action: str, plan_tier: str,
+               steps: list[FlowStep]) -> int:
+        """Count a successful job's steps toward their flow; returns its id."""
+        now = time.time()
+        data = json.dumps([s.to_dict() for s in steps])
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, steps FROM flows WHERE service = ? AND action = ? AND plan_tier = ?',
+                (service, action, plan_tier),
+            ).fetchall()
+            for row_id, stored in rows:
+                known = [FlowStep.from_dict(s) for s in json.loads(stored)]
+                if _same_steps(known, steps, self.max_distance):
+                    self._db.execute(
+                        'UPDATE flows SET steps = ?, successes = successes + 1,'
+                        ' last_used = ? WHERE id = ?', (data, now, row_id))
+                    break
+            else:
+                row_id = self._db.execute(
+                    'INSERT INTO flows (service, action, plan_tier, steps, successes,'
+                    ' created_at, last_used) VALUES (?, ?, ?, ?, 1, ?, ?)',
+                    (service, action, plan_tier, data, now, now),
+                ).lastrowid
+                self._stats['recorded'] += 1
+            self._evict()
+            self._db.commit()
+        return row_id
+
+    def fail(self, flow_id: int) -> None:
+        """A job that replayed this flow failed."""
+        with self._lock:
+            self._db.execute('UPDATE flows SET failures = failures + 1 WHERE id = ?',
+                             (flow_id,))
+            self._db.commit()
+
+    def _count_job(self, replay: FlowReplay) -> None:
+        with self._lock:
+            self._stats['jobs'] += 1
+            self._stats['lookups'] += replay.lookups
+            self._stats['hits'] += replay.hits
+            if replay.hits:
+                self._stats['replayed_jobs'] += 1
+                self._db.execute('UPDATE flows SET replays = replays + 1,'
+                                 ' last_used = ? WHERE id = ?', (time.time(), replay.flow_id))
+                self._db.commit()
+            if replay.diverged_at is not None:
+                self._stats['divergences'] += 1
+
+    def _evict(self) -> None:
+        """Delete least recently used flows beyond max_flows. Lock held."""
+        (count,) = self._db.execute('SELECT COUNT(*) FROM flows').fetchone()
+        excess = count - self.max_flows
+        if excess > 0:
+            self._db.execute(
+                'DELETE FROM flows WHERE id IN'
+                ' (SELECT id FROM flows ORDER BY last_used LIMIT ?)', (excess,))
+            self._stats['evictions'] += excess
+
+    def stats(self) -> dict:
+        """Counters since startup plus current table size, for /health."""
+        with self._lock:
+            count, verified = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(successes >= ? AND failures < successes), 0)'
+                ' FROM flows', (self.min_successes,),
+            ).fetchone()
+            stats = dict(self._stats)
+        stats['hit_rate'] = round(stats['hits'] / stats['lookups'], 3) if stats['lookups'] else 0.0
+        stats['flows'] = count
+        stats['verified'] = verified
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class FlowReplay:
+    """One job's side of flow replay: answers from the flow, and recording.
+
+    lookup() offers the flow's response for the captured page; observe()
+    is told every response the job acts on (replayed or not); finish()
+    stores the job's steps on success or charges the flow on failure.
+    """
+
+    def __init__(self, store: FlowStore, service: str, action: str,
+                 plan_tier: str = '') -> None:
+        self._store = store
+        self._key = (service, action, plan_tier or '')
+        self._candidates = store.flows(*self._key)
+        self._cursor = 0
+        self._open_step = False
+        self.active = bool(self._candidates)
+        self.steps: list[FlowStep] = []
+        self.lookups = 0
+        self.hits = 0
+        self.diverged_at: int | None = None
+
+    @property
+    def flow_id(self) -> int | None:
+        """The flow replay is following (or followed)."""
+        return self._candidates[0].id if self._candidates else None
+
+    @property
+    def hit_rate(self) -> float | None:
+        """Replayed steps / steps the flow was asked for (None: no flow)."""
+        if not self.lookups:
+            return None
+        return round(self.hits / self.lookups, 3)
+
+    def lookup(self, page, label: str) -> tuple[dict, float] | None:
+        """The flow's (response, scale_factor) for this page, or None.
+
+        The response's coordinates are page pixels (scale_factor 1.0).
+        """
+        self._open_step = False
+        if not self.active or page.dhash is None:
+            return None
+        alive = self._matching(page, label)
+        if not alive:
+            self.lookups += 1
+            return None
+        self._candidates = alive
+        response = alive[0].steps[self._cursor].response
+        if response is None:
+            self._open_step = True
+            return None
+        self.lookups += 1
+        self.hits += 1
+        self._cursor += 1
+        w, h = page.size
+        return _scale_points(response, w, h), 1.0
+
+    def observe(self, page, label: str, response: dict, scale_factor: float,
+                source: str, secrets: tuple[str, ...] = ()) -> None:
+        """Record the response the job acts on; follow or leave the flow."""
+        if is_passive(label, response) or page.dhash is None:
+            return
+        stored = None
+        if replayable(label, response, secrets):
+            w, h = page.size
+            stored = _scale_points(response, scale_factor / w, scale_factor / h)
+        self.steps.append(FlowStep(label, page.dhash, stored))
+        if not self.active or source == 'replay':
+            return
+        if source == 'plan':
+            # A step of the job's own action plan, checked locally: follow
+            # the flow past it if the flow has it too, never leave over it
+            alive = self._matching(page, label)
+            if alive:
+                self._candidates = alive
+                self._cursor += 1
+            return
+        if self._open_step:
+            self._cursor += 1
+            self._open_step = False
+        else:
+            self.diverge()
+
+    def _matching(self, page, label: str) -> list:
+        """Candidate flows whose next step is this page."""
+        distance = self._store.max_distance
+        return [f for f in self._candidates
+                if self._cursor < len(f.steps)
+                and f.steps[self._cursor].phase == label
+                and hamming(page.dhash, f.steps[self._cursor].phash) <= distance]
+
+    def diverge(self) -> None:
+        """Stop replaying: the page (or a replayed action) didn't follow the flow."""
+        if self.active:
+            self.active = False
+            self.diverged_at = self._cursor
+            log.info('Flow %s diverged at step %d (%d steps replayed)',
+                     self.flow_id, self._cursor, self.hits)
+
+    def finish(self, success: bool) -> None:
+        """Learn from a successful job; count a failed replay against its flow."""
+        if success and self.steps:
+            self._store.record(*self._key, self.steps)
+        elif not success and self.hits:
+            self._store.fail(self.flow_id)
+        self._store._count_job(self)
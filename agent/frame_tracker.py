@@ -0,0 +1,140 @@
+"""Perceptual frame tracking: skip inference when the page hasn't changed.
+
+Spinner and `wait` cycles used to cost a full VLM inference each time,
+even though the screen was the same one the model had just classified.
+FrameTracker remembers the perceptual hash of the page behind the last
+inference in each phase. When the next capture is within
+unchanged_distance bits of it and that response was passive (a spinner,
+a `wait`), the executor just waits again instead of calling the model.
+Acting responses (click, type) are only reused with FRAME_REUSE_ACTIVE:
+an unchanged page after a click usually means the click didn't land,
+and replaying it (worse, re-typing a credential) is rarely what is wanted.
+
+Hashes are 256-bit dHashes over the whole chrome-cropped page, so a
+spinner or blinking caret moves a few bits while real navigation moves
+dozens. _StuckDetector uses the same hashes with its own distance.
+
+Configuration (read at call time via get_frame_tracker_config()):
+  FRAME_REUSE               'true' (default) to reuse on unchanged frames
+  FRAME_REUSE_ACTIVE        'true' to also reuse non-passive responses
+                            (default false)
+  FRAME_UNCHANGED_DISTANCE  max Hamming bits for "unchanged" (default 4)
+  FRAME_STUCK_DISTANCE      max Hamming bits for stuck detection (default 2)
+  FRAME_MAX_REUSE           consecutive reuses before forcing inference (default 2)
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+
+HASH_SIZE = 16  # 16x16 gradient grid -> 256-bit hash
+
+
+def dhash(image, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: one bit per horizontal gradient on a small grid.
+
+    Downscales first (BOX filter on the full image, then grayscale on
+    the tiny result) so the cost is one pass over the pixels.
+    """
+    from PIL import Image
+
+    small = image.resize((hash_size + 1, hash_size), Image.BOX).convert('L')
+    px = small.tobytes()
+    row = hash_size + 1
+    bits = 0
+    for y in range(hash_size):
+        base = y * row
+        for x in range(hash_size):
+            bits = (bits << 1) | (px[base + x] > px[base + x + 1])
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+def get_frame_tracker_config() -> dict:
+    """Read frame-tracker configuration from os.environ at call time."""
+    return {
+        'reuse': os.environ.get('FRAME_REUSE', 'true').lower() in ('1', 'true', 'yes'),
+        'reuse_active': os.environ.get('FRAME_REUSE_ACTIVE', '').lower() in ('1', 'true', 'yes'),
+        'unchanged_distance': int(os.environ.get('FRAME_UNCHANGED_DISTANCE', '4')),
+        'stuck_distance': int(os.environ.get('FRAME_STUCK_DISTANCE', '2')),
+        'max_reuse': int(os.environ.get('FRAME_MAX_REUSE', '2')),
+    }
+
+
+def is_passive(label: str, response: dict) -> bool:
+    """True for responses that mean "nothing to do yet, look again"."""
+    if label == 'sign-in':
+        return response.get('page_type') == 'spinner'
+    return response.get('action') == 'wait' and not response.get('completed')
+
+
+class FrameTracker:
+    """Remember the last inferred frame per job and detect unchanged pages.
+
+    Args:
+        enabled: When False, reusable() always returns None.
+        unchanged_distance: Max Hamming distance treated as "same page".
+        max_reuse: Consecutive reuses allowed before a fresh inference is
+            forced (guards against a hash collision pinning a stale answer).
+        reuse_active: Also reuse responses that act (click, type); by
+            default only passive ones (see is_passive) are reused.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        unchanged_distance: int = 4,
+        max_reuse: int = 2,
+        reuse_active: bool = False,
+    ) -> None:
+        self.enabled = enabled
+        self.unchanged_distance = unchanged_distance
+        self.max_reuse = max_reuse
+        self.reuse_active = reuse_active
+        self.last_distance: int | None = None
+        self._last: tuple[str, int, dict, float] | None = None
+        self._reuse_count = 0
+
+    def reusable(self, frame, label: str) -> tuple[dict, float] | None:
+        """Return (response, scale_factor) to reuse for frame, or None.
+
+        None means: call the model. Frames that can't be hashed (not a
+        decodable image) never match.
+        """
+        self.last_distance = None
+        if not self.enabled or self._last is None:
+            return None
+        last_label, last_hash, response, scale_factor = self._last
+        if last_label != label:
+            return None
+        if not self.reuse_active and not is_passive(label, response):
+            return None
+        current = frame.dhash
+        if current is None:
+            return None
+        self.last_distance = hamming(current, last_hash)
+        if self.last_distance > self.unchanged_distance:
+            return None
+        if self._reuse_count >= self.max_reuse:
+            return None
+        self._reuse_count += 1
+        return copy.deepcopy(response), scale_factor
+
+    def record(self, frame, label: str, response: dict, scale_factor: float) -> None:
+        """Remember the frame a fresh inference was made on."""
+        current = frame.dhash
+        if current is None:
+            self._last = None
+        else:
+            self._last = (label, current, copy.deepcopy(response), scale_factor)
+        self._reuse_count = 0
+
+    def reset(self) -> None:
+        """Forget the last inference (e.g. after a forced navigation)."""
+        self._last = None
+        self._reuse_count = 0
@@ -6,14 +6,407 @@ type, paste, scroll) must be serialized because there is one mouse and
 one keyboard. This module provides the single lock that all GUI-touching
 code acquires.
 
+gui_lock is a scheduler, not a bare mutex: when several jobs wait for
+the GUI, the one with the most urgent priority class goes next (an OTP
+paste before a click, a click before a navigation, a navigation before
+a cosmetic cursor move), first come first served within a class. A
+waiter is promoted one class for every GUI_AGING_SECONDS it has waited,
+so low classes can't starve. Holds longer than GUI_MAX_HOLD_SECONDS are
+logged. Wait and hold times are kept as histograms per job and per
+class and reported on /health. gui_timing() additionally sums them for
+the current context, e.g. for one executor step.
+
+The class and the job are taken from context variables, so call sites
+stay a plain `with gui_lock:`. in_gui_thread() carries the caller's
+context into the GUI thread.
+
+The executor runs as a coroutine on the server's event loop, so blocking
+GUI sections are handed to a small dedicated thread pool via
+in_gui_thread(). Jobs waiting on an OTP, a VLM response or a settle
+delay hold no thread at all. A section waiting for gui_lock does hold
+its thread, so sections are admitted to the pool in the same priority
+order: set gui_priority() around the await, and an OTP entry queued
+behind a busy pool still starts before a navigation or cursor move
+queued earlier. The pool has one thread per concurrent job (plus one)
+unless GUI_THREADS says otherwise, so normally every waiting section
+has a thread and gui_lock alone decides the order.
+
 Usage:
-    from agent.gui_lock import gui_lock
+    from agent.gui_lock import GuiPriority, gui_lock, gui_priority, in_gui_thread
 
     with gui_lock:
         focus_window_by_pid(session.pid)
         mouse.click(x, y)
+
+    def _paste_code():
+        with gui_lock:
+            keyboard.hotkey('command', 'v')
+    with gui_priority(GuiPriority.OTP):
+        await in_gui_thread(_paste_code)
+
+Configuration:
+  GUI_THREADS           worker threads for GUI sections (default
+                        MAX_CONCURRENT_AGENT_JOBS + 1, read when the pool
+                        is first used)
+  GUI_MAX_HOLD_SECONDS  warn when one hold exceeds this (default 5)
+  GUI_AGING_SECONDS     waiting time that promotes a waiter one class
+                        (default 3; 0 disables aging)
 """
 
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import itertools
+import logging
+import os
 import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+
+from agent.config import MAX_CONCURRENT_AGENT_JOBS
+
+log = logging.getLogger(__name__)
+
+
+class GuiPriority(IntEnum):
+    """GUI scheduling classes, most urgent first."""
+
+    OTP = 0        # entering a one-time code before it expires
+    CLICK = 1      # page interaction, credential entry, captures
+    NAVIGATE = 2   # URL bar navigation, window setup, zoom
+    COSMETIC = 3   # cursor moves that only make input look human
+
+
+# Which job and class the current code acquires the GUI for
+gui_job: contextvars.ContextVar[str | None] = contextvars.ContextVar('gui_job', default=None)
+_priority: contextvars.ContextVar[GuiPriority] = contextvars.ContextVar(
+    'gui_priority', default=GuiPriority.CLICK)
+# Running wait/hold totals for the current context (see gui_timing())
+_timing: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    'gui_timing', default=None)
+
+
+@contextlib.contextmanager
+def gui_priority(priority: GuiPriority):
+    """Acquire gui_lock with this priority class inside the block."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def gui_timing() -> dict:
+    """Start summing this context's GUI waits and holds.
+
+    Returns {'acquisitions', 'wait_s', 'hold_s'}; every later acquisition
+    made from this context, including GUI sections it runs through
+    in_gui_thread(), adds to it. Replaces any earlier accumulator.
+    """
+    timing = {'acquisitions': 0, 'wait_s': 0.0, 'hold_s': 0.0}
+    _timing.set(timing)
+    return timing
+
+
+# Histogram bucket upper bounds in seconds (the last bucket is unbounded)
+HISTOGRAM_BOUNDS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Per-job stats kept for this many most recent jobs
+_MAX_TRACKED_JOBS = 64
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'max')
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS, seconds)] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> dict:
+        n = sum(self.counts)
+        return {
+            'counts': list(self.counts),
+            'mean_s': round(self.total / n, 4) if n else 0.0,
+            'max_s': round(self.max, 4),
+        }
+
+
+class _Stats:
+    __slots__ = ('acquisitions', 'wait', 'hold', 'long_holds')
+
+    def __init__(self) -> None:
+        self.acquisitions = 0
+        self.wait = _Histogram()
+        self.hold = _Histogram()
+        self.long_holds = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'acquisitions': self.acquisitions,
+            'long_holds': self.long_holds,
+            'wait': self.wait.to_dict(),
+            'hold': self.hold.to_dict(),
+        }
+
+
+class _Ticket:
+    __slots__ = ('priority', 'seq', 'queued_at', 'job_id', 'timing')
+
+    def __init__(self, priority: GuiPriority, seq: int, queued_at: float,
+                 job_id: str | None, timing: dict | None = None) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.queued_at = queued_at
+        self.job_id = job_id
+        self.timing = timing
+
+
+class GuiScheduler:
+    """Non-reentrant lock that grants waiters by priority class, then FIFO.
+
+    Drop-in for threading.Lock: supports `with`, acquire(blocking,
+    timeout), release() and locked().
+    """
+
+    def __init__(self, max_hold: float | None = None, aging: float | None = None,
+                 clock=time.monotonic) -> None:
+        self.max_hold = (max_hold if max_hold is not None
+                         else float(os.environ.get('GUI_MAX_HOLD_SECONDS', '5')))
+        self.aging = (aging if aging is not None
+                      else float(os.environ.get('GUI_AGING_SECONDS', '3')))
+        self._clock = clock
+        self._cond = threading.Condition(threading.Lock())
+        self._seq = itertools.count()
+        self._waiters: list[_Ticket] = []
+        self._granted: _Ticket | None = None
+        self._holder: _Ticket | None = None
+        self._held_since = 0.0
+        self._by_priority = {p: _Stats() for p in GuiPriority}
+        self._by_job: OrderedDict[str, _Stats] = OrderedDict()
+
+    # -- lock protocol ---------------------------------------------------
+
+    def acquire(self, blocking: bool = True, timeout: float = -1,
+                priority: GuiPriority | None = None) -> bool:
+        """Take the GUI. priority defaults to the gui_priority() in effect."""
+        ticket = _Ticket(priority if priority is not None else _priority.get(),
+                         next(self._seq), self._clock(), gui_job.get(), _timing.get())
+        with self._cond:
+            if self._holder is None and not self._waiters:
+                self._take(ticket)
+                return True
+            if not blocking:
+                return False
+            deadline = None if timeout is None or timeout < 0 else self._clock() + timeout
+            self._waiters.append(ticket)
+            while self._granted is not ticket:
+                remaining = None if deadline is None else deadline - self._clock()
+                if remaining is not None and remaining <= 0:
+                    self._waiters.remove(ticket)
+                    return False
+                self._cond.wait(remaining)
+            self._waiters.remove(ticket)
+            self._granted = None
+            self._take(ticket)
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            if self._holder is None:
+                raise RuntimeError('release unlocked gui_lock')
+            ticket, self._holder = self._holder, None
+            held = self._clock() - self._held_since
+            self._record(ticket, hold=held)
+            if self._waiters:
+                self._granted = min(self._waiters, key=self._rank)
+                self._cond.notify_all()
+        if held > self.max_hold:
+            log.warning('GUI held %.1fs by job %s (%s class)',
+                        held, ticket.job_id or '-', ticket.priority.name.lower())
+
+    def locked(self) -> bool:
+        with self._cond:
+            return self._holder is not None or self._granted is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    # -- internals (called with _cond held) ------------------------------
+
+    def _rank(self, ticket: _Ticket) -> tuple[int, int]:
+        priority = ticket.priority
+        if self.aging > 0:
+            waited = self._clock() - ticket.queued_at
+            priority = max(0, priority - int(waited / self.aging))
+        return priority, ticket.seq
+
+    def _take(self, ticket: _Ticket) -> None:
+        now = self._clock()
+        self._holder = ticket
+        self._held_since = now
+        self._record(ticket, wait=now - ticket.queued_at)
+
+    def _record(self, ticket: _Ticket, wait: float | None = None,
+                hold: float | None = None) -> None:
+        targets = [self._by_priority[ticket.priority]]
+        if ticket.job_id:
+            stats = self._by_job.get(ticket.job_id)
+            if stats is None:
+                stats = self._by_job[ticket.job_id] = _Stats()
+                while len(self._by_job) > _MAX_TRACKED_JOBS:
+                    self._by_job.popitem(last=False)
+            else:
+                self._by_job.move_to_end(ticket.job_id)
+            targets.append(stats)
+        timing = ticket.timing
+        if timing is not None:
+            if wait is not None:
+                timing['acquisitions'] += 1
+                timing['wait_s'] += wait
+            if hold is not None:
+                timing['hold_s'] += hold
+        for stats in targets:
+            if wait is not None:
+                stats.acquisitions += 1
+                stats.wait.add(wait)
+            if hold is not None:
+                stats.hold.add(hold)
+                if hold > self.max_hold:
+                    stats.long_holds += 1
+
+    # -- reporting -------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Current holder, queue and wait/hold histograms, for /health."""
+        with self._cond:
+            holder = self._holder
+            return {
+                'held_by': holder.job_id if holder else None,
+                'held_seconds': (round(self._clock() - self._held_since, 3)
+                                 if holder else None),
+                'waiting': [
+                    {'job_id': t.job_id, 'priority': t.priority.name.lower()}
+                    for t in sorted(self._waiters, key=self._rank)
+                ],
+                'bucket_bounds_s': list(HISTOGRAM_BOUNDS),
+                'by_priority': {p.name.lower(): s.to_dict()
+                                for p, s in self._by_priority.items()},
+                'by_job': {job: s.to_dict() for job, s in self._by_job.items()},
+            }
+
+
+gui_lock = GuiScheduler()
+
+
+class _Admission:
+    """Hands the GUI pool's threads to waiting sections by priority class.
+
+    Ranked like gui_lock's waiters (class, aging, then FIFO). Waiters may
+    belong to different event loops; grants are delivered on the
+    waiter's loop.
+    """
+
+    def __init__(self, slots: int, clock=time.monotonic) -> None:
+        self._lock = threading.Lock()
+        self._free = slots
+        self._seq = itertools.count()
+        self._clock = clock
+        self._waiters: list[tuple[_Ticket, asyncio.Future]] = []
+
+    async def acquire(self, priority: GuiPriority) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            entry = (_Ticket(priority, next(self._seq), self._clock(), gui_job.get()),
+                     loop.create_future())
+            self._waiters.append(entry)
+        fut = entry[1]
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    raise
+            # Granted: pass the thread on (_grant does it if the grant
+            # hadn't been delivered yet)
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            entry = min(self._waiters, key=self._rank)
+            self._waiters.remove(entry)
+        fut = entry[1]
+        fut.get_loop().call_soon_threadsafe(self._grant, fut)
+
+    def _grant(self, fut: asyncio.Future) -> None:
+        if fut.cancelled():
+            self.release()
+        else:
+            fut.set_result(None)
+
+    def _rank(self, entry: tuple[_Ticket, asyncio.Future]) -> tuple[int, int]:
+        ticket = entry[0]
+        priority = ticket.priority
+        if gui_lock.aging > 0:
+            waited = self._clock() - ticket.queued_at
+            priority = max(0, priority - int(waited / gui_lock.aging))
+        return priority, ticket.seq
+
+
+_pool: ThreadPoolExecutor | None = None
+_admission: _Admission | None = None
+_pool_lock = threading.Lock()
+
+
+def _gui_pool() -> tuple[ThreadPoolExecutor, _Admission]:
+    global _pool, _admission
+    with _pool_lock:
+        if _pool is None:
+            workers = max(1, int(os.environ.get('GUI_THREADS', '0'))
+                          or MAX_CONCURRENT_AGENT_JOBS + 1)
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gui')
+            _admission = _Admission(workers)
+        return _pool, _admission
+
+
+async def in_gui_thread(fn, *args, **kwargs):
+    """Run a blocking GUI section on the GUI thread pool and await it.
 
-gui_lock = threading.Lock()
+    Does not take gui_lock: fn acquires it around the physical input, so
+    sections that only capture or wait don't serialize other jobs. The
+    caller's context (gui_job, gui_priority) is carried into the thread;
+    gui_priority also orders admission to the pool when every thread is
+    busy.
+    """
+    pool, admission = _gui_pool()
+    await admission.acquire(_priority.get())
+    ctx = contextvars.copy_context()
+    try:
+        future = pool.submit(ctx.run, fn, *args, **kwargs)
+    except BaseException:
+        admission.release()
+        raise
+    # The thread is busy until fn returns, even if the caller stops waiting
+    future.add_done_callback(lambda _: admission.release())
+    return await asyncio.wrap_future(future)
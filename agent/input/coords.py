@@ -14,12 +14,12 @@ _display_scale_override: float | None = None
 
 
 def _get_display_scale() -> float:
-    """Return the display scale override, or detect fresh from Quartz."""
+    """Return the display scale override, or the window registry's cached scale."""
     if _display_scale_override is not None:
         return _display_scale_override
     try:
-        from agent.input.window import get_retina_scale
-        result = get_retina_scale()
+        from agent.input.window_registry import window_registry
+        result = window_registry.display_scale()
         return float(result) if isinstance(result, (int, float)) else 1.0
     except Exception:
         return 1.0
@@ -30,7 +30,7 @@ def set_display_scale(scale: float | None) -> None:
 
     The executor calls this each iteration with a value derived from the
     actual screenshot dimensions. Tests call it with 1.0 in conftest.
-    Pass None to clear the override and fall back to Quartz detection.
+    Pass None to clear the override and fall back to the detected display scale.
     """
     global _display_scale_override
     _display_scale_override = scale
@@ -3,14 +3,20 @@ Human-like keyboard operations via Quartz CGEvents.
 
 Typing with natural timing, optional typos with backspace correction.
 Uses CGEventCreateKeyboardEvent directly (works reliably from LaunchAgents).
+plan_type() computes a typing plan without touching the keyboard, so it
+can run before gui_lock is taken (see plan.py).
 """
 
 import random
 import time
 
-import Quartz
+try:
+    import Quartz
+except ImportError:  # not macOS: plan_* still work (agent.desktop_sim replays them)
+    Quartz = None
 
-from . import humanize
+from . import humanize, player
+from .plan import InputPlan
 
 # macOS virtual keycodes for common keys
 _KEYCODES: dict[str, int] = {
@@ -70,23 +76,24 @@ def _resolve_keycode(key: str) -> int:
     raise ValueError(f"Unknown key: {key!r}")
 
 
-def type_text(
+def plan_type(
     text: str,
     speed: str = 'medium',
     accuracy: str = 'high',
-) -> None:
+) -> InputPlan:
     """
-    Type text with human-like timing.
+    Plan typing text with human-like timing (see type_text).
 
-    speed: 'instant' (no delay, for setup), 'fast' (~60ms avg),
-           'medium' (~120ms avg), 'slow' (~200ms avg)
-    accuracy: 'high' (no typos), 'average' (~3% typo rate), 'low' (~8% typo rate)
+    All delays, typos and corrections are drawn here, so replaying the
+    plan only posts key events.
     """
+    events: list = []
+
     # Instant mode: fire keys as fast as possible, no humanization
     if speed == 'instant':
         for char in text:
-            _type_char(char)
-        return
+            events += _char_events(char, 0.0)
+        return InputPlan(events)
 
     actions = humanize.typo_generator(text, accuracy=accuracy)
     prev_char = ''
@@ -95,8 +102,7 @@ def type_text(
         if action['action'] == 'type':
             char = action['char']
             delay = humanize.typing_delay(speed, char, prev_char)
-            time.sleep(delay)
-            _type_char(char)
+            events += _char_events(char, delay)
             prev_char = char
 
         elif action['action'] == 'typo':
@@ -105,20 +111,34 @@ def type_text(
 
             # Type the wrong character
             delay = humanize.typing_delay(speed, wrong, prev_char)
-            time.sleep(delay)
-            _type_char(wrong)
+            events += _char_events(wrong, delay)
 
-            # Pause (noticing the mistake): 200-500ms
-            time.sleep(random.uniform(0.2, 0.5))
-
-            # Backspace
-            _press_key_raw('backspace')
-            time.sleep(random.uniform(0.05, 0.15))
+            # Pause (noticing the mistake): 200-500ms, then backspace
+            backspace = _resolve_keycode('backspace')
+            events.append((random.uniform(0.2, 0.5), 'key_down', (backspace, 0)))
+            events.append((random.uniform(0.04, 0.08), 'key_up', (backspace, 0)))
 
             # Type the correct character
-            _type_char(correct)
+            events += _char_events(correct, random.uniform(0.05, 0.15))
             prev_char = correct
 
+    return InputPlan(events)
+
+
+def type_text(
+    text: str,
+    speed: str = 'medium',
+    accuracy: str = 'high',
+) -> None:
+    """
+    Type text with human-like timing.
+
+    speed: 'instant' (no delay, for setup), 'fast' (~60ms avg),
+           'medium' (~120ms avg), 'slow' (~200ms avg)
+    accuracy: 'high' (no typos), 'average' (~3% typo rate), 'low' (~8% typo rate)
+    """
+    player.play(plan_type(text, speed=speed, accuracy=accuracy))
+
 
 def press_key(key: str) -> None:
     """
@@ -173,59 +193,52 @@ def hotkey(*keys: str) -> None:
         time.sleep(random.uniform(0.02, 0.06))
 
 
-def _type_char(char: str) -> None:
-    """Type a single character with natural press/release."""
+def _char_events(char: str, delay: float) -> list:
+    """Events typing one character after delay, with natural press/release."""
     hold_time = random.uniform(0.04, 0.10)
 
-    # Uppercase letter
+    # Uppercase letter or shifted symbol: shift down, key, shift up
     if char.isupper() and char.lower() in _KEYCODES:
         keycode = _KEYCODES[char.lower()]
-        _key_down(_KEYCODES['shift'])
-        time.sleep(random.uniform(0.02, 0.05))
-        _key_down(keycode, flags=_kCGEventFlagShift)
-        time.sleep(hold_time)
-        _key_up(keycode, flags=_kCGEventFlagShift)
-        time.sleep(random.uniform(0.02, 0.05))
-        _key_up(_KEYCODES['shift'])
-        return
-
-    # Shifted symbol
-    if char in _SHIFT_CHARS:
-        base = _SHIFT_CHARS[char]
-        keycode = _KEYCODES[base]
-        _key_down(_KEYCODES['shift'])
-        time.sleep(random.uniform(0.02, 0.05))
-        _key_down(keycode, flags=_kCGEventFlagShift)
-        time.sleep(hold_time)
-        _key_up(keycode, flags=_kCGEventFlagShift)
-        time.sleep(random.uniform(0.02, 0.05))
-        _key_up(_KEYCODES['shift'])
-        return
+    elif char in _SHIFT_CHARS:
+        keycode = _KEYCODES[_SHIFT_CHARS[char]]
+    else:
+        keycode = None
+    if keycode is not None:
+        shift = _KEYCODES['shift']
+        return [
+            (delay, 'key_down', (shift, 0)),
+            (random.uniform(0.02, 0.05), 'key_down', (keycode, _kCGEventFlagShift)),
+            (hold_time, 'key_up', (keycode, _kCGEventFlagShift)),
+            (random.uniform(0.02, 0.05), 'key_up', (shift, 0)),
+        ]
 
     # Normal character
     lower = char.lower()
     if lower in _KEYCODES:
         keycode = _KEYCODES[lower]
-        _key_down(keycode)
-        time.sleep(hold_time)
-        _key_up(keycode)
-        return
+        return [
+            (delay, 'key_down', (keycode, 0)),
+            (hold_time, 'key_up', (keycode, 0)),
+        ]
+
+    # Fallback: CGEvent with Unicode string, for characters not in our
+    # keycode map (accented, emoji, etc.)
+    return [
+        (delay, 'unicode_down', (char,)),
+        (hold_time, 'unicode_up', ()),
+    ]
+
 
-    # Fallback: use CGEvent with Unicode string
-    # For characters not in our keycode map (accented, emoji, etc.)
+def _unicode_down(char: str) -> None:
+    """Post a key-down CGEvent carrying a Unicode string."""
     event = Quartz.CGEventCreateKeyboardEvent(None, 0, True)
     Quartz.CGEventKeyboardSetUnicodeString(
         event, len(char), char,
     )
     Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
-    time.sleep(hold_time)
-    event_up = Quartz.CGEventCreateKeyboardEvent(None, 0, False)
-    Quartz.CGEventPost(Quartz.kCGHIDEventTap, event_up)
 
 
-def _press_key_raw(key: str) -> None:
-    """Internal: press a key without the public API's timing."""
-    keycode = _resolve_keycode(key)
-    _key_down(keycode)
-    time.sleep(random.uniform(0.04, 0.08))
-    _key_up(keycode)
+def _unicode_up() -> None:
+    event_up = Quartz.CGEventCreateKeyboardEvent(None, 0, False)
+    Quartz.CGEventPost(Quartz.kCGHIDEventTap, event_up)
@@ -3,6 +3,10 @@ Human-like mouse operations.
 
 All coordinates are in macOS screen points (pyautogui's native system).
 Coordinate translation from VLM image-pixels is handled by coords.py.
+
+Each operation has a plan_* counterpart that computes its timed events
+without touching the device (see plan.py). Callers holding gui_lock
+plan first and only replay inside the lock.
 """
 
 from __future__ import annotations
@@ -10,49 +14,68 @@ from __future__ import annotations
 import random
 import time
 
-import pyautogui
-import Quartz
+try:
+    import pyautogui
+    import Quartz
+except ImportError:  # not macOS: plan_* still work (agent.desktop_sim replays them)
+    pyautogui = Quartz = None
 
-from . import humanize
+from . import humanize, player
+from .plan import InputPlan, move_events, path
 
-# Safety: disable pyautogui's pause (we handle timing ourselves)
-pyautogui.PAUSE = 0
-# Keep failsafe (move mouse to corner to abort)
-pyautogui.FAILSAFE = True
+if pyautogui is not None:
+    # Safety: disable pyautogui's pause (we handle timing ourselves)
+    pyautogui.PAUSE = 0
+    # Keep failsafe (move mouse to corner to abort)
+    pyautogui.FAILSAFE = True
 
+# CGEvent type of a plain cursor move (Quartz.kCGEventMouseMoved)
+_kCGEventMouseMoved = 5
 
-def _execute_path(
-    points: list[tuple[float, float]],
-    duration: float,
-    event_type: int = Quartz.kCGEventMouseMoved,
-) -> None:
-    """Execute a mouse path via Quartz CGEvents with velocity-profiled timing."""
-    delays = humanize.velocity_profile(len(points), base_delay=duration / max(len(points), 1))
-    for i, (px, py) in enumerate(points):
-        event = Quartz.CGEventCreateMouseEvent(
-            None, event_type,
-            (px, py), Quartz.kCGMouseButtonLeft,
-        )
-        Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
-        if i < len(delays):
-            time.sleep(delays[i])
+
+def _post_move(x: float, y: float, event_type: int) -> None:
+    """Post one mouse move (or drag) CGEvent."""
+    event = Quartz.CGEventCreateMouseEvent(
+        None, event_type,
+        (x, y), Quartz.kCGMouseButtonLeft,
+    )
+    Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
 
 
-def move_to(x: int, y: int, fast: bool = False) -> None:
+def _warp(x: float, y: float) -> None:
+    pyautogui.moveTo(x, y)
+
+
+def _button_down(button: str) -> None:
+    pyautogui.mouseDown(button=button, _pause=False)
+
+
+def _button_up(button: str) -> None:
+    pyautogui.mouseUp(button=button, _pause=False)
+
+
+def plan_move(
+    x: float,
+    y: float,
+    fast: bool = False,
+    start: tuple[float, float] | None = None,
+) -> InputPlan:
     """
-    Move mouse to absolute screen coordinates with a human-like Bezier path.
+    Plan a human-like Bezier move to absolute screen coordinates.
     Includes velocity profile, jitter, and occasional overshoot.
 
+    start: where the cursor is expected to be when the plan is replayed
+        (default: where it is now). Replay re-anchors the path if the
+        cursor is elsewhere by then.
     fast: same arc shape but ~3x faster (for session setup, not page interaction)
     """
-    start = pyautogui.position()
-    sx, sy = start
+    sx, sy = start if start is not None else position()
     target = (float(x), float(y))
     distance = ((x - sx) ** 2 + (y - sy) ** 2) ** 0.5
 
     if distance < 2:
-        pyautogui.moveTo(x, y)
-        return
+        return InputPlan([(0.0, 'warp', target)], start=(sx, sy), target=target,
+                         path_events=0, fast=fast)
 
     n_points = humanize.num_waypoints(distance)
     duration = humanize.movement_duration(distance)
@@ -60,14 +83,24 @@ def move_to(x: int, y: int, fast: bool = False) -> None:
         duration *= 0.15
         n_points = max(n_points // 2, 10)
 
-    # Generate path
-    points = humanize.bezier_curve((sx, sy), target, num_points=n_points)
-    if not fast:
-        points = humanize.apply_jitter(points, magnitude=0.15 + distance * 0.00025)
-    if not fast:
-        points = humanize.apply_overshoot(points, target, probability=0.12)
+    points = path(
+        (sx, sy), target, n_points,
+        jitter=0.0 if fast else 0.15 + distance * 0.00025,
+        overshoot=0.0 if fast else 0.12,
+    )
+    return InputPlan(move_events(points, duration, _kCGEventMouseMoved),
+                     start=(sx, sy), target=target, path_events=len(points),
+                     fast=fast)
 
-    _execute_path(points, duration)
+
+def move_to(x: int, y: int, fast: bool = False) -> None:
+    """
+    Move mouse to absolute screen coordinates with a human-like Bezier path.
+    Includes velocity profile, jitter, and occasional overshoot.
+
+    fast: same arc shape but ~3x faster (for session setup, not page interaction)
+    """
+    player.play(plan_move(x, y, fast=fast))
 
 
 def move_by(dx: int, dy: int, fast: bool = False) -> None:
@@ -76,6 +109,30 @@ def move_by(dx: int, dy: int, fast: bool = False) -> None:
     move_to(cx + dx, cy + dy, fast=fast)
 
 
+def plan_click(
+    x: float | None = None,
+    y: float | None = None,
+    button: str = 'left',
+    fast: bool = False,
+    start: tuple[float, float] | None = None,
+) -> InputPlan:
+    """
+    Plan a click at coordinates (or the current position if no coords given).
+    Includes natural pre-click hover and click duration.
+    """
+    plan = InputPlan()
+    if x is not None and y is not None:
+        plan = plan_move(x, y, fast=fast, start=start)
+
+    # Pre-click hover: 100-300ms, then a natural press of 80-150ms
+    hover = random.uniform(0.1, 0.3)
+    press_duration = random.uniform(0.08, 0.15)
+    return plan.then(InputPlan([
+        (hover, 'down', (button,)),
+        (press_duration, 'up', (button,)),
+    ]))
+
+
 def click(
     x: int | None = None,
     y: int | None = None,
@@ -86,17 +143,7 @@ def click(
     Click at coordinates (or current position if no coords given).
     Includes natural pre-click hover and click duration.
     """
-    if x is not None and y is not None:
-        move_to(x, y, fast=fast)
-
-    # Pre-click hover: 100-300ms
-    time.sleep(random.uniform(0.1, 0.3))
-
-    # Click with natural press/release duration: 80-150ms
-    press_duration = random.uniform(0.08, 0.15)
-    pyautogui.mouseDown(button=button, _pause=False)
-    time.sleep(press_duration)
-    pyautogui.mouseUp(button=button, _pause=False)
+    player.play(plan_click(x, y, button=button, fast=fast))
 
 
 def double_click(x: int | None = None, y: int | None = None) -> None:
@@ -161,14 +208,13 @@ def drag(
         duration *= 0.15
         n_points = max(n_points // 3, 5)
 
-    points = humanize.bezier_curve(
+    points = path(
         (float(start_x), float(start_y)),
         (float(end_x), float(end_y)),
-        num_points=n_points,
+        n_points,
         curvature=0.15 if not fast else 0.02,
+        jitter=0.8 if not fast else 0.0,
     )
-    if not fast:
-        points = humanize.apply_jitter(points, magnitude=0.8)
 
     # Use Quartz kCGEventLeftMouseDragged so the window follows the cursor.
     # pyautogui.moveTo sends kCGEventMouseMoved which macOS ignores during drag.
@@ -176,7 +222,7 @@ def drag(
     if button == 'right':
         drag_type = Quartz.kCGEventRightMouseDragged
 
-    _execute_path(points, duration, event_type=drag_type)
+    player.play(InputPlan(move_events(points, duration, drag_type)))
 
     time.sleep(0.02 if fast else random.uniform(0.05, 0.15))
     pyautogui.mouseUp(button=button, _pause=False)
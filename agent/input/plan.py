@@ -0,0 +1,182 @@
+"""
+Precomputed, timed input plans.
+
+A plan is the full event sequence of one input operation (a click, a
+typed string, a scroll) with the delay before each event, computed ahead
+of time from the humanize primitives. Planning is pure math and runs
+outside gui_lock; the section holding the lock only replays the events
+(agent.input.player.play), so the hold lasts as long as the physical
+input itself.
+
+Long cursor paths are computed with NumPy when it is installed (one
+vectorized pass per path instead of per-point Python loops); short ones,
+where array setup costs more than it saves, and all paths without NumPy
+use the humanize functions. Both draw from the same distributions.
+agent/bin/bench_input_plan.py measures the difference.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field, replace
+
+from . import humanize
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# (delay_before_seconds, op, args). Ops are replayed by agent.input.player:
+#   move (x, y, event_type)   warp (x, y)   down (button,)   up (button,)
+#   key_down / key_up (keycode, flags)   unicode_down (char,)   unicode_up ()
+#   scroll (pixels,)   wait ()
+Event = tuple[float, str, tuple]
+
+_rng = np.random.default_rng() if np is not None else None
+
+# Paths with fewer points than this use the pure-Python primitives
+NUMPY_MIN_POINTS = 25
+
+
+@dataclass
+class InputPlan:
+    """Timed events for one input operation.
+
+    A plan that starts with a cursor path records where the path was
+    planned from (start), where it goes (target) and how many leading
+    events belong to it, so replay can re-anchor the path if the cursor
+    has moved since planning.
+    """
+
+    events: list[Event] = field(default_factory=list)
+    start: tuple[float, float] | None = None
+    target: tuple[float, float] | None = None
+    path_events: int = 0
+    fast: bool = False
+
+    @property
+    def duration(self) -> float:
+        """Total replay time in seconds (sum of delays)."""
+        return sum(e[0] for e in self.events)
+
+    def then(self, other: InputPlan) -> InputPlan:
+        """This plan followed by other. Keeps the leading path of the first."""
+        head = self if self.start is not None or not self.events else other
+        return replace(head, events=self.events + other.events)
+
+    def rebased(self, start: tuple[float, float]) -> InputPlan:
+        """Re-anchor the leading path at start.
+
+        Each path point moves by the start offset scaled down linearly to
+        zero at the target, so the path begins at start and still ends
+        exactly on the target.
+        """
+        if self.start is None or self.path_events < 2:
+            return self
+        dx = start[0] - self.start[0]
+        dy = start[1] - self.start[1]
+        n = self.path_events
+        events = list(self.events)
+        for i in range(n):
+            delay, op, args = events[i]
+            if op != 'move':
+                continue
+            w = 1 - i / (n - 1)
+            events[i] = (delay, op, (args[0] + dx * w, args[1] + dy * w) + args[2:])
+        return replace(self, events=events, start=start)
+
+
+# ---------------------------------------------------------------------------
+# Cursor paths
+# ---------------------------------------------------------------------------
+
+def path(
+    start: tuple[float, float],
+    target: tuple[float, float],
+    num_points: int,
+    curvature: float = 0.3,
+    jitter: float = 0.0,
+    overshoot: float = 0.0,
+) -> list[tuple[float, float]]:
+    """Bezier waypoints from start to target, optionally jittered and overshot.
+
+    Same shape as humanize.bezier_curve + apply_jitter + apply_overshoot.
+    """
+    if np is None or num_points < NUMPY_MIN_POINTS:
+        points = humanize.bezier_curve(start, target, num_points=num_points,
+                                       curvature=curvature)
+        if jitter:
+            points = humanize.apply_jitter(points, magnitude=jitter)
+        if overshoot:
+            points = humanize.apply_overshoot(points, target, probability=overshoot)
+        return points
+
+    pts = _np_bezier(start, target, num_points, curvature)
+    if pts is None:
+        return [start, target]
+    if jitter and len(pts) > 2:
+        pts[1:-1] += _rng.normal(0.0, jitter, (len(pts) - 2, 2))
+    if overshoot and _rng.random() <= overshoot:
+        dist = _rng.uniform(5, 20)
+        angle = _rng.uniform(0, 2 * math.pi)
+        over = (target[0] + dist * math.cos(angle), target[1] + dist * math.sin(angle))
+        pts[-1] = over
+        correction = _np_bezier(over, target, 8, 0.1)
+        if correction is not None:
+            pts = np.concatenate((pts, correction[1:]))
+        else:
+            pts = np.concatenate((pts, [target]))
+    return [tuple(p) for p in pts.tolist()]
+
+
+def _np_bezier(start, target, num_points: int, curvature: float):
+    """Cubic Bezier points as an (n + 1, 2) array, or None under 1 px."""
+    sx, sy = start
+    ex, ey = target
+    dx, dy = ex - sx, ey - sy
+    dist = math.hypot(dx, dy)
+    if dist < 1:
+        return None
+    px, py = -dy / dist, dx / dist
+    o1, o2 = _rng.uniform(-curvature, curvature, 2) * dist
+    p0 = np.array((sx, sy))
+    p1 = np.array((sx + dx * 0.33 + px * o1, sy + dy * 0.33 + py * o1))
+    p2 = np.array((sx + dx * 0.66 + px * o2, sy + dy * 0.66 + py * o2))
+    p3 = np.array((ex, ey))
+    t = np.linspace(0.0, 1.0, num_points + 1)[:, None]
+    u = 1 - t
+    return u**3 * p0 + 3 * u**2 * t * p1 + 3 * u * t**2 * p2 + t**3 * p3
+
+
+def path_delays(num_points: int, duration: float) -> list[float]:
+    """Per-point delays spreading duration with the ease-in-out profile.
+
+    Same values as humanize.velocity_profile(num_points, duration / num_points).
+    """
+    base = duration / max(num_points, 1)
+    if np is None or num_points < NUMPY_MIN_POINTS:
+        return humanize.velocity_profile(num_points, base_delay=base)
+    progress = np.linspace(0.0, 1.0, num_points)
+    speed = 0.5 + 0.5 * np.sin(np.pi * progress)
+    return (base / np.maximum(speed, 0.1)).tolist()
+
+
+def move_events(
+    points: list[tuple[float, float]],
+    duration: float,
+    event_type: int,
+) -> list[Event]:
+    """Move events along points: each point, then its profile delay.
+
+    A trailing wait keeps the delay after the last point, as the path
+    replay always did.
+    """
+    delays = path_delays(len(points), duration)
+    events: list[Event] = []
+    prev = 0.0
+    for (x, y), delay in zip(points, delays):
+        events.append((prev, 'move', (x, y, event_type)))
+        prev = delay
+    events.append((prev, 'wait', ()))
+    return events
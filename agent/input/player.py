@@ -0,0 +1,72 @@
+"""
+Replay precomputed input plans on the real mouse and keyboard.
+
+play() is the only part of an input operation that must run while
+holding gui_lock: it sleeps each event's delay and posts the event.
+
+A plan's leading cursor path was computed from where the cursor was at
+planning time. If another job moved the cursor since, the path is
+re-anchored: small displacements bend the planned path onto the actual
+start, larger ones re-plan the move from there.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Callable
+
+from .plan import InputPlan
+
+# Displacement (screen points) up to which a planned path is bent onto
+# the actual cursor position instead of being re-planned
+REANCHOR_MAX_DISTANCE = 60.0
+
+_ops: dict[str, Callable[..., None]] | None = None
+
+
+def _op_table() -> dict[str, Callable[..., None]]:
+    global _ops
+    if _ops is None:
+        from . import keyboard, mouse, scroll
+        _ops = {
+            'move': mouse._post_move,
+            'warp': mouse._warp,
+            'down': mouse._button_down,
+            'up': mouse._button_up,
+            'key_down': keyboard._key_down,
+            'key_up': keyboard._key_up,
+            'unicode_down': keyboard._unicode_down,
+            'unicode_up': keyboard._unicode_up,
+            'scroll': scroll._post_scroll,
+            'wait': lambda: None,
+        }
+    return _ops
+
+
+def anchor(plan: InputPlan, cursor: tuple[float, float]) -> InputPlan:
+    """plan with its leading path starting at cursor."""
+    if plan.start is None or plan.target is None:
+        return plan
+    offset = math.dist(cursor, plan.start)
+    if offset <= 2:
+        return plan
+    if offset <= REANCHOR_MAX_DISTANCE and plan.path_events >= 2:
+        return plan.rebased(cursor)
+    from . import mouse
+    moved = mouse.plan_move(*plan.target, fast=plan.fast, start=cursor)
+    head = (plan.path_events + 1) if plan.path_events else 1  # path + trailing wait, or a warp
+    return moved.then(InputPlan(plan.events[head:]))
+
+
+def play(plan: InputPlan, sleep: Callable[[float], None] | None = None) -> None:
+    """Replay plan's events with their delays. Caller holds gui_lock."""
+    sleep = sleep or time.sleep
+    if plan.start is not None:
+        from . import mouse
+        plan = anchor(plan, mouse.position())
+    ops = _op_table()
+    for delay, op, args in plan.events:
+        if delay > 0:
+            sleep(delay)
+        ops[op](*args)
@@ -3,47 +3,57 @@ Human-like scrolling.
 
 Uses Quartz directly (pyautogui.scroll is broken on newer macOS).
 Variable speed between scroll ticks to avoid robotic uniformity.
+plan_scroll() computes the ticks and delays without touching the device.
 """
 
 from __future__ import annotations
 
 import random
-import time
 
-import Quartz
+try:
+    import Quartz
+except ImportError:  # not macOS: plan_* still work (agent.desktop_sim replays them)
+    Quartz = None
 
+from . import player
+from .plan import InputPlan
 
-def scroll(
+
+def _post_scroll(pixels: int) -> None:
+    """Post one pixel-unit scroll wheel CGEvent."""
+    event = Quartz.CGEventCreateScrollWheelEvent(
+        None,
+        Quartz.kCGScrollEventUnitPixel,
+        1,  # number of axes
+        pixels,
+    )
+    Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
+
+
+def plan_scroll(
     direction: str,
     amount: int = 3,
     x: int | None = None,
     y: int | None = None,
-) -> None:
-    """
-    Scroll with human-like variable speed between ticks.
-
-    direction: 'up' or 'down'
-    amount: number of scroll "clicks"
-    x, y: optional position to move mouse to before scrolling
-    """
+) -> InputPlan:
+    """Plan a scroll (see scroll) without touching the device."""
+    plan = InputPlan()
     if x is not None and y is not None:
         from . import mouse as _mouse
-        _mouse.move_to(x, y)
-        time.sleep(random.uniform(0.1, 0.2))
+        plan = _mouse.plan_move(x, y)
+        settle = random.uniform(0.1, 0.2)
+    else:
+        settle = 0.0
 
     # Pixel-based scrolling via Quartz. Positive = content moves up (scroll up),
     # negative = content moves down (scroll down).
     pixels_per_click = 30
     scroll_px = pixels_per_click if direction == 'up' else -pixels_per_click
 
+    events = []
+    delay = settle
     for i in range(amount):
-        event = Quartz.CGEventCreateScrollWheelEvent(
-            None,
-            Quartz.kCGScrollEventUnitPixel,
-            1,  # number of axes
-            scroll_px,
-        )
-        Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
+        events.append((delay, 'scroll', (scroll_px,)))
 
         # Variable delay between ticks: starts slower, gets faster, then slows
         if amount > 1:
@@ -52,4 +62,21 @@ def scroll(
             delay = random.uniform(0.06, 0.15) / speed_factor
         else:
             delay = random.uniform(0.08, 0.15)
-        time.sleep(delay)
+    events.append((delay, 'wait', ()))
+    return plan.then(InputPlan(events))
+
+
+def scroll(
+    direction: str,
+    amount: int = 3,
+    x: int | None = None,
+    y: int | None = None,
+) -> None:
+    """
+    Scroll with human-like variable speed between ticks.
+
+    direction: 'up' or 'down'
+    amount: number of scroll "clicks"
+    x, y: optional position to move mouse to before scrolling
+    """
+    player.play(plan_scroll(direction, amount, x, y))
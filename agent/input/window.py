@@ -9,8 +9,11 @@ from __future__ import annotations
 
 import time
 
-import Quartz
-from AppKit import NSRunningApplication, NSWorkspace
+try:
+    import Quartz
+    from AppKit import NSRunningApplication, NSWorkspace
+except ImportError:  # not macOS: agent.desktop_sim stands in for the window server
+    Quartz = NSRunningApplication = NSWorkspace = None
 
 from . import mouse
 
@@ -31,7 +34,6 @@ def list_windows(app_name: str | None = None, pid: int | None = None) -> list[di
         owner = win.get(Quartz.kCGWindowOwnerName, '')
         title = win.get(Quartz.kCGWindowName, '')
         layer = win.get(Quartz.kCGWindowLayer, 0)
-        bounds = win.get(Quartz.kCGWindowBounds, {})
         owner_pid = win.get(Quartz.kCGWindowOwnerPID, 0)
 
         # Skip non-standard windows (menubar, dock, system UI)
@@ -48,20 +50,44 @@ def list_windows(app_name: str | None = None, pid: int | None = None) -> list[di
         if pid is not None and owner_pid != pid:
             continue
 
-        results.append({
-            'id': win.get(Quartz.kCGWindowNumber, 0),
-            'app': owner,
-            'title': title,
-            'pid': owner_pid,
-            'x': int(bounds.get('X', 0)),
-            'y': int(bounds.get('Y', 0)),
-            'width': int(bounds.get('Width', 0)),
-            'height': int(bounds.get('Height', 0)),
-        })
+        results.append(_window_dict(win))
 
     return results
 
 
+def window_info(window_id: int) -> dict | None:
+    """
+    Info for one window by id, without enumerating the others.
+
+    Returns {id, app, title, pid, x, y, width, height}, or None if the
+    window is gone or no longer on screen.
+    """
+    window_list = Quartz.CGWindowListCopyWindowInfo(
+        Quartz.kCGWindowListOptionIncludingWindow, window_id,
+    )
+    for win in window_list or ():
+        if win.get(Quartz.kCGWindowNumber, 0) != window_id:
+            continue
+        if not win.get(Quartz.kCGWindowIsOnscreen, False):
+            return None
+        return _window_dict(win)
+    return None
+
+
+def _window_dict(win) -> dict:
+    bounds = win.get(Quartz.kCGWindowBounds, {})
+    return {
+        'id': win.get(Quartz.kCGWindowNumber, 0),
+        'app': win.get(Quartz.kCGWindowOwnerName, ''),
+        'title': win.get(Quartz.kCGWindowName, ''),
+        'pid': win.get(Quartz.kCGWindowOwnerPID, 0),
+        'x': int(bounds.get('X', 0)),
+        'y': int(bounds.get('Y', 0)),
+        'width': int(bounds.get('Width', 0)),
+        'height': int(bounds.get('Height', 0)),
+    }
+
+
 def get_window_bounds(
     app_name: str,
     title_contains: str | None = None,
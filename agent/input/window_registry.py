@@ -0,0 +1,257 @@
+"""
+Cached window lookups for browser sessions.
+
+Finding a session's window used to enumerate every on-screen window
+(CGWindowListCopyWindowInfo over the whole window server) on each
+executor step, and the display scale was re-read from Quartz on every
+screenshot crop. The registry remembers each session's window id and
+refreshes just that window by id; it only falls back to a full scan
+when the tracked window is gone (closed, minimized, recreated by
+Chrome). The display scale is cached and dropped when a tracked window
+changes bounds (it may have moved to another display), on
+invalidate_scale(), or after WINDOW_SCALE_TTL seconds.
+
+The window server is reached through a backend: QuartzBackend on macOS,
+FakeWindowBackend for tests and non-macOS runs, which counts calls so
+lookup cost and invalidation can be checked.
+
+Usage:
+    from agent.input.window_registry import window_registry
+
+    win = window_registry.wait_for_window('Google Chrome', pid=pid)
+    bounds = window_registry.lookup(pid, window_id=win['id'])
+    scale = window_registry.display_scale()
+    window_registry.forget(pid)
+
+Configuration:
+  WINDOW_SCALE_TTL  seconds a cached display scale is trusted (default 30;
+                    0 re-reads it on every call)
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Protocol
+
+_BOUNDS_KEYS = ('x', 'y', 'width', 'height')
+
+
+class WindowBackend(Protocol):
+    """Window server queries the registry is built on.
+
+    Window dicts carry {id, app, title, pid, x, y, width, height}.
+    """
+
+    def list_windows(self, app_name: str | None = None,
+                     pid: int | None = None) -> list[dict]:
+        """All matching on-screen windows (full enumeration)."""
+
+    def window_info(self, window_id: int) -> dict | None:
+        """One window by id, or None if it is gone or off screen."""
+
+    def display_scale(self) -> float:
+        """Backing scale factor of the main display."""
+
+
+class QuartzBackend:
+    """The macOS window server, via agent.input.window."""
+
+    def list_windows(self, app_name=None, pid=None):
+        from agent.input import window
+        return window.list_windows(app_name, pid=pid)
+
+    def window_info(self, window_id):
+        from agent.input import window
+        return window.window_info(window_id)
+
+    def display_scale(self):
+        from agent.input import window
+        return window.get_retina_scale()
+
+
+class FakeWindowBackend:
+    """In-memory window server for tests and non-macOS runs.
+
+    calls counts queries by method name, so tests can assert how many
+    full scans a sequence of lookups cost.
+    """
+
+    def __init__(self, scale: float = 1.0) -> None:
+        self.windows: dict[int, dict] = {}
+        self.scale = scale
+        self.calls: Counter[str] = Counter()
+        self._ids = itertools.count(1000)
+
+    def open(self, pid: int, x: int = 0, y: int = 0, width: int = 1280,
+             height: int = 800, app: str = 'Google Chrome',
+             title: str = 'New Tab') -> dict:
+        """Add a window and return its info."""
+        wid = next(self._ids)
+        self.windows[wid] = {
+            'id': wid, 'app': app, 'title': title, 'pid': pid,
+            'x': x, 'y': y, 'width': width, 'height': height,
+        }
+        return dict(self.windows[wid])
+
+    def move(self, window_id: int, **bounds: int) -> None:
+        """Change any of x, y, width, height."""
+        self.windows[window_id].update(bounds)
+
+    def close(self, window_id: int) -> None:
+        self.windows.pop(window_id, None)
+
+    def list_windows(self, app_name=None, pid=None):
+        self.calls['list_windows'] += 1
+        return [dict(w) for w in self.windows.values()
+                if (not app_name or app_name.lower() in w['app'].lower())
+                and (pid is None or w['pid'] == pid)]
+
+    def window_info(self, window_id):
+        self.calls['window_info'] += 1
+        win = self.windows.get(window_id)
+        return dict(win) if win is not None else None
+
+    def display_scale(self):
+        self.calls['display_scale'] += 1
+        return self.scale
+
+
+class WindowRegistry:
+    """Tracks one window per process and caches the display scale.
+
+    Thread-safe: lookups run from GUI worker threads of several jobs.
+    """
+
+    def __init__(
+        self,
+        backend: WindowBackend | None = None,
+        scale_ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._backend = backend
+        self._scale_ttl = scale_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._windows: dict[int, dict] = {}  # pid -> last window info
+        self._scale: float | None = None
+        self._scale_read_at = 0.0
+        self._counts: Counter[str] = Counter()
+
+    @property
+    def backend(self) -> WindowBackend:
+        if self._backend is None:
+            self._backend = QuartzBackend()
+        return self._backend
+
+    def set_backend(self, backend: WindowBackend | None) -> None:
+        """Swap the backend (None: Quartz) and drop everything cached."""
+        with self._lock:
+            self._backend = backend
+            self._windows.clear()
+            self._scale = None
+
+    # -- windows --------------------------------------------------------
+
+    def wait_for_window(
+        self,
+        app_name: str,
+        pid: int | None = None,
+        timeout: float = 10.0,
+        poll: float = 0.5,
+    ) -> dict | None:
+        """Poll for a window to appear and track it. None on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            windows = self.backend.list_windows(app_name, pid=pid)
+            self._count('scans')
+            if windows:
+                win = windows[0]
+                with self._lock:
+                    self._windows[win['pid']] = win
+                return dict(win)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+
+    def lookup(self, pid: int, window_id: int = 0) -> dict | None:
+        """Current info for pid's window, or None if it has none.
+
+        Refreshes the tracked (or given) window id alone; scans all of
+        pid's windows only when that id no longer resolves to pid.
+        """
+        with self._lock:
+            tracked = self._windows.get(pid)
+        wid = window_id or (tracked['id'] if tracked else 0)
+
+        win = None
+        if wid:
+            win = self.backend.window_info(wid)
+            self._count('refreshes')
+            if win is not None and win['pid'] != pid:
+                win = None
+        if win is None:
+            windows = self.backend.list_windows(pid=pid)
+            self._count('scans')
+            win = windows[0] if windows else None
+
+        with self._lock:
+            if win is None:
+                self._windows.pop(pid, None)
+                return None
+            if tracked is not None and _bounds(tracked) != _bounds(win):
+                self._scale = None
+            self._windows[pid] = win
+        return dict(win)
+
+    def forget(self, pid: int) -> None:
+        """Stop tracking pid's window (its session closed)."""
+        with self._lock:
+            self._windows.pop(pid, None)
+
+    # -- display scale --------------------------------------------------
+
+    def display_scale(self) -> float:
+        """Cached main display scale, re-read when invalidated or stale."""
+        ttl = self._scale_ttl
+        if ttl is None:
+            ttl = float(os.environ.get('WINDOW_SCALE_TTL', '30'))
+        with self._lock:
+            if self._scale is not None and self._clock() - self._scale_read_at < ttl:
+                self._counts['scale_hits'] += 1
+                return self._scale
+        scale = float(self.backend.display_scale())
+        with self._lock:
+            self._counts['scale_reads'] += 1
+            self._scale = scale
+            self._scale_read_at = self._clock()
+        return scale
+
+    def invalidate_scale(self) -> None:
+        with self._lock:
+            self._scale = None
+
+    def stats(self) -> dict:
+        """Tracked window count and backend query counters."""
+        with self._lock:
+            return {
+                'tracked': len(self._windows),
+                'refreshes': self._counts['refreshes'],
+                'scans': self._counts['scans'],
+                'scale_reads': self._counts['scale_reads'],
+                'scale_hits': self._counts['scale_hits'],
+            }
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+
+def _bounds(win: dict) -> tuple:
+    return tuple(win[k] for k in _BOUNDS_KEYS)
+
+
+window_registry = WindowRegistry()
@@ -45,9 +45,31 @@ class ExecutionResult:
     duration_seconds: float
     step_count: int
     inference_count: int
+    inferences_reused: int = 0  # VLM calls skipped on unchanged pages
+    inferences_cached: int = 0  # VLM calls served from the response cache
+    inferences_triaged: int = 0  # steps resolved by the low-res triage pass alone
+    inferences_planned: int = 0  # VLM calls replaced by a checked plan step
+    inferences_replayed: int = 0  # VLM calls replaced by a learned flow step
+    replay_hit_rate: float | None = None  # replayed / flow steps tried (None: no flow)
     error_message: str = ''
     error_code: str = ''  # structured: 'credential_invalid', 'captcha', ''
     otp_required: bool = False
     billing_date: str | None = None
+    # One record per executor iteration: {iteration, phase, action, source,
+    # <phase>_ms..., encode/network/server/parse_ms, tokens, gui_wait_ms,
+    # gui_hold_ms, total_ms}. The first record (iteration None) is setup.
     step_results: list[dict] = field(default_factory=list)
     screenshots: list[dict] = field(default_factory=list)  # [{step, timestamp, path}]
+
+    def step_timings(self) -> dict:
+        """Per-job totals of step_results' numeric fields, plus step count.
+
+        Sums every *_ms and *_tokens field across steps, e.g.
+        {'steps': 12, 'vlm_ms': 48210, 'settle_ms': 30500, ...}.
+        """
+        totals: dict = {'steps': len(self.step_results)}
+        for record in self.step_results:
+            for key, value in record.items():
+                if (key.endswith('_ms') or key.endswith('_tokens')) and value:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
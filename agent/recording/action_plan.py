@@ -0,0 +1,158 @@
+"""Multi-step action plans for the cancel and resume phases.
+
+The sign-in phase already turns one classification into several local
+actions (click email, type, click password, type, submit). A
+cancel/resume response is one action per inference, even when the next
+click is plain on the same screenshot: pick a survey reason, then
+"Continue"; tick "I understand", then "Cancel membership".
+
+In plan mode the cancel/resume prompt also asks for "next_steps": up to
+max_steps further clicks, in order, whose targets are visible on the
+same screenshot (with schema-constrained decoding, the plan variant of
+the action schema allows exactly that many). The executor performs the
+main action as usual. Then, instead of the next inference, it captures
+the settled page and checks the next step locally: the area around its
+click point must still look as it did on the screenshot the plan was
+made from (mean grey-level difference of at most VLM_PLAN_REGION_DIFF).
+The check passes if the first click only changed part of the page (a
+radio button, a checkbox). It fails if the click navigated, opened a
+dialog over the target or moved it. A passing step is clicked without
+asking the VLM. At the first failed check the rest of the plan is
+dropped and the loop re-infers on that page.
+
+Steps can't reach pages that don't exist yet. A button on a confirm
+dialog that the main click opens has no coordinates on this
+screenshot, so it is always a new inference.
+
+Configuration (read at call time via get_plan_config()):
+  VLM_ACTION_PLANS       'true' to enable (default off)
+  VLM_PLAN_MAX_STEPS     follow-on steps per response (default 3)
+  VLM_PLAN_REGION_DIFF   max mean grey difference (0-1) around a step's
+                         target for it to run (default 0.04)
+"""
+
+from __future__ import annotations
+
+import os
+
+from PIL import ImageChops, ImageStat
+
+# Target area checked before a step: this fraction of the page width on
+# each side of the click point (about 100 px across on a 1280 px page).
+_REGION_HALF_WIDTH = 0.04
+
+_PLAN_PROMPT = """
+Plan mode: if, after your action, more clicks on THIS screenshot are
+certainly needed next (e.g. select a survey reason, then press
+Continue), list up to {max_steps} of them in order as "next_steps":
+[{{"action": "click", "click_point": [x, y], "target_description": "..."}}].
+Only include targets visible in this screenshot that your action will
+not hide or move. Use [] when unsure or when the next screen is unknown.
+"""
+
+
+def get_plan_config() -> dict:
+    """Read action plan configuration from os.environ at call time."""
+    return {
+        'enabled': os.environ.get('VLM_ACTION_PLANS', '').lower() in ('1', 'true', 'yes'),
+        'max_steps': int(os.environ.get('VLM_PLAN_MAX_STEPS', '3')),
+        'region_diff': float(os.environ.get('VLM_PLAN_REGION_DIFF', '0.04')),
+    }
+
+
+def build_plan_prompt(prompt: str, max_steps: int) -> str:
+    """The cancel/resume prompt with the plan instructions appended.
+
+    The phase prompt is kept verbatim as the prefix, so the backend's
+    prompt prefix cache still applies.
+    """
+    return prompt + _PLAN_PROMPT.format(max_steps=max_steps)
+
+
+def plan_steps(response: dict, max_steps: int) -> list[dict]:
+    """The response's usable follow-on steps (clicks with a point), in order.
+
+    Stops at the first malformed step: later steps assume it ran.
+    """
+    if response.get('action') != 'click' or response.get('completed'):
+        return []
+    steps = []
+    for step in (response.get('next_steps') or [])[:max_steps]:
+        if not isinstance(step, dict) or step.get('action') != 'click':
+            break
+        point = step.get('click_point')
+        if not (isinstance(point, list) and len(point) == 2
+                and all(isinstance(v, (int, float)) for v in point)):
+            break
+        steps.append(step)
+    return steps
+
+
+def region_diff(before, after, point: tuple[float, float]) -> float:
+    """Mean grey-level difference (0-1) of two pages around point (page px)."""
+    w, h = before.size
+    if after.size != (w, h):
+        return 1.0
+    half = max(8, round(w * _REGION_HALF_WIDTH))
+    x, y = point
+    box = (max(0, int(x) - half), max(0, int(y) - half),
+           min(w, int(x) + half), min(h, int(y) + half))
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return 1.0
+    a = before.image.crop(box).convert('L')
+    b = after.image.crop(box).convert('L')
+    return ImageStat.Stat(ImageChops.difference(a, b)).mean[0] / 255
+
+
+class ActionPlan:
+    """The follow-on steps of one response and the page they were planned on.
+
+    Args:
+        page: The frame the response was inferred from.
+        steps: plan_steps() of the response.
+        scale_factor: The response's scale (VLM image -> page pixels).
+        state: The response's state, carried into each step's response.
+        max_diff: region_diff() above which a step is abandoned.
+    """
+
+    def __init__(self, page, steps: list[dict], scale_factor: float,
+                 state: str = '', max_diff: float = 0.04) -> None:
+        self._page = page
+        self._steps = list(steps)
+        self._scale_factor = scale_factor
+        self._state = state
+        self.max_diff = max_diff
+        self.total = len(steps)
+        self.last_diff: float | None = None
+        self.abandoned = False
+
+    def __bool__(self) -> bool:
+        return bool(self._steps)
+
+    def next(self, page) -> tuple[dict, float] | None:
+        """(response, scale_factor) for the next step on page, or None.
+
+        None, and the plan is dropped, when the step's target no longer
+        looks as planned.
+        """
+        if not self._steps:
+            return None
+        step = self._steps[0]
+        point = [c * self._scale_factor for c in step['click_point']]
+        self.last_diff = region_diff(self._page, page, point)
+        if self.last_diff > self.max_diff:
+            self._steps.clear()
+            self.abandoned = True
+            return None
+        self._steps.pop(0)
+        index = self.total - len(self._steps)
+        return {
+            'state': f'{self._state} (plan step {index}/{self.total})',
+            'action': 'click',
+            'completed': False,
+            'billing_end_date': None,
+            'click_point': list(step['click_point']),
+            'target_description': str(step.get('target_description') or ''),
+            'text_to_type': None,
+            'key_to_press': None,
+        }, self._scale_factor
@@ -0,0 +1,155 @@
+"""Per-(service, phase) image budgets for VLM requests.
+
+Vision-token count and prefill time scale with the pixels sent. Sign-in
+page classification ("is this an email field or a profile picker?")
+survives a much smaller image than grounding a small "Cancel membership"
+link, so one VLM_MAX_WIDTH / JPEG quality for everything either wastes
+prefill on the easy phases or costs accuracy on the hard ones.
+
+A budget is width, JPEG/WebP quality, format and an optional grayscale
+flag. ImageBudgetPolicy picks one per request from a table keyed by
+'service:phase' ('*' wildcard); the most specific match wins:
+
+    service:phase  >  service:*  >  *:phase  >  *:*  >  default
+
+The default budget is VLM_MAX_WIDTH at JPEG quality 85, i.e. exactly
+what is sent without a table. Use agent/bin/eval_image_budget.py on kept
+debug traces to pick table values.
+
+Phases with their own default (the two-tier triage phases, see
+agent.recording.triage) only match entries that name them explicitly,
+so a '*:*' or 'netflix:*' entry sized for grounding never inflates the
+low-res classification pass.
+
+Configuration (read at call time via get_image_budget_config()):
+  VLM_IMAGE_BUDGETS  comma-separated 'service:phase=budget' entries, where
+                     budget is 'width[/qNN][/webp][/gray]', e.g.
+                     '*:sign-in=640/q70, netflix:cancel=1280'
+  VLM_TRIAGE_BUDGET  default budget of the triage phases (default 512/q70)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass
+
+DEFAULT_QUALITY = 85
+FORMATS = ('jpeg', 'webp')
+
+
+@dataclass(frozen=True)
+class ImageBudget:
+    """How one request's screenshot is encoded."""
+
+    width: int
+    quality: int = DEFAULT_QUALITY
+    format: str = 'jpeg'
+    grayscale: bool = False
+
+    def __str__(self) -> str:
+        text = f'{self.width}/q{self.quality}'
+        if self.format != 'jpeg':
+            text += f'/{self.format}'
+        if self.grayscale:
+            text += '/gray'
+        return text
+
+
+def parse_budget(text: str, default_width: int) -> ImageBudget:
+    """Parse 'width[/qNN][/webp|jpeg][/gray]'. An empty width keeps default_width.
+
+    Raises ValueError on an unknown token.
+    """
+    parts = [p.strip().lower() for p in text.split('/')]
+    width = int(parts[0]) if parts[0] else default_width
+    quality, fmt, gray = DEFAULT_QUALITY, 'jpeg', False
+    for token in parts[1:]:
+        if token.startswith('q') and token[1:].isdigit():
+            quality = int(token[1:])
+        elif token in FORMATS:
+            fmt = token
+        elif token == 'gray':
+            gray = True
+        elif token:
+            raise ValueError(f'Unknown image budget token {token!r} in {text!r}')
+    if width <= 0 or not 1 <= quality <= 100:
+        raise ValueError(f'Invalid image budget {text!r}')
+    return ImageBudget(width, quality, fmt, gray)
+
+
+def parse_budget_table(spec: str, default_width: int) -> dict[tuple[str, str], ImageBudget]:
+    """Parse a VLM_IMAGE_BUDGETS value into {(service, phase): budget}."""
+    table: dict[tuple[str, str], ImageBudget] = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f'Image budget entry {item!r} needs service:phase=budget')
+        service, _, phase = key.partition(':')
+        table[(service.strip() or '*', phase.strip() or '*')] = parse_budget(
+            value, default_width)
+    return table
+
+
+def get_image_budget_config() -> dict:
+    """Read image-budget configuration from os.environ at call time."""
+    return {
+        'budgets': os.environ.get('VLM_IMAGE_BUDGETS', '').strip(),
+        'triage': os.environ.get('VLM_TRIAGE_BUDGET', '512/q70').strip(),
+    }
+
+
+class ImageBudgetPolicy:
+    """Choose the image budget for a (service, phase).
+
+    Args:
+        default: Budget used when no table entry matches.
+        table: {(service, phase): budget}, '*' as wildcard.
+        phase_defaults: {phase: budget} for phases that only match table
+            entries naming them (service:phase or *:phase).
+    """
+
+    def __init__(
+        self,
+        default: ImageBudget,
+        table: dict[tuple[str, str], ImageBudget] | None = None,
+        phase_defaults: dict[str, ImageBudget] | None = None,
+    ) -> None:
+        self.default = default
+        self.table = dict(table or {})
+        self.phase_defaults = dict(phase_defaults or {})
+
+    @classmethod
+    def from_spec(
+        cls,
+        spec: str,
+        default_width: int,
+        phase_defaults: dict[str, ImageBudget] | None = None,
+    ) -> ImageBudgetPolicy:
+        return cls(ImageBudget(default_width), parse_budget_table(spec, default_width),
+                   phase_defaults)
+
+    def budget_for(self, service: str | None, phase: str | None) -> ImageBudget:
+        service, phase = service or '*', phase or '*'
+        if phase in self.phase_defaults:
+            for key in ((service, phase), ('*', phase)):
+                budget = self.table.get(key)
+                if budget is not None:
+                    return budget
+            return self.phase_defaults[phase]
+        for key in ((service, phase), (service, '*'), ('*', phase), ('*', '*')):
+            budget = self.table.get(key)
+            if budget is not None:
+                return budget
+        return self.default
+
+    @property
+    def fingerprint(self) -> str:
+        """Short stable digest of the table ('' when empty), for cache keys."""
+        if not self.table:
+            return ''
+        text = ';'.join(f'{s}:{p}={b}' for (s, p), b in sorted(self.table.items()))
+        return hashlib.sha256(text.encode()).hexdigest()[:8]
@@ -0,0 +1,86 @@
+"""Incremental parser for a JSON object arriving token by token.
+
+Used by VLMClient's streaming mode: each content delta is fed in as it
+arrives, and top-level members become available in `fields` as soon as
+their value is complete. The caller can stop reading (and abort the
+generation) once the members it needs are present, instead of waiting
+for the model to finish the whole object.
+
+Only the first top-level object is tracked. Text before its opening
+brace (preamble, ```json fences) is skipped.
+"""
+
+from __future__ import annotations
+
+import json
+
+
+class IncrementalJSONObject:
+    """Track completed top-level members of a streamed JSON object."""
+
+    def __init__(self) -> None:
+        self.fields: dict = {}
+        self.complete = False
+        self.malformed = False
+        self._text = ''
+        self._pos = 0
+        self._start = -1
+        self._member_start = -1
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return self._text
+
+    def feed(self, chunk: str) -> dict:
+        """Consume a chunk of model output. Returns `fields`."""
+        if self.complete or not chunk:
+            self._text += chunk
+            return self.fields
+        self._text += chunk
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._start < 0:
+                if ch == '{':
+                    self._start = i
+                    self._member_start = i + 1
+                    self._depth = 1
+                continue
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+                continue
+            if ch == '"':
+                self._in_str = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_member(i)
+                    self.complete = True
+                    self._pos = i + 1
+                    return self.fields
+            elif ch == ',' and self._depth == 1:
+                self._finish_member(i)
+                self._member_start = i + 1
+        self._pos = len(text)
+        return self.fields
+
+    def _finish_member(self, end: int) -> None:
+        member = self._text[self._member_start:end].strip()
+        if not member:
+            return
+        try:
+            self.fields.update(json.loads('{' + member + '}'))
+        except json.JSONDecodeError:
+            # Leave it to the caller's full-text fallback
+            self.malformed = True
@@ -0,0 +1,190 @@
+"""JSON schemas for schema-constrained decoding, one per prompt phase.
+
+OpenAI-compatible backends that support guided decoding (vLLM,
+llama.cpp grammars, OpenAI structured outputs) accept these through
+`response_format`, so the model can only emit a complete object with
+exactly these members. That removes the fenced/truncated/malformed
+output _extract_json has to recover from, and bounds the output length,
+so each phase gets a max_tokens sized to its schema.
+
+Member order matters for streaming: the fields the executor dispatches
+on come first, so early stop (see vlm_executor._signin_ready /
+_action_ready) happens as soon as possible.
+
+In plan mode (agent.recording.action_plan) cancel/resume requests use
+action_plan_schema() instead, which adds the next_steps member, and get
+PLAN_STEP_MAX_TOKENS more output per allowed step.
+"""
+
+from __future__ import annotations
+
+_POINT = {
+    'type': ['array', 'null'],
+    'items': {'type': 'number'},
+    'minItems': 2,
+    'maxItems': 2,
+}
+_TEXT = {'type': ['string', 'null']}
+
+SIGNIN_PAGE_TYPES = [
+    'user_pass', 'user_only', 'pass_only', 'button_only',
+    'verification_code', 'email_code_single', 'email_code_multi',
+    'phone_code_single', 'phone_code_multi', 'email_link',
+    'profile_select', 'signed_in', 'spinner', 'captcha',
+    'credential_error', 'unknown',
+]
+
+ACTIONS = [
+    'click', 'type_text', 'scroll_down', 'scroll_up', 'press_key',
+    'wait', 'done', 'need_human',
+]
+
+SIGNIN_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'page_type': {'type': 'string', 'enum': SIGNIN_PAGE_TYPES},
+        'email_point': _POINT,
+        'password_point': _POINT,
+        'button_point': _POINT,
+        'code_point': _POINT,
+        'profile_point': _POINT,
+        'actions': {
+            'type': ['array', 'null'],
+            'maxItems': 3,
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'action': {'type': 'string', 'enum': ['click', 'dismiss']},
+                    'point': _POINT,
+                },
+                'required': ['action', 'point'],
+                'additionalProperties': False,
+            },
+        },
+    },
+    'required': ['page_type', 'email_point', 'password_point', 'button_point',
+                 'code_point', 'profile_point', 'actions'],
+    'additionalProperties': False,
+}
+
+ACTION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'state': {'type': 'string', 'maxLength': 80},
+        'action': {'type': 'string', 'enum': ACTIONS},
+        'completed': {'type': 'boolean'},
+        'billing_end_date': _TEXT,
+        'click_point': _POINT,
+        'target_description': {'type': ['string', 'null'], 'maxLength': 80},
+        'text_to_type': _TEXT,
+        'key_to_press': _TEXT,
+    },
+    'required': ['state', 'action', 'completed', 'billing_end_date',
+                 'click_point', 'target_description', 'text_to_type',
+                 'key_to_press'],
+    'additionalProperties': False,
+}
+
+PLAN_PHASES = ('cancel', 'resume')
+
+
+def action_plan_schema(max_steps: int) -> dict:
+    """ACTION_SCHEMA plus next_steps: up to max_steps follow-on clicks."""
+    next_steps = {
+        'type': ['array', 'null'],
+        'maxItems': max_steps,
+        'items': {
+            'type': 'object',
+            'properties': {
+                'action': {'type': 'string', 'enum': ['click']},
+                'click_point': _POINT,
+                'target_description': {'type': ['string', 'null'], 'maxLength': 80},
+            },
+            'required': ['action', 'click_point', 'target_description'],
+            'additionalProperties': False,
+        },
+    }
+    return {
+        **ACTION_SCHEMA,
+        'properties': {**ACTION_SCHEMA['properties'], 'next_steps': next_steps},
+        'required': [*ACTION_SCHEMA['required'], 'next_steps'],
+    }
+
+
+# Two-tier mode: low-res classification pass (see agent.recording.triage)
+TRIAGE_SIGNIN_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'page_type': {'type': 'string', 'enum': ['spinner', 'signed_in', 'interact']},
+    },
+    'required': ['page_type'],
+    'additionalProperties': False,
+}
+
+TRIAGE_ACTION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'action': {'type': 'string', 'enum': ['wait', 'interact', 'done']},
+        'completed': {'type': 'boolean'},
+        'state': {'type': 'string', 'maxLength': 80},
+    },
+    'required': ['action', 'completed', 'state'],
+    'additionalProperties': False,
+}
+
+PHASE_SCHEMAS: dict[str, dict] = {
+    'sign-in': SIGNIN_SCHEMA,
+    'cancel': ACTION_SCHEMA,
+    'resume': ACTION_SCHEMA,
+    'triage-sign-in': TRIAGE_SIGNIN_SCHEMA,
+    'triage-action': TRIAGE_ACTION_SCHEMA,
+}
+
+# Output token budgets sized to the schemas above: a fully populated
+# object plus whitespace, with ~50% headroom. Free-form mode keeps the
+# client's max_tokens.
+PHASE_MAX_TOKENS: dict[str, int] = {
+    'sign-in': 192,
+    'cancel': 160,
+    'resume': 160,
+    'triage-sign-in': 24,
+    'triage-action': 64,
+}
+
+# Extra output per plan step: one next_steps item with an 80-char
+# description, plus headroom
+PLAN_STEP_MAX_TOKENS = 56
+
+
+def phase_max_tokens(phase: str, plan_steps: int = 0) -> int | None:
+    """The output token budget for a phase (None: no schema budget)."""
+    budget = PHASE_MAX_TOKENS.get(phase)
+    if budget is not None and plan_steps > 0 and phase in PLAN_PHASES:
+        budget += plan_steps * PLAN_STEP_MAX_TOKENS
+    return budget
+
+
+def response_format(phase: str, mode: str, plan_steps: int = 0) -> dict | None:
+    """The `response_format` payload member for a phase, or None.
+
+    mode: 'json_schema' (strict schema), 'json_object' (any JSON object),
+    or anything else for free-form output. plan_steps > 0 selects the
+    plan variant of a cancel/resume schema.
+    """
+    if mode == 'json_object':
+        return {'type': 'json_object'}
+    if mode == 'json_schema' and phase in PHASE_SCHEMAS:
+        name = phase.replace('-', '_')
+        schema = PHASE_SCHEMAS[phase]
+        if plan_steps > 0 and phase in PLAN_PHASES:
+            name += '_plan'
+            schema = action_plan_schema(plan_steps)
+        return {
+            'type': 'json_schema',
+            'json_schema': {
+                'name': name + '_response',
+                'strict': True,
+                'schema': schema,
+            },
+        }
+    return None
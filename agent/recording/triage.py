@@ -0,0 +1,100 @@
+"""Two-tier inference: low-res page triage before full-res grounding.
+
+Many steps only need to know what kind of page is showing: a loading
+spinner, the signed-in home page, a "please wait" screen, the final
+"your membership is cancelled" confirmation. None of them needs
+pixel-accurate coordinates. In two-tier mode the executor first sends a
+small image with a short classification prompt (the triage phases, whose
+image budget defaults to VLM_TRIAGE_BUDGET) and only runs the full
+grounding prompt when the triage answer says the page needs an
+interaction.
+
+resolve() decides. A triage answer stands in for the grounding response
+only when acting on it can't go wrong at low resolution:
+
+  sign-in         'spinner' (wait) and 'signed_in' (advance)
+  cancel/resume   'wait' (not completed), and 'done' / completed once a
+                  billing date was already captured mid-flow, since the
+                  date must be read from the full-res grounding answer
+
+Everything else, including failure outcomes that end the job, escalates
+to grounding.
+
+Configuration (read at call time via get_triage_config()):
+  VLM_TWO_TIER   'true' to enable (default off)
+"""
+
+from __future__ import annotations
+
+import os
+
+# Triage phase for each executor phase: selects the prompt, JSON schema,
+# max_tokens and image budget.
+TRIAGE_PHASES: dict[str, str] = {
+    'sign-in': 'triage-sign-in',
+    'cancel': 'triage-action',
+    'resume': 'triage-action',
+}
+
+_SIGNIN_TRIAGE_PROMPT = """\
+You are looking at a browser screenshot taken while signing in to {service}.
+Classify the page. Respond with JSON only: {{"page_type": "<type>"}}
+where <type> is one of:
+  "spinner"    the page is loading, blank, or shows only a progress indicator
+  "signed_in"  sign-in is finished: a profile picker, home page or account page is shown
+  "interact"   anything else (forms, buttons, codes, errors, captchas)
+"""
+
+_ACTION_TRIAGE_PROMPT = """\
+You are looking at a browser screenshot taken while trying to {goal} a {service} subscription.
+Respond with JSON only: {{"action": "<action>", "completed": <bool>, "state": "<short description>"}}
+where <action> is one of:
+  "wait"      the page is loading or processing; nothing to click yet
+  "done"      the page confirms the subscription was successfully {goal_past}
+  "interact"  anything else: something must be clicked, typed or scrolled
+Set "completed" to true only if the page confirms the {goal} succeeded.
+"""
+
+
+def get_triage_config() -> dict:
+    """Read two-tier configuration from os.environ at call time."""
+    return {
+        'enabled': os.environ.get('VLM_TWO_TIER', '').lower() in ('1', 'true', 'yes'),
+    }
+
+
+def build_triage_prompt(label: str, service: str) -> str:
+    """Classification prompt for an executor phase ('sign-in', 'cancel', 'resume')."""
+    if label == 'sign-in':
+        return _SIGNIN_TRIAGE_PROMPT.format(service=service)
+    goal_past = 'cancelled' if label == 'cancel' else 'resumed'
+    return _ACTION_TRIAGE_PROMPT.format(goal=label, goal_past=goal_past, service=service)
+
+
+def triage_ready(fields: dict) -> bool:
+    """Streaming early stop: the fields resolve() reads are present."""
+    return 'page_type' in fields or ('action' in fields and 'completed' in fields)
+
+
+def resolve(label: str, triage: dict, billing_known: bool) -> dict | None:
+    """The response to act on without grounding, or None to escalate.
+
+    The returned dict has the shape of a grounding response for `label`,
+    so the executor's dispatch handles it unchanged.
+    """
+    if label == 'sign-in':
+        page_type = triage.get('page_type')
+        if page_type in ('spinner', 'signed_in'):
+            return {'page_type': page_type}
+        return None
+
+    action = triage.get('action')
+    completed = bool(triage.get('completed'))
+    state = str(triage.get('state') or '')
+    if action == 'wait' and not completed:
+        return {'state': state, 'action': 'wait', 'completed': False,
+                'billing_end_date': None}
+    if (action == 'done' or completed) and billing_known:
+        return {'state': state, 'action': 'done', 'completed': True,
+                'billing_end_date': None}
+    return None
@@ -2,19 +2,55 @@
 
 Talks to any OpenAI-compatible vision API (Grok, OpenAI, local vLLM, etc.)
 via POST /chat/completions with base64 image content.
+
+With stream=True (VLM_STREAM) the completion is read as server-sent
+events and parsed incrementally. When the caller passes a `ready`
+predicate, analyze() returns as soon as the fields it needs are complete
+and closes the connection, which aborts the rest of the generation.
+
+With response_format='json_schema' (VLM_RESPONSE_FORMAT) and a known
+phase, the request carries that phase's JSON schema for guided decoding
+and a max_tokens sized to it (see agent.recording.schemas).
+
+With request_layout='prefix' (VLM_REQUEST_LAYOUT) everything static
+(system prompt, then a fixed instruction) comes first and everything
+that varies per step (image, image size, caller text) comes last, so the
+server's KV prefix cache can reuse the prompt prefill across steps and
+jobs. Backend cache hints (VLM_CACHE_HINTS) are added to the payload.
+Prompt-eval vs generation timings from `usage` / llama.cpp `timings`
+are kept per request (last_usage) and in running totals (usage_totals).
+
+The screenshot's width, quality, format and colour are chosen per
+(service, phase) by an ImageBudgetPolicy (VLM_IMAGE_BUDGETS, see
+agent.recording.image_budget); without a table every request is sent at
+max_image_width as JPEG quality 85.
+
+A CancelToken (agent.cancel) passed as cancel= aborts the request when
+the job is aborted: a streamed response is closed mid-generation, a
+plain request is abandoned once it returns. Either raises JobCancelled.
 """
 
 from __future__ import annotations
 
-import base64
-import io
+import hashlib
 import json
 import logging
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 
 import httpx
-from PIL import Image
+
+from agent.cancel import CancelToken
+from agent.recording.image_budget import (
+    ImageBudget, ImageBudgetPolicy, get_image_budget_config, parse_budget,
+)
+from agent.recording.json_stream import IncrementalJSONObject
+from agent.recording.schemas import phase_max_tokens, response_format as _response_format
+from agent.recording.triage import TRIAGE_PHASES
+from agent.screenshot import Frame
 
 log = logging.getLogger(__name__)
 
@@ -161,6 +197,32 @@ def _swap_yx_bboxes(obj: dict | list) -> None:
                 _swap_yx_bboxes(item)
 
 
+# Static instruction for the prefix layout. Must not vary between calls:
+# it is part of the cacheable prompt prefix.
+_PREFIX_INSTRUCTION = 'Analyze the screenshot below and respond with the JSON action.'
+
+
+def _parse_usage(data: dict) -> dict | None:
+    """Token counts and prefill/generation timings from a response body.
+
+    Understands OpenAI-style `usage` (with prompt_tokens_details.cached_tokens)
+    and llama.cpp `timings` (prompt_n / cache_n / prompt_ms / predicted_ms).
+    Returns None when the backend reported neither.
+    """
+    usage = data.get('usage') or {}
+    timings = data.get('timings') or {}
+    if not usage and not timings:
+        return None
+    details = usage.get('prompt_tokens_details') or {}
+    return {
+        'prompt_tokens': usage.get('prompt_tokens', timings.get('prompt_n')),
+        'completion_tokens': usage.get('completion_tokens', timings.get('predicted_n')),
+        'cached_tokens': details.get('cached_tokens', timings.get('cache_n')),
+        'prompt_ms': timings.get('prompt_ms'),
+        'gen_ms': timings.get('predicted_ms'),
+    }
+
+
 class VLMClient:
     """Minimal client for OpenAI-compatible vision APIs.
 
@@ -180,18 +242,46 @@ class VLMClient:
         coord_normalize: bool | None = None,
         coord_yx: bool | None = None,
         coord_square_pad: bool | None = None,
+        stream: bool | None = None,
+        response_format: str | None = None,
+        request_layout: str | None = None,
+        cache_hints: str | None = None,
+        image_budgets: str | None = None,
+        max_inflight: int | None = None,
     ) -> None:
         self.base_url = base_url.rstrip('/')
         self.model = model
         self.max_tokens = max_tokens
         self.temperature = temperature
 
-        from agent.config import get_vlm_config
+        from agent.config import MAX_CONCURRENT_AGENT_JOBS, get_vlm_config
         _defaults = get_vlm_config()
         self._max_image_width = max_image_width if max_image_width is not None else _defaults['max_width']
         self._normalized_coords = coord_normalize if coord_normalize is not None else _defaults['coord_normalize']
         self._coord_yx = coord_yx if coord_yx is not None else _defaults['coord_yx']
         self._coord_square_pad = coord_square_pad if coord_square_pad is not None else _defaults['coord_square_pad']
+        self.stream = stream if stream is not None else _defaults.get('stream', False)
+        self.response_format = (response_format if response_format is not None
+                                else _defaults.get('response_format', ''))
+        self.request_layout = (request_layout if request_layout is not None
+                               else _defaults.get('request_layout', 'legacy'))
+        hints = cache_hints if cache_hints is not None else _defaults.get('cache_hints', '')
+        self.cache_hints = {h.strip() for h in hints.split(',') if h.strip()}
+        budget_cfg = get_image_budget_config()
+        if image_budgets is None:
+            image_budgets = budget_cfg['budgets']
+        triage_budget = parse_budget(budget_cfg['triage'], self._max_image_width)
+        self.image_policy = ImageBudgetPolicy.from_spec(
+            image_budgets, self._max_image_width,
+            phase_defaults={p: triage_budget for p in TRIAGE_PHASES.values()},
+        )
+        # last_* values are per thread: concurrent jobs share one client.
+        self._local = threading.local()
+        self.usage_totals = {
+            'requests': 0, 'prompt_tokens': 0, 'cached_tokens': 0,
+            'completion_tokens': 0, 'prompt_ms': 0.0, 'gen_ms': 0.0,
+        }
+        self._usage_lock = threading.Lock()
 
         self._client = httpx.Client(
             base_url=self.base_url,
@@ -201,20 +291,43 @@ class VLMClient:
             },
             timeout=timeout,
         )
+        # Cancellable non-streamed requests (see _post), at most one
+        # worker per request the backend is allowed to have in flight
+        self._posts = ThreadPoolExecutor(
+            max_workers=max_inflight or MAX_CONCURRENT_AGENT_JOBS,
+            thread_name_prefix='vlm-post',
+        )
 
     def analyze(
         self,
-        screenshot_b64: str,
+        screenshot_b64: str | Frame,
         system_prompt: str,
         user_message: str = '',
+        ready: Callable[[dict], bool] | None = None,
+        phase: str | None = None,
+        service: str | None = None,
+        cancel: CancelToken | None = None,
+        plan_steps: int = 0,
     ) -> tuple[dict, float]:
         """Send a screenshot to the VLM and return the parsed JSON response.
 
         Args:
-            screenshot_b64: Base64-encoded PNG screenshot.
+            screenshot_b64: Base64-encoded PNG screenshot, or a Frame
+                (preferred: reuses its decoded image and cached encode).
             system_prompt: System prompt describing the task.
             user_message: User-role text accompanying the image. If empty,
                 a default message including image dimensions is generated.
+            ready: Streaming mode only. Called with the top-level fields
+                parsed so far; once it returns True the remaining output
+                is abandoned and those fields are returned.
+            phase: Prompt phase ('sign-in', 'cancel', 'resume'). With a
+                response_format mode set, selects the JSON schema and the
+                phase's max_tokens budget.
+            service: Service name; with phase, selects the image budget.
+            cancel: The job's CancelToken; aborts the request when it fires.
+            plan_steps: Plan mode (cancel/resume): the response may list up
+                to this many next_steps; selects the plan schema and a
+                larger max_tokens budget.
 
         Returns:
             Tuple of (parsed JSON dict, scale_factor). The scale_factor is
@@ -225,54 +338,72 @@ class VLMClient:
         Raises:
             httpx.HTTPStatusError: On non-2xx response.
             ValueError: If JSON cannot be extracted from the response.
+            JobCancelled: If cancel fired before or during the request.
         """
+        if cancel is not None:
+            cancel.raise_if_cancelled()
         # Resize oversized screenshots to stay under API payload limits
-        image_b64, scale_factor, sent_size = self._resize_if_needed(screenshot_b64)
+        if isinstance(screenshot_b64, Frame):
+            frame = screenshot_b64
+        else:
+            frame = Frame.from_base64(screenshot_b64)
+        budget = self.image_policy.budget_for(service, phase)
+        encode_t0 = time.monotonic()
+        encoded = frame.encode(budget.width, budget.quality, budget.format, budget.grayscale)
+        encode_ms = (time.monotonic() - encode_t0) * 1000
+        image_b64, scale_factor, sent_size = encoded.b64, encoded.scale_factor, encoded.size
 
         # Store sent image for debug trace (before building payload)
         self.last_sent_image_b64: str = image_b64
-
-        if not user_message:
-            w, h = sent_size
-            user_message = (
-                f'This screenshot is {w}x{h} pixels. '
-                f'Analyze this screenshot and respond with the JSON action.'
-            )
+        self.last_image_budget = budget
 
         payload = {
             'model': self.model,
             'max_tokens': self.max_tokens,
             'temperature': self.temperature,
-            'messages': [
-                {'role': 'system', 'content': system_prompt},
-                {
-                    'role': 'user',
-                    'content': [
-                        {
-                            'type': 'image_url',
-                            'image_url': {
-                                'url': f'data:image/jpeg;base64,{image_b64}',
-                            },
-                        },
-                        {'type': 'text', 'text': user_message},
-                    ],
-                },
-            ],
+            'messages': self._build_messages(
+                system_prompt, image_b64, sent_size, user_message,
+                encoded.media_type),
         }
+        if self.request_layout == 'prefix':
+            if 'cache_prompt' in self.cache_hints:
+                payload['cache_prompt'] = True  # llama.cpp server
+            if 'prompt_cache_key' in self.cache_hints:
+                # OpenAI-style routing hint: same prefix -> same cache shard
+                payload['prompt_cache_key'] = hashlib.sha256(
+                    f'{self.model}\n{system_prompt}'.encode()).hexdigest()[:32]
+        fmt = _response_format(phase, self.response_format, plan_steps) if phase else None
+        if fmt is not None:
+            payload['response_format'] = fmt
+            budget = phase_max_tokens(phase, plan_steps)
+            payload['max_tokens'] = min(
+                self.max_tokens, budget if budget is not None else self.max_tokens)
 
         t0 = time.monotonic()
-        resp = self._client.post('/chat/completions', json=payload)
-        self.last_inference_ms = int((time.monotonic() - t0) * 1000)
-        if resp.status_code != 200:
-            body = resp.text[:500]
-            log.error('VLM API error %d: %s', resp.status_code, body)
-            raise RuntimeError(f'VLM API {resp.status_code}: {body}')
-
-        data = resp.json()
-        raw_text = data['choices'][0]['message']['content']
-        log.debug('VLM raw response: %s', raw_text[:500])
-
-        parsed = _extract_json(raw_text)
+        if self.stream:
+            parsed = self._analyze_streaming(payload, ready, t0, cancel)
+            network_ms = self.last_inference_ms
+            parse_ms = 0.0  # parsed incrementally while streaming
+        else:
+            resp = self._post(payload, cancel)
+            self.last_inference_ms = int((time.monotonic() - t0) * 1000)
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            if resp.status_code != 200:
+                body = resp.text[:500]
+                log.error('VLM API error %d: %s', resp.status_code, body)
+                raise RuntimeError(f'VLM API {resp.status_code}: {body}')
+
+            network_ms = self.last_inference_ms
+            parse_t0 = time.monotonic()
+            data = resp.json()
+            self._record_usage(_parse_usage(data))
+            raw_text = data['choices'][0]['message']['content']
+            log.debug('VLM raw response: %s', raw_text[:500])
+
+            parsed = _extract_json(raw_text)
+            parse_ms = (time.monotonic() - parse_t0) * 1000
+        parse_t0 = time.monotonic()
 
         # Swap [y,x,y,x] -> [x,y,x,y] before denormalization so that
         # width/height multipliers are applied to the correct indices.
@@ -293,35 +424,266 @@ class VLMClient:
             else:
                 _denormalize_bboxes(parsed, w, h)
 
+        parse_ms += (time.monotonic() - parse_t0) * 1000
+        self.last_timings = {
+            'encode_ms': round(encode_ms, 1),
+            'network_ms': network_ms,
+            'parse_ms': round(parse_ms, 1),
+        }
         return parsed, scale_factor
 
+    def _analyze_streaming(
+        self,
+        payload: dict,
+        ready: Callable[[dict], bool] | None,
+        t0: float,
+        cancel: CancelToken | None = None,
+    ) -> dict:
+        """POST with stream=true and parse content deltas as they arrive.
+
+        Returns as soon as the object is closed or `ready` accepts the
+        fields so far; leaving the stream context closes the connection,
+        which OpenAI-compatible servers treat as an abort. Falls back to
+        _extract_json on the full text if the object never completes.
+        A fired cancel token closes the response from the cancelling
+        thread, so a stalled read ends too.
+        """
+        parser = IncrementalJSONObject()
+        first_token_ms = None
+        early = False
+        usage = None
+        with self._client.stream(
+            'POST', '/chat/completions',
+            json={**payload, 'stream': True,
+                  'stream_options': {'include_usage': True}},
+        ) as resp:
+            if resp.status_code != 200:
+                body = resp.read().decode(errors='replace')[:500]
+                log.error('VLM API error %d: %s', resp.status_code, body)
+                raise RuntimeError(f'VLM API {resp.status_code}: {body}')
+            unregister = cancel.on_cancel(resp.close) if cancel is not None else None
+            try:
+                for line in self._stream_lines(resp, cancel):
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    try:
+                        event = json.loads(data)
+                    except json.JSONDecodeError:
+                        continue
+                    usage = _parse_usage(event) or usage
+                    choices = event.get('choices') or []
+                    if not choices:
+                        continue  # usage-only final chunk
+                    choice = choices[0]
+                    delta = (choice.get('delta') or {}).get('content') or ''
+                    if not delta:
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = int((time.monotonic() - t0) * 1000)
+                    parser.feed(delta)
+                    if parser.complete:
+                        break
+                    if ready is not None and parser.fields and ready(parser.fields):
+                        early = True
+                        break
+            finally:
+                if unregister is not None:
+                    unregister()
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+
+        self.last_inference_ms = int((time.monotonic() - t0) * 1000)
+        # An early stop abandons the stream before the usage chunk arrives.
+        self._record_usage(usage)
+        self.last_stream_stats = {
+            'first_token_ms': first_token_ms,
+            'early_stop': early,
+            'chars': len(parser.text),
+        }
+        log.debug('VLM streamed response (%s): %s',
+                  'early stop' if early else 'complete', parser.text[:500])
+        if early or (parser.complete and not parser.malformed):
+            return dict(parser.fields)
+        return _extract_json(parser.text)
+
+    def _post(self, payload: dict, cancel: CancelToken | None) -> httpx.Response:
+        """POST a non-streamed request, giving up as soon as cancel fires.
+
+        httpx can't interrupt a send that is still waiting for the
+        response headers (a non-streamed backend sends them only after
+        generating), so the request runs on a worker thread and the
+        caller stops waiting when the token fires. The late response is
+        dropped.
+        """
+        if cancel is None:
+            return self._client.post('/chat/completions', json=payload)
+        future = self._posts.submit(self._client.post, '/chat/completions', json=payload)
+        finished = threading.Event()
+        future.add_done_callback(lambda _: finished.set())
+        unregister = cancel.on_cancel(finished.set)
+        try:
+            finished.wait()
+        finally:
+            unregister()
+        if not future.done():
+            cancel.raise_if_cancelled()
+        return future.result()
+
+    @staticmethod
+    def _stream_lines(resp: httpx.Response, cancel: CancelToken | None):
+        """resp.iter_lines(), stopping with JobCancelled once cancel fires."""
+        try:
+            for line in resp.iter_lines():
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                yield line
+        except Exception:
+            # Closed under us by the cancel callback
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            raise
+
+    def _build_messages(
+        self,
+        system_prompt: str,
+        image_b64: str,
+        sent_size: tuple[int, int],
+        user_message: str,
+        media_type: str = 'image/jpeg',
+    ) -> list[dict]:
+        """Chat messages for one request, in the configured layout."""
+        w, h = sent_size
+        image_part = {
+            'type': 'image_url',
+            'image_url': {'url': f'data:{media_type};base64,{image_b64}'},
+        }
+        if self.request_layout == 'prefix':
+            # Static prefix first, per-step parts last.
+            tail = f'The screenshot is {w}x{h} pixels.'
+            if user_message:
+                tail += f' {user_message}'
+            content = [
+                {'type': 'text', 'text': _PREFIX_INSTRUCTION},
+                image_part,
+                {'type': 'text', 'text': tail},
+            ]
+        else:
+            if not user_message:
+                user_message = (
+                    f'This screenshot is {w}x{h} pixels. '
+                    f'Analyze this screenshot and respond with the JSON action.'
+                )
+            content = [image_part, {'type': 'text', 'text': user_message}]
+        return [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': content},
+        ]
+
+    def _record_usage(self, usage: dict | None) -> None:
+        """Keep the last request's usage and add it to the running totals."""
+        self.last_usage = usage
+        if usage is None:
+            return
+        with self._usage_lock:
+            totals = self.usage_totals
+            totals['requests'] += 1
+            for key in ('prompt_tokens', 'cached_tokens', 'completion_tokens',
+                        'prompt_ms', 'gen_ms'):
+                if usage.get(key):
+                    totals[key] += usage[key]
+
     def _resize_if_needed(self, screenshot_b64: str) -> tuple[str, float, tuple[int, int]]:
         """Downscale a base64 PNG to JPEG at _max_image_width if wider.
 
         Returns (base64_jpeg, scale_factor, (sent_width, sent_height)) where
         scale_factor is original_width / sent_width (1.0 if no resize needed).
         """
-        raw = base64.b64decode(screenshot_b64)
-        img = Image.open(io.BytesIO(raw))
-
-        scale_factor = 1.0
-        if img.width > self._max_image_width:
-            scale_factor = img.width / self._max_image_width
-            new_size = (self._max_image_width, int(img.height / scale_factor))
-            img = img.resize(new_size, Image.LANCZOS)
-            log.debug('Resized screenshot %dx%d -> %dx%d (scale_factor=%.3f)',
-                       int(new_size[0] * scale_factor), int(new_size[1] * scale_factor),
-                       *new_size, scale_factor)
-
-        sent_size = (img.width, img.height)
-
-        # Convert to JPEG (much smaller than PNG for screenshots)
-        buf = io.BytesIO()
-        img.convert('RGB').save(buf, format='JPEG', quality=85)
-        return base64.b64encode(buf.getvalue()).decode('ascii'), scale_factor, sent_size
+        encoded = Frame.from_base64(screenshot_b64).encode(self._max_image_width)
+        if encoded.scale_factor != 1.0:
+            log.debug('Resized screenshot to %dx%d (scale_factor=%.3f)',
+                      *encoded.size, encoded.scale_factor)
+        return encoded.b64, encoded.scale_factor, encoded.size
+
+    @property
+    def last_sent_image_b64(self) -> str:
+        """JPEG (base64) sent by this thread's most recent request."""
+        return getattr(self._local, 'sent_image_b64', '')
+
+    @last_sent_image_b64.setter
+    def last_sent_image_b64(self, value: str) -> None:
+        self._local.sent_image_b64 = value
+
+    @property
+    def last_image_budget(self) -> ImageBudget | None:
+        """Image budget used by this thread's most recent request."""
+        return getattr(self._local, 'image_budget', None)
+
+    @last_image_budget.setter
+    def last_image_budget(self, value: ImageBudget | None) -> None:
+        self._local.image_budget = value
+
+    @property
+    def last_inference_ms(self) -> int | None:
+        return getattr(self._local, 'inference_ms', None)
+
+    @last_inference_ms.setter
+    def last_inference_ms(self, value: int) -> None:
+        self._local.inference_ms = value
+
+    @property
+    def last_usage(self) -> dict | None:
+        """Token counts and timings of this thread's most recent request."""
+        return getattr(self._local, 'usage', None)
+
+    @last_usage.setter
+    def last_usage(self, value: dict | None) -> None:
+        self._local.usage = value
+
+    @property
+    def last_stream_stats(self) -> dict | None:
+        return getattr(self._local, 'stream_stats', None)
+
+    @last_stream_stats.setter
+    def last_stream_stats(self, value: dict | None) -> None:
+        self._local.stream_stats = value
+
+    @property
+    def last_timings(self) -> dict | None:
+        """Client-side encode, request and parse times of this thread's
+        most recent request (server time is in last_usage)."""
+        return getattr(self._local, 'timings', None)
+
+    @last_timings.setter
+    def last_timings(self, value: dict | None) -> None:
+        self._local.timings = value
+
+    @property
+    def cache_identity(self) -> str:
+        """Settings that change the response for the same image and prompt.
+
+        Used as part of the response-cache key: model, image width and
+        budget table, coordinate convention and output format.
+        """
+        mode = 'norm' if self._normalized_coords else 'px'
+        if self._coord_yx:
+            mode += '-yx'
+        if self._coord_square_pad:
+            mode += '-sq'
+        if self.response_format:
+            mode += f'-{self.response_format}'
+        if self.request_layout == 'prefix':
+            mode += '-prefix'
+        identity = f'{self.model}|w{self._max_image_width}|{mode}'
+        if self.image_policy.fingerprint:
+            identity += f'|b{self.image_policy.fingerprint}'
+        return identity
 
     def close(self) -> None:
         """Close the underlying HTTP client."""
+        self._posts.shutdown(wait=False)
         self._client.close()
 
     def __enter__(self) -> VLMClient:
@@ -0,0 +1,396 @@
+"""Pool of OpenAI-compatible VLM backends with health-aware routing.
+
+One VLMClient per endpoint. Each analyze() call goes to the healthy
+backend with the lowest expected wait, (in_flight + 1) * EWMA latency,
+subject to a per-backend concurrency cap. When every backend is at its
+cap the call waits for a free slot.
+
+Optional hedging: if the chosen backend hasn't answered within its
+observed latency percentile (VLM_HEDGE_PERCENTILE), the same request is
+sent to the next-best backend and whichever answers first wins. Each
+attempt has its own CancelToken (also fired by the job's), and the
+loser's is fired once the winner returns, so it frees its backend slot.
+
+A backend that fails eject_after times in a row (transport errors and
+non-2xx, not parse errors) is ejected for eject_seconds, then retried.
+
+Backends must serve the same model with the same coordinate settings:
+cache_identity and the coordinate attributes come from the first one.
+
+The pool exposes the VLMClient surface the executor uses. last_* values
+are per thread, so concurrent jobs each see their own request's data.
+
+Configuration (read via get_vlm_pool_config()):
+  VLM_URL                    comma-separated endpoints (pool when > 1)
+  VLM_BACKEND_MAX_INFLIGHT   cap per backend, one value or one per URL (default 2;
+                             any other count is a ValueError)
+  VLM_HEDGE_PERCENTILE       e.g. 95 to hedge past p95; 0 disables (default 0)
+  VLM_EJECT_AFTER            consecutive failures before ejection (default 2)
+  VLM_EJECT_SECONDS          ejection duration (default 30)
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from agent.cancel import CancelToken, JobCancelled
+from agent.recording.vlm_client import VLMClient
+
+log = logging.getLogger(__name__)
+
+# Latency assumed for a backend with no samples yet (ms)
+_DEFAULT_LATENCY_MS = 3000.0
+# Samples needed before a backend's percentile is trusted for hedging
+_MIN_HEDGE_SAMPLES = 20
+
+
+def get_vlm_pool_config() -> dict:
+    """Read pool configuration from os.environ at call time."""
+    urls = [u.strip() for u in os.environ.get('VLM_URL', '').split(',') if u.strip()]
+    caps = [int(c) for c in
+            os.environ.get('VLM_BACKEND_MAX_INFLIGHT', '2').split(',') if c.strip()]
+    if len(caps) == 1:
+        caps = caps * max(len(urls), 1)
+    elif urls and len(caps) != len(urls):
+        raise ValueError(f'VLM_BACKEND_MAX_INFLIGHT lists {len(caps)} caps '
+                         f'for {len(urls)} VLM_URL endpoints')
+    return {
+        'urls': urls,
+        'max_inflight': caps,
+        'hedge_percentile': float(os.environ.get('VLM_HEDGE_PERCENTILE', '0')),
+        'eject_after': int(os.environ.get('VLM_EJECT_AFTER', '2')),
+        'eject_seconds': float(os.environ.get('VLM_EJECT_SECONDS', '30')),
+    }
+
+
+class _Backend:
+    """Routing state for one endpoint. Mutated only under the pool lock."""
+
+    def __init__(self, client: VLMClient, max_inflight: int) -> None:
+        self.client = client
+        self.name = client.base_url
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.ewma_ms: float | None = None
+        self.latencies: deque[float] = deque(maxlen=200)
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.hedges_won = 0
+
+    def expected_wait(self) -> float:
+        return (self.inflight + 1) * (self.ewma_ms or _DEFAULT_LATENCY_MS)
+
+    def percentile(self, q: float) -> float | None:
+        if len(self.latencies) < _MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class VLMPool:
+    """Route VLMClient.analyze() calls across several backends.
+
+    Args:
+        clients: One VLMClient per endpoint, all serving the same model.
+        max_inflight: Per-backend concurrency caps (same order as clients).
+        hedge_percentile: Hedge to a second backend once the first has
+            taken longer than this percentile of its latency; 0 disables.
+        eject_after: Consecutive failures before a backend is ejected.
+        eject_seconds: How long an ejected backend is skipped.
+        slot_timeout: Max seconds to wait for a free backend slot.
+    """
+
+    def __init__(
+        self,
+        clients: list[VLMClient],
+        max_inflight: list[int] | None = None,
+        hedge_percentile: float = 0.0,
+        eject_after: int = 2,
+        eject_seconds: float = 30.0,
+        slot_timeout: float = 300.0,
+    ) -> None:
+        if not clients:
+            raise ValueError('VLMPool needs at least one client')
+        caps = max_inflight or [2] * len(clients)
+        if len(caps) != len(clients):
+            raise ValueError(f'VLMPool got {len(caps)} max_inflight caps '
+                             f'for {len(clients)} clients')
+        self._backends = [_Backend(c, cap) for c, cap in zip(clients, caps)]
+        self.hedge_percentile = hedge_percentile
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.slot_timeout = slot_timeout
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._hedger = concurrent.futures.ThreadPoolExecutor(
+            max_workers=sum(caps), thread_name_prefix='vlm-pool')
+        primary = clients[0]
+        self.model = primary.model
+        self._max_image_width = primary._max_image_width
+        self._normalized_coords = primary._normalized_coords
+        self._coord_yx = primary._coord_yx
+        self._coord_square_pad = primary._coord_square_pad
+
+    @classmethod
+    def from_config(cls, vlm_cfg: dict, **client_kwargs) -> VLMPool:
+        """Build a pool from get_vlm_config() and get_vlm_pool_config()."""
+        pool_cfg = get_vlm_pool_config()
+        clients = [
+            VLMClient(base_url=url, api_key=vlm_cfg['key'], model=vlm_cfg['model'],
+                      max_inflight=cap, **client_kwargs)
+            for url, cap in zip(pool_cfg['urls'], pool_cfg['max_inflight'])
+        ]
+        return cls(clients, pool_cfg['max_inflight'], pool_cfg['hedge_percentile'],
+                   pool_cfg['eject_after'], pool_cfg['eject_seconds'])
+
+    # ------------------------------------------------------------------
+    # VLMClient surface
+    # ------------------------------------------------------------------
+
+    @property
+    def cache_identity(self) -> str:
+        return self._backends[0].client.cache_identity
+
+    @property
+    def last_sent_image_b64(self) -> str:
+        return getattr(self._local, 'sent_image_b64', '')
+
+    @property
+    def last_usage(self) -> dict | None:
+        return getattr(self._local, 'usage', None)
+
+    @property
+    def last_stream_stats(self) -> dict | None:
+        return getattr(self._local, 'stream_stats', None)
+
+    @property
+    def last_image_budget(self):
+        return getattr(self._local, 'image_budget', None)
+
+    @property
+    def last_timings(self) -> dict | None:
+        return getattr(self._local, 'timings', None)
+
+    @property
+    def last_backend(self) -> str | None:
+        return getattr(self._local, 'backend', None)
+
+    @property
+    def usage_totals(self) -> dict:
+        totals: dict = {}
+        for b in self._backends:
+            for key, value in b.client.usage_totals.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def analyze(
+        self,
+        screenshot_b64,
+        system_prompt: str,
+        user_message: str = '',
+        ready: Callable[[dict], bool] | None = None,
+        phase: str | None = None,
+        service: str | None = None,
+        cancel: CancelToken | None = None,
+        plan_steps: int = 0,
+    ) -> tuple[dict, float]:
+        """Same contract as VLMClient.analyze, routed to the best backend.
+
+        Each hedged attempt gets its own CancelToken, fired by cancel
+        too, so an abort closes both and the loser is closed once the
+        winner returns.
+        """
+        kwargs = dict(user_message=user_message, ready=ready, phase=phase,
+                      service=service)
+        if cancel is not None:
+            kwargs['cancel'] = cancel
+        if plan_steps:
+            kwargs['plan_steps'] = plan_steps
+        primary = self._acquire(cancel=cancel)
+        hedge_after = (primary.percentile(self.hedge_percentile)
+                       if self.hedge_percentile > 0 and len(self._backends) > 1
+                       else None)
+        if hedge_after is None:
+            return self._finish(
+                self._call(primary, screenshot_b64, system_prompt, kwargs))
+
+        future, future_token = self._submit(
+            primary, screenshot_b64, system_prompt, kwargs, cancel)
+
+        done, _ = concurrent.futures.wait([future], timeout=hedge_after / 1000)
+        if done:
+            return self._finish(future.result())
+
+        second = self._acquire(exclude=primary, wait=False)
+        if second is None:
+            return self._finish(future.result())
+        log.info('VLM hedge: %s exceeded p%g (%.0f ms), also asking %s',
+                 primary.name, self.hedge_percentile, hedge_after, second.name)
+        hedge, hedge_token = self._submit(
+            second, screenshot_b64, system_prompt, kwargs, cancel)
+        tokens = {future: future_token, hedge: hedge_token}
+
+        pending = {future, hedge}
+        error: BaseException | None = None
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is hedge:
+                        with self._cond:
+                            second.hedges_won += 1
+                    for other in pending:
+                        tokens[other].cancel('hedge lost')
+                    return self._finish(f.result())
+                error = f.exception()
+                if isinstance(error, JobCancelled):
+                    raise error
+        raise error
+
+    def close(self) -> None:
+        self._hedger.shutdown(wait=False)
+        for b in self._backends:
+            b.client.close()
+
+    def __enter__(self) -> VLMPool:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    def _acquire(self, exclude: _Backend | None = None, wait: bool = True,
+                 cancel: CancelToken | None = None) -> _Backend | None:
+        """Reserve a slot on the best backend, waiting for one if needed.
+
+        With wait=False (hedging) only a healthy backend with a free slot
+        is returned, else None. A fired cancel token ends the wait.
+        """
+        deadline = time.monotonic() + self.slot_timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                candidates = [b for b in self._backends
+                              if b is not exclude and b.inflight < b.max_inflight]
+                healthy = [b for b in candidates if b.ejected_until <= now]
+                if healthy:
+                    best = min(healthy, key=_Backend.expected_wait)
+                elif wait and candidates and all(
+                        b.ejected_until > now for b in self._backends if b is not exclude):
+                    # Everything is ejected: try the one due back soonest
+                    # rather than failing the job outright.
+                    best = min(candidates, key=lambda b: b.ejected_until)
+                else:
+                    best = None
+                if best is not None:
+                    best.inflight += 1
+                    best.requests += 1
+                    return best
+                if not wait:
+                    return None
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise RuntimeError('VLM pool: no backend slot available')
+                self._cond.wait(min(remaining, 1.0))
+
+    def _submit(self, backend: _Backend, screenshot, system_prompt: str, kwargs: dict,
+                cancel: CancelToken | None) -> tuple[concurrent.futures.Future, CancelToken]:
+        """Start a hedged attempt on a worker thread with its own CancelToken."""
+        token = CancelToken()
+        unlink = (cancel.on_cancel(lambda: token.cancel(cancel.reason))
+                  if cancel is not None else None)
+        future = self._hedger.submit(
+            self._call, backend, screenshot, system_prompt, {**kwargs, 'cancel': token})
+        if unlink is not None:
+            future.add_done_callback(lambda _: unlink())
+        return future, token
+
+    def _call(self, backend: _Backend, screenshot, system_prompt: str, kwargs: dict):
+        """Run one request on backend (worker thread); update its stats."""
+        t0 = time.monotonic()
+        try:
+            result = backend.client.analyze(screenshot, system_prompt, **kwargs)
+        except ValueError:
+            # Unparseable output: the backend is healthy, the model isn't.
+            self._release(backend, (time.monotonic() - t0) * 1000, ok=True)
+            raise
+        except JobCancelled:
+            # Aborted by us: says nothing about the backend's health or speed.
+            self._release(backend, None, ok=True)
+            raise
+        except Exception:
+            self._release(backend, None, ok=False)
+            raise
+        self._release(backend, (time.monotonic() - t0) * 1000, ok=True)
+        client = backend.client
+        return result, {
+            'sent_image_b64': getattr(client, 'last_sent_image_b64', ''),
+            'usage': client.last_usage,
+            'stream_stats': client.last_stream_stats,
+            'image_budget': getattr(client, 'last_image_budget', None),
+            'timings': getattr(client, 'last_timings', None),
+            'backend': backend.name,
+        }
+
+    def _release(self, backend: _Backend, elapsed_ms: float | None, ok: bool) -> None:
+        with self._cond:
+            backend.inflight -= 1
+            if ok:
+                backend.consecutive_failures = 0
+                if elapsed_ms is not None:
+                    backend.latencies.append(elapsed_ms)
+                    backend.ewma_ms = (elapsed_ms if backend.ewma_ms is None
+                                       else 0.8 * backend.ewma_ms + 0.2 * elapsed_ms)
+            else:
+                backend.errors += 1
+                backend.consecutive_failures += 1
+                if backend.consecutive_failures >= self.eject_after:
+                    backend.ejected_until = time.monotonic() + self.eject_seconds
+                    log.warning('VLM backend %s ejected for %.0fs after %d failures',
+                                backend.name, self.eject_seconds,
+                                backend.consecutive_failures)
+            self._cond.notify_all()
+
+    def _finish(self, outcome) -> tuple[dict, float]:
+        """Publish a call's per-request data to the calling thread."""
+        result, info = outcome
+        self._local.sent_image_b64 = info['sent_image_b64']
+        self._local.usage = info['usage']
+        self._local.stream_stats = info['stream_stats']
+        self._local.image_budget = info['image_budget']
+        self._local.timings = info['timings']
+        self._local.backend = info['backend']
+        return result
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def stats(self) -> list[dict]:
+        """Per-backend routing state, for /health."""
+        now = time.monotonic()
+        with self._cond:
+            return [{
+                'url': b.name,
+                'in_flight': b.inflight,
+                'max_in_flight': b.max_inflight,
+                'ewma_ms': round(b.ewma_ms) if b.ewma_ms is not None else None,
+                'requests': b.requests,
+                'errors': b.errors,
+                'hedges_won': b.hedges_won,
+                'ejected_for_s': round(max(b.ejected_until - now, 0.0), 1),
+            } for b in self._backends]
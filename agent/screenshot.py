@@ -1,21 +1,31 @@
 """
-Screenshot capture via macOS screencapture.
+Screenshot capture and the Frame pipeline.
 
-Captures a specific window by its CGWindowID using
-`screencapture -l <windowID>`. No full-screen grabs,
-no desktop background bleed.
+Captures a specific window by its CGWindowID. No full-screen grabs, no
+desktop background bleed. capture_frame() and capture_thumbnail() go
+through the capture backend (agent.capture: in-process Quartz, with
+`screencapture -l <windowID>` as the fallback); the file-based helpers
+below always use screencapture.
+
+Frame wraps one capture for the executor pipeline: the PNG bytes are
+decoded at most once, and the chrome crop and the VLM JPEG encode are
+cached views on that single decoded image.
 """
 
 from __future__ import annotations
 
 import base64
+import hashlib
 import io
 import os
+import struct
 import subprocess
 import tempfile
 import time
+from dataclasses import dataclass
 
 from agent.input import window
+from agent.input.window_registry import window_registry
 
 # Chrome's tab bar + address bar height in logical (non-Retina) pixels.
 # Physical pixel crop = int(CHROME_HEIGHT_LOGICAL * retina_scale).
@@ -24,19 +34,27 @@ from agent.input import window
 CHROME_HEIGHT_LOGICAL = int(os.getenv('CHROME_HEIGHT', '88'))
 
 
-def capture_window(window_id: int, output_path: str | None = None) -> str:
+def capture_window(
+    window_id: int,
+    output_path: str | None = None,
+    fmt: str = 'png',
+) -> str:
     """
     Capture a specific window by its CGWindowID.
 
     Uses `screencapture -l <windowID> -o <path>` where -o suppresses
-    the drop shadow. Returns the path to the saved PNG.
+    the drop shadow. fmt is passed as `-t <fmt>` when not PNG (e.g. 'jpg'
+    for cheap settle polling). Returns the path to the saved image.
     """
     if output_path is None:
         timestamp = int(time.time() * 1000)
-        output_path = f'/tmp/ub-screenshot-{timestamp}.png'
+        output_path = f'/tmp/ub-screenshot-{timestamp}.{fmt}'
 
+    cmd = ['screencapture', '-l', str(window_id), '-o']
+    if fmt != 'png':
+        cmd += ['-t', fmt]
     result = subprocess.run(
-        ['screencapture', '-l', str(window_id), '-o', output_path],
+        cmd + [output_path],
         capture_output=True,
         text=True,
     )
@@ -79,25 +97,41 @@ def capture_to_bytes(window_id: int) -> bytes:
             os.unlink(tmp_path)
 
 
+def capture_thumbnail(window_id: int, width: int = 160) -> 'Image.Image':
+    """Capture a window as a small grayscale image for change detection.
+
+    Used by the settle detector to poll for visual stability between
+    actions. In-process captures are taken at 1x; the screencapture
+    fallback decodes a JPEG in draft mode, so only a fraction of the
+    pixels are ever decoded.
+    """
+    from agent import capture
+
+    return capture.capture_thumbnail(window_id, width)
+
+
 def capture_to_base64(window_id: int) -> str:
     """Capture a window and return base64-encoded PNG data."""
     raw = capture_to_bytes(window_id)
     return base64.b64encode(raw).decode('ascii')
 
 
-def png_dimensions(b64: str) -> tuple[int, int]:
-    """Extract (width, height) from a base64-encoded PNG without full decode.
+def _ihdr_dimensions(raw: bytes) -> tuple[int, int]:
+    """Read (width, height) from the IHDR chunk of raw PNG bytes.
 
-    Reads the IHDR chunk: bytes 16-19 are width, 20-23 are height (big-endian).
+    Bytes 16-19 are width, 20-23 are height (big-endian).
     """
-    import struct
-    raw = base64.b64decode(b64[:200])  # IHDR is within the first ~33 bytes
-    if raw[:8] != b'\x89PNG\r\n\x1a\n':
+    if raw[:8] != b'\x89PNG\r\n\x1a\n' or len(raw) < 24:
         raise ValueError('Not a valid PNG')
     width, height = struct.unpack('>II', raw[16:24])
     return width, height
 
 
+def png_dimensions(b64: str) -> tuple[int, int]:
+    """Extract (width, height) from a base64-encoded PNG without full decode."""
+    return _ihdr_dimensions(base64.b64decode(b64[:200]))  # IHDR is within the first ~33 bytes
+
+
 def b64_to_image(b64: str) -> 'Image.Image':
     """Decode a base64-encoded PNG into a PIL Image."""
     from PIL import Image
@@ -106,41 +140,250 @@ def b64_to_image(b64: str) -> 'Image.Image':
     return Image.open(io.BytesIO(raw))
 
 
-def crop_browser_chrome(screenshot_b64: str) -> tuple[str, int]:
-    """Remove browser chrome (tab bar + address bar) from a screenshot.
+@dataclass(frozen=True)
+class EncodedImage:
+    """A frame encoded for the VLM (JPEG or WebP, possibly downscaled).
 
-    Crops the top N physical pixels corresponding to CHROME_HEIGHT_LOGICAL
-    scaled by the display's Retina factor.
+    scale_factor is original_width / sent_width (1.0 if not resized).
+    """
 
-    Args:
-        screenshot_b64: Base64-encoded PNG of the full Chrome window.
+    data: bytes
+    b64: str
+    scale_factor: float
+    size: tuple[int, int]
+    media_type: str = 'image/jpeg'
 
-    Returns:
-        (cropped_b64, chrome_height_px): cropped base64 PNG and the number
-        of physical pixels that were removed. The caller needs chrome_height_px
-        to convert page-relative VLM coords back to screen coords.
+
+class Frame:
+    """One window capture, decoded at most once.
+
+    Holds the PNG bytes exactly as captured plus a lazily decoded PIL
+    image. crop_top() and encode() return cached views derived from that
+    single image, so however many consumers look at a step's screenshot
+    (dimension probe, chrome crop, VLM resize, stuck detection, debug
+    trace) the capture is decoded once and encoded once for the VLM.
+
+    Derived frames (crops) and in-process captures carry no PNG bytes
+    until someone asks for .png, which only the debug trace does.
+
+    scale is image pixels per screen point when the capture backend
+    knows it (None otherwise); capture is the backend's record of the
+    capture (backend, ms, bytes, scale, size), None for frames not made
+    by capture_frame().
+
+    Not thread-safe: a Frame belongs to the job that captured it.
     """
-    from PIL import Image
 
+    __slots__ = ('_png', '_image', '_size', '_b64', '_digest', '_dhash', '_crops', '_encodes',
+                 'scale', 'capture')
+
+    def __init__(
+        self,
+        png: bytes | None = None,
+        *,
+        image: 'Image.Image | None' = None,
+        digest: str | None = None,
+        scale: float | None = None,
+    ) -> None:
+        if png is None and image is None:
+            raise ValueError('Frame needs PNG bytes or a decoded image')
+        self._png = png
+        self._image = image
+        self._size: tuple[int, int] | None = image.size if image is not None else None
+        self._b64: str | None = None
+        self._digest = digest
+        self._dhash: int | None | bool = False  # False = not computed yet
+        self._crops: dict[int, Frame] = {}
+        self._encodes: dict[tuple, EncodedImage] = {}
+        self.scale = scale
+        self.capture: dict | None = None
+
+    @classmethod
+    def from_base64(cls, b64: str) -> Frame:
+        """Wrap a base64-encoded PNG (for callers still holding strings)."""
+        return cls(base64.b64decode(b64))
+
+    @property
+    def png(self) -> bytes:
+        """PNG bytes. Encoded on first access for derived frames."""
+        if self._png is None:
+            buf = io.BytesIO()
+            self._image.save(buf, format='PNG')
+            self._png = buf.getvalue()
+        return self._png
+
+    @property
+    def captured_png(self) -> bytes | None:
+        """PNG bytes if the frame already has them; never encodes."""
+        return self._png
+
+    @property
+    def b64(self) -> str:
+        """Base64 of the PNG bytes (cached)."""
+        if self._b64 is None:
+            self._b64 = base64.b64encode(self.png).decode('ascii')
+        return self._b64
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """(width, height) in pixels, read from IHDR when not yet decoded.
+
+        Raises ValueError if the bytes are not a PNG.
+        """
+        if self._size is None:
+            self._size = _ihdr_dimensions(self._png)
+        return self._size
+
+    @property
+    def image(self) -> 'Image.Image':
+        """The decoded PIL image. Decoded once, on first access."""
+        if self._image is None:
+            from PIL import Image
+
+            img = Image.open(io.BytesIO(self._png))
+            img.load()
+            self._image = img
+            self._size = img.size
+        return self._image
+
+    @property
+    def digest(self) -> str:
+        """Stable content identity: MD5 of the captured bytes.
+
+        Derived frames inherit their parent's digest plus the derivation,
+        so hashing a crop never forces a PNG encode. Frames captured as
+        pixels hash the pixel buffer instead.
+        """
+        if self._digest is None:
+            if self._png is not None:
+                self._digest = hashlib.md5(self._png).hexdigest()
+            else:
+                self._digest = hashlib.md5(self._image.tobytes()).hexdigest()
+        return self._digest
+
+    @property
+    def dhash(self) -> int | None:
+        """256-bit perceptual hash of the whole image (cached).
+
+        None when the bytes can't be decoded as an image.
+        """
+        if self._dhash is False:
+            from agent.frame_tracker import dhash
+
+            try:
+                self._dhash = dhash(self.image)
+            except (OSError, ValueError):
+                self._dhash = None
+        return self._dhash
+
+    def crop_top(self, px: int) -> Frame:
+        """Return a view with the top px rows removed (cached per px)."""
+        if px <= 0:
+            return self
+        cropped = self._crops.get(px)
+        if cropped is None:
+            img = self.image
+            cropped = Frame(
+                image=img.crop((0, px, img.width, img.height)),
+                digest=f'{self.digest}:top{px}',
+                scale=self.scale,
+            )
+            self._crops[px] = cropped
+        return cropped
+
+    def encode(
+        self,
+        max_width: int,
+        quality: int = 85,
+        fmt: str = 'jpeg',
+        grayscale: bool = False,
+    ) -> EncodedImage:
+        """Downscale to max_width (if wider) and encode (cached).
+
+        fmt is 'jpeg' or 'webp'. grayscale drops colour, which shrinks the
+        payload (not the vision-token count) for text-heavy pages.
+        """
+        key = (max_width, quality, fmt, grayscale)
+        encoded = self._encodes.get(key)
+        if encoded is not None:
+            return encoded
+
+        from PIL import Image
+
+        img = self.image
+        scale_factor = 1.0
+        if img.width > max_width:
+            scale_factor = img.width / max_width
+            img = img.resize((max_width, int(img.height / scale_factor)), Image.LANCZOS)
+        mode = 'L' if grayscale else 'RGB'
+        if img.mode != mode:
+            img = img.convert(mode)
+
+        buf = io.BytesIO()
+        img.save(buf, format=fmt.upper(), quality=quality)
+        data = buf.getvalue()
+        encoded = EncodedImage(
+            data=data,
+            b64=base64.b64encode(data).decode('ascii'),
+            scale_factor=scale_factor,
+            size=(img.width, img.height),
+            media_type=f'image/{fmt}',
+        )
+        self._encodes[key] = encoded
+        return encoded
+
+
+def capture_frame(window_id: int) -> Frame:
+    """Capture a window through the capture backend at CAPTURE_SCALE.
+
+    See agent.capture. frame.capture has the latency and bytes read.
+    """
+    from agent import capture
+
+    return capture.capture_frame(window_id)
+
+
+def crop_browser_chrome_frame(frame: Frame) -> tuple[Frame, int]:
+    """Frame variant of crop_browser_chrome: returns (cropped_view, chrome_px).
+
+    The crop is a cached view on the frame's decoded image; no PNG is
+    re-encoded.
+    """
     # Re-read at call time: dotenv loads agent.env after module import,
     # so the module-level CHROME_HEIGHT_LOGICAL may still be the default.
     chrome_logical = int(os.environ.get('CHROME_HEIGHT', '88'))
-    scale = window.get_retina_scale()
+    scale = frame.scale if frame.scale is not None else window_registry.display_scale()
     chrome_px = int(chrome_logical * scale)
 
     # No stripping requested
     if chrome_px <= 0:
-        return screenshot_b64, 0
-
-    raw = base64.b64decode(screenshot_b64)
-    img = Image.open(io.BytesIO(raw))
+        return frame, 0
 
     # Guard: don't crop if the image is too short
-    if img.height <= chrome_px:
-        return screenshot_b64, 0
-
-    cropped = img.crop((0, chrome_px, img.width, img.height))
-    buf = io.BytesIO()
-    cropped.save(buf, format='PNG')
-    cropped_b64 = base64.b64encode(buf.getvalue()).decode('ascii')
-    return cropped_b64, chrome_px
+    if frame.size[1] <= chrome_px:
+        return frame, 0
+
+    return frame.crop_top(chrome_px), chrome_px
+
+
+def crop_browser_chrome(screenshot_b64: str) -> tuple[str, int]:
+    """Remove browser chrome (tab bar + address bar) from a screenshot.
+
+    Crops the top N physical pixels corresponding to CHROME_HEIGHT_LOGICAL
+    scaled by the display's Retina factor. The executor uses
+    crop_browser_chrome_frame() instead; this wrapper is for callers that
+    hold base64 strings.
+
+    Args:
+        screenshot_b64: Base64-encoded PNG of the full Chrome window.
+
+    Returns:
+        (cropped_b64, chrome_height_px): cropped base64 PNG and the number
+        of physical pixels that were removed. The caller needs chrome_height_px
+        to convert page-relative VLM coords back to screen coords.
+    """
+    frame = Frame.from_base64(screenshot_b64)
+    cropped, chrome_px = crop_browser_chrome_frame(frame)
+    if cropped is frame:
+        return screenshot_b64, chrome_px
+    return cropped.b64, chrome_px
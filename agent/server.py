@@ -14,11 +14,19 @@ Endpoints (matches what orchestrator's AgentClient sends):
 Multi-job execution: up to MAX_CONCURRENT_AGENT_JOBS jobs run concurrently.
 GUI actions are serialized via gui_lock; everything else (VLM inference,
 screenshots, OTP waits) runs in true parallel across jobs.
+
+Capacity is counted twice. Execution slots (MAX_CONCURRENT_AGENT_JOBS)
+bound jobs using the GUI and VLM. A job waiting for a user's OTP or
+credential parks: it keeps its Chrome session but gives its slot back
+(up to MAX_PARKED_AGENT_JOBS parked at once, a memory bound) and takes
+a slot again when the code arrives, ahead of new dispatches. /health
+reports both.
 """
 
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import logging
 import os
 import signal
@@ -31,10 +39,18 @@ import httpx
 from aiohttp import web
 from dotenv import load_dotenv
 
-from agent.config import AGENT_PORT, MAX_CONCURRENT_AGENT_JOBS
+from agent.cancel import CancelToken
+from agent.config import AGENT_PORT, MAX_CONCURRENT_AGENT_JOBS, MAX_PARKED_AGENT_JOBS
+from agent.debug_trace import DebugTrace
+from agent.flow_replay import FlowStore
+from agent.gui_lock import gui_lock
+from agent.input.window_registry import window_registry
 from agent.playbook import ExecutionResult
 from agent.profile import NORMAL, PROFILES
 from agent.recording.vlm_client import VLMClient
+from agent.recording.vlm_pool import VLMPool
+from agent.session_pool import SessionManager
+from agent.vlm_cache import ResponseCache
 from agent.vlm_executor import VLMExecutor
 
 log = logging.getLogger(__name__)
@@ -68,7 +84,10 @@ class ActiveJob:
     task: asyncio.Task | None = None
     otp_future: asyncio.Future | None = None
     credential_future: asyncio.Future | None = None
+    cancel: CancelToken = field(default_factory=CancelToken)
     started_at: float = field(default_factory=time.monotonic)
+    # Set while the job waits for the user with its execution slot released
+    parked_since: float | None = None
 
 
 # ---------------------------------------------------------------------------
@@ -85,12 +104,14 @@ class Agent:
         orchestrator_url: str = "http://192.168.1.101:8422",
         profile_name: str = "normal",
         max_jobs: int = MAX_CONCURRENT_AGENT_JOBS,
+        max_parked: int = MAX_PARKED_AGENT_JOBS,
     ) -> None:
         self._host = host
         self._port = port
         self._orchestrator_url = orchestrator_url.rstrip("/")
         self._profile = PROFILES.get(profile_name, NORMAL)
         self._max_jobs = max_jobs
+        self._max_parked = max_parked
 
         self._app = web.Application()
         self._runner: web.AppRunner | None = None
@@ -98,11 +119,22 @@ class Agent:
 
         self._active_jobs: dict[str, ActiveJob] = {}
         self._lock = asyncio.Lock()
+        # Notified (under _lock) whenever an execution slot is released
+        self._slot_freed = asyncio.Condition(self._lock)
+        # Parked jobs waiting to take a slot back; they go before new jobs
+        self._resuming = 0
         self._shutdown = asyncio.Event()
         self._loop: asyncio.AbstractEventLoop | None = None
 
-        # VLM client (created at startup, closed at shutdown)
-        self._vlm: VLMClient | None = None
+        # VLM client, or a pool when VLM_URL lists several endpoints
+        # (created at startup, closed at shutdown)
+        self._vlm: VLMClient | VLMPool | None = None
+        # Cross-job VLM response cache (opt-in via VLM_CACHE)
+        self._response_cache: ResponseCache | None = None
+        # Learned flow replay (opt-in via FLOW_REPLAY)
+        self._flows: FlowStore | None = None
+        # Chrome warm pool and background teardown (created at startup)
+        self._sessions: SessionManager | None = None
 
     # ------------------------------------------------------------------
     # Lifecycle
@@ -120,17 +152,34 @@ class Agent:
 
         if not vlm_cfg['url']:
             log.warning("VLM_URL not set; jobs will fail until configured")
-        self._vlm = VLMClient(
-            base_url=vlm_cfg['url'] or "http://localhost:8080",
-            api_key=vlm_cfg['key'],
-            model=vlm_cfg['model'],
-        )
+        if ',' in vlm_cfg['url']:
+            self._vlm = VLMPool.from_config(vlm_cfg)
+        else:
+            self._vlm = VLMClient(
+                base_url=vlm_cfg['url'] or "http://localhost:8080",
+                api_key=vlm_cfg['key'],
+                model=vlm_cfg['model'],
+            )
         self._vlm_model = vlm_cfg['model']
         log.info("VLM client: model=%s url=%s max_width=%d normalize=%s yx=%s square_pad=%s",
                  vlm_cfg['model'], vlm_cfg['url'] or "(not set)",
                  vlm_cfg['max_width'], vlm_cfg['coord_normalize'],
                  vlm_cfg['coord_yx'], vlm_cfg['coord_square_pad'])
 
+        self._response_cache = ResponseCache.from_env()
+        if self._response_cache is not None:
+            log.info("VLM response cache enabled: %s",
+                     self._response_cache.stats())
+        self._flows = FlowStore.from_env()
+        if self._flows is not None:
+            log.info("Flow replay enabled: %s", self._flows.stats())
+
+        self._sessions = SessionManager.from_env()
+        self._sessions.start()
+
+        # Trace archive eviction runs on the trace writer thread
+        DebugTrace.maintain()
+
         # Register routes
         self._app.router.add_post("/execute", self._handle_execute)
         self._app.router.add_post("/otp", self._handle_otp)
@@ -159,6 +208,9 @@ class Agent:
         if tasks:
             log.info("Waiting for %d active job(s) to complete...", len(tasks))
             done, pending = await asyncio.wait(tasks, timeout=30.0)
+            for aj in list(self._active_jobs.values()):
+                if aj.task in pending:
+                    aj.cancel.cancel("shutdown")
             for t in pending:
                 job_name = t.get_name()
                 log.warning("Job %s did not finish in 30s, cancelling", job_name)
@@ -168,9 +220,20 @@ class Agent:
                 except (asyncio.CancelledError, Exception):
                     pass
 
+        # Close pooled Chrome sessions and finish pending teardowns
+        if self._sessions is not None:
+            await asyncio.to_thread(self._sessions.shutdown)
+            self._sessions = None
+
         # Close VLM client
         if self._vlm is not None:
             self._vlm.close()
+        if self._response_cache is not None:
+            self._response_cache.close()
+            self._response_cache = None
+        if self._flows is not None:
+            self._flows.close()
+            self._flows = None
 
         # Close HTTP client
         if self._http_client:
@@ -220,14 +283,16 @@ class Agent:
                     status=409,
                 )
 
-            if len(self._active_jobs) >= self._max_jobs:
-                running = list(self._active_jobs.keys())
+            if self._slots_available() <= 0:
+                running = [aj.job_id for aj in self._active_jobs.values()
+                           if aj.parked_since is None]
                 log.warning(
-                    "Rejected job %s: at capacity (%d/%d, running: %s)",
-                    job_id, len(self._active_jobs), self._max_jobs, running,
+                    "Rejected job %s: at capacity (%d/%d, running: %s, resuming: %d)",
+                    job_id, self._executing_count(), self._max_jobs, running,
+                    self._resuming,
                 )
                 return web.json_response(
-                    {"error": f"At capacity ({len(self._active_jobs)}/{self._max_jobs})"},
+                    {"error": f"At capacity ({self._executing_count()}/{self._max_jobs})"},
                     status=409,
                 )
 
@@ -240,7 +305,7 @@ class Agent:
             log.info(
                 "Accepted job %s (%s/%s) [%d/%d slots]",
                 job_id, service, action,
-                len(self._active_jobs), self._max_jobs,
+                self._executing_count(), self._max_jobs,
             )
 
         # Run the job in a background task so we can return 200 immediately
@@ -326,7 +391,10 @@ class Agent:
         """POST /abort
 
         Body: {"job_id": str}
-        Cancels a specific running job.
+        Cancels a specific running job. The job's CancelToken aborts work
+        the executor has handed to threads (the in-flight VLM request, a
+        long GUI section); cancelling the task ends its current await.
+        Chrome is closed and the slot freed right after.
         """
         try:
             data = await request.json()
@@ -345,6 +413,7 @@ class Agent:
             )
 
         if active.task and not active.task.done():
+            active.cancel.cancel("aborted")
             active.task.cancel()
             log.info("Abort requested for job %s", job_id)
 
@@ -352,24 +421,51 @@ class Agent:
 
     async def _handle_health(self, request: web.Request) -> web.Response:
         """GET /health"""
+        now = time.monotonic()
         active_jobs = []
         for aj in self._active_jobs.values():
             active_jobs.append({
                 "job_id": aj.job_id,
                 "service": aj.service,
                 "action": aj.action,
-                "elapsed_seconds": round(time.monotonic() - aj.started_at, 1),
+                "elapsed_seconds": round(now - aj.started_at, 1),
+                "parked_seconds": (round(now - aj.parked_since, 1)
+                                   if aj.parked_since is not None else None),
             })
 
+        parked = self._parked_count()
         status: dict = {
             "ok": True,
             "version": GIT_HASH,
             "vlm_model": self._vlm_model,
+            # Execution slots: jobs driving the GUI / VLM
             "max_jobs": self._max_jobs,
-            "active_job_count": len(self._active_jobs),
-            "slots_available": self._max_jobs - len(self._active_jobs),
+            "active_job_count": self._executing_count(),
+            "slots_available": self._slots_available(),
+            # Parked sessions: jobs waiting on a user's OTP or credential
+            "max_parked": self._max_parked,
+            "parked_job_count": parked,
+            "parked_available": max(0, self._max_parked - parked),
+            "resuming_job_count": self._resuming,
             "active_jobs": active_jobs,
         }
+        if self._response_cache is not None:
+            status["vlm_cache"] = self._response_cache.stats()
+        if self._flows is not None:
+            status["flow_replay"] = self._flows.stats()
+        if self._vlm is not None:
+            totals = dict(self._vlm.usage_totals)
+            if totals["prompt_tokens"]:
+                totals["prefix_cached_ratio"] = round(
+                    totals["cached_tokens"] / totals["prompt_tokens"], 3)
+            status["vlm_usage"] = totals
+        if isinstance(self._vlm, VLMPool):
+            status["vlm_backends"] = self._vlm.stats()
+        # GUI scheduler: holder, queue, wait/hold histograms per job and class
+        status["gui"] = gui_lock.stats()
+        status["windows"] = window_registry.stats()
+        if self._sessions is not None:
+            status["chrome"] = self._sessions.stats()
         return web.json_response(status)
 
     # ------------------------------------------------------------------
@@ -379,8 +475,11 @@ class Agent:
     async def _run_job(self, active: ActiveJob, credentials: dict) -> None:
         """Execute a VLM-driven flow for the given job, then report result.
 
-        Runs the synchronous VLMExecutor in a thread pool so we don't block
-        the event loop (Chrome automation, VLM calls, and sleeps are all blocking).
+        The executor runs as a coroutine on this loop: its GUI sections go
+        to the GUI thread pool and VLM calls to a worker thread, while
+        settle delays and OTP/credential waits are plain awaits. A job
+        parked on an OTP holds no thread, and cancelling this task (abort,
+        shutdown) stops the executor at its next await and closes Chrome.
         """
         result: ExecutionResult | None = None
         error_msg = ""
@@ -409,17 +508,19 @@ class Agent:
                 otp_callback=self.request_otp,
                 credential_callback=self.request_credential,
                 loop=self._loop,
+                response_cache=self._response_cache,
+                sessions=self._sessions,
+                flows=self._flows,
             )
 
-            result = await asyncio.get_running_loop().run_in_executor(
-                None,
-                executor.run,
+            result = await executor.run_async(
                 active.service,
                 active.action,
                 dict(credentials),  # defensive copy
                 active.job_id,
                 plan_tier,
                 active.user_npub,
+                cancel=active.cancel,
             )
 
             if result.success:
@@ -437,6 +538,7 @@ class Agent:
                     result.duration_seconds,
                     result.error_message,
                 )
+            log.info("Job %s step timings: %s", active.job_id, result.step_timings())
 
         except asyncio.CancelledError:
             error_msg = "Job aborted"
@@ -451,10 +553,11 @@ class Agent:
             await self._report_result(active, result, error_msg)
             async with self._lock:
                 self._active_jobs.pop(active.job_id, None)
+                self._slot_freed.notify_all()
             log.info(
                 "Slot freed for job %s [%d/%d slots]",
                 active.job_id,
-                len(self._active_jobs), self._max_jobs,
+                self._executing_count(), self._max_jobs,
             )
 
     async def _report_result(
@@ -480,6 +583,11 @@ class Agent:
                 "step_count": result.step_count,
                 "inference_count": result.inference_count,
                 "otp_required": result.otp_required,
+                # Where the time went: per-job totals and per-step records
+                "step_timings": {
+                    "totals": result.step_timings(),
+                    "steps": result.step_results,
+                },
             }
         else:
             payload = {
@@ -512,7 +620,69 @@ class Agent:
             )
 
     # ------------------------------------------------------------------
-    # OTP support (called from executor thread via the event loop)
+    # Capacity: execution slots and parked sessions
+    # ------------------------------------------------------------------
+
+    def _executing_count(self) -> int:
+        return sum(1 for aj in self._active_jobs.values() if aj.parked_since is None)
+
+    def _parked_count(self) -> int:
+        return len(self._active_jobs) - self._executing_count()
+
+    def _slots_available(self) -> int:
+        """Execution slots a new job may take (resuming jobs go first)."""
+        return max(0, self._max_jobs - self._executing_count() - self._resuming)
+
+    @contextlib.asynccontextmanager
+    async def _parked(self, active: ActiveJob):
+        """Release active's execution slot while it waits on the user.
+
+        On exit the job waits for a slot again before the executor
+        resumes, unless it was aborted: then it only tears down, without
+        holding back a slot from new jobs. When MAX_PARKED_AGENT_JOBS
+        sessions are already parked the job keeps its slot instead.
+        """
+        async with self._lock:
+            park = self._parked_count() < self._max_parked
+            if park:
+                active.parked_since = time.monotonic()
+                self._slot_freed.notify_all()
+        if park:
+            log.info(
+                "Job %s parked [%d/%d slots, %d/%d parked]",
+                active.job_id, self._executing_count(), self._max_jobs,
+                self._parked_count(), self._max_parked,
+            )
+        aborted = False
+        try:
+            yield
+        except asyncio.CancelledError:
+            aborted = True
+            raise
+        finally:
+            if park and (aborted or active.cancel.cancelled):
+                active.parked_since = None
+            elif park:
+                await self._resume(active)
+
+    async def _resume(self, active: ActiveJob) -> None:
+        """Take an execution slot back for a parked job, waiting if all are busy."""
+        async with self._slot_freed:
+            self._resuming += 1
+            try:
+                while self._executing_count() >= self._max_jobs:
+                    await self._slot_freed.wait()
+            finally:
+                self._resuming -= 1
+            parked_for = time.monotonic() - active.parked_since
+            active.parked_since = None
+        log.info(
+            "Job %s resumed after %.1fs parked [%d/%d slots]",
+            active.job_id, parked_for, self._executing_count(), self._max_jobs,
+        )
+
+    # ------------------------------------------------------------------
+    # OTP support (awaited by the executor on this loop)
     # ------------------------------------------------------------------
 
     async def request_otp(self, job_id: str, service: str, prompt: str | None = None) -> str | None:
@@ -553,10 +723,12 @@ class Agent:
             log.error("Failed to request OTP for job %s: %s", job_id, exc)
             return None
 
-        # Wait for the code (up to 15 minutes, matching orchestrator's OTP timeout)
+        # Wait for the code (up to 15 minutes, matching orchestrator's OTP
+        # timeout), parked: the execution slot is free for other jobs.
         otp_timeout = int(os.environ.get("OTP_TIMEOUT_SECONDS", "900"))
         try:
-            code = await asyncio.wait_for(active.otp_future, timeout=otp_timeout)
+            async with self._parked(active):
+                code = await asyncio.wait_for(active.otp_future, timeout=otp_timeout)
             log.info("Received OTP for job %s", job_id)
             return code
         except asyncio.TimeoutError:
@@ -566,7 +738,7 @@ class Agent:
             active.otp_future = None
 
     # ------------------------------------------------------------------
-    # Credential support (called from executor thread via the event loop)
+    # Credential support (awaited by the executor on this loop)
     # ------------------------------------------------------------------
 
     async def request_credential(
@@ -616,12 +788,13 @@ class Agent:
             )
             return None
 
-        # Wait for the value (up to 15 minutes, matching OTP timeout)
+        # Wait for the value (up to 15 minutes, matching OTP timeout), parked
         cred_timeout = int(os.environ.get("CREDENTIAL_TIMEOUT_SECONDS", "900"))
         try:
-            value = await asyncio.wait_for(
-                active.credential_future, timeout=cred_timeout
-            )
+            async with self._parked(active):
+                value = await asyncio.wait_for(
+                    active.credential_future, timeout=cred_timeout
+                )
             log.info("Received credential '%s' for job %s", credential_name, job_id)
             return value
         except asyncio.TimeoutError:
@@ -0,0 +1,311 @@
+"""
+Chrome session lifecycle: warm pool and background teardown.
+
+Launching Chrome for a job (clone a profile, start the process, wait
+up to 10s for its window, drag-resize it under gui_lock) costs several
+seconds before the first screenshot, and browser.close_session blocks
+for up to 3s in _kill_pid plus the profile rmtree. SessionManager keeps
+up to CHROME_POOL_SIZE pre-launched, pre-sized Chrome instances ready,
+each on its own fresh profile, and hands one to each job.
+
+Sessions are never reused across jobs: release() kills the process and
+deletes the profile on a background thread, so the caller reports its
+result without waiting, and the pool refills itself in the background.
+Pooled sessions older than CHROME_POOL_MAX_IDLE seconds, or whose
+process or window has gone away, are retired instead of handed out.
+
+Pool launches go through the same launch function as a cold start
+(browser.create_session by default), so their resize takes gui_lock
+like any job's launch would.
+
+Usage:
+    from agent.session_pool import SessionManager
+
+    sessions = SessionManager.from_env()
+    sessions.start()                  # begin warming the pool
+    session = sessions.acquire()      # warm if one is ready, else cold launch
+    ...
+    sessions.release(session)         # returns immediately
+    sessions.shutdown()
+
+Configuration (the TTS agent reads the same keys with a TTS_ prefix):
+  CHROME_POOL_SIZE      pre-launched sessions kept ready (default 0:
+                        launch per job; teardown is still backgrounded)
+  CHROME_POOL_MAX_IDLE  seconds a pooled session may wait before it is
+                        replaced with a new one (default 900)
+  CHROME_PROFILE_TEMPLATE  see agent.browser
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from agent import browser
+from agent.browser import BrowserSession
+
+log = logging.getLogger(__name__)
+
+
+def get_session_pool_config(prefix: str = 'CHROME_POOL') -> dict:
+    """Read pool configuration from os.environ at call time."""
+    return {
+        'size': max(0, int(os.environ.get(f'{prefix}_SIZE', '0'))),
+        'max_idle': float(os.environ.get(f'{prefix}_MAX_IDLE', '900')),
+    }
+
+
+def _default_launch() -> BrowserSession:
+    return browser.create_session()
+
+
+def _default_close(session: BrowserSession) -> None:
+    browser.close_session(session)
+
+
+def _default_check(session: BrowserSession) -> bool:
+    """True if the session's process is running and its window exists."""
+    if session.process is not None and session.process.poll() is not None:
+        return False
+    try:
+        browser.get_session_window(session)
+    except RuntimeError:
+        return False
+    return True
+
+
+class SessionManager:
+    """Hands out fresh Chrome sessions and tears them down off-thread.
+
+    Args:
+        launch: Starts one ready-to-use session (blocking). Defaults to
+            browser.create_session at its default size.
+        close: Kills a session and removes its profile (blocking).
+            Defaults to browser.close_session.
+        pool_size: Sessions to keep pre-launched. 0 disables the pool.
+        max_idle: Seconds a pooled session may wait before it is retired.
+        check: Returns False for a pooled session that can't be used
+            (process exited, window closed). Defaults to a process poll
+            plus a window lookup.
+        clock: Monotonic clock, injectable for tests.
+    """
+
+    def __init__(
+        self,
+        launch: Callable[[], BrowserSession] | None = None,
+        close: Callable[[BrowserSession], None] | None = None,
+        pool_size: int = 0,
+        max_idle: float = 900.0,
+        check: Callable[[BrowserSession], bool] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._launch = launch or _default_launch
+        self._close = close or _default_close
+        self._check = check or _default_check
+        self.pool_size = pool_size
+        self.max_idle = max_idle
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._idle: deque[tuple[BrowserSession, float]] = deque()
+        self._filling = False
+        self._closed = False
+        self._teardowns: set[Future] = set()
+        self._launcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chrome-launch')
+        self._reaper = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chrome-reap')
+        self._counts: Counter[str] = Counter()
+        self._acquire_ms: dict[str, deque[float]] = {
+            'warm': deque(maxlen=64), 'cold': deque(maxlen=64),
+        }
+
+    @classmethod
+    def from_env(
+        cls,
+        launch: Callable[[], BrowserSession] | None = None,
+        prefix: str = 'CHROME_POOL',
+    ) -> SessionManager:
+        """Build a manager from {prefix}_SIZE / {prefix}_MAX_IDLE env vars."""
+        cfg = get_session_pool_config(prefix)
+        return cls(launch=launch, pool_size=cfg['size'], max_idle=cfg['max_idle'])
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Begin filling the pool in the background."""
+        if self.pool_size:
+            log.info('Chrome pool: warming %d session(s)', self.pool_size)
+        self._refill()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop refilling and close pooled sessions.
+
+        With wait, returns once every pending launch has finished and
+        every teardown (including ones released earlier) has run.
+        """
+        with self._lock:
+            self._closed = True
+            idle = [session for session, _ in self._idle]
+            self._idle.clear()
+        for session in idle:
+            self.release(session)
+        # A launch in flight sees _closed and releases its session itself
+        self._launcher.shutdown(wait=wait)
+        self._reaper.shutdown(wait=wait)
+
+    # ------------------------------------------------------------------
+    # Sessions
+    # ------------------------------------------------------------------
+
+    def acquire(self) -> BrowserSession:
+        """A ready session for one job: a pooled one if usable, else cold.
+
+        Raises whatever the launch function raises on a cold start, or
+        RuntimeError after shutdown().
+        """
+        t0 = self._clock()
+        session = None
+        while session is None:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError('Chrome session manager is shut down')
+                if not self._idle:
+                    break
+                candidate, ready_at = self._idle.popleft()
+            if t0 - ready_at > self.max_idle:
+                self._count('expired')
+                self.release(candidate)
+            elif not self._check(candidate):
+                self._count('unhealthy')
+                self.release(candidate)
+            else:
+                session = candidate
+
+        kind = 'warm' if session is not None else 'cold'
+        if session is None:
+            session = self._launch()
+        self._refill()
+
+        ms = (self._clock() - t0) * 1000
+        with self._lock:
+            self._counts[kind] += 1
+            self._acquire_ms[kind].append(ms)
+        log.info('Chrome session ready (PID %d, %s) in %.0f ms', session.pid, kind, ms)
+        return session
+
+    def release(self, session: BrowserSession) -> None:
+        """Close the session and delete its profile in the background.
+
+        Falls back to closing inline if the manager has fully shut down.
+        """
+        try:
+            future = self._reaper.submit(self._teardown, session)
+        except RuntimeError:
+            self._teardown(session)
+            return
+        with self._lock:
+            self._teardowns.add(future)
+        future.add_done_callback(self._teardown_done)
+
+    def _teardown(self, session: BrowserSession) -> None:
+        try:
+            self._close(session)
+            self._count('closed')
+        except Exception as exc:
+            self._count('close_failures')
+            log.warning('Failed to close Chrome (PID %d): %s', session.pid, exc)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _teardown_done(self, future: Future) -> None:
+        with self._lock:
+            self._teardowns.discard(future)
+
+    # ------------------------------------------------------------------
+    # Pool
+    # ------------------------------------------------------------------
+
+    def _refill(self) -> None:
+        """Start the launcher thread if the pool is short and idle."""
+        with self._lock:
+            if self._closed or self._filling or len(self._idle) >= self.pool_size:
+                return
+            self._filling = True
+        try:
+            self._launcher.submit(self._fill)
+        except RuntimeError:  # shut down in between
+            with self._lock:
+                self._filling = False
+
+    def _fill(self) -> None:
+        """Launch sessions one at a time until the pool is full.
+
+        A failed launch stops the fill; the next acquire() retries.
+        """
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or len(self._idle) >= self.pool_size:
+                        return
+                try:
+                    session = self._launch()
+                except Exception as exc:
+                    self._count('launch_failures')
+                    log.warning('Chrome pool: launch failed: %s', exc)
+                    return
+                with self._lock:
+                    closed = self._closed
+                    if not closed:
+                        self._idle.append((session, self._clock()))
+                if closed:
+                    self.release(session)
+                    return
+                self._count('launched')
+        finally:
+            with self._lock:
+                self._filling = False
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Pool occupancy, hit counts and acquire latency for /health."""
+        with self._lock:
+            idle = len(self._idle)
+            filling = self._filling
+            tearing_down = len(self._teardowns)
+            counts = Counter(self._counts)
+            samples_by_kind = {k: list(v) for k, v in self._acquire_ms.items()}
+        acquire_ms = {}
+        for kind, samples in samples_by_kind.items():
+            if samples:
+                ordered = sorted(samples)
+                acquire_ms[kind] = {
+                    'count': len(ordered),
+                    'p50': round(ordered[len(ordered) // 2], 1),
+                    'max': round(ordered[-1], 1),
+                }
+        return {
+            'pool_size': self.pool_size,
+            'idle': idle,
+            'filling': filling,
+            'tearing_down': tearing_down,
+            'warm': counts['warm'],
+            'cold': counts['cold'],
+            'launched': counts['launched'],
+            'launch_failures': counts['launch_failures'],
+            'expired': counts['expired'],
+            'unhealthy': counts['unhealthy'],
+            'closed': counts['closed'],
+            'close_failures': counts['close_failures'],
+            'acquire_ms': acquire_ms,
+        }
@@ -0,0 +1,127 @@
+"""Adaptive page settle: wait until the window stops changing.
+
+After each action the executor used to sleep a fixed SETTLE_DELAY. In
+adaptive mode it instead polls cheap low-res captures of the session
+window and returns as soon as consecutive frames agree within a
+threshold, bounded by a minimum (let the page start reacting) and a
+maximum (spinners and video never settle).
+
+No GUI lock is needed: screencapture -l reads the window buffer without
+touching the mouse or keyboard.
+
+Configuration (read at call time via get_settle_config()):
+  SETTLE_MODE            'fixed' (default) or 'adaptive'
+  SETTLE_MIN             minimum wait in seconds (default 0.5)
+  SETTLE_NAV_MIN         minimum wait after a URL navigation (default 1.0)
+  SETTLE_MAX             maximum wait in seconds (default 6.0)
+  SETTLE_INTERVAL        seconds between polls (default 0.25)
+  SETTLE_THRESHOLD       mean abs pixel difference, 0-1 (default 0.004)
+  SETTLE_STABLE_FRAMES   consecutive matching frames required (default 3)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class SettleResult:
+    """Outcome of one settle wait."""
+
+    elapsed: float   # seconds actually waited
+    stable: bool     # False if max_wait was hit (or capture failed)
+    polls: int       # thumbnails captured
+
+    def as_dict(self) -> dict:
+        return {
+            'settle_ms': round(self.elapsed * 1000),
+            'stable': self.stable,
+            'polls': self.polls,
+        }
+
+
+def get_settle_config() -> dict:
+    """Read settle configuration from os.environ at call time."""
+    return {
+        'mode': os.environ.get('SETTLE_MODE', 'fixed').strip().lower(),
+        'min_wait': float(os.environ.get('SETTLE_MIN', '0.5')),
+        'nav_min_wait': float(os.environ.get('SETTLE_NAV_MIN', '1.0')),
+        'max_wait': float(os.environ.get('SETTLE_MAX', '6.0')),
+        'interval': float(os.environ.get('SETTLE_INTERVAL', '0.25')),
+        'threshold': float(os.environ.get('SETTLE_THRESHOLD', '0.004')),
+        'stable_frames': int(os.environ.get('SETTLE_STABLE_FRAMES', '3')),
+    }
+
+
+def frame_difference(a, b) -> float:
+    """Mean absolute pixel difference of two grayscale images, 0.0-1.0.
+
+    Images of different sizes (window resized mid-poll) count as fully
+    different.
+    """
+    from PIL import ImageChops, ImageStat
+
+    if a.size != b.size:
+        return 1.0
+    diff = ImageChops.difference(a, b)
+    return ImageStat.Stat(diff).mean[0] / 255.0
+
+
+async def wait_for_stable(
+    capture: Callable[[], Awaitable[object]],
+    *,
+    min_wait: float,
+    max_wait: float,
+    interval: float,
+    threshold: float,
+    stable_frames: int = 3,
+    clock: Callable[[], float] | None = None,
+    sleep: Callable[[float], Awaitable[None]] | None = None,
+) -> SettleResult:
+    """Poll capture() until stable_frames consecutive frames match.
+
+    Returns once the frames agree (and at least min_wait has passed), or
+    when max_wait is reached. A capture error ends the wait early with
+    stable=False after honouring min_wait; the caller's next full capture
+    will surface the real error. capture and sleep are awaited, so the
+    waits between polls don't hold a thread.
+    """
+    clock = clock or time.monotonic
+    sleep = sleep or asyncio.sleep
+    t0 = clock()
+    prev = None
+    run = 1
+    polls = 0
+    needed = max(stable_frames, 2)
+
+    while True:
+        try:
+            thumb = await capture()
+        except Exception as exc:
+            log.debug('Settle capture failed: %s', exc)
+            remaining = min_wait - (clock() - t0)
+            if remaining > 0:
+                await sleep(remaining)
+            return SettleResult(clock() - t0, False, polls)
+        polls += 1
+
+        if prev is not None and frame_difference(prev, thumb) <= threshold:
+            run += 1
+        else:
+            run = 1
+        prev = thumb
+
+        elapsed = clock() - t0
+        if run >= needed and elapsed >= min_wait:
+            return SettleResult(elapsed, True, polls)
+        if elapsed >= max_wait:
+            return SettleResult(elapsed, False, polls)
+
+        await sleep(min(interval, max_wait - elapsed))
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import sys
 from pathlib import Path
 from typing import Any
@@ -57,6 +58,8 @@ _quartz.kCGWindowLayer = 'kCGWindowLayer'
 _quartz.kCGWindowBounds = 'kCGWindowBounds'
 _quartz.kCGWindowOwnerPID = 'kCGWindowOwnerPID'
 _quartz.kCGWindowNumber = 'kCGWindowNumber'
+_quartz.kCGWindowIsOnscreen = 'kCGWindowIsOnscreen'
+_quartz.kCGWindowListOptionIncludingWindow = 8
 _quartz.kCGScrollEventUnitPixel = 1
 _quartz.kCGEventLeftMouseDragged = 6
 _quartz.kCGEventRightMouseDragged = 7
@@ -81,9 +84,18 @@ set_display_scale(1.0)
 # Shared fixtures
 # ---------------------------------------------------------------------------
 
+from agent.input.window_registry import window_registry
 from agent.playbook import JobContext
 
 
+@pytest.fixture(autouse=True)
+def _fresh_window_registry():
+    """Don't let one test's tracked windows or cached display scale leak."""
+    window_registry.set_backend(None)
+    yield
+    window_registry.set_backend(None)
+
+
 @pytest.fixture()
 def job_context() -> JobContext:
     """A sample job context with credentials for testing."""
@@ -123,12 +135,14 @@ def apply_vlm_system_mocks(
 ) -> MagicMock:
     """Patch all system interactions used by VLMExecutor.
 
-    Mocks browser, input devices, screenshots, subprocess, random, and
-    time.sleep so VLMExecutor tests run without real Chrome or macOS APIs.
+    Mocks browser, input devices, screenshots, subprocess, random,
+    time.sleep and asyncio.sleep so VLMExecutor tests run without real
+    Chrome or macOS APIs.
 
     Args:
         monkeypatch: pytest monkeypatch fixture.
-        screenshot_b64: Base64 string returned by screenshot capture.
+        screenshot_b64: Base64 string wrapped in the Frame returned by
+            screenshot capture.
         session: Optional pre-built mock session. Creates one if None.
 
     Returns:
@@ -141,10 +155,11 @@ def apply_vlm_system_mocks(
     monkeypatch.setattr('agent.vlm_executor.browser.navigate', lambda *a, **kw: None)
     monkeypatch.setattr('agent.vlm_executor.browser.get_session_window', lambda s: s.bounds)
     monkeypatch.setattr('agent.vlm_executor.browser.close_session', lambda s: None)
-    monkeypatch.setattr('agent.vlm_executor.ss.capture_to_base64',
-                        lambda wid: screenshot_b64)
-    monkeypatch.setattr('agent.vlm_executor.crop_browser_chrome',
-                        lambda b64: (b64, 88))
+    from agent.screenshot import Frame
+    monkeypatch.setattr('agent.vlm_executor.ss.capture_frame',
+                        lambda wid: Frame.from_base64(screenshot_b64))
+    monkeypatch.setattr('agent.vlm_executor.crop_browser_chrome_frame',
+                        lambda frame: (frame, 88))
     monkeypatch.setattr('agent.vlm_executor.mouse.click',
                         lambda x, y, fast=False: None)
     monkeypatch.setattr('agent.vlm_executor.mouse.move_to',
@@ -157,12 +172,20 @@ def apply_vlm_system_mocks(
                         lambda *a, **kw: None)
     monkeypatch.setattr('agent.vlm_executor.scroll_mod.scroll',
                         lambda d, c: None)
+    monkeypatch.setattr('agent.vlm_executor.player.play', lambda plan: None)
     monkeypatch.setattr('agent.vlm_executor.coords.image_to_screen',
                         lambda x, y, bounds, chrome_offset=0: (x, y))
     monkeypatch.setattr('agent.vlm_executor.focus_window_by_pid',
                         lambda pid: None)
     monkeypatch.setattr('agent.vlm_executor._clipboard_copy', lambda t: None)
     monkeypatch.setattr('agent.vlm_executor.time.sleep', lambda s: None)
+    real_async_sleep = asyncio.sleep
+
+    async def _no_async_sleep(delay, result=None):
+        await real_async_sleep(0)  # still yield to other tasks
+        return result
+
+    monkeypatch.setattr('agent.vlm_executor.asyncio.sleep', _no_async_sleep)
     monkeypatch.setattr('agent.vlm_executor.random.gauss',
                         lambda mu, sigma: mu)
     monkeypatch.setattr('agent.vlm_executor.random.uniform',
@@ -0,0 +1,232 @@
+"""Tests for multi-step cancel/resume action plans (agent.recording.action_plan)."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image, ImageDraw
+
+from agent import vlm_executor
+from agent.desktop_sim import SimDesktop, SimScript, sim_vlm_steps
+from agent.flow_replay import FlowStore
+from agent.recording.action_plan import (
+    ActionPlan, build_plan_prompt, get_plan_config, plan_steps, region_diff,
+)
+from agent.recording.vlm_client import VLMClient
+from agent.screenshot import Frame
+from agent.trace_replay import FakeVLMServer
+
+CLICK = {'state': 'survey', 'action': 'click', 'completed': False,
+         'click_point': [100, 100], 'target_description': 'reason'}
+
+
+def _frame(*boxes) -> Frame:
+    """A 400x300 page with a grey block and the given black boxes."""
+    img = Image.new('RGB', (400, 300), 'white')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([250, 200, 350, 260], fill=(120, 120, 120))
+    for box in boxes:
+        draw.rectangle(box, fill='black')
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return Frame(buf.getvalue())
+
+
+class TestPlanSteps:
+    def test_clicks_with_points_in_order(self):
+        response = {**CLICK, 'next_steps': [
+            {'action': 'click', 'click_point': [300, 230], 'target_description': 'Continue'},
+            {'action': 'click', 'click_point': [10, 10]},
+        ]}
+        assert [s['click_point'] for s in plan_steps(response, 3)] == [[300, 230], [10, 10]]
+        assert len(plan_steps(response, 1)) == 1
+
+    def test_stops_at_first_unusable_step(self):
+        response = {**CLICK, 'next_steps': [
+            {'action': 'click', 'click_point': [1, 2]},
+            {'action': 'type_text', 'click_point': [3, 4]},
+            {'action': 'click', 'click_point': [5, 6]},
+        ]}
+        assert len(plan_steps(response, 3)) == 1
+        bad_point = {**CLICK, 'next_steps': [{'action': 'click', 'click_point': [1]}]}
+        assert plan_steps(bad_point, 3) == []
+
+    def test_only_for_clicks_that_dont_finish(self):
+        steps = [{'action': 'click', 'click_point': [1, 2]}]
+        assert plan_steps({**CLICK, 'action': 'wait', 'next_steps': steps}, 3) == []
+        assert plan_steps({**CLICK, 'completed': True, 'next_steps': steps}, 3) == []
+        assert plan_steps({**CLICK, 'next_steps': None}, 3) == []
+
+
+class TestActionPlan:
+    def test_step_runs_when_its_target_is_unchanged(self):
+        planned = _frame()
+        after = _frame([20, 20, 60, 60])  # the first click ticked a box elsewhere
+        steps = [{'action': 'click', 'click_point': [150, 115], 'target_description': 'Go'}]
+        plan = ActionPlan(planned, steps, scale_factor=2.0, state='survey')
+        response, scale = plan.next(after)
+        assert scale == 2.0 and response['click_point'] == [150, 115]
+        assert response['action'] == 'click' and response['state'] == 'survey (plan step 1/1)'
+        assert not plan and plan.next(after) is None and not plan.abandoned
+
+    def test_changed_target_abandons_the_plan(self):
+        planned = _frame()
+        dialog = _frame([220, 180, 380, 280])  # something now covers the target
+        steps = [{'action': 'click', 'click_point': [300, 230]},
+                 {'action': 'click', 'click_point': [10, 10]}]
+        plan = ActionPlan(planned, steps, scale_factor=1.0)
+        assert plan.next(dialog) is None
+        assert plan.abandoned and not plan and plan.last_diff > plan.max_diff
+
+    def test_region_diff(self):
+        page = _frame()
+        assert region_diff(page, _frame(), (300, 230)) == 0.0
+        assert region_diff(page, _frame([280, 210, 320, 250]), (300, 230)) > 0.1
+        assert region_diff(page, _frame([280, 210, 320, 250]), (50, 50)) == 0.0
+
+
+class TestConfig:
+    def test_defaults(self, monkeypatch):
+        for name in ('VLM_ACTION_PLANS', 'VLM_PLAN_MAX_STEPS', 'VLM_PLAN_REGION_DIFF'):
+            monkeypatch.delenv(name, raising=False)
+        assert get_plan_config() == {'enabled': False, 'max_steps': 3, 'region_diff': 0.04}
+
+    def test_prompt_keeps_the_phase_prompt(self):
+        prompt = build_plan_prompt('Cancel it.\n', 2)
+        assert prompt.startswith('Cancel it.\n') and 'up to 2' in prompt
+        assert 'next_steps' in prompt
+
+    def test_streaming_waits_for_next_steps(self):
+        fields = {'state': 's', 'action': 'click', 'completed': False,
+                  'billing_end_date': None, 'click_point': [1, 2],
+                  'target_description': 'x'}
+        assert vlm_executor._action_ready(fields)
+        assert not vlm_executor._plan_action_ready(fields)
+        assert vlm_executor._plan_action_ready({**fields, 'next_steps': []})
+        assert vlm_executor._plan_action_ready({**fields, 'action': 'wait'})
+
+    @pytest.mark.parametrize('plans,label,expected', [
+        (True, 'cancel', 2), (True, 'sign-in', 0), (False, 'cancel', 0)])
+    def test_plan_schema_requested_only_in_plan_mode(self, monkeypatch, plans, label, expected):
+        monkeypatch.setenv('VLM_PLAN_MAX_STEPS', '2')
+        vlm = MagicMock()
+        vlm.analyze.return_value = ({'action': 'wait'}, 1.0)
+        executor = vlm_executor.VLMExecutor(vlm, two_tier=False, debug=False,
+                                            action_plans=plans)
+        executor._infer(_frame(), 'netflix', label, 'prompt', False)
+        assert vlm.analyze.call_args.kwargs['plan_steps'] == expected
+
+
+def _survey_script(reason_to: str | None = None, reason: str = 'Too expensive') -> SimScript:
+    """Account -> survey (pick a reason, then Continue) -> cancelled.
+
+    The sim doesn't draw a picked reason, so the VLM answer on the survey
+    page is always the reason click plus its plan.
+    """
+    def click(state, point, target, **extra):
+        return {'state': state, 'action': 'click', 'completed': False,
+                'billing_end_date': None, 'click_point': point,
+                'target_description': target, **extra}
+
+    return SimScript.from_dict({
+        'size': [800, 600],
+        'start': 'blank',
+        'urls': {'https://www.netflix.com/': 'account'},
+        'pages': {
+            'blank': {'load_ms': 0},
+            'loading': {'load_ms': 0},
+            'account': {
+                'load_ms': 0,
+                'regions': [{'bbox': [300, 200, 500, 250], 'to': 'survey'}],
+                'answers': {'sign-in': {'page_type': 'signed_in'},
+                            'cancel': click('account', [400, 225], 'Cancel Membership')},
+            },
+            'survey': {
+                'load_ms': 0,
+                'regions': [{'bbox': [100, 150, 300, 190], 'field': 'reason',
+                             'to': reason_to},
+                            {'bbox': [500, 450, 700, 500], 'to': 'cancelled'}],
+                'answers': {'cancel': click('survey', [200, 170], reason, next_steps=[
+                    {'action': 'click', 'click_point': [600, 475],
+                     'target_description': 'Continue'}])},
+            },
+            'cancelled': {
+                'load_ms': 0,
+                'answers': {'cancel': {'state': 'done', 'action': 'done', 'completed': True,
+                                       'billing_end_date': '2026-12-01'}},
+            },
+        },
+    })
+
+
+class TestExecutorPlans:
+    @pytest.fixture
+    def no_waits(self, monkeypatch):
+        real_async_sleep = asyncio.sleep
+
+        async def _no_async_sleep(delay, result=None):
+            await real_async_sleep(0)
+            return result
+
+        monkeypatch.setattr('agent.vlm_executor.time.sleep', lambda s: None)
+        monkeypatch.setattr('agent.vlm_executor.asyncio.sleep', _no_async_sleep)
+        monkeypatch.setattr('agent.vlm_executor.random.random', lambda: 0.5)
+        yield
+        vlm_executor.set_desktop(None)
+
+    @pytest.mark.parametrize('reason_to,planned', [(None, 1), ('cancelled', 0)])
+    def test_plan_step_runs_only_if_its_target_is_unchanged(
+            self, no_waits, reason_to, planned):
+        script = _survey_script(reason_to)
+        sim = SimDesktop(script, launch_ms=0, capture_ms=0, time_scale=0)
+        vlm_executor.set_desktop(sim.desktop())
+        with FakeVLMServer(sim_vlm_steps(script, 'netflix')) as fake:
+            with VLMClient(base_url=fake.url, api_key='k', model='m', stream=False,
+                           coord_normalize=False, coord_yx=False,
+                           coord_square_pad=False, image_budgets='') as vlm:
+                executor = vlm_executor.VLMExecutor(
+                    vlm, settle_mode='fixed', frame_reuse=False, two_tier=False,
+                    debug=False, action_plans=True)
+                result = executor.run('netflix', 'cancel',
+                                      {'email': 'a@example.com', 'pass': 'pw'}, 'job-1')
+
+        assert result.success, result.error_message
+        win = next(iter(sim.windows.values()))
+        assert win.history[-2:] == ['survey', 'cancelled']
+        assert sim.stats['missed_clicks'] == 0
+        assert result.inferences_planned == planned
+        assert [r.get('source') for r in result.step_results].count('plan') == planned
+
+    def test_plans_with_flow_replay(self, no_waits, caplog):
+        # The reason click names the account, so flows leave it to the VLM
+        # (an open step) and the job plans the Continue click from there
+        script = _survey_script(reason='Too expensive for a@example.com')
+        caplog.set_level(logging.INFO, logger='agent.flow_replay')
+        store = FlowStore(min_successes=2)
+        results = []
+        with FakeVLMServer(sim_vlm_steps(script, 'netflix')) as fake:
+            with VLMClient(base_url=fake.url, api_key='k', model='m', stream=False,
+                           coord_normalize=False, coord_yx=False,
+                           coord_square_pad=False, image_budgets='') as vlm:
+                for i in range(3):
+                    sim = SimDesktop(script, launch_ms=0, capture_ms=0, time_scale=0)
+                    vlm_executor.set_desktop(sim.desktop())
+                    executor = vlm_executor.VLMExecutor(
+                        vlm, settle_mode='fixed', frame_reuse=False, two_tier=False,
+                        debug=False, action_plans=True, flows=store)
+                    results.append(executor.run(
+                        'netflix', 'cancel', {'email': 'a@example.com', 'pass': 'pw'},
+                        f'job-{i}'))
+                    assert results[-1].success, results[-1].error_message
+                    assert sim.stats['missed_clicks'] == 0
+
+        first, _, third = results
+        assert first.inferences_planned == third.inferences_planned == 1
+        assert third.inferences_replayed == 2 and third.replay_hit_rate == 1.0
+        # The planned step follows the flow instead of leaving it
+        assert 'diverged' not in caplog.text
+        assert store.stats()['flows'] == 1
@@ -0,0 +1,159 @@
+"""Tests for window capture backends (agent.capture)."""
+
+from __future__ import annotations
+
+import io
+
+import pytest
+
+from agent import capture, screenshot
+from agent.capture import FakeCapture, QuartzCapture
+from agent.input.window_registry import FakeWindowBackend, window_registry
+from agent.screenshot import Frame, crop_browser_chrome_frame
+
+
+@pytest.fixture
+def fake(monkeypatch) -> FakeCapture:
+    backend = FakeCapture(size=(640, 400), native_scale=2.0)
+    monkeypatch.setattr(capture, '_backend', backend)
+    return backend
+
+
+@pytest.fixture
+def retina():
+    window_registry.set_backend(FakeWindowBackend(scale=2.0))
+
+
+def _png(size=(1280, 800)) -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new('RGB', size, (10, 20, 30)).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+@pytest.fixture
+def screencapture_writes_png(monkeypatch):
+    """Stand in for the screencapture CLI: write a 640x400-pt Retina PNG."""
+    calls = []
+
+    def fake_capture_window(window_id, output_path=None, fmt='png'):
+        calls.append((window_id, fmt))
+        with open(output_path, 'wb') as f:
+            f.write(_png())
+        return output_path
+
+    monkeypatch.setattr(capture, 'capture_window', fake_capture_window)
+    return calls
+
+
+# ---------------------------------------------------------------------------
+# Fake backend and capture records
+# ---------------------------------------------------------------------------
+
+class TestFakeCapture:
+    def test_native_and_logical_scale(self, fake):
+        full = capture.capture_frame(7)
+        half = capture.capture_frame(7, scale=1.0)
+        assert full.size == (1280, 800) and full.scale == 2.0
+        assert half.size == (640, 400) and half.scale == 1.0
+
+    def test_deterministic_until_page_changes(self, fake):
+        a = capture.capture_frame(7, scale=1.0).digest
+        assert capture.capture_frame(7, scale=1.0).digest == a
+        fake.pages[7] = 1
+        assert capture.capture_frame(7, scale=1.0).digest != a
+
+    def test_capture_record(self, fake):
+        frame = capture.capture_frame(7, scale=1.0)
+        assert frame.capture['backend'] == 'fake'
+        assert frame.capture['bytes'] == 640 * 400 * 4
+        assert frame.capture['scale'] == 1.0
+        assert frame.capture['size'] == [640, 400]
+        assert frame.capture['ms'] >= 0
+
+    def test_capture_scale_env(self, fake, monkeypatch):
+        monkeypatch.setenv('CAPTURE_SCALE', '1')
+        assert screenshot.capture_frame(7).size == (640, 400)
+        monkeypatch.setenv('CAPTURE_SCALE', '0')
+        assert screenshot.capture_frame(7).size == (1280, 800)
+
+    def test_thumbnail(self, fake):
+        thumb = screenshot.capture_thumbnail(7, width=160)
+        assert thumb.mode == 'L' and thumb.width == 160
+        assert fake.calls['thumbnail'] == 1
+
+    def test_chrome_crop_uses_frame_scale(self, fake, monkeypatch):
+        monkeypatch.setenv('CHROME_HEIGHT', '88')
+        # The display reports 2x, but this frame was captured at 1x
+        window_registry.set_backend(FakeWindowBackend(scale=2.0))
+        page, chrome_px = crop_browser_chrome_frame(capture.capture_frame(7, scale=1.0))
+        assert chrome_px == 88
+        assert page.size == (640, 400 - 88)
+        assert page.scale == 1.0
+
+    def test_crops_keep_scale(self):
+        from PIL import Image
+
+        frame = Frame(image=Image.new('RGB', (100, 50)), scale=1.5)
+        assert frame.crop_top(10).scale == 1.5
+
+    def test_pixel_frame_digest_skips_png_encode(self, fake):
+        frame = capture.capture_frame(7, scale=1.0)
+        assert frame.digest
+        assert frame._png is None
+
+
+# ---------------------------------------------------------------------------
+# screencapture fallback
+# ---------------------------------------------------------------------------
+
+class TestFallback:
+    def test_screencapture_backend(self, monkeypatch, screencapture_writes_png, retina):
+        monkeypatch.setenv('CAPTURE_BACKEND', 'screencapture')
+        frame = capture.capture_frame(7)
+        assert frame.capture['backend'] == 'screencapture'
+        assert frame.capture['bytes'] == len(_png())
+        assert frame.size == (1280, 800)
+        assert frame.scale is None  # native, as before: crop asks the registry
+
+    def test_screencapture_downscales_to_requested_scale(
+            self, monkeypatch, screencapture_writes_png, retina):
+        monkeypatch.setenv('CAPTURE_BACKEND', 'screencapture')
+        frame = capture.capture_frame(7, scale=1.0)
+        assert frame.size == (640, 400) and frame.scale == 1.0
+
+    def test_quartz_failure_retries_with_screencapture(
+            self, monkeypatch, screencapture_writes_png, retina):
+        monkeypatch.delenv('CAPTURE_BACKEND', raising=False)
+        monkeypatch.setattr(capture, '_quartz_unavailable', False)
+
+        def denied(self, window_id, nominal):
+            raise RuntimeError('no screen recording permission')
+
+        monkeypatch.setattr(QuartzCapture, '_grab', denied)
+        frame = capture.capture_frame(7)
+        assert frame.capture['backend'] == 'screencapture'
+        assert screencapture_writes_png == [(7, 'png')]
+        # A transient failure keeps trying in-process next time
+        assert capture.get_backend().name == 'quartz'
+
+    def test_missing_api_disables_quartz(self, monkeypatch, screencapture_writes_png, retina):
+        monkeypatch.delenv('CAPTURE_BACKEND', raising=False)
+        monkeypatch.setattr(capture, '_quartz_unavailable', False)
+
+        def missing(self, window_id, nominal):
+            raise AttributeError('CGWindowListCreateImage')
+
+        monkeypatch.setattr(QuartzCapture, '_grab', missing)
+        capture.capture_frame(7)
+        assert capture.get_backend().name == 'screencapture'
+
+    def test_other_backend_errors_propagate(self, monkeypatch):
+        class Broken(FakeCapture):
+            def capture(self, window_id, scale=None):
+                raise RuntimeError('window gone')
+
+        monkeypatch.setattr(capture, '_backend', Broken())
+        with pytest.raises(RuntimeError, match='window gone'):
+            capture.capture_frame(7)
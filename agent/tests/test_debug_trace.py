@@ -13,7 +13,14 @@ from unittest.mock import MagicMock, patch
 import pytest
 from PIL import Image
 
-from agent.debug_trace import DebugTrace, _draw_bbox_overlay
+from agent.debug_trace import (
+    DebugTrace,
+    _draw_bbox_overlay,
+    get_debug_trace_config,
+    get_trace_store,
+)
+from agent.screenshot import Frame
+from agent.trace_store import open_trace
 
 
 # ---------------------------------------------------------------------------
@@ -205,6 +212,109 @@ class TestDebugTrace:
         assert trace.trace_dir.exists()
 
 
+# ---------------------------------------------------------------------------
+# Flight recorder
+# ---------------------------------------------------------------------------
+
+class TestFlightRecorder:
+    def test_save_step_does_no_io_until_flush(self, tmp_path):
+        trace = DebugTrace('job-ring', base_dir=str(tmp_path), ring_size=5, keep_all=False)
+        trace.save_step(0, _TINY_PNG, _SAMPLE_RESPONSE, phase='cancel',
+                        scale_factor=1.0)
+        assert trace.buffered
+        assert list(tmp_path.iterdir()) == []
+
+        trace.flush('boom').result(5)
+        assert not (tmp_path / 'job-ring').exists()
+        with open_trace(trace.archive_path) as archived:
+            assert archived.step_names() == ['step_000.json']
+            assert archived.read('step_000.png')[:4] == b'\x89PNG'
+        job = get_trace_store(str(tmp_path)).jobs()[0]
+        assert (job['job_id'], job['outcome'], job['error']) == ('job-ring', 'failed', 'boom')
+
+    def test_keeps_only_last_steps(self, tmp_path):
+        trace = DebugTrace('job-last', base_dir=str(tmp_path), ring_size=2, keep_all=False)
+        for step in range(5):
+            trace.save_step(step, _TINY_PNG, _SAMPLE_RESPONSE)
+        trace.flush().result(5)
+        with open_trace(trace.archive_path) as archived:
+            assert archived.step_names() == ['step_003.json', 'step_004.json']
+
+    def test_ring_holds_bytes_not_frames(self, tmp_path):
+        trace = DebugTrace('job-bytes', base_dir=str(tmp_path), ring_size=5, keep_all=False)
+        captured = Frame.from_base64(_TEST_PNG)
+        crop = captured.crop_top(100)  # derived: decoded pixels, no PNG
+        sent = crop.encode(400).b64
+        trace.save_step(0, captured, _SAMPLE_RESPONSE)
+        trace.save_step(1, crop, _SAMPLE_RESPONSE, scale_factor=0.5, sent_image_b64=sent)
+        first, second = trace._ring
+        assert first.screenshot == captured.png
+        assert second.sent_image[:2] == b'\xff\xd8'
+        assert not isinstance(second.screenshot, Frame)
+        assert crop.captured_png is None  # encoded off the frame, not into it
+
+        trace.flush().result(5)
+        with open_trace(trace.archive_path) as archived:
+            assert archived.read('step_000.png')[:4] == b'\x89PNG'
+            assert archived.read('step_001_sent.jpg')[:2] == b'\xff\xd8'
+            assert archived.read('step_001_overlay.png')[:4] == b'\x89PNG'
+            # The crop is encoded on the writer thread, at full resolution
+            png = archived.read('step_001.png')
+            assert Image.open(io.BytesIO(png)).size == (800, 500)
+
+    def test_ring_is_capped_by_bytes(self, tmp_path):
+        step_bytes = len(base64.b64decode(_TEST_PNG))
+        trace = DebugTrace('job-cap', base_dir=str(tmp_path), ring_size=10, keep_all=False,
+                           ring_bytes=int(step_bytes * 2.5))
+        for step in range(5):
+            trace.save_step(step, _TEST_PNG, _SAMPLE_RESPONSE)
+        assert [r.step for r in trace._ring] == [3, 4]
+        # The newest step is kept even if it alone is over the cap
+        trace.ring_bytes = 1
+        trace.save_step(5, _TEST_PNG, _SAMPLE_RESPONSE)
+        assert [r.step for r in trace._ring] == [5]
+
+    def test_overlay_is_rendered_on_flush(self, tmp_path):
+        trace = DebugTrace('job-ov', base_dir=str(tmp_path), ring_size=5, keep_all=False)
+        trace.save_step(0, _TEST_PNG, _SAMPLE_RESPONSE, scale_factor=1.0)
+        trace.flush().result(5)
+        with open_trace(trace.archive_path) as archived:
+            assert archived.read('step_000_overlay.png')[:4] == b'\x89PNG'
+
+    def test_success_writes_nothing(self, tmp_path):
+        trace = DebugTrace('job-ok', base_dir=str(tmp_path), ring_size=5, keep_all=False)
+        trace.save_step(0, _TINY_PNG, _SAMPLE_RESPONSE)
+        trace.cleanup_success()
+        assert trace.flush() is None
+        DebugTrace.drain(5)
+        assert list(tmp_path.iterdir()) == []
+
+    def test_keep_all_archives_every_step_in_background(self, tmp_path):
+        trace = DebugTrace('job-all', base_dir=str(tmp_path), ring_size=2, keep_all=True)
+        for step in range(4):
+            trace.save_step(step, _TINY_PNG, _SAMPLE_RESPONSE, prompt='same prompt')
+        trace.cleanup_success()
+        DebugTrace.drain(5)
+        with open_trace(trace.archive_path) as archived:
+            assert len(archived.step_names()) == 4
+            assert archived.read('step_003_prompt.txt') == b'same prompt'
+        job = get_trace_store(str(tmp_path)).jobs()[0]
+        assert job['outcome'] == 'success' and job['steps'] == 4
+        assert job['blobs'] == 2  # one PNG, one prompt
+
+    def test_config(self, monkeypatch):
+        monkeypatch.delenv('AGENT_DEBUG_RING_STEPS', raising=False)
+        monkeypatch.delenv('AGENT_DEBUG_RING_MB', raising=False)
+        monkeypatch.delenv('AGENT_DEBUG_MAX_MB', raising=False)
+        monkeypatch.setenv('AGENT_DEBUG_KEEP_ALL', '0')
+        assert get_debug_trace_config() == {
+            'ring_steps': 20, 'ring_bytes': 32 * 1024 * 1024, 'keep_all': False,
+            'max_bytes': 2048 * 1024 * 1024,
+        }
+        monkeypatch.setenv('AGENT_DEBUG_RING_STEPS', '0')
+        assert get_debug_trace_config()['ring_steps'] == 0
+
+
 # ---------------------------------------------------------------------------
 # Prune old traces
 # ---------------------------------------------------------------------------
@@ -249,6 +359,21 @@ class TestPruneOld:
         assert deleted == 0
         assert (tmp_path / 'stray.txt').exists()
 
+    def test_maintenance_is_rate_limited(self, tmp_path, monkeypatch):
+        pruned = []
+        monkeypatch.setattr(DebugTrace, 'prune_old',
+                            staticmethod(lambda base_dir=None, **kw: pruned.append(base_dir)))
+        monkeypatch.setattr('agent.debug_trace._last_maintain', {})
+        DebugTrace('job-a', base_dir=str(tmp_path))
+        DebugTrace('job-b', base_dir=str(tmp_path))
+        DebugTrace.drain(5)
+        assert pruned == [str(tmp_path)]
+
+        monkeypatch.setattr('agent.debug_trace.MAINTAIN_INTERVAL_SECONDS', 0)
+        DebugTrace('job-c', base_dir=str(tmp_path))
+        DebugTrace.drain(5)
+        assert pruned == [str(tmp_path)] * 2
+
 
 # ---------------------------------------------------------------------------
 # Integration with VLMExecutor
@@ -262,12 +387,12 @@ class TestDebugTraceVLMIntegration:
         """Mock all system interactions for VLMExecutor tests."""
         self.tmp_path = tmp_path
         # Override screenshot to use a real tiny PNG (debug trace saves it)
-        monkeypatch.setattr('agent.vlm_executor.ss.capture_to_base64',
-                            lambda wid: _TINY_PNG)
+        monkeypatch.setattr('agent.vlm_executor.ss.capture_frame',
+                            lambda wid: Frame.from_base64(_TINY_PNG))
         # Redirect debug trace to tmp_path
         monkeypatch.setattr('agent.debug_trace.DEFAULT_DEBUG_DIR', str(tmp_path))
         monkeypatch.setattr('agent.vlm_executor.DebugTrace.prune_old',
-                            lambda **kw: 0)
+                            lambda *a, **kw: 0)
 
     def test_success_cleans_up_trace(self):
         from agent.vlm_executor import VLMExecutor
@@ -289,22 +414,34 @@ class TestDebugTraceVLMIntegration:
         # Folder should be cleaned up
         assert not (self.tmp_path / 'job-success').exists()
 
-    def test_failure_keeps_trace(self):
+    def test_failure_keeps_trace(self, monkeypatch):
         from agent.vlm_executor import VLMExecutor
 
+        # As in production: the page is a chrome crop with no PNG bytes of
+        # its own, and the client reports the JPEG it sent
+        monkeypatch.setattr('agent.vlm_executor.ss.capture_frame',
+                            lambda wid: Frame.from_base64(_TEST_PNG))
+        monkeypatch.setattr('agent.vlm_executor.crop_browser_chrome_frame',
+                            lambda frame: (frame.crop_top(88), 88))
         captcha = {'page_type': 'captcha'}
         vlm = MagicMock()
         vlm.analyze = MagicMock(side_effect=[(captcha, 1.0)])
+        vlm.last_sent_image_b64 = Frame.from_base64(_TEST_PNG).encode(400).b64
 
         executor = VLMExecutor(vlm, settle_delay=0, debug=True)
         result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'},
                               job_id='job-fail')
         assert not result.success
-        # Folder should persist with the step
-        job_dir = self.tmp_path / 'job-fail'
-        assert job_dir.exists()
-        assert (job_dir / 'step_000.json').exists()
-        assert (job_dir / 'step_000.png').exists()
+        DebugTrace.drain(5)
+        # Archive should persist with the step, indexed as failed
+        with open_trace(self.tmp_path / 'job-fail.zip') as trace:
+            assert trace.step_names() == ['step_000.json']
+            png = trace.read('step_000.png')
+            assert Image.open(io.BytesIO(png)).size == (800, 512)
+            assert trace.read('step_000_sent.jpg')[:2] == b'\xff\xd8'
+            assert trace.metadata()['service'] == 'netflix'
+        job = get_trace_store(str(self.tmp_path)).jobs()[0]
+        assert job['outcome'] == 'failed' and job['service'] == 'netflix'
 
     def test_debug_disabled_no_trace(self):
         from agent.vlm_executor import VLMExecutor
@@ -378,17 +515,13 @@ class TestDebugTraceVLMIntegration:
         result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'},
                               job_id='job-artifacts')
         assert not result.success
+        DebugTrace.drain(5)
 
-        job_dir = self.tmp_path / 'job-artifacts'
-        assert job_dir.exists()
-        # Prompt should be saved
-        prompt_path = job_dir / 'step_000_prompt.txt'
-        assert prompt_path.exists()
-        assert len(prompt_path.read_text()) > 0
-        # Sent image should be saved
-        sent_path = job_dir / 'step_000_sent.jpg'
-        assert sent_path.exists()
-        assert sent_path.read_bytes()[:2] == b'\xff\xd8'  # JPEG magic
+        with open_trace(self.tmp_path / 'job-artifacts.zip') as trace:
+            # Prompt should be saved
+            assert len(trace.read('step_000_prompt.txt')) > 0
+            # Sent image should be saved
+            assert trace.read('step_000_sent.jpg')[:2] == b'\xff\xd8'  # JPEG magic
 
 
 # ---------------------------------------------------------------------------
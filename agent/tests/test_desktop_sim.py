@@ -0,0 +1,171 @@
+"""Tests for the simulated desktop (agent.desktop_sim) and set_desktop()."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from agent import vlm_executor
+from agent.desktop_sim import SimDesktop, SimScript, demo_script, sim_vlm_steps
+from agent.recording.vlm_client import VLMClient
+from agent.trace_replay import FakeVLMServer
+
+
+def _script(load_ms: float = 0) -> SimScript:
+    return SimScript.from_dict({
+        'size': [400, 300],
+        'start': 'blank',
+        'urls': {'https://example.com/': 'login', 'https://example.com/account': 'account'},
+        'pages': {
+            'blank': {},
+            'loading': {},
+            'login': {
+                'load_ms': load_ms,
+                'regions': [{'bbox': [50, 50, 350, 90], 'field': 'email'},
+                            {'bbox': [50, 120, 350, 160], 'field': 'password'},
+                            {'bbox': [50, 200, 350, 240], 'to': 'account'}],
+                'keys': {'enter': 'account'},
+            },
+            'account': {},
+        },
+    })
+
+
+@pytest.fixture
+def sim():
+    return SimDesktop(_script(), launch_ms=0, capture_ms=0, time_scale=0)
+
+
+def _screen(sim, session, x, y):
+    """Screen point of page pixel (x, y)."""
+    return session.bounds['x'] + x, session.bounds['y'] + y + sim.chrome_px
+
+
+class TestScript:
+    def test_longest_url_wins(self):
+        script = _script()
+        assert script.page_for('https://example.com/account?x=1').name == 'account'
+        assert script.page_for('https://example.com/').name == 'login'
+        assert script.page_for('https://other.com/').name == 'blank'
+
+    def test_unknown_targets_are_rejected(self):
+        with pytest.raises(ValueError, match='nowhere'):
+            SimScript.from_dict({'start': 'a', 'pages': {
+                'a': {'regions': [{'bbox': [0, 0, 1, 1], 'to': 'nowhere'}]}}})
+
+
+class TestInput:
+    def test_form_fill_and_submit(self, sim):
+        session = sim.create_session()
+        sim.navigate(session, 'https://example.com/', settle=lambda: None)
+        sim.focus_window_by_pid(session.pid)
+
+        sim.play(sim.plan_click(*_screen(sim, session, 200, 70)))
+        sim.type_text('Ann@Example.com', speed='instant')
+        sim.play(sim.plan_click(*_screen(sim, session, 200, 140)))
+        sim.clipboard_copy('s3cret!')
+        sim.hotkey('command', 'v')
+        sim.press_key('enter')
+
+        win = sim.windows[session.window_id]
+        assert win.history == ['blank', 'login', 'account']
+        assert win.submitted == [('login', {'email': 'Ann@Example.com',
+                                            'password': 's3cret!'})]
+
+    def test_select_all_then_paste_replaces(self, sim):
+        session = sim.create_session()
+        sim.navigate(session, 'https://example.com/', settle=lambda: None)
+        sim.click(*_screen(sim, session, 200, 70))
+        sim.type_text('old', speed='instant')
+        sim.hotkey('command', 'a')
+        sim.clipboard_copy('new')
+        sim.hotkey('command', 'v')
+        assert sim.windows[session.window_id].fields == {'email': 'new'}
+
+    def test_input_goes_to_the_focused_window_only(self, sim):
+        first, second = sim.create_session(), sim.create_session()
+        sim.navigate(first, 'https://example.com/', settle=lambda: None)
+        sim.navigate(second, 'https://example.com/', settle=lambda: None)
+        sim.focus_window('Finder')
+        sim.click(*_screen(sim, first, 200, 220))
+        assert sim.stats['missed_clicks'] == 1
+
+        sim.focus_window_by_pid(second.pid)
+        sim.click(*_screen(sim, first, 200, 220))
+        assert sim.windows[first.window_id].page.name == 'login'
+        assert sim.windows[second.window_id].page.name == 'account'
+
+
+class TestScreen:
+    def test_loading_page_until_loaded(self):
+        sim = SimDesktop(_script(load_ms=60_000), launch_ms=0, capture_ms=0)
+        session = sim.create_session()
+        sim.navigate(session, 'https://example.com/', settle=lambda: None)
+        page = sim.script.pages['login'].image
+        frame = sim.capture_frame(session.window_id)
+        assert frame.size == (400, 300 + sim.chrome_px)
+        assert frame.image.crop((0, sim.chrome_px, 400, 300 + sim.chrome_px)) != page
+
+        sim.click(*_screen(sim, session, 200, 220))
+        assert sim.stats['clicks_while_loading'] == 1
+
+        sim.windows[session.window_id].ready_at = 0
+        frame = sim.capture_frame(session.window_id)
+        assert frame.crop_top(sim.chrome_px).image.tobytes() == page.tobytes()
+
+    def test_closed_window_is_gone(self, sim):
+        session = sim.create_session()
+        sim.close_session(session)
+        with pytest.raises(RuntimeError):
+            sim.get_session_window(session)
+
+
+class TestExecutorOnSim:
+    @pytest.fixture
+    def no_waits(self, monkeypatch):
+        real_async_sleep = asyncio.sleep
+
+        async def _no_async_sleep(delay, result=None):
+            await real_async_sleep(0)
+            return result
+
+        monkeypatch.setattr('agent.vlm_executor.time.sleep', lambda s: None)
+        monkeypatch.setattr('agent.vlm_executor.asyncio.sleep', _no_async_sleep)
+        monkeypatch.setattr('agent.vlm_executor.random.random', lambda: 0.5)
+        yield
+        vlm_executor.set_desktop(None)
+
+    @pytest.mark.parametrize('action,last_page', [('cancel', 'cancelled'),
+                                                  ('resume', 'resumed')])
+    def test_full_job(self, no_waits, action, last_page):
+        script = demo_script('netflix')
+        sim = SimDesktop(script, launch_ms=0, capture_ms=0, time_scale=0)
+        vlm_executor.set_desktop(sim.desktop())
+        with FakeVLMServer(sim_vlm_steps(script, 'netflix')) as fake:
+            with VLMClient(base_url=fake.url, api_key='k', model='m', stream=False,
+                           coord_normalize=False, coord_yx=False,
+                           coord_square_pad=False, image_budgets='') as vlm:
+                executor = vlm_executor.VLMExecutor(vlm, settle_mode='fixed',
+                                                    frame_reuse=False, two_tier=False,
+                                                    debug=False)
+                result = executor.run('netflix', action,
+                                      {'email': 'a@example.com', 'pass': 'pw'}, 'job-1')
+
+        assert result.success, result.error_message
+        assert result.billing_date == '2026-12-01'
+        win = next(iter(sim.windows.values()))
+        assert win.history[-1] == last_page and win.closed
+        assert win.submitted[0] == ('login', {'email': 'a@example.com', 'password': 'pw'})
+        assert sim.stats['missed_clicks'] == 0
+        assert result.step_results[0]['phase'] == 'setup'
+
+    def test_set_desktop_none_restores_macos(self):
+        from agent import browser
+        from agent.input import mouse
+
+        sim = SimDesktop(_script(), time_scale=0)
+        vlm_executor.set_desktop(sim.desktop())
+        assert vlm_executor.browser is sim and vlm_executor.mouse is sim
+        vlm_executor.set_desktop(None)
+        assert vlm_executor.browser is browser and vlm_executor.mouse is mouse
@@ -0,0 +1,226 @@
+"""Tests for learned flow replay (agent.flow_replay) and its executor wiring."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agent import vlm_executor
+from agent.desktop_sim import SimDesktop, demo_script, sim_vlm_steps
+from agent.flow_replay import FlowReplay, FlowStep, FlowStore, get_flow_replay_config
+from agent.recording.vlm_client import VLMClient
+from agent.trace_replay import FakeVLMServer
+
+# Page hashes far apart (32 differing bits each)
+LOGIN, ACCOUNT, CONFIRM, DONE, SPINNER, OTHER = ((1 << 32) - 1 << 32 * i for i in range(6))
+
+
+def _page(phash: int, size=(1000, 500)):
+    return SimpleNamespace(dhash=phash, size=size)
+
+
+def _cancel_job(replay: FlowReplay, pages=(ACCOUNT, CONFIRM, DONE)) -> list:
+    """Drive replay through a cancel flow, asking the 'VLM' where needed.
+
+    Returns (source, response) for each step.
+    """
+    answers = {
+        ACCOUNT: {'action': 'click', 'target_bbox': [100, 50, 300, 150]},
+        CONFIRM: {'action': 'click', 'target_bbox': [500, 250, 700, 300]},
+        DONE: {'action': 'done', 'billing_end_date': '2026-12-01'},
+        SPINNER: {'action': 'wait'},
+    }
+    sources = []
+    for phash in pages:
+        page = _page(phash)
+        replayed = replay.lookup(page, 'cancel')
+        if replayed is not None:
+            response, scale = replayed
+            source = 'replay'
+        else:
+            response, scale = answers.get(phash, {'action': 'click', 'target_bbox': [1, 1, 2, 2]}), 2.0
+            source = 'vlm'
+        replay.observe(page, 'cancel', response, scale, source)
+        sources.append((source, response))
+    return sources
+
+
+class TestFlowReplay:
+    def test_replays_after_min_successes(self):
+        store = FlowStore(min_successes=2)
+        for _ in range(2):
+            replay = FlowReplay(store, 'netflix', 'cancel')
+            assert [s for s, _ in _cancel_job(replay)] == ['vlm'] * 3
+            replay.finish(True)
+
+        replay = FlowReplay(store, 'netflix', 'cancel')
+        steps = _cancel_job(replay)
+        replay.finish(True)
+        assert [s for s, _ in steps] == ['replay', 'replay', 'vlm']
+        # Stored relative to the page, replayed in page pixels at scale 1.0
+        assert steps[0][1] == {'action': 'click', 'target_bbox': [200, 100, 600, 300]}
+        assert (replay.hits, replay.lookups, replay.hit_rate) == (2, 2, 1.0)
+        stats = store.stats()
+        assert (stats['flows'], stats['verified'], stats['replayed_jobs']) == (1, 1, 1)
+
+    def test_divergence_hands_back_to_the_vlm(self):
+        store = FlowStore(min_successes=1)
+        replay = FlowReplay(store, 'netflix', 'cancel')
+        _cancel_job(replay)
+        replay.finish(True)
+
+        replay = FlowReplay(store, 'netflix', 'cancel')
+        steps = _cancel_job(replay, pages=(ACCOUNT, OTHER, CONFIRM, DONE))
+        assert [s for s, _ in steps] == ['replay', 'vlm', 'vlm', 'vlm']
+        assert replay.diverged_at == 1 and replay.hit_rate == 0.5
+        replay.finish(True)
+        assert store.stats()['flows'] == 2
+
+    def test_loading_page_does_not_break_replay(self):
+        store = FlowStore(min_successes=1)
+        replay = FlowReplay(store, 'netflix', 'cancel')
+        _cancel_job(replay)
+        replay.finish(True)
+
+        replay = FlowReplay(store, 'netflix', 'cancel')
+        steps = _cancel_job(replay, pages=(ACCOUNT, SPINNER, CONFIRM, DONE))
+        assert [s for s, _ in steps] == ['replay', 'vlm', 'replay', 'vlm']
+        replay.finish(True)
+        # Same flow again: the spinner isn't part of it
+        assert store.stats()['flows'] == 1
+
+    def test_plan_steps_do_not_leave_the_flow(self):
+        store = FlowStore(min_successes=1)
+        click = {'action': 'click', 'target_bbox': [500, 250, 700, 300]}
+        # Learned with the confirm page answered live (an open step),
+        # then a planned click on the same page
+        store.record('netflix', 'cancel', '', [
+            FlowStep('cancel', ACCOUNT, {'action': 'click', 'target_bbox': [0.1, 0.1, 0.3, 0.3]}),
+            FlowStep('cancel', CONFIRM, None),
+            FlowStep('cancel', CONFIRM, click),
+            FlowStep('cancel', DONE, None),
+        ])
+
+        replay = FlowReplay(store, 'netflix', 'cancel')
+        assert replay.lookup(_page(ACCOUNT), 'cancel') is not None
+        replay.observe(_page(ACCOUNT), 'cancel', {'action': 'click'}, 1.0, 'replay')
+        assert replay.lookup(_page(CONFIRM), 'cancel') is None
+        replay.observe(_page(CONFIRM), 'cancel', click, 2.0, 'vlm')
+        replay.observe(_page(CONFIRM), 'cancel', click, 2.0, 'plan')
+        assert replay.lookup(_page(DONE), 'cancel') is None
+        replay.observe(_page(DONE), 'cancel', {'action': 'done'}, 2.0, 'vlm')
+        assert replay.active and replay.diverged_at is None
+
+        # A planned step the flow doesn't have doesn't end replay either
+        replay = FlowReplay(store, 'netflix', 'cancel')
+        replay.lookup(_page(ACCOUNT), 'cancel')
+        replay.observe(_page(ACCOUNT), 'cancel', {'action': 'click'}, 1.0, 'replay')
+        replay.observe(_page(OTHER), 'cancel', click, 2.0, 'plan')
+        assert replay.active
+
+    def test_failed_replays_retire_the_flow(self):
+        store = FlowStore(min_successes=1)
+        replay = FlowReplay(store, 'netflix', 'cancel')
+        _cancel_job(replay)
+        replay.finish(True)
+
+        replay = FlowReplay(store, 'netflix', 'cancel')
+        _cancel_job(replay)
+        replay.finish(False)
+        assert store.flows('netflix', 'cancel') == []
+        assert not FlowReplay(store, 'netflix', 'cancel').active
+
+    def test_secrets_and_typing_are_left_to_the_vlm(self):
+        store = FlowStore(min_successes=1)
+        replay = FlowReplay(store, 'netflix', 'sign-in')
+        replay.observe(_page(LOGIN), 'sign-in',
+                       {'page_type': 'user_pass', 'email_point': [10, 10],
+                        'note': 'typed hunter2'}, 1.0, 'vlm', secrets=('hunter2',))
+        replay.observe(_page(ACCOUNT), 'cancel',
+                       {'action': 'click', 'target_bbox': [1, 1, 2, 2],
+                        'text_to_type': 'why'}, 1.0, 'vlm')
+        assert [s.response for s in replay.steps] == [None, None]
+
+    def test_keys_are_separate(self):
+        store = FlowStore(min_successes=1)
+        replay = FlowReplay(store, 'netflix', 'resume', 'premium')
+        _cancel_job(replay)
+        replay.finish(True)
+        assert not FlowReplay(store, 'netflix', 'resume', 'basic').active
+        assert not FlowReplay(store, 'hulu', 'resume', 'premium').active
+        assert FlowReplay(store, 'netflix', 'resume', 'premium').active
+
+    def test_eviction(self):
+        store = FlowStore(min_successes=1, max_flows=2)
+        for service in ('a', 'b', 'c'):
+            store.record(service, 'cancel', '', [FlowStep('cancel', 1, None)])
+        assert store.stats()['flows'] == 2
+        assert store.flows('a', 'cancel') == []
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / 'flows.db')
+        store = FlowStore(path, min_successes=1)
+        store.record('netflix', 'cancel', '', [FlowStep('cancel', ACCOUNT, {'action': 'click'})])
+        store.close()
+        flows = FlowStore(path, min_successes=1).flows('netflix', 'cancel')
+        assert flows[0].steps == [FlowStep('cancel', ACCOUNT, {'action': 'click'})]
+
+
+class TestConfig:
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv('FLOW_REPLAY', raising=False)
+        assert FlowStore.from_env() is None
+
+    def test_env(self, monkeypatch, tmp_path):
+        monkeypatch.setenv('FLOW_REPLAY', 'true')
+        monkeypatch.setenv('FLOW_REPLAY_PATH', str(tmp_path / 'f.db'))
+        monkeypatch.setenv('FLOW_REPLAY_MIN_SUCCESSES', '3')
+        assert get_flow_replay_config()['min_successes'] == 3
+        store = FlowStore.from_env()
+        assert store.min_successes == 3 and (tmp_path / 'f.db').exists()
+        store.close()
+
+
+class TestExecutorReplay:
+    @pytest.fixture
+    def no_waits(self, monkeypatch):
+        real_async_sleep = asyncio.sleep
+
+        async def _no_async_sleep(delay, result=None):
+            await real_async_sleep(0)
+            return result
+
+        monkeypatch.setattr('agent.vlm_executor.time.sleep', lambda s: None)
+        monkeypatch.setattr('agent.vlm_executor.asyncio.sleep', _no_async_sleep)
+        monkeypatch.setattr('agent.vlm_executor.random.random', lambda: 0.5)
+        yield
+        vlm_executor.set_desktop(None)
+
+    def test_third_job_replays_the_learned_flow(self, no_waits):
+        script = demo_script('netflix')
+        store = FlowStore(min_successes=2)
+        results = []
+        with FakeVLMServer(sim_vlm_steps(script, 'netflix')) as fake:
+            with VLMClient(base_url=fake.url, api_key='k', model='m', stream=False,
+                           coord_normalize=False, coord_yx=False,
+                           coord_square_pad=False, image_budgets='') as vlm:
+                for i in range(3):
+                    sim = SimDesktop(script, launch_ms=0, capture_ms=0, time_scale=0)
+                    vlm_executor.set_desktop(sim.desktop())
+                    executor = vlm_executor.VLMExecutor(
+                        vlm, settle_mode='fixed', frame_reuse=False, two_tier=False,
+                        debug=False, flows=store)
+                    results.append(executor.run(
+                        'netflix', 'cancel', {'email': 'a@example.com', 'pass': 'pw'},
+                        f'job-{i}'))
+                    assert results[-1].success, results[-1].error_message
+                    assert sim.stats['missed_clicks'] == 0
+
+        first, _, third = results
+        assert first.inferences_replayed == 0 and first.replay_hit_rate is None
+        assert third.inferences_replayed > 0 and third.replay_hit_rate == 1.0
+        assert third.inference_count == first.inference_count - third.inferences_replayed
+        assert third.billing_date == '2026-12-01'
+        assert 'replay' in {r.get('source') for r in third.step_results}
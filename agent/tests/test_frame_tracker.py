@@ -0,0 +1,247 @@
+"""Tests for perceptual frame tracking (dHash, reuse, stuck detection)."""
+
+from __future__ import annotations
+
+import io
+import random
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image, ImageDraw
+
+from agent.frame_tracker import (
+    FrameTracker,
+    dhash,
+    get_frame_tracker_config,
+    hamming,
+    is_passive,
+)
+from agent.screenshot import Frame
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _page(seed: int, spinner_angle: int | None = None,
+          size: tuple[int, int] = (640, 400)) -> Image.Image:
+    """A synthetic page: random blocks, optionally a small spinner."""
+    rng = random.Random(seed)
+    img = Image.new('RGB', size, (250, 250, 250))
+    draw = ImageDraw.Draw(img)
+    for _ in range(25):
+        x = rng.randint(0, size[0] - 60)
+        y = rng.randint(0, size[1] - 30)
+        color = tuple(rng.randint(0, 255) for _ in range(3))
+        draw.rectangle([x, y, x + rng.randint(20, 200), y + rng.randint(10, 80)],
+                       fill=color)
+    if spinner_angle is not None:
+        cx, cy = size[0] // 2, size[1] // 2
+        draw.pieslice([cx - 8, cy - 8, cx + 8, cy + 8],
+                      spinner_angle, spinner_angle + 90, fill=(30, 30, 30))
+    return img
+
+
+def _frame(img: Image.Image) -> Frame:
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return Frame(buf.getvalue())
+
+
+# ---------------------------------------------------------------------------
+# dhash / hamming
+# ---------------------------------------------------------------------------
+
+class TestDhash:
+    def test_identical_pages_match(self):
+        assert dhash(_page(1)) == dhash(_page(1))
+
+    def test_spinner_frames_are_close(self):
+        a = dhash(_page(1, spinner_angle=0))
+        b = dhash(_page(1, spinner_angle=180))
+        assert hamming(a, b) <= 4
+
+    def test_different_pages_are_far(self):
+        assert hamming(dhash(_page(1)), dhash(_page(2))) > 30
+
+    def test_hash_is_256_bits(self):
+        assert dhash(_page(3)).bit_length() <= 256
+
+    def test_frame_dhash_is_cached(self):
+        frame = _frame(_page(1))
+        assert frame.dhash == dhash(_page(1))
+        assert frame.dhash is frame.dhash
+
+    def test_undecodable_frame_has_no_dhash(self):
+        assert Frame(b'not a png').dhash is None
+
+
+# ---------------------------------------------------------------------------
+# FrameTracker
+# ---------------------------------------------------------------------------
+
+class TestFrameTracker:
+    def test_no_reuse_before_first_inference(self):
+        tracker = FrameTracker()
+        assert tracker.reusable(_frame(_page(1)), 'cancel') is None
+
+    def test_reuses_on_unchanged_page(self):
+        tracker = FrameTracker()
+        response = {'state': 'loading', 'action': 'wait'}
+        tracker.record(_frame(_page(1, 0)), 'cancel', response, 2.0)
+        reused = tracker.reusable(_frame(_page(1, 90)), 'cancel')
+        assert reused == (response, 2.0)
+        assert reused[0] is not response  # callers may mutate their copy
+
+    def test_acting_responses_are_not_reused_by_default(self):
+        click = {'state': 'account', 'action': 'click', 'click_point': [1, 2]}
+        user_pass = {'page_type': 'user_pass', 'email_point': [1, 2]}
+        tracker = FrameTracker()
+        tracker.record(_frame(_page(1)), 'cancel', click, 1.0)
+        assert tracker.reusable(_frame(_page(1)), 'cancel') is None
+        tracker.record(_frame(_page(1)), 'sign-in', user_pass, 1.0)
+        assert tracker.reusable(_frame(_page(1)), 'sign-in') is None
+
+        tracker = FrameTracker(reuse_active=True)
+        tracker.record(_frame(_page(1)), 'cancel', click, 1.0)
+        assert tracker.reusable(_frame(_page(1)), 'cancel') == (click, 1.0)
+
+    def test_changed_page_is_not_reused(self):
+        tracker = FrameTracker()
+        tracker.record(_frame(_page(1)), 'cancel', {'action': 'wait'}, 1.0)
+        assert tracker.reusable(_frame(_page(2)), 'cancel') is None
+        assert tracker.last_distance > tracker.unchanged_distance
+
+    def test_other_phase_is_not_reused(self):
+        tracker = FrameTracker()
+        tracker.record(_frame(_page(1)), 'sign-in', {'page_type': 'spinner'}, 1.0)
+        assert tracker.reusable(_frame(_page(1)), 'cancel') is None
+
+    def test_max_reuse_forces_inference(self):
+        tracker = FrameTracker(max_reuse=2)
+        tracker.record(_frame(_page(1)), 'cancel', {'action': 'wait'}, 1.0)
+        assert tracker.reusable(_frame(_page(1)), 'cancel') is not None
+        assert tracker.reusable(_frame(_page(1)), 'cancel') is not None
+        assert tracker.reusable(_frame(_page(1)), 'cancel') is None
+
+    def test_disabled_never_reuses(self):
+        tracker = FrameTracker(enabled=False)
+        tracker.record(_frame(_page(1)), 'cancel', {'action': 'wait'}, 1.0)
+        assert tracker.reusable(_frame(_page(1)), 'cancel') is None
+
+    def test_undecodable_frames_never_match(self):
+        tracker = FrameTracker()
+        tracker.record(Frame(b'AAAA'), 'cancel', {'action': 'wait'}, 1.0)
+        assert tracker.reusable(Frame(b'AAAA'), 'cancel') is None
+
+    def test_is_passive(self):
+        assert is_passive('sign-in', {'page_type': 'spinner'})
+        assert not is_passive('sign-in', {'page_type': 'user_pass'})
+        assert is_passive('cancel', {'action': 'wait'})
+        assert not is_passive('cancel', {'action': 'wait', 'completed': True})
+        assert not is_passive('resume', {'action': 'click'})
+
+    def test_config_env_override(self, monkeypatch):
+        monkeypatch.setenv('FRAME_REUSE', 'false')
+        monkeypatch.setenv('FRAME_STUCK_DISTANCE', '5')
+        cfg = get_frame_tracker_config()
+        assert cfg['reuse'] is False
+        assert cfg['reuse_active'] is False
+        assert cfg['stuck_distance'] == 5
+        assert cfg['unchanged_distance'] == 4
+
+
+# ---------------------------------------------------------------------------
+# Stuck detection on perceptual hashes
+# ---------------------------------------------------------------------------
+
+class TestPerceptualStuck:
+    def test_spinner_frames_count_as_same_within_distance(self):
+        from agent.vlm_executor import _StuckDetector
+
+        sd = _StuckDetector(threshold=3, max_distance=4)
+        frames = [_frame(_page(1, angle)) for angle in (0, 120, 240)]
+        assert not sd.check('a', 'wait', frames[0])
+        assert not sd.check('b', 'wait', frames[1])
+        assert sd.check('c', 'wait', frames[2])
+
+    def test_different_pages_not_stuck(self):
+        from agent.vlm_executor import _StuckDetector
+
+        sd = _StuckDetector(threshold=3, max_distance=4)
+        for seed in range(5):
+            assert not sd.check(f's{seed}', 'wait', _frame(_page(seed)))
+
+
+# ---------------------------------------------------------------------------
+# VLMExecutor integration
+# ---------------------------------------------------------------------------
+
+class TestExecutorFrameReuse:
+    @pytest.fixture(autouse=True)
+    def _mock_system(self, mock_vlm_system):
+        pass
+
+    def _capture(self, monkeypatch, frames):
+        it = iter(frames)
+        last = [None]
+
+        def capture(wid):
+            try:
+                last[0] = next(it)
+            except StopIteration:
+                pass
+            return last[0]
+
+        monkeypatch.setattr('agent.vlm_executor.ss.capture_frame', capture)
+
+    def test_unchanged_wait_page_skips_inference(self, monkeypatch):
+        from agent.vlm_executor import VLMExecutor
+
+        loading = _page(7, spinner_angle=0)
+        self._capture(monkeypatch, [
+            _frame(_page(5)),                       # sign-in
+            _frame(loading),                        # cancel: wait
+            _frame(_page(7, spinner_angle=120)),    # unchanged: reused
+            _frame(_page(7, spinner_angle=240)),    # unchanged: reused
+            _frame(_page(8)),                       # done
+        ])
+        done = {'state': 'confirmation', 'action': 'done', 'billing_end_date': None}
+        vlm = MagicMock()
+        vlm.analyze = MagicMock(side_effect=[
+            ({'page_type': 'signed_in'}, 1.0),
+            ({'state': 'loading', 'action': 'wait'}, 1.0),
+            (done, 1.0),
+        ])
+
+        executor = VLMExecutor(vlm, settle_delay=0, frame_reuse=True)
+        result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+
+        assert result.success
+        assert vlm.analyze.call_count == 3
+        assert result.inference_count == 3
+        assert result.inferences_reused == 2
+        assert [e['label'] for e in executor._settle_log].count('unchanged') == 2
+
+    def test_reuse_disabled_calls_vlm_every_step(self, monkeypatch):
+        from agent.vlm_executor import VLMExecutor
+
+        self._capture(monkeypatch, [
+            _frame(_page(5)),
+            _frame(_page(7, spinner_angle=0)),
+            _frame(_page(7, spinner_angle=120)),
+            _frame(_page(8)),
+        ])
+        wait = {'state': 'loading', 'action': 'wait'}
+        done = {'state': 'confirmation', 'action': 'done', 'billing_end_date': None}
+        vlm = MagicMock()
+        vlm.analyze = MagicMock(side_effect=[
+            ({'page_type': 'signed_in'}, 1.0), (wait, 1.0), (wait, 1.0), (done, 1.0),
+        ])
+
+        executor = VLMExecutor(vlm, settle_delay=0, frame_reuse=False)
+        result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+
+        assert result.success
+        assert vlm.analyze.call_count == 4
+        assert result.inferences_reused == 0
@@ -0,0 +1,235 @@
+"""Tests for the GUI scheduler (agent.gui_lock)."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agent import gui_lock as gui_lock_module
+from agent.gui_lock import (
+    GuiPriority, GuiScheduler, gui_job, gui_priority, gui_timing, in_gui_thread,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _queue_waiters(lock: GuiScheduler, waiters: list[tuple[str, GuiPriority]],
+                   order: list[str]) -> list[threading.Thread]:
+    """Start one thread per (name, priority), each queued in turn on lock."""
+    threads = []
+    for name, priority in waiters:
+        def run(name=name, priority=priority):
+            with gui_priority(priority), lock:
+                order.append(name)
+        t = threading.Thread(target=run)
+        t.start()
+        deadline = time.monotonic() + 2
+        while len(lock._waiters) < len(threads) + 1:
+            assert time.monotonic() < deadline, 'waiter never queued'
+            time.sleep(0.001)
+        threads.append(t)
+    return threads
+
+
+# ---------------------------------------------------------------------------
+# Scheduling order
+# ---------------------------------------------------------------------------
+
+class TestScheduling:
+    def test_uncontended_acquire(self):
+        lock = GuiScheduler(aging=0)
+        with lock:
+            assert lock.locked()
+        assert not lock.locked()
+
+    def test_priority_then_fifo(self):
+        lock = GuiScheduler(aging=0)
+        order: list[str] = []
+        lock.acquire()
+        threads = _queue_waiters(lock, [
+            ('nav', GuiPriority.NAVIGATE),
+            ('click-1', GuiPriority.CLICK),
+            ('cosmetic', GuiPriority.COSMETIC),
+            ('click-2', GuiPriority.CLICK),
+            ('otp', GuiPriority.OTP),
+        ], order)
+        lock.release()
+        for t in threads:
+            t.join(timeout=2)
+        assert order == ['otp', 'click-1', 'click-2', 'nav', 'cosmetic']
+
+    def test_aging_promotes_long_waiters(self):
+        clock = FakeClock()
+        lock = GuiScheduler(aging=1.0, clock=clock)
+        order: list[str] = []
+        lock.acquire()
+        threads = _queue_waiters(lock, [('cosmetic', GuiPriority.COSMETIC)], order)
+        clock.now += 2.5  # cosmetic (3) ages to class 1, ahead of a later click
+        threads += _queue_waiters(lock, [('click', GuiPriority.CLICK)], order)
+        lock.release()
+        for t in threads:
+            t.join(timeout=2)
+        assert order == ['cosmetic', 'click']
+
+    def test_acquire_timeout_leaves_queue(self):
+        lock = GuiScheduler(aging=0)
+        lock.acquire()
+        got = []
+        t = threading.Thread(target=lambda: got.append(lock.acquire(timeout=0.05)))
+        t.start()
+        t.join(timeout=2)
+        assert got == [False]
+        assert lock._waiters == []
+        lock.release()
+        assert lock.acquire(blocking=False)
+        lock.release()
+
+    def test_release_unlocked_raises(self):
+        with pytest.raises(RuntimeError):
+            GuiScheduler().release()
+
+
+# ---------------------------------------------------------------------------
+# Stats and hold warnings
+# ---------------------------------------------------------------------------
+
+class TestStats:
+    def test_wait_and_hold_recorded_per_job_and_class(self):
+        clock = FakeClock()
+        lock = GuiScheduler(max_hold=5, clock=clock)
+        token = gui_job.set('job-1')
+        try:
+            with gui_priority(GuiPriority.OTP), lock:
+                clock.now += 0.2
+        finally:
+            gui_job.reset(token)
+
+        stats = lock.stats()
+        job = stats['by_job']['job-1']
+        assert job['acquisitions'] == 1
+        assert job['hold']['max_s'] == pytest.approx(0.2)
+        assert sum(job['wait']['counts']) == 1
+        # 0.2s falls in the (0.1, 0.25] bucket
+        assert job['hold']['counts'][stats['bucket_bounds_s'].index(0.25)] == 1
+        assert stats['by_priority']['otp']['acquisitions'] == 1
+        assert stats['by_priority']['click']['acquisitions'] == 0
+        assert stats['held_by'] is None
+
+    def test_long_hold_warns(self, caplog):
+        clock = FakeClock()
+        lock = GuiScheduler(max_hold=1.0, clock=clock)
+        token = gui_job.set('job-slow')
+        try:
+            with caplog.at_level(logging.WARNING, logger='agent.gui_lock'), lock:
+                clock.now += 3.0
+        finally:
+            gui_job.reset(token)
+        assert 'job-slow' in caplog.text
+        assert lock.stats()['by_job']['job-slow']['long_holds'] == 1
+
+    def test_in_gui_thread_carries_job_and_priority(self):
+        lock = GuiScheduler()
+
+        def section():
+            with lock:
+                return gui_job.get()
+
+        async def go():
+            gui_job.set('job-ctx')
+            with gui_priority(GuiPriority.NAVIGATE):
+                return await in_gui_thread(section)
+
+        assert asyncio.run(go()) == 'job-ctx'
+        stats = lock.stats()
+        assert stats['by_job']['job-ctx']['acquisitions'] == 1
+        assert stats['by_priority']['navigate']['acquisitions'] == 1
+
+    def test_gui_timing_sums_this_context_including_gui_threads(self):
+        clock = FakeClock()
+        lock = GuiScheduler(clock=clock)
+
+        def section():
+            with lock:
+                clock.now += 0.5
+
+        async def go():
+            timing = gui_timing()
+            section()
+            await in_gui_thread(section)
+            return timing
+
+        timing = asyncio.run(go())
+        assert timing['acquisitions'] == 2
+        assert timing['hold_s'] == pytest.approx(1.0)
+        # Another context's acquisitions don't count
+        with lock:
+            clock.now += 1.0
+        assert timing['acquisitions'] == 2
+
+    @pytest.mark.parametrize('threads,expected', [
+        (4, ['holder', 'otp', 'nav', 'cosmetic']),
+        # nav already holds the second thread; otp still beats cosmetic
+        (2, ['holder', 'nav', 'otp', 'cosmetic']),
+    ])
+    def test_in_gui_thread_admits_waiters_by_priority(self, monkeypatch, threads, expected):
+        pool = ThreadPoolExecutor(max_workers=threads)
+        monkeypatch.setattr(gui_lock_module, '_pool', pool)
+        monkeypatch.setattr(gui_lock_module, '_admission', gui_lock_module._Admission(threads))
+        lock = GuiScheduler(aging=0)
+        order = []
+        held, done = threading.Event(), threading.Event()
+
+        def holder():
+            with lock:
+                order.append('holder')
+                held.set()
+                done.wait(5)
+
+        def section(name):
+            with lock:
+                order.append(name)
+
+        async def go():
+            tasks = [asyncio.ensure_future(in_gui_thread(holder))]
+            await asyncio.to_thread(held.wait, 5)
+            # Fill the pool past its size, lowest priority first
+            for name, priority in (('nav', GuiPriority.NAVIGATE),
+                                   ('cosmetic', GuiPriority.COSMETIC),
+                                   ('otp', GuiPriority.OTP)):
+                with gui_priority(priority):
+                    tasks.append(asyncio.ensure_future(in_gui_thread(section, name)))
+                await asyncio.sleep(0.05)
+            done.set()
+            await asyncio.gather(*tasks)
+
+        try:
+            asyncio.run(go())
+        finally:
+            pool.shutdown()
+        assert order == expected
+
+    def test_cancelled_admission_waiter_frees_its_place(self):
+        admission = gui_lock_module._Admission(1)
+
+        async def go():
+            await admission.acquire(GuiPriority.COSMETIC)
+            waiter = asyncio.ensure_future(admission.acquire(GuiPriority.OTP))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            admission.release()
+            await asyncio.wait_for(admission.acquire(GuiPriority.COSMETIC), 1)
+
+        asyncio.run(go())
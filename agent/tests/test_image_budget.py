@@ -0,0 +1,165 @@
+"""Tests for per-(service, phase) image budgets and their use by VLMClient."""
+
+from __future__ import annotations
+
+import base64
+import io
+
+import httpx
+import pytest
+from PIL import Image
+
+from agent.recording.image_budget import (
+    ImageBudget,
+    ImageBudgetPolicy,
+    get_image_budget_config,
+    parse_budget,
+    parse_budget_table,
+)
+from agent.recording.vlm_client import VLMClient
+from agent.screenshot import Frame
+
+
+def _frame(width: int = 1920, height: int = 1080) -> Frame:
+    img = Image.new('RGB', (width, height), (40, 120, 200))
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return Frame(buf.getvalue())
+
+
+class TestParseBudget:
+    def test_width_only(self):
+        assert parse_budget('640', 960) == ImageBudget(640)
+
+    def test_all_tokens(self):
+        assert parse_budget('1280/q70/webp/gray', 960) == ImageBudget(1280, 70, 'webp', True)
+
+    def test_empty_width_keeps_default(self):
+        assert parse_budget('/q60', 960) == ImageBudget(960, 60)
+
+    @pytest.mark.parametrize('text', ['640/png', '640/q0', '-1', 'abc'])
+    def test_invalid(self, text):
+        with pytest.raises(ValueError):
+            parse_budget(text, 960)
+
+    def test_str_round_trips(self):
+        budget = ImageBudget(768, 75, 'webp', True)
+        assert str(budget) == '768/q75/webp/gray'
+        assert parse_budget(str(budget), 960) == budget
+
+    def test_table(self):
+        table = parse_budget_table('*:sign-in=640/q70, netflix:cancel=1280', 960)
+        assert table == {
+            ('*', 'sign-in'): ImageBudget(640, 70),
+            ('netflix', 'cancel'): ImageBudget(1280),
+        }
+
+    def test_table_entry_without_budget(self):
+        with pytest.raises(ValueError):
+            parse_budget_table('netflix:cancel', 960)
+
+
+class TestPolicy:
+    def test_most_specific_match_wins(self):
+        policy = ImageBudgetPolicy.from_spec(
+            '*:*=800, *:sign-in=640, hulu:*=1024, hulu:sign-in=512', 960)
+        assert policy.budget_for('hulu', 'sign-in').width == 512
+        assert policy.budget_for('hulu', 'cancel').width == 1024
+        assert policy.budget_for('netflix', 'sign-in').width == 640
+        assert policy.budget_for('netflix', 'cancel').width == 800
+
+    def test_default_without_table(self):
+        policy = ImageBudgetPolicy.from_spec('', 960)
+        assert policy.budget_for('netflix', 'cancel') == ImageBudget(960)
+        assert policy.budget_for(None, None) == ImageBudget(960)
+        assert policy.fingerprint == ''
+
+    def test_fingerprint_tracks_table(self):
+        a = ImageBudgetPolicy.from_spec('*:sign-in=640', 960)
+        b = ImageBudgetPolicy.from_spec('*:sign-in=512', 960)
+        assert a.fingerprint and a.fingerprint != b.fingerprint
+
+    def test_config_from_env(self, monkeypatch):
+        monkeypatch.setenv('VLM_IMAGE_BUDGETS', ' *:sign-in=640 ')
+        monkeypatch.delenv('VLM_TRIAGE_BUDGET', raising=False)
+        assert get_image_budget_config() == {'budgets': '*:sign-in=640', 'triage': '512/q70'}
+
+    def test_phase_defaults_ignore_wildcard_phase_entries(self):
+        policy = ImageBudgetPolicy.from_spec(
+            '*:*=1280, hulu:*=1024, hulu:triage-action=256', 960,
+            phase_defaults={'triage-sign-in': ImageBudget(512, 70),
+                            'triage-action': ImageBudget(512, 70)})
+        assert policy.budget_for('netflix', 'triage-sign-in') == ImageBudget(512, 70)
+        assert policy.budget_for('hulu', 'triage-sign-in') == ImageBudget(512, 70)
+        assert policy.budget_for('hulu', 'triage-action').width == 256
+        assert policy.budget_for('hulu', 'cancel').width == 1024
+
+
+class TestFrameEncodeFormats:
+    def test_webp(self):
+        encoded = _frame().encode(640, 80, 'webp')
+        assert encoded.media_type == 'image/webp'
+        assert encoded.data[8:12] == b'WEBP'
+        assert encoded.size == (640, 360)
+
+    def test_grayscale(self):
+        encoded = _frame().encode(640, grayscale=True)
+        assert Image.open(io.BytesIO(encoded.data)).mode == 'L'
+        assert encoded.media_type == 'image/jpeg'
+
+    def test_cached_per_budget(self):
+        frame = _frame()
+        assert frame.encode(640) is frame.encode(640)
+        assert frame.encode(640) is not frame.encode(640, grayscale=True)
+
+
+class TestVLMClientBudgets:
+    @staticmethod
+    def _capture(monkeypatch) -> list:
+        sent: list = []
+
+        def mock_post(self_client, url, **kwargs):
+            sent.append(kwargs['json'])
+            resp = httpx.Response(
+                200, json={'choices': [{'message': {'content': '{"action": "wait"}'}}]})
+            resp._request = httpx.Request('POST', 'https://fake.example.com')
+            return resp
+
+        monkeypatch.setattr(httpx.Client, 'post', mock_post)
+        return sent
+
+    def test_budget_selected_per_phase(self, monkeypatch):
+        sent = self._capture(monkeypatch)
+        frame = _frame()
+        with VLMClient(base_url='https://x', api_key='k', model='m', max_image_width=960,
+                       image_budgets='*:sign-in=480/q70, netflix:cancel=1280/webp') as client:
+            _, scale = client.analyze(frame, 'sys', phase='sign-in', service='netflix')
+            assert scale == 4.0
+            assert client.last_image_budget == ImageBudget(480, 70)
+            assert client.last_sent_image_b64 == frame.encode(480, 70).b64
+
+            _, scale = client.analyze(frame, 'sys', phase='cancel', service='netflix')
+            assert scale == 1.5
+            url = sent[-1]['messages'][1]['content'][0]['image_url']['url']
+            assert url.startswith('data:image/webp;base64,')
+
+            _, scale = client.analyze(frame, 'sys', phase='cancel', service='hulu')
+            assert scale == 2.0  # default: max_image_width, JPEG
+
+    def test_cache_identity_includes_table(self):
+        plain = VLMClient(base_url='https://x', api_key='k', model='m', image_budgets='')
+        tuned = VLMClient(base_url='https://x', api_key='k', model='m',
+                          image_budgets='*:sign-in=640')
+        assert '|b' not in plain.cache_identity
+        assert tuned.cache_identity.startswith(plain.cache_identity + '|b')
+        plain.close()
+        tuned.close()
+
+    def test_sent_image_decodes(self, monkeypatch):
+        self._capture(monkeypatch)
+        with VLMClient(base_url='https://x', api_key='k', model='m',
+                       image_budgets='*:*=320/gray') as client:
+            client.analyze(_frame(), 'sys', phase='cancel')
+            img = Image.open(io.BytesIO(base64.b64decode(client.last_sent_image_b64)))
+        assert img.size == (320, 180)
+        assert img.mode == 'L'
@@ -0,0 +1,161 @@
+"""Tests for precomputed input plans (agent.input.plan / player).
+
+Planning is pure math; replay is checked against a recording op table,
+so these run without macOS input APIs.
+"""
+
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from agent.input import keyboard, mouse, player, scroll
+from agent.input import plan as plan_mod
+from agent.input.plan import InputPlan, move_events, path, path_delays
+from agent.input.humanize import velocity_profile
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    """Run a test with the NumPy path generator and with the fallback."""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(plan_mod, 'np', None)
+    return request.param
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Replace the player's op table with one that records (op, args)."""
+    calls: list[tuple[str, tuple]] = []
+    ops = {name: (lambda *args, name=name: calls.append((name, args)))
+           for name in ('move', 'warp', 'down', 'up', 'key_down', 'key_up',
+                        'unicode_down', 'unicode_up', 'scroll', 'wait')}
+    monkeypatch.setattr(player, '_ops', ops)
+    return calls
+
+
+def _moves(plan: InputPlan) -> list[tuple[float, float]]:
+    return [args[:2] for _, op, args in plan.events if op == 'move']
+
+
+# ---------------------------------------------------------------------------
+# Path math
+# ---------------------------------------------------------------------------
+
+class TestPath:
+    def test_endpoints(self, backend):
+        pts = path((0, 0), (300, 200), 30)
+        assert len(pts) == 31
+        assert pts[0] == pytest.approx((0, 0))
+        assert pts[-1] == pytest.approx((300, 200))
+
+    def test_jitter_keeps_endpoints(self, backend):
+        pts = path((10, 10), (500, 400), 30, jitter=2.0)
+        assert pts[0] == pytest.approx((10, 10))
+        assert pts[-1] == pytest.approx((500, 400))
+
+    def test_overshoot_ends_on_target(self, backend):
+        pts = path((0, 0), (400, 0), 20, overshoot=1.0)
+        assert len(pts) == 21 + 8
+        assert pts[-1] == pytest.approx((400, 0))
+        assert 5 <= math.dist(pts[20], (400, 0)) <= 20
+
+    def test_short_distance(self, backend):
+        assert path((5, 5), (5.5, 5), 10) == [(5, 5), (5.5, 5)]
+
+    def test_delays_match_velocity_profile(self, backend):
+        assert path_delays(20, 0.4) == pytest.approx(velocity_profile(20, 0.4 / 20))
+
+    def test_move_events_keep_trailing_delay(self):
+        events = move_events([(0, 0), (1, 1), (2, 2)], 0.3, event_type=5)
+        assert [op for _, op, _ in events] == ['move', 'move', 'move', 'wait']
+        assert events[0][0] == 0.0
+        assert sum(e[0] for e in events) == pytest.approx(sum(path_delays(3, 0.3)))
+
+
+# ---------------------------------------------------------------------------
+# Operation plans
+# ---------------------------------------------------------------------------
+
+class TestPlans:
+    def test_plan_move_records_path(self, backend):
+        plan = mouse.plan_move(600, 400, start=(100, 100))
+        pts = _moves(plan)
+        assert plan.start == (100, 100)
+        assert plan.target == (600.0, 400.0)
+        assert plan.path_events == len(pts)
+        assert pts[0] == pytest.approx((100, 100))
+        assert pts[-1] == pytest.approx((600, 400))
+        assert plan.duration > 0
+
+    def test_plan_move_tiny_distance_warps(self):
+        plan = mouse.plan_move(101, 100, start=(100, 100))
+        assert [op for _, op, _ in plan.events] == ['warp']
+
+    def test_plan_click_ends_with_press(self, backend):
+        plan = mouse.plan_click(300, 300, start=(0, 0))
+        ops = [op for _, op, _ in plan.events]
+        assert ops[-2:] == ['down', 'up']
+        assert plan.target == (300.0, 300.0)
+
+    def test_plan_type_keys(self):
+        plan = keyboard.plan_type('aB!é', speed='fast')
+        ops = [op for _, op, _ in plan.events]
+        # a: down/up; B and !: shift + key down/up; é: unicode
+        assert ops == ['key_down', 'key_up'] + ['key_down', 'key_down', 'key_up', 'key_up'] * 2 \
+            + ['unicode_down', 'unicode_up']
+
+    def test_plan_type_instant_has_no_typing_delay(self):
+        plan = keyboard.plan_type('abc', speed='instant')
+        assert [d for d, op, _ in plan.events if op == 'key_down'] == [0.0] * 3
+
+    def test_plan_scroll_ticks(self):
+        plan = scroll.plan_scroll('down', 4)
+        ticks = [args for _, op, args in plan.events if op == 'scroll']
+        assert ticks == [(-30,)] * 4
+        assert plan.events[-1][1] == 'wait'
+
+
+# ---------------------------------------------------------------------------
+# Re-anchoring and replay
+# ---------------------------------------------------------------------------
+
+class TestReplay:
+    def test_rebased_bends_path_onto_new_start(self, backend):
+        plan = mouse.plan_click(500, 300, start=(100, 100))
+        moved = plan.rebased((120, 110))
+        pts = _moves(moved)
+        assert pts[0] == pytest.approx((120, 110))
+        assert pts[-1] == pytest.approx((500, 300))
+        assert moved.events[-2:] == plan.events[-2:]
+
+    def test_anchor_replans_large_displacement(self, backend):
+        plan = mouse.plan_click(500, 300, start=(100, 100))
+        anchored = player.anchor(plan, (900, 700))
+        assert _moves(anchored)[0] == pytest.approx((900, 700))
+        assert _moves(anchored)[-1] == pytest.approx((500, 300))
+        assert [op for _, op, _ in anchored.events][-2:] == ['down', 'up']
+
+    def test_anchor_keeps_plan_when_cursor_unmoved(self):
+        plan = mouse.plan_click(500, 300, start=(100, 100))
+        assert player.anchor(plan, (101, 100)) is plan
+
+    def test_play_posts_events_with_delays(self, recorded, monkeypatch):
+        monkeypatch.setattr(mouse, 'position', lambda: (100, 100))
+        plan = InputPlan([(0.0, 'down', ('left',)), (0.1, 'up', ('left',))])
+        slept: list[float] = []
+        player.play(plan, sleep=slept.append)
+        assert recorded == [('down', ('left',)), ('up', ('left',))]
+        assert slept == [0.1]
+
+    def test_click_replays_planned_events(self, recorded, monkeypatch):
+        monkeypatch.setattr(mouse, 'position', lambda: (100, 100))
+        monkeypatch.setattr('agent.input.player.time.sleep', lambda s: None)
+        mouse.click(400, 250)
+        ops = [op for op, _ in recorded]
+        assert ops[0] == 'move' and ops[-2:] == ['down', 'up']
+        moves = [args for op, args in recorded if op == 'move']
+        assert moves[-1][:2] == pytest.approx((400, 250))
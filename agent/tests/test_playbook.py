@@ -83,3 +83,21 @@ class TestExecutionResult:
         )
         assert result.success is False
         assert 'timeout' in result.error_message
+
+    def test_step_timings_sums_ms_and_tokens(self) -> None:
+        result = ExecutionResult(
+            job_id='j3', service='netflix', flow='cancel',
+            success=True, duration_seconds=20.0,
+            step_count=2, inference_count=2,
+            step_results=[
+                {'iteration': None, 'phase': 'setup', 'launch_ms': 3000, 'total_ms': 5000},
+                {'iteration': 0, 'phase': 'sign-in', 'vlm_ms': 4000,
+                 'prompt_tokens': 900, 'network_ms': None, 'total_ms': 6000},
+                {'iteration': 1, 'phase': 'cancel', 'vlm_ms': 2500,
+                 'prompt_tokens': 800, 'total_ms': 4000},
+            ],
+        )
+        assert result.step_timings() == {
+            'steps': 3, 'launch_ms': 3000, 'vlm_ms': 6500,
+            'prompt_tokens': 1700, 'total_ms': 15000,
+        }
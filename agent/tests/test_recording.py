@@ -8,6 +8,8 @@ from __future__ import annotations
 import base64
 import io
 import json
+import threading
+import time
 
 import pytest
 from PIL import Image
@@ -38,7 +40,12 @@ _skip_without_private = pytest.mark.skipif(
     reason='unsaltedbutter-prompts not installed (service-specific content)',
 )
 from agent.recording.vlm_client import VLMClient, _denormalize_bboxes, _extract_json, _swap_yx_bboxes
-from agent.screenshot import CHROME_HEIGHT_LOGICAL, crop_browser_chrome
+from agent.screenshot import (
+    CHROME_HEIGHT_LOGICAL,
+    Frame,
+    crop_browser_chrome,
+    crop_browser_chrome_frame,
+)
 
 
 # ===========================================================================
@@ -94,6 +101,85 @@ class TestCropBrowserChrome:
         img.verify()  # raises if invalid
 
 
+class TestFrame:
+    """Frame: single-decode screenshot with cached crop/encode views."""
+
+    def test_size_reads_ihdr_without_decoding(self, monkeypatch) -> None:
+        frame = Frame(base64.b64decode(_make_test_png_b64(320, 200)))
+
+        def _no_open(*a, **kw):
+            raise AssertionError('size must not decode the PNG')
+
+        monkeypatch.setattr('PIL.Image.open', _no_open)
+        assert frame.size == (320, 200)
+
+    def test_size_rejects_non_png(self) -> None:
+        with pytest.raises(ValueError):
+            Frame(b'not a png').size
+
+    def test_decodes_once_across_crop_and_encode(self, monkeypatch) -> None:
+        opens = []
+        real_open = Image.open
+
+        def counting_open(*a, **kw):
+            opens.append(1)
+            return real_open(*a, **kw)
+
+        monkeypatch.setattr('PIL.Image.open', counting_open)
+        frame = Frame(base64.b64decode(_make_test_png_b64(1920, 1200)))
+        page = frame.crop_top(88)
+        encoded = page.encode(960)
+        page.encode(960)
+        frame.crop_top(88).encode(960)
+        assert len(opens) == 1
+        assert page.size == (1920, 1200 - 88)
+        assert encoded.size == (960, (1200 - 88) // 2)
+        assert encoded.scale_factor == 2.0
+        assert encoded.data[:2] == b'\xff\xd8'
+
+    def test_crop_and_encode_are_cached(self) -> None:
+        frame = Frame(base64.b64decode(_make_test_png_b64(400, 300)))
+        assert frame.crop_top(50) is frame.crop_top(50)
+        assert frame.crop_top(0) is frame
+        page = frame.crop_top(50)
+        assert page.encode(200) is page.encode(200)
+        assert page.encode(200) is not page.encode(200, quality=60)
+
+    def test_no_resize_when_narrow(self) -> None:
+        frame = Frame(base64.b64decode(_make_test_png_b64(200, 100)))
+        encoded = frame.encode(960)
+        assert encoded.scale_factor == 1.0
+        assert encoded.size == (200, 100)
+
+    def test_crop_digest_does_not_encode_png(self) -> None:
+        frame = Frame(base64.b64decode(_make_test_png_b64(400, 300)))
+        page = frame.crop_top(50)
+        assert page.digest.startswith(frame.digest)
+        assert page._png is None  # digest did not force a PNG encode
+
+    def test_derived_png_roundtrips(self) -> None:
+        frame = Frame(base64.b64decode(_make_test_png_b64(400, 300)))
+        page = frame.crop_top(50)
+        img = Image.open(io.BytesIO(page.png))
+        assert img.size == (400, 250)
+        assert Frame.from_base64(page.b64).size == (400, 250)
+
+    def test_crop_browser_chrome_frame_matches_b64_variant(self, monkeypatch) -> None:
+        monkeypatch.setattr('agent.input.window.get_retina_scale', lambda: 2.0)
+        img_b64 = _make_test_png_b64(2560, 1800)
+        page, chrome_px = crop_browser_chrome_frame(Frame.from_base64(img_b64))
+        cropped_b64, chrome_px_b64 = crop_browser_chrome(img_b64)
+        assert chrome_px == chrome_px_b64 == 176
+        assert page.size == Frame.from_base64(cropped_b64).size
+
+    def test_crop_browser_chrome_frame_short_image_returns_same_frame(self, monkeypatch) -> None:
+        monkeypatch.setattr('agent.input.window.get_retina_scale', lambda: 1.0)
+        frame = Frame.from_base64(_make_test_png_b64(200, 50))
+        page, chrome_px = crop_browser_chrome_frame(frame)
+        assert page is frame
+        assert chrome_px == 0
+
+
 # ===========================================================================
 # Prompt construction tests
 # ===========================================================================
@@ -360,6 +446,16 @@ class TestVLMClientInit:
         assert client.base_url == 'https://api.example.com'
         client.close()
 
+    def test_post_workers_bounded(self) -> None:
+        client = VLMClient(
+            base_url='https://api.example.com/v1',
+            api_key='key',
+            model='model',
+            max_inflight=3,
+        )
+        assert client._posts._max_workers == 3
+        client.close()
+
     def test_context_manager(self) -> None:
         with VLMClient(
             base_url='https://api.example.com/v1',
@@ -462,6 +558,34 @@ class TestVLMClientAnalyze:
         text_part = body['messages'][1]['content'][1]
         assert text_part['text'] == 'custom message'
 
+    def test_accepts_frame_and_reuses_cached_encode(self, monkeypatch) -> None:
+        """A Frame is encoded once; the sent image is the cached JPEG."""
+        import httpx
+
+        captured_kwargs: dict = {}
+
+        def mock_post(self_client, url, **kwargs):
+            captured_kwargs.update(kwargs)
+            return TestVLMClientAnalyze._make_response(
+                {'choices': [{'message': {'content': '{"action": "done"}'}}]},
+            )
+
+        monkeypatch.setattr(httpx.Client, 'post', mock_post)
+
+        frame = Frame(base64.b64decode(_make_test_png_b64(width=1920, height=1080)))
+        with VLMClient(
+            base_url='https://api.example.com',
+            api_key='test-key',
+            model='test-model',
+            max_image_width=960,
+        ) as client:
+            _result, scale = client.analyze(frame, 'test')
+            assert client.last_sent_image_b64 == frame.encode(960).b64
+
+        assert scale == 2.0
+        url = captured_kwargs['json']['messages'][1]['content'][0]['image_url']['url']
+        assert url == f'data:image/jpeg;base64,{frame.encode(960).b64}'
+
     def test_default_user_message_includes_dimensions(self, monkeypatch) -> None:
         """When no user_message is provided, the default includes image dimensions."""
         import httpx
@@ -919,3 +1043,351 @@ class TestSwapYxBboxes:
         assert obj['confidence'] == 0.95
 
 
+
+
+# ===========================================================================
+# Streaming: incremental JSON parser and VLMClient stream mode
+# ===========================================================================
+
+class TestIncrementalJSONObject:
+    """Top-level members become available as soon as they are complete."""
+
+    def _feed_chars(self, text: str):
+        from agent.recording.json_stream import IncrementalJSONObject
+        parser = IncrementalJSONObject()
+        snapshots = []
+        for ch in text:
+            parser.feed(ch)
+            snapshots.append(dict(parser.fields))
+        return parser, snapshots
+
+    def test_members_complete_incrementally(self) -> None:
+        text = '{"page_type": "user_pass", "email_point": [1, 2], "notes": "x"}'
+        parser, snaps = self._feed_chars(text)
+        assert parser.complete
+        assert parser.fields == json.loads(text)
+        # page_type is available before the rest of the object arrives
+        first = next(i for i, s in enumerate(snaps) if 'page_type' in s)
+        assert 'email_point' not in snaps[first]
+
+    def test_commas_and_braces_inside_strings_and_arrays(self) -> None:
+        text = '{"state": "a, {b}", "actions": [{"action": "click", "point": [1, 2]}], "k": "\\"q\\""}'
+        parser, _ = self._feed_chars(text)
+        assert parser.fields == json.loads(text)
+
+    def test_skips_fence_preamble(self) -> None:
+        parser, _ = self._feed_chars('```json\n{"action": "wait"}\n```')
+        assert parser.complete
+        assert parser.fields == {'action': 'wait'}
+
+    def test_truncated_member_not_reported(self) -> None:
+        parser, _ = self._feed_chars('{"action": "click", "click_point": [3')
+        assert not parser.complete
+        assert parser.fields == {'action': 'click'}
+
+
+class TestVLMClientStreaming:
+    """stream=True reads SSE deltas and can stop before the model finishes."""
+
+    @staticmethod
+    def _client(monkeypatch, deltas: list[str], sent: list):
+        import httpx
+
+        def events():
+            for d in deltas:
+                sent.append(d)
+                chunk = {'choices': [{'delta': {'content': d}}]}
+                yield f'data: {json.dumps(chunk)}\n\n'.encode()
+            yield b'data: [DONE]\n\n'
+
+        captured: dict = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            captured['json'] = json.loads(request.content)
+            return httpx.Response(200, content=events())
+
+        client = VLMClient(base_url='https://api.example.com', api_key='k',
+                           model='m', coord_normalize=False, stream=True)
+        client._client = httpx.Client(base_url=client.base_url,
+                                      transport=httpx.MockTransport(handler))
+        return client, captured
+
+    def test_full_stream_parses_object(self, monkeypatch) -> None:
+        sent: list = []
+        client, captured = self._client(
+            monkeypatch, ['{"action": ', '"done", ', '"state": "x"}'], sent)
+        result, scale = client.analyze(_make_test_png_b64(), 'sys')
+        assert captured['json']['stream'] is True
+        assert result == {'action': 'done', 'state': 'x'}
+        assert client.last_stream_stats['early_stop'] is False
+        client.close()
+
+    def test_ready_stops_generation_early(self, monkeypatch) -> None:
+        sent: list = []
+        deltas = ['{"page_type": "spinner"', ', "email_point": null',
+                  ', "notes": "', 'long ', 'trailing ', 'text"}']
+        client, _ = self._client(monkeypatch, deltas, sent)
+        result, _ = client.analyze(_make_test_png_b64(), 'sys',
+                                   ready=lambda f: 'page_type' in f)
+        assert result == {'page_type': 'spinner'}
+        assert client.last_stream_stats['early_stop'] is True
+        assert len(sent) < len(deltas)
+        client.close()
+
+    def test_malformed_stream_falls_back_to_extract(self, monkeypatch) -> None:
+        sent: list = []
+        client, _ = self._client(
+            monkeypatch, ['{"page_type": "user_pass", ', '"email_point": [5, 6}]'], sent)
+        result, _ = client.analyze(_make_test_png_b64(), 'sys')
+        assert result['page_type'] == 'user_pass'
+        assert result['email_point'] == [5, 6]
+        client.close()
+
+    def test_cancel_aborts_stream(self, monkeypatch) -> None:
+        from agent.cancel import CancelToken, JobCancelled
+
+        token = CancelToken()
+        sent: list = []
+        deltas = ['{"action": ', '"click", ', '"state": "x"}']
+        client, _ = self._client(monkeypatch, deltas, sent)
+        original = client._stream_lines
+
+        def lines(resp, cancel):
+            for i, line in enumerate(original(resp, cancel)):
+                if i == 1:
+                    token.cancel()  # abort arrives after the first delta
+                yield line
+
+        monkeypatch.setattr(client, '_stream_lines', lines)
+        with pytest.raises(JobCancelled):
+            client.analyze(_make_test_png_b64(), 'sys', cancel=token)
+        assert len(sent) < len(deltas)
+        client.close()
+
+    def test_cancelled_token_skips_request(self, monkeypatch) -> None:
+        from agent.cancel import CancelToken, JobCancelled
+
+        token = CancelToken()
+        token.cancel()
+        sent: list = []
+        client, captured = self._client(monkeypatch, ['{}'], sent)
+        with pytest.raises(JobCancelled):
+            client.analyze(_make_test_png_b64(), 'sys', cancel=token)
+        assert captured == {}
+        client.close()
+
+    def test_cancel_stops_waiting_for_non_streamed_request(self, monkeypatch) -> None:
+        import httpx
+        from agent.cancel import CancelToken, JobCancelled
+
+        token = CancelToken()
+        in_request, backend_done = threading.Event(), threading.Event()
+
+        def mock_post(self_client, url, **kwargs):
+            in_request.set()
+            backend_done.wait(10)  # a backend still generating
+            return TestVLMClientAnalyze._make_response({
+                'choices': [{'message': {'content': '{}'}}]})
+
+        monkeypatch.setattr(httpx.Client, 'post', mock_post)
+        client = VLMClient(base_url='https://api.example.com', api_key='k',
+                           model='m', coord_normalize=False, stream=False)
+        threading.Thread(target=lambda: in_request.wait(5) and token.cancel()).start()
+        t0 = time.monotonic()
+        try:
+            with pytest.raises(JobCancelled):
+                client.analyze(_make_test_png_b64(), 'sys', cancel=token)
+            assert time.monotonic() - t0 < 5
+        finally:
+            backend_done.set()
+            client.close()
+
+
+# ===========================================================================
+# Schema-constrained decoding
+# ===========================================================================
+
+class TestPhaseSchemas:
+    def test_schemas_are_strict_mode_compatible(self) -> None:
+        from agent.recording.schemas import PHASE_SCHEMAS
+        for schema in PHASE_SCHEMAS.values():
+            assert schema['additionalProperties'] is False
+            assert set(schema['required']) == set(schema['properties'])
+
+    def test_schemas_cover_fields_the_executor_reads(self) -> None:
+        from agent.recording.schemas import ACTION_SCHEMA, SIGNIN_SCHEMA
+        from agent.vlm_executor import _ACTION_BASE_FIELDS, _ACTION_EXTRA_FIELDS
+        action_fields = set(_ACTION_BASE_FIELDS)
+        for extra in _ACTION_EXTRA_FIELDS.values():
+            action_fields.update(extra)
+        assert action_fields <= set(ACTION_SCHEMA['properties'])
+        assert {'page_type', 'email_point', 'password_point', 'button_point',
+                'code_point', 'actions'} <= set(SIGNIN_SCHEMA['properties'])
+
+    def test_dispatch_fields_come_first(self) -> None:
+        from agent.recording.schemas import ACTION_SCHEMA, SIGNIN_SCHEMA
+        assert next(iter(SIGNIN_SCHEMA['properties'])) == 'page_type'
+        assert list(ACTION_SCHEMA['properties'])[:2] == ['state', 'action']
+
+    def test_plan_schema_only_in_plan_mode(self) -> None:
+        from agent.recording.schemas import (
+            ACTION_SCHEMA, PHASE_MAX_TOKENS, PLAN_STEP_MAX_TOKENS, action_plan_schema,
+            phase_max_tokens,
+        )
+        assert 'next_steps' not in ACTION_SCHEMA['properties']
+        schema = action_plan_schema(2)
+        assert schema['properties']['next_steps']['maxItems'] == 2
+        assert set(schema['required']) == set(schema['properties'])
+        assert phase_max_tokens('cancel') == PHASE_MAX_TOKENS['cancel']
+        assert phase_max_tokens('cancel', 2) == PHASE_MAX_TOKENS['cancel'] + 2 * PLAN_STEP_MAX_TOKENS
+        assert phase_max_tokens('sign-in', 2) == PHASE_MAX_TOKENS['sign-in']
+        assert phase_max_tokens('unknown') is None
+
+
+class TestVLMClientResponseFormat:
+    @staticmethod
+    def _capture(monkeypatch) -> dict:
+        import httpx
+        captured: dict = {}
+
+        def mock_post(self_client, url, **kwargs):
+            captured.update(kwargs['json'])
+            return TestVLMClientAnalyze._make_response(
+                {'choices': [{'message': {'content': '{"action": "wait"}'}}]},
+            )
+
+        monkeypatch.setattr(httpx.Client, 'post', mock_post)
+        return captured
+
+    def test_json_schema_per_phase(self, monkeypatch) -> None:
+        from agent.recording.schemas import PHASE_MAX_TOKENS, SIGNIN_SCHEMA
+        captured = self._capture(monkeypatch)
+        with VLMClient(base_url='https://x', api_key='k', model='m',
+                       response_format='json_schema') as client:
+            client.analyze(_make_test_png_b64(), 'sys', phase='sign-in')
+        fmt = captured['response_format']
+        assert fmt['type'] == 'json_schema'
+        assert fmt['json_schema']['strict'] is True
+        assert fmt['json_schema']['schema'] == SIGNIN_SCHEMA
+        assert captured['max_tokens'] == PHASE_MAX_TOKENS['sign-in']
+
+    def test_plan_mode_uses_plan_schema(self, monkeypatch) -> None:
+        from agent.recording.schemas import action_plan_schema, phase_max_tokens
+        captured = self._capture(monkeypatch)
+        with VLMClient(base_url='https://x', api_key='k', model='m',
+                       response_format='json_schema') as client:
+            client.analyze(_make_test_png_b64(), 'sys', phase='cancel', plan_steps=4)
+        fmt = captured['response_format']['json_schema']
+        assert fmt['name'] == 'cancel_plan_response'
+        assert fmt['schema'] == action_plan_schema(4)
+        assert captured['max_tokens'] == phase_max_tokens('cancel', 4)
+
+    def test_json_object_mode(self, monkeypatch) -> None:
+        captured = self._capture(monkeypatch)
+        with VLMClient(base_url='https://x', api_key='k', model='m',
+                       response_format='json_object') as client:
+            client.analyze(_make_test_png_b64(), 'sys', phase='cancel')
+        assert captured['response_format'] == {'type': 'json_object'}
+
+    def test_free_form_without_mode_or_phase(self, monkeypatch) -> None:
+        captured = self._capture(monkeypatch)
+        with VLMClient(base_url='https://x', api_key='k', model='m',
+                       max_tokens=2048, response_format='') as client:
+            client.analyze(_make_test_png_b64(), 'sys', phase='cancel')
+        assert 'response_format' not in captured
+        assert captured['max_tokens'] == 2048
+
+        captured.clear()
+        with VLMClient(base_url='https://x', api_key='k', model='m',
+                       response_format='json_schema') as client:
+            client.analyze(_make_test_png_b64(), 'sys')
+        assert 'response_format' not in captured
+
+    def test_cache_identity_includes_format(self) -> None:
+        a = VLMClient(base_url='https://x', api_key='k', model='m', response_format='')
+        b = VLMClient(base_url='https://x', api_key='k', model='m',
+                      response_format='json_schema')
+        assert a.cache_identity != b.cache_identity
+        a.close()
+        b.close()
+
+
+# ===========================================================================
+# Prefix-cache-friendly layout and usage accounting
+# ===========================================================================
+
+class TestVLMClientPrefixLayout:
+    @staticmethod
+    def _capture(monkeypatch, body: dict | None = None) -> list:
+        import httpx
+        captured: list = []
+
+        def mock_post(self_client, url, **kwargs):
+            captured.append(kwargs['json'])
+            return TestVLMClientAnalyze._make_response(body or {
+                'choices': [{'message': {'content': '{"action": "wait"}'}}],
+            })
+
+        monkeypatch.setattr(httpx.Client, 'post', mock_post)
+        return captured
+
+    def test_static_parts_precede_variable_parts(self, monkeypatch) -> None:
+        captured = self._capture(monkeypatch)
+        with VLMClient(base_url='https://x', api_key='k', model='m',
+                       request_layout='prefix', cache_hints='cache_prompt') as client:
+            client.analyze(_make_test_png_b64(200, 100), 'sys prompt')
+            client.analyze(_make_test_png_b64(300, 100), 'sys prompt')
+
+        first, second = captured
+        assert first['cache_prompt'] is True
+        # Everything up to the image is byte-identical across steps
+        assert first['messages'][0] == second['messages'][0]
+        c1, c2 = first['messages'][1]['content'], second['messages'][1]['content']
+        assert c1[0] == c2[0] and c1[0]['type'] == 'text'
+        assert c1[1]['type'] == 'image_url'
+        assert '200x100' in c1[2]['text'] and '300x100' in c2[2]['text']
+
+    def test_prompt_cache_key_is_stable(self, monkeypatch) -> None:
+        captured = self._capture(monkeypatch)
+        with VLMClient(base_url='https://x', api_key='k', model='m',
+                       request_layout='prefix', cache_hints='prompt_cache_key') as client:
+            client.analyze(_make_test_png_b64(), 'sys prompt')
+            client.analyze(_make_test_png_b64(), 'sys prompt')
+            client.analyze(_make_test_png_b64(), 'other prompt')
+        keys = [c['prompt_cache_key'] for c in captured]
+        assert keys[0] == keys[1] != keys[2]
+        assert 'cache_prompt' not in captured[0]
+
+    def test_legacy_layout_unchanged(self, monkeypatch) -> None:
+        captured = self._capture(monkeypatch)
+        with VLMClient(base_url='https://x', api_key='k', model='m',
+                       request_layout='legacy') as client:
+            client.analyze(_make_test_png_b64(), 'sys prompt')
+        content = captured[0]['messages'][1]['content']
+        assert [p['type'] for p in content] == ['image_url', 'text']
+        assert 'cache_prompt' not in captured[0]
+
+    def test_records_openai_usage(self, monkeypatch) -> None:
+        self._capture(monkeypatch, {
+            'choices': [{'message': {'content': '{"action": "wait"}'}}],
+            'usage': {'prompt_tokens': 900, 'completion_tokens': 20,
+                      'prompt_tokens_details': {'cached_tokens': 600}},
+        })
+        with VLMClient(base_url='https://x', api_key='k', model='m') as client:
+            client.analyze(_make_test_png_b64(), 'sys')
+            client.analyze(_make_test_png_b64(), 'sys')
+            assert client.last_usage['cached_tokens'] == 600
+            assert client.usage_totals['requests'] == 2
+            assert client.usage_totals['prompt_tokens'] == 1800
+
+    def test_records_llama_cpp_timings(self, monkeypatch) -> None:
+        self._capture(monkeypatch, {
+            'choices': [{'message': {'content': '{"action": "wait"}'}}],
+            'timings': {'prompt_n': 300, 'cache_n': 600, 'prompt_ms': 410.5,
+                        'predicted_n': 22, 'predicted_ms': 880.0},
+        })
+        with VLMClient(base_url='https://x', api_key='k', model='m') as client:
+            client.analyze(_make_test_png_b64(), 'sys')
+            usage = client.last_usage
+        assert usage == {'prompt_tokens': 300, 'completion_tokens': 22,
+                         'cached_tokens': 600, 'prompt_ms': 410.5, 'gen_ms': 880.0}
@@ -28,6 +28,7 @@ def _fake_json_response(data, *, status=200):
 from aiohttp import web  # this is actually a MagicMock from conftest
 web.json_response = _fake_json_response
 
+from agent.cancel import JobCancelled
 from agent.playbook import ExecutionResult
 from agent.server import ActiveJob, Agent
 
@@ -46,6 +47,10 @@ def _make_agent(max_jobs: int = 3) -> Agent:
     )
     agent._http_client = AsyncMock()
     agent._vlm = MagicMock()
+    agent._vlm.usage_totals = {
+        "requests": 0, "prompt_tokens": 0, "cached_tokens": 0,
+        "completion_tokens": 0, "prompt_ms": 0.0, "gen_ms": 0.0,
+    }
     agent._vlm_model = "test-model"
     return agent
 
@@ -316,6 +321,56 @@ class TestHandleAbort:
 
         _run(go())
 
+    def test_abort_fires_cancel_token(self):
+        async def go():
+            agent = _make_agent()
+            task = MagicMock()
+            task.done.return_value = False
+            aj = ActiveJob(job_id="job-1", service="netflix", action="cancel")
+            aj.task = task
+            agent._active_jobs["job-1"] = aj
+
+            await agent._handle_abort(_make_request({"job_id": "job-1"}))
+            assert aj.cancel.cancelled
+            assert aj.cancel.reason == "aborted"
+
+        _run(go())
+
+    def test_abort_stops_running_flow(self, mock_vlm_system, monkeypatch):
+        """A job stuck in a VLM call is torn down and its slot freed fast."""
+        import threading
+
+        closed = []
+        monkeypatch.setattr("agent.vlm_executor.browser.close_session",
+                            lambda s: closed.append(s.pid))
+        in_call = threading.Event()
+
+        def slow_analyze(page, prompt, **kwargs):
+            in_call.set()
+            kwargs["cancel"]._event.wait(10)
+            kwargs["cancel"].raise_if_cancelled()
+
+        async def go():
+            agent = _make_agent()
+            agent._loop = asyncio.get_running_loop()
+            agent._vlm.analyze = MagicMock(side_effect=slow_analyze)
+            await agent._handle_execute(_make_request(_valid_execute_body("job-1")))
+            task = agent._active_jobs["job-1"].task
+            assert await asyncio.to_thread(in_call.wait, 5)
+
+            t0 = time.monotonic()
+            await agent._handle_abort(_make_request({"job_id": "job-1"}))
+            await asyncio.wait_for(task, timeout=5)
+            return time.monotonic() - t0, agent
+
+        latency, agent = _run(go())
+        assert latency < 1.0
+        assert "job-1" not in agent._active_jobs
+        assert closed == [12345]
+        payload = agent._http_client.post.call_args.kwargs["json"]
+        assert payload["success"] is False
+        assert payload["error"] == "Job aborted"
+
     def test_abort_unknown_job_returns_404(self):
         async def go():
             agent = _make_agent()
@@ -366,6 +421,23 @@ class TestHandleHealth:
             assert body["active_job_count"] == 0
             assert body["slots_available"] == 3
             assert body["active_jobs"] == []
+            assert "vlm_cache" not in body
+            assert body["vlm_usage"]["requests"] == 0
+
+        _run(go())
+
+    def test_health_reports_vlm_cache_stats(self):
+        from agent.vlm_cache import ResponseCache
+
+        async def go():
+            agent = _make_agent(max_jobs=3)
+            agent._response_cache = ResponseCache()
+            agent._response_cache.get('ctx', 0)
+            resp = await agent._handle_health(_make_request({}))
+
+            body = json.loads(resp.body)
+            assert body["vlm_cache"]["misses"] == 1
+            assert body["vlm_cache"]["entries"] == 0
 
         _run(go())
 
@@ -441,6 +513,165 @@ class TestSlotLifecycle:
         _run(go())
 
 
+# ---------------------------------------------------------------------------
+# Parking: jobs waiting on the user release their execution slot
+# ---------------------------------------------------------------------------
+
+def _otp_ok_client() -> AsyncMock:
+    client = AsyncMock()
+    client.post.return_value = MagicMock(status_code=200)
+    return client
+
+
+class TestParking:
+    def test_otp_wait_frees_slot_for_new_job(self):
+        async def go():
+            agent = _make_agent(max_jobs=1)
+            agent._http_client = _otp_ok_client()
+            agent._run_job = AsyncMock()
+            aj = ActiveJob(job_id="job-1", service="netflix", action="cancel")
+            agent._active_jobs["job-1"] = aj
+
+            otp = asyncio.create_task(agent.request_otp("job-1", "netflix"))
+            await asyncio.sleep(0.01)
+            assert aj.parked_since is not None
+            assert agent._slots_available() == 1
+
+            resp = await agent._handle_execute(_make_request(_valid_execute_body("job-2")))
+            assert resp.status == 200
+            assert agent._slots_available() == 0
+
+            # The code arrives but job-2 holds the only slot: job-1 waits
+            await agent._handle_otp(_make_request({"job_id": "job-1", "code": "42"}))
+            await asyncio.sleep(0.01)
+            assert not otp.done()
+            assert agent._resuming == 1
+
+            # A newcomer can't jump the queue while job-1 is resuming
+            async with agent._lock:
+                agent._active_jobs.pop("job-2")
+                agent._slot_freed.notify_all()
+            assert agent._slots_available() == 0
+            assert await otp == "42"
+            assert aj.parked_since is None
+            assert agent._resuming == 0
+            assert agent._executing_count() == 1
+
+        _run(go())
+
+    @pytest.mark.parametrize("how", ["task", "token"])
+    def test_aborted_parked_job_does_not_wait_for_a_slot(self, how):
+        async def go():
+            agent = _make_agent(max_jobs=1)
+            agent._http_client = _otp_ok_client()
+            aj = ActiveJob(job_id="job-1", service="netflix", action="cancel")
+            agent._active_jobs["job-1"] = aj
+
+            async def park():
+                async with agent._parked(aj):
+                    await aj.cancel.wait_for(asyncio.Event().wait())
+
+            task = asyncio.create_task(park())
+            await asyncio.sleep(0.01)
+            # A new job takes the slot job-1 released
+            agent._active_jobs["job-2"] = ActiveJob(
+                job_id="job-2", service="hulu", action="cancel")
+            if how == "token":
+                aj.cancel.cancel("aborted")
+                expected = JobCancelled
+            else:
+                task.cancel()
+                expected = asyncio.CancelledError
+            with pytest.raises(expected):
+                await asyncio.wait_for(task, 1)
+            assert aj.parked_since is None
+            assert agent._resuming == 0
+
+        _run(go())
+
+    def test_credential_wait_parks(self):
+        async def go():
+            agent = _make_agent(max_jobs=1)
+            agent._http_client = _otp_ok_client()
+            aj = ActiveJob(job_id="job-1", service="netflix", action="cancel")
+            agent._active_jobs["job-1"] = aj
+
+            cred = asyncio.create_task(
+                agent.request_credential("job-1", "netflix", "name"))
+            await asyncio.sleep(0.01)
+            assert agent._parked_count() == 1
+            assert agent._slots_available() == 1
+
+            await agent._handle_credential(
+                _make_request({"job_id": "job-1", "credential_name": "name",
+                               "value": "Jo"}))
+            assert await cred == "Jo"
+            assert agent._parked_count() == 0
+
+        _run(go())
+
+    def test_parking_capped_at_max_parked(self):
+        async def go():
+            agent = _make_agent(max_jobs=2)
+            agent._max_parked = 1
+            agent._http_client = _otp_ok_client()
+            for i in (1, 2):
+                agent._active_jobs[f"job-{i}"] = ActiveJob(
+                    job_id=f"job-{i}", service="netflix", action="cancel")
+
+            waits = [asyncio.create_task(agent.request_otp(f"job-{i}", "netflix"))
+                     for i in (1, 2)]
+            await asyncio.sleep(0.01)
+            # Only one parks; the other keeps its slot
+            assert agent._parked_count() == 1
+            assert agent._executing_count() == 1
+
+            for i in (1, 2):
+                await agent._handle_otp(
+                    _make_request({"job_id": f"job-{i}", "code": str(i)}))
+            assert await asyncio.gather(*waits) == ["1", "2"]
+            assert agent._parked_count() == 0
+
+        _run(go())
+
+    def test_otp_timeout_takes_slot_back(self, monkeypatch):
+        monkeypatch.setenv("OTP_TIMEOUT_SECONDS", "0")
+
+        async def go():
+            agent = _make_agent(max_jobs=1)
+            agent._http_client = _otp_ok_client()
+            aj = ActiveJob(job_id="job-1", service="netflix", action="cancel")
+            agent._active_jobs["job-1"] = aj
+
+            assert await agent.request_otp("job-1", "netflix") is None
+            assert aj.parked_since is None
+            assert agent._slots_available() == 0
+
+        _run(go())
+
+    def test_health_reports_parked_jobs(self):
+        async def go():
+            agent = _make_agent(max_jobs=2)
+            agent._max_parked = 4
+            agent._active_jobs["job-1"] = ActiveJob(
+                job_id="job-1", service="netflix", action="cancel")
+            agent._active_jobs["job-2"] = ActiveJob(
+                job_id="job-2", service="hulu", action="cancel",
+                parked_since=time.monotonic())
+
+            body = json.loads((await agent._handle_health(_make_request({}))).body)
+            assert body["active_job_count"] == 1
+            assert body["slots_available"] == 1
+            assert body["max_parked"] == 4
+            assert body["parked_job_count"] == 1
+            assert body["parked_available"] == 3
+            by_id = {j["job_id"]: j for j in body["active_jobs"]}
+            assert by_id["job-1"]["parked_seconds"] is None
+            assert by_id["job-2"]["parked_seconds"] >= 0
+
+        _run(go())
+
+
 # ---------------------------------------------------------------------------
 # Shutdown tests
 # ---------------------------------------------------------------------------
@@ -0,0 +1,216 @@
+"""Tests for the Chrome session manager (agent.session_pool)."""
+
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+
+import pytest
+
+from agent import browser
+from agent.browser import BrowserSession
+from agent.session_pool import SessionManager, get_session_pool_config
+
+
+class FakeChrome:
+    """Launch/close/check callables that record what happened."""
+
+    def __init__(self) -> None:
+        self._pids = itertools.count(100)
+        self.launched: list[int] = []
+        self.closed: list[int] = []
+        self.dead: set[int] = set()
+        self.fail = False
+        self.close_gate = threading.Event()
+        self.close_gate.set()
+
+    def launch(self) -> BrowserSession:
+        if self.fail:
+            raise RuntimeError('no window')
+        pid = next(self._pids)
+        self.launched.append(pid)
+        return BrowserSession(pid=pid, process=None, profile_dir=f'/tmp/p{pid}')
+
+    def close(self, session: BrowserSession) -> None:
+        self.close_gate.wait(5)
+        self.closed.append(session.pid)
+
+    def check(self, session: BrowserSession) -> bool:
+        return session.pid not in self.dead
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def chrome() -> FakeChrome:
+    return FakeChrome()
+
+
+def _manager(chrome, **kw) -> SessionManager:
+    return SessionManager(launch=chrome.launch, close=chrome.close,
+                          check=chrome.check, **kw)
+
+
+def _settle(manager: SessionManager) -> None:
+    """Wait for the background fill to finish."""
+    manager._launcher.submit(lambda: None).result(5)
+
+
+# ---------------------------------------------------------------------------
+# Acquire
+# ---------------------------------------------------------------------------
+
+class TestAcquire:
+    def test_no_pool_launches_cold(self, chrome):
+        manager = _manager(chrome)
+        manager.start()
+        session = manager.acquire()
+        assert chrome.launched == [session.pid]
+        assert manager.stats()['cold'] == 1
+        manager.shutdown()
+
+    def test_warm_session_is_handed_out_and_pool_refills(self, chrome):
+        manager = _manager(chrome, pool_size=2)
+        manager.start()
+        _settle(manager)
+        assert manager.stats()['idle'] == 2
+
+        session = manager.acquire()
+        assert session.pid == chrome.launched[0]
+        _settle(manager)
+        stats = manager.stats()
+        assert stats['warm'] == 1 and stats['cold'] == 0
+        assert stats['idle'] == 2
+        assert len(chrome.launched) == 3
+        manager.shutdown()
+
+    def test_expired_sessions_are_retired(self, chrome):
+        clock = FakeClock()
+        manager = _manager(chrome, pool_size=2, max_idle=60, clock=clock)
+        manager.start()
+        _settle(manager)
+        pooled = list(chrome.launched)
+        clock.now += 61
+        manager.pool_size = 0  # no refill: the next session must be cold
+
+        session = manager.acquire()
+        manager.shutdown()
+        assert session.pid not in pooled
+        assert sorted(chrome.closed) == pooled
+        assert manager.stats()['expired'] == 2
+
+    def test_dead_session_is_skipped(self, chrome):
+        manager = _manager(chrome, pool_size=2)
+        manager.start()
+        _settle(manager)
+        first, second = chrome.launched
+        chrome.dead.add(first)
+
+        assert manager.acquire().pid == second
+        manager.shutdown()
+        assert first in chrome.closed
+        assert manager.stats()['unhealthy'] == 1
+
+    def test_launch_failure_stops_fill_and_cold_start_raises(self, chrome):
+        chrome.fail = True
+        manager = _manager(chrome, pool_size=1)
+        manager.start()
+        _settle(manager)
+        assert manager.stats()['launch_failures'] == 1
+        with pytest.raises(RuntimeError, match='no window'):
+            manager.acquire()
+        manager.shutdown()
+
+    def test_acquire_after_shutdown_raises(self, chrome):
+        manager = _manager(chrome)
+        manager.shutdown()
+        with pytest.raises(RuntimeError, match='shut down'):
+            manager.acquire()
+
+
+# ---------------------------------------------------------------------------
+# Teardown
+# ---------------------------------------------------------------------------
+
+class TestRelease:
+    def test_release_returns_before_chrome_is_closed(self, chrome):
+        manager = _manager(chrome)
+        session = manager.acquire()
+        chrome.close_gate.clear()
+
+        manager.release(session)
+        assert chrome.closed == []
+        assert manager.stats()['tearing_down'] == 1
+
+        chrome.close_gate.set()
+        manager.shutdown()
+        assert chrome.closed == [session.pid]
+        assert manager.stats()['tearing_down'] == 0
+
+    def test_shutdown_closes_pooled_sessions(self, chrome):
+        manager = _manager(chrome, pool_size=2)
+        manager.start()
+        _settle(manager)
+        manager.shutdown()
+        assert sorted(chrome.closed) == sorted(chrome.launched)
+        assert manager.stats()['idle'] == 0
+
+    def test_close_failure_is_counted(self, chrome):
+        def close(session):
+            raise OSError('busy')
+
+        manager = SessionManager(launch=chrome.launch, close=close)
+        manager.release(manager.acquire())
+        manager.shutdown()
+        assert manager.stats()['close_failures'] == 1
+
+
+# ---------------------------------------------------------------------------
+# Config and profiles
+# ---------------------------------------------------------------------------
+
+class TestConfig:
+    def test_defaults(self, monkeypatch):
+        monkeypatch.delenv('CHROME_POOL_SIZE', raising=False)
+        monkeypatch.delenv('CHROME_POOL_MAX_IDLE', raising=False)
+        assert get_session_pool_config() == {'size': 0, 'max_idle': 900.0}
+
+    def test_prefix(self, monkeypatch):
+        monkeypatch.setenv('TTS_CHROME_POOL_SIZE', '2')
+        manager = SessionManager.from_env(prefix='TTS_CHROME_POOL')
+        assert manager.pool_size == 2
+        manager.shutdown()
+
+
+class TestProfileTemplate:
+    def test_generated_template_has_prefs(self, monkeypatch):
+        monkeypatch.delenv('CHROME_PROFILE_TEMPLATE', raising=False)
+        profile = browser.new_profile_dir()
+        try:
+            assert os.path.exists(os.path.join(profile, 'Default', 'Preferences'))
+        finally:
+            browser.shutil.rmtree(profile, ignore_errors=True)
+
+    def test_clone_skips_signed_in_state(self, monkeypatch, tmp_path):
+        template = tmp_path / 'template'
+        (template / 'Default' / 'Cache').mkdir(parents=True)
+        (template / 'Default' / 'Preferences').write_text('{}')
+        (template / 'Default' / 'Cookies').write_text('secret')
+        (template / 'Default' / 'Login Data').write_text('secret')
+        (template / 'SingletonLock').write_text('')
+        (template / 'First Run').write_text('')
+        monkeypatch.setenv('CHROME_PROFILE_TEMPLATE', str(template))
+
+        profile = browser.new_profile_dir()
+        try:
+            assert sorted(os.listdir(profile)) == ['Default', 'First Run']
+            assert os.listdir(os.path.join(profile, 'Default')) == ['Preferences']
+        finally:
+            browser.shutil.rmtree(profile, ignore_errors=True)
@@ -0,0 +1,206 @@
+"""Tests for adaptive page settle (visual stability polling)."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from agent.settle import (
+    SettleResult,
+    frame_difference,
+    get_settle_config,
+    wait_for_stable,
+)
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class FakeClock:
+    """Monotonic clock advanced only by sleep()."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _gray(value: int, size: tuple[int, int] = (16, 10)) -> Image.Image:
+    return Image.new('L', size, color=value)
+
+
+def _sequence(*frames):
+    it = iter(frames)
+    last = [None]
+
+    def capture():
+        try:
+            last[0] = next(it)
+        except StopIteration:
+            pass
+        return last[0]
+
+    async def acapture():
+        return capture()
+
+    return acapture
+
+
+def _settle(capture, clock: FakeClock) -> SettleResult:
+    return asyncio.run(wait_for_stable(capture, clock=clock, sleep=clock.sleep,
+                                       **_DEFAULTS))
+
+
+_DEFAULTS = dict(min_wait=0.5, max_wait=6.0, interval=0.25, threshold=0.01,
+                 stable_frames=3)
+
+
+# ---------------------------------------------------------------------------
+# frame_difference
+# ---------------------------------------------------------------------------
+
+class TestFrameDifference:
+    def test_identical_is_zero(self):
+        assert frame_difference(_gray(100), _gray(100)) == 0.0
+
+    def test_black_white_is_one(self):
+        assert frame_difference(_gray(0), _gray(255)) == pytest.approx(1.0)
+
+    def test_size_mismatch_is_one(self):
+        assert frame_difference(_gray(0, (16, 10)), _gray(0, (16, 12))) == 1.0
+
+
+# ---------------------------------------------------------------------------
+# wait_for_stable
+# ---------------------------------------------------------------------------
+
+class TestWaitForStable:
+    def test_static_page_returns_after_min_wait(self):
+        clock = FakeClock()
+        result = _settle(_sequence(_gray(50)), clock)
+        assert result.stable
+        assert result.elapsed == pytest.approx(0.5)
+        assert result.elapsed < 2.5  # beats the old fixed SETTLE_DELAY
+
+    def test_changing_page_waits_until_stable(self):
+        clock = FakeClock()
+        capture = _sequence(_gray(0), _gray(60), _gray(120), _gray(200),
+                            _gray(200), _gray(200))
+        result = _settle(capture, clock)
+        assert result.stable
+        assert result.polls == 6
+        assert result.elapsed == pytest.approx(1.25)
+
+    def test_never_stable_hits_max(self):
+        clock = FakeClock()
+        values = iter(range(0, 10_000, 40))
+
+        async def capture():
+            return _gray(next(values) % 256)
+
+        result = _settle(capture, clock)
+        assert not result.stable
+        assert result.elapsed == pytest.approx(6.0)
+
+    def test_small_noise_below_threshold_counts_as_stable(self):
+        clock = FakeClock()
+        capture = _sequence(_gray(100), _gray(101), _gray(100))
+        result = _settle(capture, clock)
+        assert result.stable
+
+    def test_capture_error_honours_min_wait(self):
+        clock = FakeClock()
+
+        async def boom():
+            raise RuntimeError('window gone')
+
+        result = _settle(boom, clock)
+        assert not result.stable
+        assert result.polls == 0
+        assert result.elapsed == pytest.approx(0.5)
+
+    def test_as_dict_reports_milliseconds(self):
+        assert SettleResult(1.2345, True, 4).as_dict() == {
+            'settle_ms': 1234, 'stable': True, 'polls': 4,
+        }
+
+
+class TestSettleConfig:
+    def test_defaults(self, monkeypatch):
+        for key in ('SETTLE_MODE', 'SETTLE_MIN', 'SETTLE_MAX'):
+            monkeypatch.delenv(key, raising=False)
+        cfg = get_settle_config()
+        assert cfg['mode'] == 'fixed'
+        assert cfg['min_wait'] == 0.5
+        assert cfg['max_wait'] == 6.0
+
+    def test_env_override(self, monkeypatch):
+        monkeypatch.setenv('SETTLE_MODE', 'Adaptive')
+        monkeypatch.setenv('SETTLE_MAX', '3')
+        cfg = get_settle_config()
+        assert cfg['mode'] == 'adaptive'
+        assert cfg['max_wait'] == 3.0
+
+
+# ---------------------------------------------------------------------------
+# VLMExecutor integration
+# ---------------------------------------------------------------------------
+
+class TestExecutorAdaptiveSettle:
+    @pytest.fixture(autouse=True)
+    def _mock_system(self, mock_vlm_system):
+        pass
+
+    def _vlm(self, responses):
+        vlm = MagicMock()
+        vlm.analyze = MagicMock(side_effect=[(r, 1.0) for r in responses])
+        return vlm
+
+    def test_adaptive_mode_polls_thumbnails(self, monkeypatch):
+        from agent.vlm_executor import VLMExecutor
+
+        # time.sleep is a no-op in executor tests; drop the floors so the
+        # real monotonic clock doesn't have to advance.
+        monkeypatch.setenv('SETTLE_MIN', '0')
+        monkeypatch.setenv('SETTLE_NAV_MIN', '0')
+
+        polls = []
+        monkeypatch.setattr('agent.vlm_executor.ss.capture_thumbnail',
+                            lambda wid: polls.append(wid) or _gray(10))
+        click = {'state': 'account', 'action': 'click',
+                 'target_description': 'Cancel button', 'click_point': [200, 225]}
+        done = {'state': 'confirmation', 'action': 'done', 'billing_end_date': None}
+        vlm = self._vlm([{'page_type': 'signed_in'}, click, done])
+
+        executor = VLMExecutor(vlm, settle_delay=99, settle_mode='adaptive')
+        result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+
+        assert result.success
+        assert polls and set(polls) == {42}
+        labels = [e['label'] for e in executor._settle_log]
+        assert 'click' in labels
+        assert all(e['stable'] for e in executor._settle_log)
+
+    def test_fixed_mode_never_polls(self, monkeypatch):
+        from agent.vlm_executor import VLMExecutor
+
+        monkeypatch.setattr('agent.vlm_executor.ss.capture_thumbnail',
+                            MagicMock(side_effect=AssertionError('no polling')))
+        click = {'state': 'account', 'action': 'click',
+                 'target_description': 'Cancel button', 'click_point': [200, 225]}
+        done = {'state': 'confirmation', 'action': 'done', 'billing_end_date': None}
+        vlm = self._vlm([{'page_type': 'signed_in'}, click, done])
+
+        executor = VLMExecutor(vlm, settle_delay=2.5, settle_mode='fixed')
+        result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+
+        assert result.success
+        assert [e['settle_ms'] for e in executor._settle_log] == [2500]
@@ -0,0 +1,139 @@
+"""Tests for offline trace replay (agent.trace_replay)."""
+
+from __future__ import annotations
+
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from agent.recording.vlm_client import VLMClient
+from agent.trace_replay import (
+    FakeVLMServer,
+    _to_model_space,
+    agrees,
+    load_steps,
+    replay,
+    summarize,
+)
+from agent.trace_store import TraceStore
+
+
+def _page(seed: int, size=(1600, 1000), fmt='PNG') -> bytes:
+    """A page with a distinctive layout so each seed has its own dhash."""
+    img = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(img)
+    for i in range(6):
+        x = (seed * 97 + i * 211) % (size[0] - 200)
+        y = (seed * 53 + i * 149) % (size[1] - 100)
+        draw.rectangle([x, y, x + 180, y + 80], fill=(seed * 40 % 255, 20 * i, 90))
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+_SENT_SCALE = 1600 / 800  # full page 1600px wide, sent at 800px
+
+
+def _sent(seed: int) -> bytes:
+    img = Image.open(io.BytesIO(_page(seed))).resize((800, 500))
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=85)
+    return buf.getvalue()
+
+
+_RESPONSES = [
+    ('sign-in', {'page_type': 'user_pass', 'email_point': [400, 120],
+                 'password_point': [400, 180], 'button_point': [400, 240]}),
+    ('cancel', {'state': 'account', 'action': 'click', 'click_point': [300, 200]}),
+    ('cancel', {'state': 'done', 'action': 'done'}),
+]
+
+
+@pytest.fixture
+def trace(tmp_path):
+    store = TraceStore(tmp_path)
+    steps = []
+    for i, (phase, response) in enumerate(_RESPONSES):
+        meta = {'step': i, 'phase': phase, 'timestamp': 1000.0 + i,
+                'vlm_response': response,
+                'diagnostics': {'inference_source': 'vlm',
+                                'vlm_scale_factor': _SENT_SCALE}}
+        files = {'png': _page(i), 'sent': _sent(i), 'prompt': f'{phase} prompt'.encode()}
+        steps.append((meta, files))
+    # A cache hit is not replayable
+    steps.append(({'step': 3, 'phase': 'cancel', 'vlm_response': {'action': 'wait'},
+                   'diagnostics': {'inference_source': 'cache'}},
+                  {'png': _page(3), 'prompt': b'x'}))
+    store.write_steps('job-1', steps, {'service': 'netflix'})
+    store.close()
+    return store.archive_path('job-1')
+
+
+class TestLoadSteps:
+    def test_sent_and_full_images(self, trace):
+        sent = load_steps(trace)
+        assert [s.phase for s in sent] == ['sign-in', 'cancel', 'cancel']
+        assert sent[0].service == 'netflix'
+        assert sent[0].prompt == 'sign-in prompt'
+        assert sent[0].image[:2] == b'\xff\xd8'
+        assert sent[0].image_scale == _SENT_SCALE
+
+        full = load_steps(trace, phase_filter='cancel', image='full')
+        assert len(full) == 2
+        assert full[0].image[:4] == b'\x89PNG' and full[0].image_scale == 1.0
+
+
+class TestAgreement:
+    def test_click_within_tolerance(self):
+        ref = {'action': 'click', 'click_point': [100, 100]}
+        assert agrees('cancel', ref, 2.0, {'action': 'click', 'click_point': [205, 200]},
+                      1.0, 24)
+        assert not agrees('cancel', ref, 2.0, {'action': 'click', 'click_point': [300, 200]},
+                          1.0, 24)
+        assert not agrees('cancel', ref, 2.0, {'action': 'wait'}, 1.0, 24)
+
+    def test_to_model_space_normalizes_and_swaps(self):
+        out = _to_model_space({'click_point': [100, 50], 'bbox': [0, 0, 200, 100],
+                               'label': 'x'}, 1.0, 1.0, (200, 100), True)
+        assert out == {'click_point': [500.0, 500.0], 'bbox': [0.0, 0.0, 1000.0, 1000.0],
+                       'label': 'x'}
+
+
+class TestReplayAgainstFake:
+    @pytest.mark.parametrize('image,max_width', [('sent', 800), ('full', 640)])
+    def test_fake_reproduces_recorded_answers(self, trace, image, max_width):
+        steps = load_steps(trace, image=image)
+        with FakeVLMServer(steps) as fake:
+            with VLMClient(base_url=fake.url, api_key='k', model='m', stream=False,
+                           max_image_width=max_width, coord_normalize=False,
+                           coord_yx=False, image_budgets='') as vlm:
+                rows, wall_s = replay(vlm, steps, concurrency=3)
+        summary = summarize(rows, wall_s)
+        assert summary['agreement'] == 1.0
+        assert summary['parse_failures'] == 0 and summary['errors'] == 0
+        assert summary['p95_ms'] >= summary['p50_ms'] > 0
+        assert summary['prompt_tokens'] > 0
+        assert set(summary['phases']) == {'sign-in', 'cancel'}
+        assert fake.requests == 3
+
+    def test_normalized_client_round_trips(self, trace):
+        steps = load_steps(trace)
+        with FakeVLMServer(steps, coord_normalize=True, coord_yx=True) as fake:
+            with VLMClient(base_url=fake.url, api_key='k', model='m', stream=False,
+                           max_image_width=800, coord_normalize=True, coord_yx=True,
+                           coord_square_pad=False, image_budgets='') as vlm:
+                rows, _ = replay(vlm, steps)
+        assert all(r['ok'] for r in rows)
+
+    def test_unknown_page_is_a_parse_failure(self, trace):
+        steps = load_steps(trace)
+        with FakeVLMServer(steps[:1]) as fake:
+            with VLMClient(base_url=fake.url, api_key='k', model='m', stream=False,
+                           max_image_width=800, coord_normalize=False,
+                           coord_yx=False, image_budgets='') as vlm:
+                rows, _ = replay(vlm, steps)
+        summary = summarize(rows)
+        assert summary['parse_failures'] == 2
+        assert summary['agreement'] == pytest.approx(1 / 3)
+        assert summary['phases']['sign-in']['agreement'] == 1.0
@@ -0,0 +1,118 @@
+"""Tests for the debug trace archive store (agent.trace_store)."""
+
+from __future__ import annotations
+
+import json
+import time
+import zipfile
+
+import pytest
+
+from agent.trace_store import TraceStore, open_trace, trace_paths
+
+
+def _step(step: int, phase: str = 'cancel', source: str = 'vlm', ms: float = 100.0,
+          ts: float | None = None) -> dict:
+    return {
+        'step': step,
+        'phase': phase,
+        'timestamp': ts if ts is not None else time.time(),
+        'vlm_response': {'action': 'click', 'click_point': [1, 2]},
+        'diagnostics': {'inference_source': source, 'vlm_response_ms': ms},
+    }
+
+
+@pytest.fixture
+def store(tmp_path) -> TraceStore:
+    store = TraceStore(tmp_path)
+    yield store
+    store.close()
+
+
+class TestWriteSteps:
+    def test_identical_files_are_stored_once(self, store):
+        steps = [
+            (_step(0), {'png': b'frame-a', 'prompt': b'prompt'}),
+            (_step(1), {'png': b'frame-a', 'prompt': b'prompt'}),
+            (_step(2), {'png': b'frame-b', 'prompt': b'prompt'}),
+        ]
+        store.write_steps('job-1', steps, {'service': 'netflix', 'action': 'cancel'})
+
+        with zipfile.ZipFile(store.archive_path('job-1')) as archive:
+            blobs = [n for n in archive.namelist() if n.startswith('blobs/')]
+        assert len(blobs) == 3
+        job = store.jobs()[0]
+        assert (job['steps'], job['blobs'], job['deduped']) == (3, 3, 3)
+
+    def test_appends_dedupe_against_earlier_writes(self, store):
+        store.write_steps('job-1', [(_step(0), {'prompt': b'p'})])
+        store.write_steps('job-1', [(_step(1), {'prompt': b'p'})])
+        job = store.jobs()[0]
+        assert (job['steps'], job['blobs'], job['deduped']) == (2, 1, 1)
+
+    def test_index_records_outcome_and_timings(self, store):
+        store.write_steps('job-1', [
+            (_step(0, phase='sign-in', ms=300.0), {}),
+            (_step(1, source='cache', ms=5.0), {}),
+        ], {'service': 'hulu', 'action': 'resume'})
+        store.finish_job('job-1', 'failed', 'Needs human intervention')
+
+        job = store.jobs(outcome='failed', service='hulu')[0]
+        assert job['action'] == 'resume'
+        assert job['error'] == 'Needs human intervention'
+        assert job['vlm_ms'] == 300.0
+        assert job['bytes'] == store.archive_path('job-1').stat().st_size
+        assert [s['phase'] for s in store.steps('job-1')] == ['sign-in', 'cancel']
+        assert store.jobs(outcome='success') == []
+
+
+class TestEvict:
+    def test_oldest_jobs_go_first_when_over_budget(self, store):
+        for i in range(3):
+            store.write_steps(f'job-{i}', [(_step(0, ts=1000.0 + i), {'png': bytes(2000)})])
+        store.max_bytes = store.stats()['bytes'] - 1
+        store.max_age_days = 10 ** 6
+
+        assert store.evict() == 1
+        assert not store.archive_path('job-0').exists()
+        assert [j['job_id'] for j in store.jobs()] == ['job-2', 'job-1']
+
+    def test_expired_jobs_are_evicted(self, store):
+        store.write_steps('old', [(_step(0, ts=time.time() - 30 * 86400), {})])
+        store.write_steps('new', [(_step(0), {})])
+        assert store.evict() == 1
+        assert [j['job_id'] for j in store.jobs()] == ['new']
+
+
+class TestReader:
+    def test_reads_archive_by_legacy_names(self, store):
+        store.write_steps('job-1', [
+            (_step(0), {'png': b'png', 'sent': b'jpg', 'prompt': b'txt'}),
+        ], {'service': 'netflix'})
+        with open_trace(store.archive_path('job-1')) as trace:
+            assert trace.name == 'job-1'
+            assert trace.metadata() == {'service': 'netflix'}
+            assert trace.step_names() == ['step_000.json']
+            assert json.loads(trace.read('step_000.json'))['phase'] == 'cancel'
+            assert trace.read('step_000.png') == b'png'
+            assert trace.read('step_000_sent.jpg') == b'jpg'
+            assert trace.read('step_000_prompt.txt') == b'txt'
+            assert trace.read('step_000_overlay.png') is None
+            assert trace.read('step_001.json') is None
+
+    def test_reads_legacy_folder(self, tmp_path):
+        folder = tmp_path / 'job-old'
+        folder.mkdir()
+        (folder / 'step_000.json').write_text(json.dumps(
+            {'step': 0, 'job_metadata': {'service': 'max'}}))
+        (folder / 'step_000.png').write_bytes(b'png')
+        with open_trace(folder) as trace:
+            assert trace.metadata() == {'service': 'max'}
+            assert trace.read('step_000.png') == b'png'
+
+    def test_trace_paths_finds_archives_and_folders(self, store, tmp_path):
+        store.write_steps('job-1', [(_step(0), {})])
+        folder = tmp_path / 'job-old'
+        folder.mkdir()
+        (folder / 'step_000.json').write_text('{}')
+        assert trace_paths([str(tmp_path)]) == [store.archive_path('job-1'), folder]
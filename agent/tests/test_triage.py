@@ -0,0 +1,62 @@
+"""Tests for two-tier triage rules and prompts."""
+
+from __future__ import annotations
+
+from agent.recording.schemas import PHASE_MAX_TOKENS, PHASE_SCHEMAS
+from agent.recording.triage import (
+    TRIAGE_PHASES,
+    build_triage_prompt,
+    get_triage_config,
+    resolve,
+    triage_ready,
+)
+
+
+class TestResolve:
+    def test_signin_passive_pages(self):
+        assert resolve('sign-in', {'page_type': 'spinner'}, False) == {'page_type': 'spinner'}
+        assert resolve('sign-in', {'page_type': 'signed_in'}, False) == {'page_type': 'signed_in'}
+
+    def test_signin_interact_escalates(self):
+        assert resolve('sign-in', {'page_type': 'interact'}, False) is None
+        assert resolve('sign-in', {}, False) is None
+
+    def test_action_wait(self):
+        got = resolve('cancel', {'action': 'wait', 'completed': False, 'state': 'loading'}, False)
+        assert got == {'state': 'loading', 'action': 'wait', 'completed': False,
+                       'billing_end_date': None}
+
+    def test_completed_needs_known_billing_date(self):
+        triage = {'action': 'done', 'completed': True, 'state': 'cancelled'}
+        assert resolve('cancel', triage, billing_known=False) is None
+        assert resolve('cancel', triage, billing_known=True)['action'] == 'done'
+
+    def test_completed_flag_overrides_wait(self):
+        triage = {'action': 'wait', 'completed': True, 'state': 'cancelled'}
+        assert resolve('resume', triage, billing_known=False) is None
+
+    def test_interact_escalates(self):
+        assert resolve('cancel', {'action': 'interact', 'completed': False}, True) is None
+
+
+class TestTriageSetup:
+    def test_every_triage_phase_has_schema_and_budget(self):
+        for phase in TRIAGE_PHASES.values():
+            assert phase in PHASE_SCHEMAS
+            assert PHASE_MAX_TOKENS[phase] <= 64
+
+    def test_prompts(self):
+        assert 'netflix' in build_triage_prompt('sign-in', 'netflix')
+        assert 'cancelled' in build_triage_prompt('cancel', 'hulu')
+        assert 'resumed' in build_triage_prompt('resume', 'hulu')
+
+    def test_ready(self):
+        assert triage_ready({'page_type': 'spinner'})
+        assert not triage_ready({'action': 'wait'})
+        assert triage_ready({'action': 'wait', 'completed': False})
+
+    def test_config(self, monkeypatch):
+        monkeypatch.setenv('VLM_TWO_TIER', 'true')
+        assert get_triage_config()['enabled'] is True
+        monkeypatch.delenv('VLM_TWO_TIER')
+        assert get_triage_config()['enabled'] is False
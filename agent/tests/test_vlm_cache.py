@@ -0,0 +1,205 @@
+"""Tests for the persistent cross-job VLM response cache."""
+
+from __future__ import annotations
+
+import io
+import random
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image, ImageDraw
+
+from agent.screenshot import Frame
+from agent.vlm_cache import ResponseCache, context_key, get_vlm_cache_config
+
+
+CTX = context_key('sign in prompt', 'model|w960|norm', (1280, 812))
+LOGIN = {'page_type': 'user_pass', 'email_point': [100, 200]}
+
+
+def _flip(phash: int, bits: int) -> int:
+    """phash with its lowest `bits` bits flipped."""
+    return phash ^ ((1 << bits) - 1)
+
+
+# ---------------------------------------------------------------------------
+# get / put
+# ---------------------------------------------------------------------------
+
+class TestResponseCache:
+    def test_miss_then_hit(self):
+        cache = ResponseCache()
+        assert cache.get(CTX, 0xABC) is None
+        assert cache.put(CTX, 0xABC, 'netflix', 'sign-in', LOGIN, 2.0)
+        assert cache.get(CTX, 0xABC) == (LOGIN, 2.0)
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+        assert stats['hit_rate'] == 0.5
+
+    def test_near_hash_within_distance_hits(self):
+        cache = ResponseCache(max_distance=3)
+        cache.put(CTX, 0xFF00, 'netflix', 'sign-in', LOGIN, 1.0)
+        assert cache.get(CTX, _flip(0xFF00, 3)) == (LOGIN, 1.0)
+        assert cache.get(CTX, _flip(0xFF00, 4)) is None
+
+    def test_context_separates_entries(self):
+        cache = ResponseCache()
+        cache.put(CTX, 1, 'netflix', 'sign-in', LOGIN, 1.0)
+        other_model = context_key('sign in prompt', 'other|w960|norm', (1280, 812))
+        other_prompt = context_key('cancel prompt', 'model|w960|norm', (1280, 812))
+        other_size = context_key('sign in prompt', 'model|w960|norm', (1280, 900))
+        for ctx in (other_model, other_prompt, other_size):
+            assert cache.get(ctx, 1) is None
+
+    def test_put_replaces_near_duplicate(self):
+        cache = ResponseCache()
+        cache.put(CTX, 1, 'netflix', 'sign-in', LOGIN, 1.0)
+        cache.put(CTX, 1, 'netflix', 'sign-in', {'page_type': 'spinner'}, 1.0)
+        assert cache.stats()['entries'] == 1
+        assert cache.get(CTX, 1)[0] == {'page_type': 'spinner'}
+
+    def test_discard(self):
+        cache = ResponseCache()
+        cache.put(CTX, 1, 'netflix', 'sign-in', LOGIN, 1.0)
+        cache.discard(CTX, 1)
+        assert cache.get(CTX, 1) is None
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / 'sub' / 'cache.db')
+        cache = ResponseCache(path)
+        cache.put(CTX, 7, 'netflix', 'sign-in', LOGIN, 1.5)
+        cache.close()
+        assert ResponseCache(path).get(CTX, 7) == (LOGIN, 1.5)
+
+
+class TestNeverCachesCredentials:
+    def test_text_to_type_not_cached(self):
+        cache = ResponseCache()
+        response = {'action': 'type_text', 'text_to_type': 'jane@example.com'}
+        assert not cache.put(CTX, 1, 'netflix', 'cancel', response, 1.0)
+        assert cache.get(CTX, 1) is None
+        assert cache.stats()['skipped'] == 1
+
+    def test_billing_date_not_cached(self):
+        cache = ResponseCache()
+        response = {'action': 'done', 'billing_end_date': '2026-11-01'}
+        assert not cache.put(CTX, 1, 'netflix', 'cancel', response, 1.0)
+
+    def test_response_echoing_secret_not_cached(self):
+        cache = ResponseCache()
+        response = {'state': 'signed in as jane@example.com', 'action': 'click'}
+        assert not cache.put(CTX, 1, 'netflix', 'cancel', response, 1.0,
+                             secrets=('jane@example.com', 'hunter2'))
+        assert cache.put(CTX, 1, 'netflix', 'cancel', {'action': 'click'}, 1.0,
+                         secrets=('jane@example.com',))
+
+
+class TestEviction:
+    def test_lru_by_entries(self):
+        cache = ResponseCache(max_entries=2, max_distance=0)
+        cache.put(CTX, 1, 'netflix', 'sign-in', LOGIN, 1.0)
+        cache.put(CTX, 2, 'netflix', 'sign-in', LOGIN, 1.0)
+        cache.get(CTX, 1)  # 1 is now more recent than 2
+        cache.put(CTX, 4, 'netflix', 'sign-in', LOGIN, 1.0)
+        assert cache.get(CTX, 2) is None
+        assert cache.get(CTX, 1) is not None
+        assert cache.get(CTX, 4) is not None
+        assert cache.stats()['evictions'] == 1
+
+    def test_bytes_cap(self):
+        cache = ResponseCache(max_bytes=100, max_distance=0)
+        big = {'state': 'x' * 60, 'action': 'wait'}
+        cache.put(CTX, 1, 'netflix', 'cancel', big, 1.0)
+        cache.put(CTX, 2, 'netflix', 'cancel', big, 1.0)
+        stats = cache.stats()
+        assert stats['entries'] == 1
+        assert stats['bytes'] <= 100
+
+
+class TestScopeAndConfig:
+    def test_default_scope_is_everything(self):
+        assert ResponseCache().enabled_for('hulu', 'cancel')
+
+    def test_scope_pairs_and_wildcards(self):
+        cache = ResponseCache(scope='netflix:sign-in, *:cancel')
+        assert cache.enabled_for('netflix', 'sign-in')
+        assert cache.enabled_for('hulu', 'cancel')
+        assert not cache.enabled_for('hulu', 'sign-in')
+        assert not cache.enabled_for('netflix', 'resume')
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv('VLM_CACHE', raising=False)
+        assert not get_vlm_cache_config()['enabled']
+        assert ResponseCache.from_env() is None
+
+    def test_from_env(self, monkeypatch, tmp_path):
+        monkeypatch.setenv('VLM_CACHE', 'true')
+        monkeypatch.setenv('VLM_CACHE_PATH', str(tmp_path / 'c.db'))
+        monkeypatch.setenv('VLM_CACHE_DISTANCE', '6')
+        cache = ResponseCache.from_env()
+        assert cache is not None and cache.max_distance == 6
+
+
+# ---------------------------------------------------------------------------
+# VLMExecutor integration
+# ---------------------------------------------------------------------------
+
+def _page_frame(seed: int) -> Frame:
+    rng = random.Random(seed)
+    img = Image.new('RGB', (640, 400), (250, 250, 250))
+    draw = ImageDraw.Draw(img)
+    for _ in range(25):
+        x, y = rng.randint(0, 580), rng.randint(0, 370)
+        draw.rectangle([x, y, x + rng.randint(20, 200), y + rng.randint(10, 80)],
+                       fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return Frame(buf.getvalue())
+
+
+class TestExecutorCache:
+    @pytest.fixture(autouse=True)
+    def _mock_system(self, mock_vlm_system):
+        pass
+
+    def _run(self, monkeypatch, cache, responses):
+        from agent.vlm_executor import VLMExecutor
+
+        frames = iter([_page_frame(1), _page_frame(2), _page_frame(3)])
+        monkeypatch.setattr('agent.vlm_executor.ss.capture_frame',
+                            lambda wid: next(frames))
+        vlm = MagicMock()
+        vlm.cache_identity = 'model|w960|norm'
+        vlm.analyze = MagicMock(side_effect=[(r, 1.0) for r in responses])
+        executor = VLMExecutor(vlm, settle_delay=0, response_cache=cache)
+        result = executor.run('netflix', 'cancel',
+                              {'email': 'jane@example.com', 'pass': 'hunter2'})
+        return result, vlm
+
+    def test_second_job_served_from_cache(self, monkeypatch):
+        cache = ResponseCache()
+        click = {'state': 'account', 'action': 'click',
+                 'target_description': 'Cancel button', 'click_point': [200, 225]}
+        done = {'state': 'confirmation', 'action': 'done',
+                'billing_end_date': '2026-11-01'}
+
+        first, vlm1 = self._run(monkeypatch, cache,
+                                [{'page_type': 'signed_in'}, click, done])
+        assert first.success
+        assert vlm1.analyze.call_count == 3
+        assert cache.stats()['entries'] == 2  # done carries a billing date
+
+        second, vlm2 = self._run(monkeypatch, cache, [done])
+        assert second.success
+        assert second.billing_date == '2026-11-01'
+        assert vlm2.analyze.call_count == 1
+        assert second.inferences_cached == 2
+        assert second.inference_count == 1
+
+    def test_out_of_scope_phase_not_cached(self, monkeypatch):
+        cache = ResponseCache(scope='*:sign-in')
+        click = {'state': 'account', 'action': 'click',
+                 'target_description': 'Cancel button', 'click_point': [200, 225]}
+        done = {'state': 'confirmation', 'action': 'done', 'billing_end_date': None}
+        self._run(monkeypatch, cache, [{'page_type': 'signed_in'}, click, done])
+        assert cache.stats()['entries'] == 1
@@ -3,19 +3,22 @@
 from __future__ import annotations
 
 import asyncio
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from agent.playbook import ExecutionResult
+from agent.screenshot import Frame
 from agent.vlm_executor import (
     VLMExecutor,
     _StuckDetector,
+    _action_ready,
     _bbox_to_screen,
     _infer_credential_from_target,
     _next_month_date,
     _resolve_credential,
     _restore_cursor,
+    _signin_ready,
 )
 
 # ---------------------------------------------------------------------------
@@ -201,6 +204,29 @@ class TestStuckDetector:
 # _infer_credential_from_target tests
 # ---------------------------------------------------------------------------
 
+class TestStepTimer:
+    def test_nested_phases_are_exclusive(self, monkeypatch):
+        from agent.vlm_executor import _StepTimer
+        now = [100.0]
+        monkeypatch.setattr('agent.vlm_executor.time.monotonic', lambda: now[0])
+
+        timer = _StepTimer(3)
+        with timer.phase('action'):
+            now[0] += 0.5
+            with timer.phase('settle'):
+                now[0] += 2.0
+            now[0] += 0.25
+        with timer.phase('settle'):
+            now[0] += 1.0
+        record = timer.finish()
+
+        assert record['iteration'] == 3
+        assert record['action_ms'] == 750
+        assert record['settle_ms'] == 3000
+        assert record['total_ms'] == 3750
+        assert record['gui_wait_ms'] == 0
+
+
 class TestInferCredentialFromTarget:
     def test_email_input_field(self):
         assert _infer_credential_from_target('email input field') == 'the email address'
@@ -218,6 +244,38 @@ class TestInferCredentialFromTarget:
         assert _infer_credential_from_target('CVV input field') == 'the cvv'
 
 
+# ---------------------------------------------------------------------------
+# Streaming readiness predicates
+# ---------------------------------------------------------------------------
+
+class TestStreamReadiness:
+    def test_signin_terminal_page_ready_on_page_type(self):
+        assert _signin_ready({'page_type': 'spinner'})
+        assert _signin_ready({'page_type': 'signed_in'})
+        assert not _signin_ready({})
+
+    def test_signin_credential_page_waits_for_points(self):
+        fields = {'page_type': 'user_pass', 'email_point': [1, 2]}
+        assert not _signin_ready(fields)
+        fields.update(password_point=None, button_point=[3, 4])
+        assert _signin_ready(fields)
+
+    def test_signin_code_and_unknown_pages(self):
+        assert not _signin_ready({'page_type': 'verification_code', 'code_point': [1, 2]})
+        assert _signin_ready({'page_type': 'verification_code',
+                              'code_point': [1, 2], 'button_point': None})
+        assert _signin_ready({'page_type': 'unknown', 'actions': []})
+
+    def test_action_ready_needs_base_and_action_fields(self):
+        base = {'state': 's', 'action': 'click', 'completed': False,
+                'billing_end_date': None}
+        assert not _action_ready(base)
+        assert _action_ready({**base, 'click_point': [1, 2],
+                              'target_description': 'Cancel'})
+        assert _action_ready({**base, 'action': 'wait'})
+        assert not _action_ready({'state': 's', 'action': 'wait'})
+
+
 # ---------------------------------------------------------------------------
 # VLMExecutor.run() tests
 # ---------------------------------------------------------------------------
@@ -289,8 +347,8 @@ class TestVLMExecutorRun:
         def varying_screenshot(wid):
             nonlocal call_count
             call_count += 1
-            return f'screenshot_{call_count}'
-        monkeypatch.setattr('agent.vlm_executor.ss.capture_to_base64', varying_screenshot)
+            return Frame(f'screenshot_{call_count}'.encode())
+        monkeypatch.setattr('agent.vlm_executor.ss.capture_frame', varying_screenshot)
 
         # VLM keeps saying "click" on different targets to avoid stuck
         click_responses = []
@@ -686,6 +744,263 @@ class TestOTPCallback:
             loop.close()
 
 
+# ---------------------------------------------------------------------------
+# Async execution (run_async on the server's loop)
+# ---------------------------------------------------------------------------
+
+class TestRunAsync:
+    def test_otp_callback_on_same_loop(self):
+        """run_async awaits a callback living on its own loop directly."""
+        calls = []
+
+        async def otp_callback(job_id, service):
+            calls.append(job_id)
+            await asyncio.sleep(0)
+            return '123456'
+
+        async def main():
+            executor = VLMExecutor(
+                _make_vlm([EMAIL_CODE_PAGE, SIGNED_IN, CANCEL_DONE]),
+                settle_delay=0, otp_callback=otp_callback,
+                loop=asyncio.get_running_loop(),
+            )
+            return await executor.run_async(
+                'netflix', 'cancel', {'email': 'a', 'pass': 'b'}, job_id='job-otp')
+
+        result = asyncio.run(main())
+        assert result.success
+        assert result.otp_required
+        assert calls == ['job-otp']
+
+    def test_parked_jobs_hold_no_threads(self):
+        """Jobs waiting on OTPs don't occupy worker threads.
+
+        With a single-thread default executor, every job still reaches its
+        OTP wait before any code is delivered.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        n_jobs = 4
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+            codes: dict[str, asyncio.Future] = {}
+            all_parked = asyncio.Event()
+
+            async def otp_callback(job_id, service):
+                codes[job_id] = loop.create_future()
+                if len(codes) == n_jobs:
+                    all_parked.set()
+                return await codes[job_id]
+
+            executors = [
+                VLMExecutor(_make_vlm([EMAIL_CODE_PAGE, SIGNED_IN, CANCEL_DONE]),
+                            settle_delay=0, otp_callback=otp_callback, loop=loop)
+                for _ in range(n_jobs)
+            ]
+            tasks = [
+                asyncio.create_task(ex.run_async(
+                    'netflix', 'cancel', {'email': 'a', 'pass': 'b'}, job_id=f'job-{i}'))
+                for i, ex in enumerate(executors)
+            ]
+            await asyncio.wait_for(all_parked.wait(), timeout=10)
+            for future in codes.values():
+                future.set_result('123456')
+            return await asyncio.gather(*tasks)
+
+        results = asyncio.run(main())
+        assert all(r.success for r in results)
+
+    def test_cancel_closes_chrome(self, monkeypatch):
+        """Cancelling the task mid-OTP-wait still closes the session."""
+        closed = []
+        monkeypatch.setattr('agent.vlm_executor.browser.close_session',
+                            lambda s: closed.append(s.pid))
+
+        async def main():
+            parked = asyncio.Event()
+
+            async def otp_callback(job_id, service):
+                parked.set()
+                await asyncio.Event().wait()
+
+            executor = VLMExecutor(_make_vlm([EMAIL_CODE_PAGE]), settle_delay=0,
+                                   otp_callback=otp_callback)
+            task = asyncio.create_task(executor.run_async(
+                'netflix', 'cancel', {'email': 'a', 'pass': 'b'}, job_id='job-abort'))
+            await asyncio.wait_for(parked.wait(), timeout=10)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        assert closed == [12345]
+
+
+# ---------------------------------------------------------------------------
+# Abort via CancelToken: time from cancel() to a returned result
+# ---------------------------------------------------------------------------
+
+class TestAbort:
+    """Each test aborts a job parked somewhere slow and checks it returns
+    within ABORT_BUDGET seconds, with Chrome closed."""
+
+    ABORT_BUDGET = 1.0
+
+    @pytest.fixture(autouse=True)
+    def _track_close(self, monkeypatch):
+        self.closed = []
+        monkeypatch.setattr('agent.vlm_executor.browser.close_session',
+                            lambda s: self.closed.append(s.pid))
+
+    def _abort_after(self, executor, started, token, **run_kw):
+        """Run the job, cancel once started() is true; (result, abort latency)."""
+        async def main():
+            task = asyncio.create_task(executor.run_async(
+                'netflix', 'cancel', {'email': 'a', 'pass': 'b'},
+                job_id='job-abort', cancel=token, **run_kw))
+            deadline = _time.monotonic() + 5
+            while not started() and _time.monotonic() < deadline:
+                await asyncio.tasks.sleep(0.01)
+            assert started(), 'job never reached the parked state'
+            t0 = _time.monotonic()
+            token.cancel()
+            result = await task
+            return result, _time.monotonic() - t0
+
+        return asyncio.run(main())
+
+    def _assert_aborted(self, result, latency):
+        assert not result.success
+        assert result.error_message == 'Job aborted'
+        assert latency < self.ABORT_BUDGET
+        assert self.closed == [12345]
+
+    def test_abort_during_vlm_call(self):
+        from agent.cancel import CancelToken
+
+        token = CancelToken()
+        in_call = threading.Event()
+        seen = {}
+
+        def slow_analyze(page, prompt, **kwargs):
+            seen['cancel'] = kwargs.get('cancel')
+            in_call.set()
+            # Stands in for a long generation; a real client closes the
+            # stream when the token fires.
+            kwargs['cancel']._event.wait(10)
+            kwargs['cancel'].raise_if_cancelled()
+
+        vlm = MagicMock()
+        vlm.analyze = MagicMock(side_effect=slow_analyze)
+        executor = VLMExecutor(vlm, settle_delay=0)
+        result, latency = self._abort_after(executor, in_call.is_set, token)
+
+        self._assert_aborted(result, latency)
+        assert seen['cancel'] is token
+        assert result.inference_count == 0
+
+    def test_abort_during_settle(self, monkeypatch):
+        from agent.cancel import CancelToken
+
+        # Real sleeps for this one: a 30 s settle must be cut short.
+        monkeypatch.setattr('asyncio.sleep', asyncio.tasks.sleep)
+        token = CancelToken()
+        vlm = _make_vlm([SIGNED_IN, CANCEL_CLICK, CANCEL_DONE])
+        executor = VLMExecutor(vlm, settle_delay=30)
+        monkeypatch.setattr(executor, '_navigate', AsyncMock())
+        result, latency = self._abort_after(
+            executor, lambda: vlm.analyze.call_count >= 2, token)
+
+        self._assert_aborted(result, latency)
+        assert vlm.analyze.call_count == 2
+
+    def test_abort_during_otp_wait(self):
+        from agent.cancel import CancelToken
+
+        token = CancelToken()
+        parked = threading.Event()
+
+        async def otp_callback(job_id, service):
+            parked.set()
+            await asyncio.Event().wait()
+
+        executor = VLMExecutor(_make_vlm([EMAIL_CODE_PAGE]), settle_delay=0,
+                               otp_callback=otp_callback)
+        result, latency = self._abort_after(executor, parked.is_set, token)
+
+        self._assert_aborted(result, latency)
+        assert result.otp_required
+
+    def test_cancelled_before_start(self):
+        from agent.cancel import CancelToken
+
+        token = CancelToken()
+        token.cancel()
+        vlm = _make_vlm([SIGNED_IN, CANCEL_DONE])
+        result = VLMExecutor(vlm, settle_delay=0).run(
+            'netflix', 'cancel', {'email': 'a', 'pass': 'b'}, cancel=token)
+
+        assert result.error_message == 'Job aborted'
+        vlm.analyze.assert_not_called()
+        assert self.closed == [12345]
+
+    def test_task_cancelled_during_launch_closes_chrome(self, monkeypatch):
+        """Shutdown/abort cancels the task while Chrome is still starting."""
+        launching, launched = threading.Event(), threading.Event()
+
+        def slow_create_session():
+            launching.set()
+            launched.wait(5)
+            return _make_session()
+
+        monkeypatch.setattr('agent.vlm_executor.browser.create_session', slow_create_session)
+        executor = VLMExecutor(_make_vlm([SIGNED_IN, CANCEL_DONE]), settle_delay=0)
+
+        async def main():
+            task = asyncio.create_task(executor.run_async(
+                'netflix', 'cancel', {'email': 'a', 'pass': 'b'}, job_id='job-abort'))
+            await asyncio.to_thread(launching.wait, 5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert self.closed == []
+            launched.set()
+            deadline = _time.monotonic() + 5
+            while not self.closed and _time.monotonic() < deadline:
+                await asyncio.tasks.sleep(0.01)
+
+        asyncio.run(main())
+        assert self.closed == [12345]
+
+    def test_abort_sync_run_from_another_thread(self):
+        """CLI case: run() blocks one thread, cancel() comes from another."""
+        from agent.cancel import CancelToken
+
+        token = CancelToken()
+        in_call = threading.Event()
+
+        def slow_analyze(page, prompt, **kwargs):
+            in_call.set()
+            kwargs['cancel']._event.wait(10)
+            kwargs['cancel'].raise_if_cancelled()
+
+        vlm = MagicMock()
+        vlm.analyze = MagicMock(side_effect=slow_analyze)
+        executor = VLMExecutor(vlm, settle_delay=0)
+        out = {}
+        runner = threading.Thread(target=lambda: out.setdefault('result', executor.run(
+            'netflix', 'cancel', {'email': 'a', 'pass': 'b'}, cancel=token)))
+        runner.start()
+        assert in_call.wait(5)
+        t0 = _time.monotonic()
+        token.cancel()
+        runner.join(5)
+
+        self._assert_aborted(out['result'], _time.monotonic() - t0)
+
+
 # ---------------------------------------------------------------------------
 # Auto-type after click tests
 # ---------------------------------------------------------------------------
@@ -1139,6 +1454,31 @@ class TestExecutionResultStructure:
         assert result.duration_seconds >= 0
         assert result.inference_count == 2
 
+    def test_step_results_record_timings(self):
+        vlm = _make_vlm([SIGNED_IN, CANCEL_CLICK, CANCEL_DONE])
+        vlm.last_timings = {'encode_ms': 4.2, 'network_ms': 100, 'parse_ms': 0.3}
+        vlm.last_usage = {'prompt_tokens': 900, 'cached_tokens': 800,
+                          'completion_tokens': 20, 'prompt_ms': 40.0, 'gen_ms': 50.0}
+        executor = VLMExecutor(vlm, settle_delay=0)
+        result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+
+        setup, *steps = result.step_results
+        assert setup['iteration'] is None and setup['phase'] == 'setup'
+        assert 'launch_ms' in setup and 'action_ms' in setup
+        assert [s['iteration'] for s in steps] == [0, 1, 2]
+        assert [s['phase'] for s in steps] == ['sign-in', 'cancel', 'cancel']
+        assert steps[2]['action'] == 'click'
+        for step in steps:
+            assert step['source'] == 'vlm'
+            assert step['server_ms'] == 90
+            assert step['prompt_tokens'] == 900
+            assert step['encode_ms'] == 4
+            for key in ('capture_ms', 'crop_ms', 'vlm_ms', 'gui_wait_ms', 'total_ms'):
+                assert step[key] >= 0
+        totals = result.step_timings()
+        assert totals['steps'] == 4
+        assert totals['prompt_tokens'] == 2700
+
     def test_custom_job_id(self):
         vlm = _make_vlm([SIGNED_IN, CANCEL_DONE])
         executor = VLMExecutor(vlm, settle_delay=0)
@@ -1536,3 +1876,88 @@ class TestNextMonthDate:
     def test_first_of_month(self):
         from datetime import date as d
         assert _next_month_date(d(2026, 6, 1)) == d(2026, 7, 1)
+
+
+# ---------------------------------------------------------------------------
+# Two-tier inference
+# ---------------------------------------------------------------------------
+
+class TestTwoTier:
+    @staticmethod
+    def _phases(vlm) -> list[str]:
+        return [c.kwargs['phase'] for c in vlm.analyze.call_args_list]
+
+    def test_passive_pages_skip_grounding(self):
+        """Spinner and signed_in triage answers are acted on directly."""
+        vlm = _make_vlm([
+            {'page_type': 'spinner'},
+            {'page_type': 'signed_in'},
+            {'action': 'interact', 'completed': False, 'state': 'account'},
+            CANCEL_DONE,
+        ])
+        executor = VLMExecutor(vlm, settle_delay=0, two_tier=True)
+        result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+        assert result.success
+        assert result.billing_date == '2026-03-15'
+        assert self._phases(vlm) == [
+            'triage-sign-in', 'triage-sign-in', 'triage-action', 'cancel']
+        assert result.inferences_triaged == 2
+        assert result.inference_count == 3
+
+    def test_interaction_escalates_to_grounding(self):
+        vlm = _make_vlm([
+            {'page_type': 'interact'}, USER_PASS_PAGE,
+            {'page_type': 'signed_in'},
+            {'action': 'interact', 'completed': False, 'state': 'account'}, CANCEL_CLICK,
+            {'action': 'interact', 'completed': False, 'state': 'confirm'}, CANCEL_DONE,
+        ])
+        executor = VLMExecutor(vlm, settle_delay=0, two_tier=True)
+        result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+        assert result.success
+        assert self._phases(vlm)[:2] == ['triage-sign-in', 'sign-in']
+
+    def test_done_without_billing_date_is_grounded(self):
+        """Completion needs the full-res answer unless a date was already captured."""
+        vlm = _make_vlm([
+            {'page_type': 'signed_in'},
+            {'action': 'done', 'completed': True, 'state': 'cancelled'}, CANCEL_DONE,
+        ])
+        executor = VLMExecutor(vlm, settle_delay=0, two_tier=True)
+        result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+        assert result.success
+        assert result.billing_date == '2026-03-15'
+        assert self._phases(vlm)[-1] == 'cancel'
+
+    def test_unparseable_triage_escalates(self):
+        vlm = MagicMock()
+        vlm.analyze = MagicMock(side_effect=[
+            ValueError('no JSON'), (SIGNED_IN, 1.0),
+            ({'action': 'interact', 'completed': False, 'state': 'x'}, 1.0),
+            (CANCEL_DONE, 1.0),
+        ])
+        executor = VLMExecutor(vlm, settle_delay=0, two_tier=True)
+        result = executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+        assert result.success
+        assert result.inferences_triaged == 0
+
+    def test_tier_timings_in_trace(self):
+        vlm = _make_vlm([
+            {'page_type': 'signed_in'},
+            {'action': 'interact', 'completed': False, 'state': 'account'}, CANCEL_DONE,
+        ])
+        executor = VLMExecutor(vlm, settle_delay=0, two_tier=True)
+        with patch('agent.vlm_executor.DebugTrace') as trace_cls:
+            executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'}, job_id='j1')
+        steps = [c.kwargs['diagnostics']['vlm_tiers']
+                 for c in trace_cls.return_value.save_step.call_args_list]
+        assert steps[0]['resolved_by'] == 'triage'
+        assert steps[0]['grounding_ms'] is None
+        assert steps[1]['resolved_by'] == 'grounding'
+        assert steps[1]['triage']['action'] == 'interact'
+        assert steps[1]['grounding_ms'] is not None
+
+    def test_single_tier_by_default(self):
+        vlm = _make_vlm([SIGNED_IN, CANCEL_DONE])
+        executor = VLMExecutor(vlm, settle_delay=0, two_tier=False)
+        executor.run('netflix', 'cancel', {'email': 'a', 'pass': 'b'})
+        assert self._phases(vlm) == ['sign-in', 'cancel']
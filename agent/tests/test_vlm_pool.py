@@ -0,0 +1,189 @@
+"""Tests for the multi-endpoint VLM pool (routing, caps, ejection, hedging)."""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from agent.recording.vlm_pool import VLMPool, get_vlm_pool_config
+
+
+class FakeClient:
+    """Stands in for VLMClient: records calls, optional gate/failure."""
+
+    def __init__(self, name: str, fail: Exception | None = None) -> None:
+        self.base_url = name
+        self.model = 'm'
+        self._max_image_width = 960
+        self._normalized_coords = True
+        self._coord_yx = False
+        self._coord_square_pad = False
+        self.cache_identity = 'm|w960|norm'
+        self.usage_totals = {'requests': 0, 'prompt_tokens': 0}
+        self.last_sent_image_b64 = ''
+        self.last_usage = None
+        self.last_stream_stats = None
+        self.fail = fail
+        self.gate: threading.Event | None = None
+        self.calls = 0
+        self.started = threading.Event()
+
+    def analyze(self, screenshot, system_prompt, **kwargs):
+        self.calls += 1
+        self.started.set()
+        cancel = kwargs.get('cancel')
+        if self.gate is not None:
+            if cancel is not None:
+                cancel.on_cancel(self.gate.set)
+            self.gate.wait(5)
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        if self.fail is not None:
+            raise self.fail
+        self.last_sent_image_b64 = f'sent-by-{self.base_url}'
+        self.usage_totals['requests'] += 1
+        return {'backend': self.base_url}, 1.0
+
+    def close(self) -> None:
+        pass
+
+
+def _prime(pool: VLMPool, index: int, ms: float, n: int = 25) -> None:
+    """Give backend `index` n latency samples of `ms`."""
+    backend = pool._backends[index]
+    backend.latencies.extend([ms] * n)
+    backend.ewma_ms = ms
+
+
+class TestRouting:
+    def test_prefers_lower_latency_backend(self):
+        a, b = FakeClient('a'), FakeClient('b')
+        pool = VLMPool([a, b])
+        _prime(pool, 0, 4000)
+        _prime(pool, 1, 1000)
+        assert pool.analyze('img', 'sys') == ({'backend': 'b'}, 1.0)
+        assert pool.last_backend == 'b'
+        assert pool.last_sent_image_b64 == 'sent-by-b'
+
+    def test_in_flight_spreads_load(self):
+        a, b = FakeClient('a'), FakeClient('b')
+        a.gate = threading.Event()
+        pool = VLMPool([a, b], max_inflight=[1, 1])
+        _prime(pool, 0, 1000)
+        _prime(pool, 1, 1500)
+
+        t = threading.Thread(target=pool.analyze, args=('img', 'sys'))
+        t.start()
+        assert a.started.wait(2)
+        # a is at its cap: the second request must go to b
+        assert pool.analyze('img', 'sys')[0] == {'backend': 'b'}
+        a.gate.set()
+        t.join(2)
+        assert (a.calls, b.calls) == (1, 1)
+
+    def test_usage_totals_summed(self):
+        a, b = FakeClient('a'), FakeClient('b')
+        pool = VLMPool([a, b])
+        pool.analyze('img', 'sys')
+        pool.analyze('img', 'sys')
+        assert pool.usage_totals['requests'] == 2
+
+    def test_exposes_client_surface(self):
+        pool = VLMPool([FakeClient('a'), FakeClient('b')])
+        assert pool.cache_identity == 'm|w960|norm'
+        assert pool._max_image_width == 960
+
+
+class TestEjection:
+    def test_failing_backend_is_ejected(self):
+        bad = FakeClient('bad', fail=RuntimeError('VLM API 502'))
+        good = FakeClient('good')
+        pool = VLMPool([bad, good], eject_after=2, eject_seconds=60)
+        _prime(pool, 0, 100)
+        _prime(pool, 1, 5000)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                pool.analyze('img', 'sys')
+        # bad is ejected despite its better latency
+        assert pool.analyze('img', 'sys')[0] == {'backend': 'good'}
+        stats = {s['url']: s for s in pool.stats()}
+        assert stats['bad']['errors'] == 2
+        assert stats['bad']['ejected_for_s'] > 0
+
+    def test_parse_errors_do_not_eject(self):
+        flaky = FakeClient('flaky', fail=ValueError('no JSON'))
+        pool = VLMPool([flaky, FakeClient('other')], eject_after=1)
+        _prime(pool, 0, 100)
+        _prime(pool, 1, 5000)
+        with pytest.raises(ValueError):
+            pool.analyze('img', 'sys')
+        assert pool._backends[0].ejected_until == 0.0
+
+    def test_all_ejected_still_tries(self):
+        only = FakeClient('only', fail=RuntimeError('down'))
+        pool = VLMPool([only], eject_after=1, eject_seconds=60)
+        with pytest.raises(RuntimeError):
+            pool.analyze('img', 'sys')
+        only.fail = None
+        assert pool.analyze('img', 'sys')[0] == {'backend': 'only'}
+
+
+class TestHedging:
+    def test_slow_primary_is_hedged(self):
+        slow, fast = FakeClient('slow'), FakeClient('fast')
+        slow.gate = threading.Event()
+        pool = VLMPool([slow, fast], hedge_percentile=95)
+        _prime(pool, 0, 20)    # p95 = 20 ms, so hedge quickly
+        _prime(pool, 1, 5000)
+
+        assert pool.analyze('img', 'sys')[0] == {'backend': 'fast'}
+        slow.gate.set()
+        assert {s['url']: s['hedges_won'] for s in pool.stats()} == {'slow': 0, 'fast': 1}
+        pool.close()
+
+    def test_hedge_loser_is_cancelled(self):
+        slow, fast = FakeClient('slow'), FakeClient('fast')
+        slow.gate = threading.Event()
+        pool = VLMPool([slow, fast], max_inflight=[1, 1], hedge_percentile=95)
+        _prime(pool, 0, 20)
+        _prime(pool, 1, 5000)
+
+        assert pool.analyze('img', 'sys')[0] == {'backend': 'fast'}
+        # the gate is only opened by the loser's token, never by the test
+        deadline = time.monotonic() + 2
+        while pool._backends[0].inflight and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool._backends[0].inflight == 0
+        assert pool._backends[0].consecutive_failures == 0
+        pool.close()
+
+    def test_no_hedge_without_samples(self):
+        a, b = FakeClient('a'), FakeClient('b')
+        pool = VLMPool([a, b], hedge_percentile=95)
+        pool.analyze('img', 'sys')
+        assert a.calls + b.calls == 1
+
+
+class TestPoolConfig:
+    def test_single_cap_applies_to_all(self, monkeypatch):
+        monkeypatch.setenv('VLM_URL', 'http://a:8080, http://b:8080')
+        monkeypatch.setenv('VLM_BACKEND_MAX_INFLIGHT', '3')
+        cfg = get_vlm_pool_config()
+        assert cfg['urls'] == ['http://a:8080', 'http://b:8080']
+        assert cfg['max_inflight'] == [3, 3]
+        assert cfg['hedge_percentile'] == 0.0
+
+    def test_per_backend_caps(self, monkeypatch):
+        monkeypatch.setenv('VLM_URL', 'http://a,http://b')
+        monkeypatch.setenv('VLM_BACKEND_MAX_INFLIGHT', '4,1')
+        assert get_vlm_pool_config()['max_inflight'] == [4, 1]
+
+    def test_cap_count_mismatch_raises(self, monkeypatch):
+        monkeypatch.setenv('VLM_URL', 'http://a,http://b,http://c')
+        monkeypatch.setenv('VLM_BACKEND_MAX_INFLIGHT', '4,1')
+        with pytest.raises(ValueError):
+            get_vlm_pool_config()
+        with pytest.raises(ValueError):
+            VLMPool([FakeClient('a'), FakeClient('b'), FakeClient('c')], max_inflight=[4, 1])
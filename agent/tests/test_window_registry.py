@@ -0,0 +1,145 @@
+"""Tests for cached window lookups (agent.input.window_registry)."""
+
+from __future__ import annotations
+
+import pytest
+
+from agent import browser
+from agent.input.window_registry import FakeWindowBackend, WindowRegistry
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def fake() -> FakeWindowBackend:
+    backend = FakeWindowBackend(scale=2.0)
+    # Other processes' windows: a full scan has to walk past them
+    for pid in range(10, 20):
+        backend.open(pid, app='Finder')
+    return backend
+
+
+@pytest.fixture
+def registry(fake) -> WindowRegistry:
+    return WindowRegistry(fake, scale_ttl=30, clock=FakeClock())
+
+
+# ---------------------------------------------------------------------------
+# Window lookups
+# ---------------------------------------------------------------------------
+
+class TestLookup:
+    def test_steps_refresh_by_id_without_scanning(self, fake, registry):
+        win = fake.open(pid=42, x=10, y=20)
+        assert registry.wait_for_window('Google Chrome', pid=42, timeout=0)['id'] == win['id']
+        fake.calls.clear()
+
+        for _ in range(20):
+            assert registry.lookup(42)['x'] == 10
+
+        assert fake.calls == {'window_info': 20}
+        assert registry.stats()['tracked'] == 1
+
+    def test_bounds_follow_window(self, fake, registry):
+        win = fake.open(pid=42)
+        registry.lookup(42, win['id'])
+        fake.move(win['id'], x=300, width=900)
+        assert registry.lookup(42)['x'] == 300
+        assert registry.lookup(42)['width'] == 900
+
+    def test_recreated_window_falls_back_to_scan(self, fake, registry):
+        old = fake.open(pid=42)
+        registry.lookup(42, old['id'])
+        fake.close(old['id'])
+        new = fake.open(pid=42)
+        fake.calls.clear()
+
+        assert registry.lookup(42)['id'] == new['id']
+        assert fake.calls == {'window_info': 1, 'list_windows': 1}
+        fake.calls.clear()
+        registry.lookup(42)
+        assert fake.calls == {'window_info': 1}
+
+    def test_recycled_id_of_other_process_ignored(self, fake, registry):
+        win = fake.open(pid=42)
+        registry.lookup(42, win['id'])
+        fake.windows[win['id']]['pid'] = 99
+        assert registry.lookup(42) is None
+        assert registry.stats()['tracked'] == 0
+
+    def test_wait_for_window_times_out(self, registry):
+        assert registry.wait_for_window('Google Chrome', pid=42, timeout=0) is None
+
+    def test_forget(self, fake, registry):
+        win = fake.open(pid=42)
+        registry.lookup(42, win['id'])
+        registry.forget(42)
+        assert registry.stats()['tracked'] == 0
+
+
+# ---------------------------------------------------------------------------
+# Display scale cache
+# ---------------------------------------------------------------------------
+
+class TestDisplayScale:
+    def test_cached_until_ttl(self, fake, registry):
+        assert registry.display_scale() == 2.0
+        fake.scale = 1.0
+        assert registry.display_scale() == 2.0
+        registry._clock.now += 31
+        assert registry.display_scale() == 1.0
+        assert fake.calls['display_scale'] == 2
+
+    def test_invalidate(self, fake, registry):
+        registry.display_scale()
+        fake.scale = 1.0
+        registry.invalidate_scale()
+        assert registry.display_scale() == 1.0
+
+    def test_window_bounds_change_invalidates(self, fake, registry):
+        win = fake.open(pid=42)
+        registry.lookup(42, win['id'])
+        registry.display_scale()
+        registry.lookup(42)  # unchanged: cache kept
+        assert fake.calls['display_scale'] == 1
+
+        fake.scale = 1.0  # dragged to a non-Retina display
+        fake.move(win['id'], x=2000)
+        registry.lookup(42)
+        assert registry.display_scale() == 1.0
+
+    def test_zero_ttl_always_reads(self, fake):
+        registry = WindowRegistry(fake, scale_ttl=0)
+        registry.display_scale()
+        registry.display_scale()
+        assert fake.calls['display_scale'] == 2
+
+
+# ---------------------------------------------------------------------------
+# Browser sessions
+# ---------------------------------------------------------------------------
+
+class TestBrowserSession:
+    def test_session_window_uses_registry(self, fake, monkeypatch):
+        registry = WindowRegistry(fake)
+        monkeypatch.setattr(browser, 'window_registry', registry)
+        monkeypatch.setattr(browser, '_kill_pid', lambda pid: None)
+        win = fake.open(pid=42, x=5, y=6, width=800, height=600)
+        session = browser.BrowserSession(pid=42, process=None, profile_dir='/nonexistent',
+                                          window_id=win['id'])
+
+        assert browser.get_session_window(session) == {
+            'x': 5, 'y': 6, 'width': 800, 'height': 600}
+        assert fake.calls['list_windows'] == 0
+
+        fake.close(win['id'])
+        browser.close_session(session)
+        assert registry.stats()['tracked'] == 0
+        with pytest.raises(RuntimeError, match='PID 42'):
+            browser.get_session_window(session)
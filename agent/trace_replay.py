@@ -0,0 +1,415 @@
+"""Replay recorded debug-trace steps against a VLM endpoint.
+
+Each traced VLM step holds the image that was analysed, the prompt and
+the response the production model gave. Replaying those steps against
+another endpoint, model or VLM_* setting answers "would this change
+have made the same decisions, and how fast?" without running live jobs.
+
+  load_steps()    replayable steps from trace archives/folders: the sent
+                  JPEG (what the VLM saw) or the full-resolution page
+  replay()        run them through a VLMClient with N concurrent requests
+  summarize()     latency percentiles, tokens, parse failures and
+                  agreement with the recorded responses, per phase
+  FakeVLMServer   a local OpenAI-compatible server answering with the
+                  recorded responses, for CI and harness checks
+
+Agreement compares in original-page pixels:
+  sign-in         same page_type, and every point present in both within
+                  tolerance pixels
+  cancel/resume   same action, and for clicks, click_point within
+                  tolerance pixels
+
+Used by agent/bin/replay_traces.py and agent/bin/eval_image_budget.py.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import logging
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from agent.trace_store import open_trace
+
+log = logging.getLogger(__name__)
+
+SIGNIN_POINTS = ('email_point', 'password_point', 'button_point', 'code_point', 'profile_point')
+
+
+@dataclass
+class ReplayStep:
+    """One recorded VLM step.
+
+    scale maps the reference response's coordinates to original-page
+    pixels; image_scale maps pixels of image (the replayed input) to
+    original-page pixels.
+    """
+
+    id: str
+    service: str | None
+    phase: str
+    image: bytes
+    prompt: str
+    reference: dict
+    scale: float
+    image_scale: float
+
+
+def load_steps(
+    path: str | Path,
+    phase_filter: str | None = None,
+    image: str = 'sent',
+) -> list[ReplayStep]:
+    """Replayable steps of one job trace (archive or folder).
+
+    image is 'sent' (the JPEG the VLM received) or 'full' (the
+    chrome-cropped page, for re-encoding at other widths). Steps served
+    from the reuse tracker or response cache, resolved by the two-tier
+    triage pass, or missing the image or prompt are skipped.
+    """
+    steps = []
+    with open_trace(path) as trace:
+        service = trace.metadata().get('service')
+        for name in trace.step_names():
+            meta = json.loads(trace.read(name))
+            diag = meta.get('diagnostics') or {}
+            prefix = name[:-len('.json')]
+            data = trace.read(f'{prefix}_sent.jpg' if image == 'sent' else f'{prefix}.png')
+            prompt = trace.read(f'{prefix}_prompt.txt')
+            tiers = diag.get('vlm_tiers') or {}
+            if (meta.get('vlm_response') is None or data is None or prompt is None
+                    or diag.get('inference_source', 'vlm') != 'vlm'
+                    or tiers.get('resolved_by') == 'triage'):
+                continue
+            if phase_filter and meta.get('phase') != phase_filter:
+                continue
+            scale = diag.get('vlm_scale_factor') or 1.0
+            steps.append(ReplayStep(
+                id=f'{trace.name}/{prefix}',
+                service=service,
+                phase=meta.get('phase') or '',
+                image=data,
+                prompt=prompt.decode(),
+                reference=meta['vlm_response'],
+                scale=scale,
+                image_scale=scale if image == 'sent' else 1.0,
+            ))
+    return steps
+
+
+# ---------------------------------------------------------------------------
+# Agreement
+# ---------------------------------------------------------------------------
+
+def _point(value, scale: float) -> tuple[float, float] | None:
+    """A [x, y] point or [x1, y1, x2, y2] box centre, in original pixels."""
+    if not isinstance(value, list) or len(value) not in (2, 4):
+        return None
+    if len(value) == 4:
+        value = [(value[0] + value[2]) / 2, (value[1] + value[3]) / 2]
+    return value[0] * scale, value[1] * scale
+
+
+def _near(a, a_scale: float, b, b_scale: float, tolerance: float) -> bool:
+    pa, pb = _point(a, a_scale), _point(b, b_scale)
+    if pa is None or pb is None:
+        return pa is None and pb is None
+    return math.dist(pa, pb) <= tolerance
+
+
+def agrees(phase: str, ref: dict, ref_scale: float, got: dict, got_scale: float,
+           tolerance: float) -> bool:
+    """True if got makes the same decision as ref (see module docstring)."""
+    if phase == 'sign-in':
+        if ref.get('page_type') != got.get('page_type'):
+            return False
+        return all(_near(ref.get(k), ref_scale, got.get(k), got_scale, tolerance)
+                   for k in SIGNIN_POINTS if ref.get(k) and got.get(k))
+    if ref.get('action') != got.get('action'):
+        return False
+    if ref.get('action') == 'click':
+        return _near(ref.get('click_point'), ref_scale, got.get('click_point'),
+                     got_scale, tolerance)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+def _frame(data: bytes):
+    """A Frame over a replayed image (PNG or JPEG), decoded up front."""
+    from PIL import Image
+
+    from agent.screenshot import Frame
+
+    return Frame(image=Image.open(io.BytesIO(data)).convert('RGB'))
+
+
+def replay_step(vlm, step: ReplayStep, tolerance: float) -> dict:
+    """Replay one step; a result row for summarize()."""
+    frame = _frame(step.image)
+    row = {'id': step.id, 'phase': step.phase, 'ok': False, 'error': None}
+    t0 = time.monotonic()
+    try:
+        got, scale = vlm.analyze(frame, step.prompt, phase=step.phase, service=step.service)
+    except ValueError as exc:
+        row.update(error='parse', message=str(exc)[:200])
+        return row
+    except Exception as exc:
+        row.update(error='request', message=str(exc)[:200])
+        return row
+    usage = vlm.last_usage or {}
+    row.update({
+        'ok': agrees(step.phase, step.reference, step.scale,
+                     got, scale * step.image_scale, tolerance),
+        'ms': (time.monotonic() - t0) * 1000,
+        'prompt_tokens': usage.get('prompt_tokens'),
+        'completion_tokens': usage.get('completion_tokens'),
+        'kb': len(vlm.last_sent_image_b64 or '') * 3 / 4 / 1024,
+    })
+    return row
+
+
+def replay(
+    vlm,
+    steps: list[ReplayStep],
+    concurrency: int = 1,
+    tolerance: float = 24.0,
+) -> tuple[list[dict], float]:
+    """Replay steps with up to concurrency requests in flight.
+
+    vlm is a VLMClient or VLMPool (their last_* values are per thread).
+    Returns (rows in step order, wall-clock seconds).
+    """
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency),
+                            thread_name_prefix='replay') as pool:
+        rows = list(pool.map(lambda s: replay_step(vlm, s, tolerance), steps))
+    return rows, time.monotonic() - t0
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _group_summary(rows: list[dict]) -> dict:
+    timed = [r for r in rows if r['error'] is None]
+    ms = sorted(r['ms'] for r in timed)
+    prompt = [r['prompt_tokens'] for r in timed if r.get('prompt_tokens')]
+    completion = [r['completion_tokens'] for r in timed if r.get('completion_tokens')]
+    return {
+        'steps': len(rows),
+        'agreement': sum(r['ok'] for r in rows) / len(rows) if rows else 0.0,
+        'parse_failures': sum(r['error'] == 'parse' for r in rows),
+        'errors': sum(r['error'] == 'request' for r in rows),
+        'p50_ms': _percentile(ms, 50) if ms else None,
+        'p95_ms': _percentile(ms, 95) if ms else None,
+        'prompt_tokens': statistics.fmean(prompt) if prompt else None,
+        'completion_tokens': statistics.fmean(completion) if completion else None,
+        'kb': statistics.fmean(r['kb'] for r in timed) if timed else None,
+    }
+
+
+def summarize(rows: list[dict], wall_s: float | None = None) -> dict:
+    """Overall and per-phase latency, tokens, failures and agreement."""
+    summary = _group_summary(rows)
+    if wall_s:
+        summary['wall_s'] = round(wall_s, 2)
+        summary['steps_per_s'] = round(len(rows) / wall_s, 2)
+    summary['phases'] = {
+        phase: _group_summary([r for r in rows if r['phase'] == phase])
+        for phase in sorted({r['phase'] for r in rows})
+    }
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# Fake endpoint
+# ---------------------------------------------------------------------------
+
+def _to_model_space(obj, sx: float, sy: float, normalize: tuple[int, int] | None,
+                    yx: bool):
+    """Inverse of the client's post-processing for recorded pixel coordinates.
+
+    Scales [x, y] points and [x1, y1, x2, y2] boxes to the received
+    image, then to 0-1000 space and/or [y, x] order if the client will
+    undo that.
+    """
+    if isinstance(obj, list):
+        return [_to_model_space(v, sx, sy, normalize, yx) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    out = {}
+    for key, val in obj.items():
+        is_coords = (isinstance(val, list) and val
+                     and all(isinstance(v, (int, float)) for v in val)
+                     and (len(val) == 4 or (len(val) == 2 and key.endswith('_point'))))
+        if not is_coords:
+            out[key] = _to_model_space(val, sx, sy, normalize, yx)
+            continue
+        coords = [v * (sx if i % 2 == 0 else sy) for i, v in enumerate(val)]
+        if normalize:
+            w, h = normalize
+            coords = [v * 1000 / (w if i % 2 == 0 else h) for i, v in enumerate(coords)]
+        if yx:
+            coords = [coords[i ^ 1] for i in range(len(coords))]
+        out[key] = [round(v, 1) for v in coords]
+    return out
+
+
+class FakeVLMServer:
+    """OpenAI-compatible /chat/completions answering with recorded responses.
+
+    The received image is matched to the nearest replay step by
+    perceptual hash, so resized or re-encoded inputs still match, and
+    the step's reference response is returned with its coordinates
+    mapped to the received image size. Among matches, a step whose
+    prompt occurs in the request wins, so one page can carry different
+    answers per phase. Unmatched images get a non-JSON answer (a parse
+    failure). Usage reports rough token estimates.
+
+    Args:
+        steps: The steps whose responses to serve.
+        latency_ms: Delay before answering each request.
+        coord_normalize / coord_yx: Answer in the client's coordinate
+            convention (match the client's VLM_COORD_* settings).
+        max_distance: Max dhash distance (of 256 bits) for a match.
+    """
+
+    def __init__(
+        self,
+        steps: list[ReplayStep],
+        latency_ms: float = 0.0,
+        coord_normalize: bool = False,
+        coord_yx: bool = False,
+        max_distance: int = 8,
+    ) -> None:
+        from agent.frame_tracker import dhash
+
+        self.latency_ms = latency_ms
+        self.coord_normalize = coord_normalize
+        self.coord_yx = coord_yx
+        self.max_distance = max_distance
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._table = []
+        for step in steps:
+            image = _frame(step.image).image
+            # Reference coordinates in replayed-image pixels
+            self._table.append((dhash(image), image.width, step.reference,
+                                step.scale / step.image_scale, step.prompt))
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> str:
+        """Serve on a free localhost port; returns the base URL."""
+        handler = self._handler()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='fake-vlm', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> FakeVLMServer:
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def answer(self, payload: dict) -> dict:
+        """The chat completion body for one request payload."""
+        import base64
+
+        from agent.frame_tracker import dhash, hamming
+
+        with self._lock:
+            self.requests += 1
+        texts = []
+        image = None
+        for message in payload.get('messages', []):
+            content = message.get('content')
+            if isinstance(content, str):
+                texts.append(content)
+                continue
+            for part in content or []:
+                if part.get('type') == 'text':
+                    texts.append(part.get('text', ''))
+                elif part.get('type') == 'image_url':
+                    url = part['image_url']['url']
+                    image = _frame(base64.b64decode(url.split(',', 1)[1])).image
+
+        text = '\n'.join(texts)
+        text_chars = len(text)
+        content = 'No matching recorded step.'
+        if image is not None:
+            h = dhash(image)
+            matches = [row for row in self._table if hamming(h, row[0]) <= self.max_distance]
+            best = min(matches, key=lambda row: (row[4] not in text, hamming(h, row[0])),
+                       default=None)
+            if best is not None:
+                _, width, reference, ref_to_image, _ = best
+                s = ref_to_image * image.width / width
+                normalize = image.size if self.coord_normalize else None
+                content = json.dumps(_to_model_space(reference, s, s, normalize,
+                                                     self.coord_yx))
+        return {
+            'id': f'fake-{self.requests}',
+            'object': 'chat.completion',
+            'model': payload.get('model', 'fake'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {
+                'prompt_tokens': text_chars // 4 + (256 if image is not None else 0),
+                'completion_tokens': max(1, len(content) // 4),
+            },
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length))
+                if payload.get('stream'):
+                    self.send_error(400, 'fake server does not stream')
+                    return
+                if server.latency_ms:
+                    time.sleep(server.latency_ms / 1000)
+                body = json.dumps(server.answer(payload)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args) -> None:
+                log.debug('fake VLM: ' + fmt, *args)
+
+        return Handler
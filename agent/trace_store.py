@@ -0,0 +1,372 @@
+"""Content-addressed debug trace archives with a SQLite index.
+
+Each kept job trace is one zip archive, {base_dir}/{job_id}.zip. Step
+files are stored once per distinct content, under their SHA-256 in
+blobs/, so the prompt (identical for every step of a phase) and the
+screenshots of unchanged pages cost nothing after their first step.
+step_NNN.json holds the step's metadata plus a 'files' map from kind
+(png, sent, prompt, overlay) to its blob. Text blobs are deflated;
+PNG/JPEG blobs are stored as is.
+
+index.db records every archived job (service, action, outcome, error,
+step count, size, VLM time) and every step (phase, action, inference
+source, VLM ms), so traces can be found with a query instead of a
+directory walk. evict() drops the oldest archives once the total
+exceeds the disk budget or they pass the age limit. DebugTrace calls
+all of this on its background writer thread.
+
+Read archives (and legacy step_NNN.* folders) with open_trace():
+
+    trace = open_trace('~/.unsaltedbutter/debug/job-123.zip')
+    for name in trace.step_names():
+        meta = json.loads(trace.read(name))
+        png = trace.read(name.replace('.json', '.png'))
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIX = '.zip'
+
+# Logical file name suffix -> (files key, blob extension)
+FILE_KINDS = {
+    '.png': ('png', '.png'),
+    '_sent.jpg': ('sent', '.jpg'),
+    '_prompt.txt': ('prompt', '.txt'),
+    '_overlay.png': ('overlay', '.png'),
+}
+_COMPRESSED = ('.txt', '.json')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    service     TEXT,
+    action      TEXT,
+    outcome     TEXT NOT NULL DEFAULT 'running',
+    error       TEXT,
+    steps       INTEGER NOT NULL DEFAULT 0,
+    blobs       INTEGER NOT NULL DEFAULT 0,
+    deduped     INTEGER NOT NULL DEFAULT 0,
+    bytes       INTEGER NOT NULL DEFAULT 0,
+    vlm_ms      REAL NOT NULL DEFAULT 0,
+    started_at  REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_started ON jobs(started_at);
+CREATE TABLE IF NOT EXISTS steps (
+    job_id           TEXT NOT NULL,
+    step             INTEGER NOT NULL,
+    phase            TEXT,
+    action           TEXT,
+    inference_source TEXT,
+    vlm_ms           REAL,
+    timestamp        REAL,
+    PRIMARY KEY (job_id, step)
+);
+"""
+
+
+def _step_action(meta: dict) -> str | None:
+    response = meta.get('vlm_response') or {}
+    return response.get('action') or response.get('page_type')
+
+
+class TraceStore:
+    """Per-job trace archives under base_dir, indexed in base_dir/index.db.
+
+    Thread-safe, but meant to be driven from one writer thread: archives
+    are appended without a file lock.
+
+    Args:
+        base_dir: Folder holding the archives and index.
+        max_bytes: Total archive size kept by evict().
+        max_age_days: Archives older than this are evicted regardless.
+    """
+
+    def __init__(
+        self,
+        base_dir: str | Path,
+        max_bytes: int = 2048 * 1024 * 1024,
+        max_age_days: float = 14,
+    ) -> None:
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._db = sqlite3.connect(str(self.base_dir / 'index.db'), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def archive_path(self, job_id: str) -> Path:
+        return self.base_dir / f'{job_id}{ARCHIVE_SUFFIX}'
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def write_steps(
+        self,
+        job_id: str,
+        steps: list[tuple[dict, dict[str, bytes]]],
+        metadata: dict | None = None,
+    ) -> None:
+        """Append steps to the job's archive and index them.
+
+        Each step is (meta, files): the step_NNN.json content and its
+        files by kind ('png', 'sent', 'prompt', 'overlay'). Blobs already
+        in the archive are not written again.
+        """
+        path = self.archive_path(job_id)
+        written = deduped = 0
+        with zipfile.ZipFile(path, 'a') as archive:
+            present = set(archive.namelist())
+            if 'job.json' not in present:
+                archive.writestr('job.json', json.dumps(metadata or {}, default=str),
+                                 compress_type=zipfile.ZIP_DEFLATED)
+            for meta, files in steps:
+                refs = {}
+                for kind, data in files.items():
+                    ext = next(e for k, e in FILE_KINDS.values() if k == kind)
+                    name = f'blobs/{hashlib.sha256(data).hexdigest()}{ext}'
+                    refs[kind] = name
+                    if name in present:
+                        deduped += 1
+                        continue
+                    compress = (zipfile.ZIP_DEFLATED if ext in _COMPRESSED
+                                else zipfile.ZIP_STORED)
+                    archive.writestr(name, data, compress_type=compress)
+                    present.add(name)
+                    written += 1
+                step_name = f'step_{meta["step"]:03d}.json'
+                if step_name in present:
+                    # Same step recorded twice (e.g. an error retry): keep the first
+                    continue
+                archive.writestr(step_name, json.dumps({**meta, 'files': refs},
+                                                       indent=2, default=str),
+                                 compress_type=zipfile.ZIP_DEFLATED)
+                present.add(step_name)
+        self._index(job_id, steps, metadata or {}, path.stat().st_size, written, deduped)
+
+    def _index(
+        self, job_id: str, steps: list[tuple[dict, dict]], metadata: dict,
+        size: int, written: int, deduped: int,
+    ) -> None:
+        rows = []
+        vlm_ms = 0.0
+        for meta, _ in steps:
+            diag = meta.get('diagnostics') or {}
+            ms = diag.get('vlm_response_ms')
+            if ms and diag.get('inference_source', 'vlm') == 'vlm':
+                vlm_ms += ms
+            rows.append((job_id, meta['step'], meta.get('phase'), _step_action(meta),
+                         diag.get('inference_source'), ms, meta.get('timestamp')))
+        started = min((r[6] for r in rows if r[6]), default=time.time())
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO jobs (job_id, service, action, started_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(job_id) DO NOTHING',
+                (job_id, metadata.get('service'), metadata.get('action'), started),
+            )
+            self._db.executemany(
+                'INSERT OR IGNORE INTO steps VALUES (?, ?, ?, ?, ?, ?, ?)', rows,
+            )
+            self._db.execute(
+                'UPDATE jobs SET steps = (SELECT COUNT(*) FROM steps WHERE job_id = ?), '
+                'blobs = blobs + ?, deduped = deduped + ?, bytes = ?, '
+                'vlm_ms = vlm_ms + ? WHERE job_id = ?',
+                (job_id, written, deduped, size, vlm_ms, job_id),
+            )
+            self._db.commit()
+
+    def finish_job(self, job_id: str, outcome: str, error: str = '') -> None:
+        """Record the job's outcome ('success' or 'failed')."""
+        with self._lock:
+            self._db.execute(
+                'UPDATE jobs SET outcome = ?, error = ?, finished_at = ? WHERE job_id = ?',
+                (outcome, error or None, time.time(), job_id),
+            )
+            self._db.commit()
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def evict(self) -> int:
+        """Drop expired archives, then the oldest until under max_bytes.
+
+        Returns the number of archives deleted.
+        """
+        cutoff = time.time() - self.max_age_days * 86400
+        with self._lock:
+            jobs = self._db.execute(
+                'SELECT job_id, bytes, started_at FROM jobs ORDER BY started_at',
+            ).fetchall()
+        total = sum(size for _, size, _ in jobs)
+        doomed = []
+        for job_id, size, started_at in jobs:
+            if started_at >= cutoff and total <= self.max_bytes:
+                break
+            doomed.append(job_id)
+            total -= size
+        for job_id in doomed:
+            try:
+                self.archive_path(job_id).unlink(missing_ok=True)
+            except OSError as exc:
+                log.warning('Failed to delete trace archive %s: %s', job_id, exc)
+                continue
+            with self._lock:
+                self._db.execute('DELETE FROM steps WHERE job_id = ?', (job_id,))
+                self._db.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+                self._db.commit()
+            log.info('Evicted debug trace %s', job_id)
+        return len(doomed)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def jobs(self, outcome: str | None = None, service: str | None = None,
+             limit: int = 100) -> list[dict]:
+        """Indexed jobs, newest first."""
+        sql = 'SELECT * FROM jobs WHERE 1=1'
+        args: list = []
+        if outcome:
+            sql += ' AND outcome = ?'
+            args.append(outcome)
+        if service:
+            sql += ' AND service = ?'
+            args.append(service)
+        sql += ' ORDER BY started_at DESC LIMIT ?'
+        args.append(limit)
+        with self._lock:
+            cursor = self._db.execute(sql, args)
+            names = [c[0] for c in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def steps(self, job_id: str) -> list[dict]:
+        """Indexed steps of one job, in order."""
+        with self._lock:
+            cursor = self._db.execute(
+                'SELECT * FROM steps WHERE job_id = ? ORDER BY step', (job_id,),
+            )
+            names = [c[0] for c in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs, size, blobs, deduped = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(blobs), 0), '
+                'COALESCE(SUM(deduped), 0) FROM jobs',
+            ).fetchone()
+        return {'jobs': jobs, 'bytes': size, 'max_bytes': self.max_bytes,
+                'blobs': blobs, 'deduped': deduped}
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+class TraceReader:
+    """Read one job trace, archived or a legacy step_NNN.* folder.
+
+    Files are addressed by their legacy names (step_003.png,
+    step_003_prompt.txt, ...) either way.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(os.path.expanduser(str(path)))
+        self.name = self.path.name.removesuffix(ARCHIVE_SUFFIX)
+        self._zip = zipfile.ZipFile(self.path) if self.path.is_file() else None
+        self._meta: dict[str, dict] = {}
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+
+    def __enter__(self) -> TraceReader:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _names(self) -> list[str]:
+        if self._zip is not None:
+            return self._zip.namelist()
+        return [p.name for p in self.path.iterdir()]
+
+    def step_names(self) -> list[str]:
+        """step_NNN.json names, in step order."""
+        return sorted(n for n in self._names()
+                      if n.startswith('step_') and n.endswith('.json') and len(n) == 13)
+
+    def metadata(self) -> dict:
+        """Job metadata (service, action, ...) if recorded."""
+        if self._zip is not None:
+            data = self.read('job.json')
+            if data:
+                return json.loads(data)
+        first = self.read('step_000.json')
+        return json.loads(first).get('job_metadata', {}) if first else {}
+
+    def read(self, name: str) -> bytes | None:
+        """Contents of a legacy-named file, or None if it was not saved."""
+        if self._zip is None:
+            path = self.path / name
+            return path.read_bytes() if path.exists() else None
+        if name.endswith('.json'):
+            try:
+                return self._zip.read(name)
+            except KeyError:
+                return None
+        prefix = name[:8]  # step_NNN
+        for suffix, (kind, _) in FILE_KINDS.items():
+            if name == prefix + suffix:
+                break
+        else:
+            return None
+        meta = self._meta.get(prefix)
+        if meta is None:
+            data = self.read(f'{prefix}.json')
+            if data is None:
+                return None
+            meta = self._meta[prefix] = json.loads(data)
+        blob = (meta.get('files') or {}).get(kind)
+        return self._zip.read(blob) if blob else None
+
+
+def open_trace(path: str | Path) -> TraceReader:
+    """Open a job's trace archive or legacy trace folder."""
+    return TraceReader(path)
+
+
+def trace_paths(paths: list[str]) -> list[Path]:
+    """Job traces under each path: an archive, a job folder, or the debug dir."""
+    found = []
+    for p in paths:
+        path = Path(os.path.expanduser(p))
+        if path.is_file() and path.suffix == ARCHIVE_SUFFIX:
+            found.append(path)
+        elif any(path.glob('step_*.json')):
+            found.append(path)
+        elif path.is_dir():
+            found.extend(sorted(
+                d for d in path.iterdir()
+                if (d.is_file() and d.suffix == ARCHIVE_SUFFIX)
+                or (d.is_dir() and any(d.glob('step_*.json')))
+            ))
+    return found
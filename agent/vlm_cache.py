@@ -0,0 +1,265 @@
+"""Persistent cross-job VLM response cache.
+
+At temperature 0 the VLM gives (nearly) the same answer every time it
+sees the Netflix login page or a Hulu "are you sure?" interstitial.
+ResponseCache stores those answers in SQLite so later jobs can skip the
+inference entirely.
+
+Entries are keyed by a context string (model, max image width,
+coordinate mode, page size, prompt hash) plus the page's perceptual
+hash. A lookup matches the nearest stored hash within max_distance bits
+for the same context. The least recently used entries are evicted once
+the table exceeds max_entries rows or max_bytes of response JSON.
+
+Nothing credential-bearing is stored: responses carrying on-screen text
+to type or a per-account billing date are skipped, as is any response
+that contains one of the job's credential values verbatim.
+
+Opt-in. Configuration (read at call time via get_vlm_cache_config()):
+  VLM_CACHE              'true' to enable (default off)
+  VLM_CACHE_PATH         SQLite file (default ~/.unsaltedbutter/vlm_cache.db)
+  VLM_CACHE_MAX_ENTRIES  row cap (default 5000)
+  VLM_CACHE_MAX_MB       response JSON cap in MB (default 50)
+  VLM_CACHE_DISTANCE     max Hamming bits for a hit (default 3)
+  VLM_CACHE_SCOPE        comma-separated service:phase pairs, '*' wildcard
+                         (default '*:*'), e.g. 'netflix:sign-in,*:cancel'
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from agent.frame_tracker import hamming
+
+log = logging.getLogger(__name__)
+
+# Response fields that may echo on-screen user data. Responses with any
+# of these set are never cached.
+_UNCACHEABLE_FIELDS = ('text_to_type', 'billing_end_date')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    id           INTEGER PRIMARY KEY,
+    context      TEXT NOT NULL,
+    phash        TEXT NOT NULL,
+    service      TEXT NOT NULL,
+    phase        TEXT NOT NULL,
+    response     TEXT NOT NULL,
+    scale_factor REAL NOT NULL,
+    bytes        INTEGER NOT NULL,
+    created_at   REAL NOT NULL,
+    last_used    REAL NOT NULL,
+    hits         INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_context ON responses(context);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+"""
+
+
+def get_vlm_cache_config() -> dict:
+    """Read response-cache configuration from os.environ at call time."""
+    return {
+        'enabled': os.environ.get('VLM_CACHE', '').lower() in ('1', 'true', 'yes'),
+        'path': os.path.expanduser(os.environ.get(
+            'VLM_CACHE_PATH', '~/.unsaltedbutter/vlm_cache.db',
+        )),
+        'max_entries': int(os.environ.get('VLM_CACHE_MAX_ENTRIES', '5000')),
+        'max_bytes': int(float(os.environ.get('VLM_CACHE_MAX_MB', '50')) * 1024 * 1024),
+        'max_distance': int(os.environ.get('VLM_CACHE_DISTANCE', '3')),
+        'scope': os.environ.get('VLM_CACHE_SCOPE', '*:*'),
+    }
+
+
+def context_key(prompt: str, identity: str, size: tuple[int, int]) -> str:
+    """Everything besides the page that determines the response."""
+    prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+    return f'{identity}|{size[0]}x{size[1]}|{prompt_hash}'
+
+
+def _parse_scope(scope: str) -> set[tuple[str, str]]:
+    pairs = set()
+    for item in scope.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        service, _, phase = item.partition(':')
+        pairs.add((service.strip() or '*', phase.strip() or '*'))
+    return pairs
+
+
+class ResponseCache:
+    """SQLite-backed VLM response cache, shared by all jobs in the agent.
+
+    Thread-safe: all jobs share one instance and call it through
+    asyncio.to_thread, so SQLite work stays off the event loop.
+
+    Args:
+        path: SQLite file (':memory:' for tests).
+        max_entries: Row cap before LRU eviction.
+        max_bytes: Total response-JSON cap before LRU eviction.
+        max_distance: Max Hamming distance between page hashes for a hit.
+        scope: 'service:phase' pairs to cache, '*' as wildcard.
+    """
+
+    def __init__(
+        self,
+        path: str = ':memory:',
+        max_entries: int = 5000,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_distance: int = 3,
+        scope: str = '*:*',
+    ) -> None:
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_distance = max_distance
+        self._scope = _parse_scope(scope)
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'skipped': 0,
+                       'evictions': 0}
+
+    @classmethod
+    def from_env(cls) -> ResponseCache | None:
+        """Build a cache from VLM_CACHE_* env vars, or None if disabled."""
+        cfg = get_vlm_cache_config()
+        if not cfg['enabled']:
+            return None
+        return cls(cfg['path'], cfg['max_entries'], cfg['max_bytes'],
+                   cfg['max_distance'], cfg['scope'])
+
+    def enabled_for(self, service: str, phase: str) -> bool:
+        """True if responses for this service and phase may be cached."""
+        return any(
+            s in ('*', service) and p in ('*', phase) for s, p in self._scope
+        )
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def _nearest(self, context: str, phash: int) -> tuple[int, int] | None:
+        """(row id, distance) of the closest entry within max_distance."""
+        best = None
+        for row_id, stored in self._db.execute(
+            'SELECT id, phash FROM responses WHERE context = ?', (context,),
+        ):
+            distance = hamming(phash, int(stored, 16))
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (row_id, distance)
+                if distance == 0:
+                    break
+        return best
+
+    def get(self, context: str, phash: int) -> tuple[dict, float] | None:
+        """Return (response, scale_factor) for a matching page, or None."""
+        with self._lock:
+            match = self._nearest(context, phash)
+            if match is None:
+                self._stats['misses'] += 1
+                return None
+            row_id, _ = match
+            response, scale_factor = self._db.execute(
+                'SELECT response, scale_factor FROM responses WHERE id = ?', (row_id,),
+            ).fetchone()
+            self._db.execute(
+                'UPDATE responses SET last_used = ?, hits = hits + 1 WHERE id = ?',
+                (time.time(), row_id),
+            )
+            self._db.commit()
+            self._stats['hits'] += 1
+        return json.loads(response), scale_factor
+
+    def put(
+        self,
+        context: str,
+        phash: int,
+        service: str,
+        phase: str,
+        response: dict,
+        scale_factor: float,
+        secrets: tuple[str, ...] = (),
+    ) -> bool:
+        """Store a fresh response. Returns False if it was not cacheable."""
+        data = json.dumps(response, sort_keys=True)
+        if (any(response.get(f) for f in _UNCACHEABLE_FIELDS)
+                or any(s and len(s) >= 3 and s in data for s in secrets)):
+            with self._lock:
+                self._stats['skipped'] += 1
+            return False
+
+        now = time.time()
+        with self._lock:
+            match = self._nearest(context, phash)
+            if match is not None:
+                self._db.execute(
+                    'UPDATE responses SET phash = ?, response = ?, scale_factor = ?,'
+                    ' bytes = ?, last_used = ? WHERE id = ?',
+                    (f'{phash:x}', data, scale_factor, len(data), now, match[0]),
+                )
+            else:
+                self._db.execute(
+                    'INSERT INTO responses (context, phash, service, phase, response,'
+                    ' scale_factor, bytes, created_at, last_used)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (context, f'{phash:x}', service, phase, data, scale_factor,
+                     len(data), now, now),
+                )
+            self._stats['stores'] += 1
+            self._evict()
+            self._db.commit()
+        return True
+
+    def discard(self, context: str, phash: int) -> None:
+        """Drop the entry matching this page (e.g. it led to a stuck loop)."""
+        with self._lock:
+            match = self._nearest(context, phash)
+            if match is not None:
+                self._db.execute('DELETE FROM responses WHERE id = ?', (match[0],))
+                self._db.commit()
+
+    def _evict(self) -> None:
+        """Delete least recently used rows until under both caps. Lock held."""
+        while True:
+            count, total = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM responses',
+            ).fetchone()
+            excess = count - self.max_entries
+            if excess <= 0 and total <= self.max_bytes:
+                return
+            batch = max(excess, 1)
+            self._db.execute(
+                'DELETE FROM responses WHERE id IN'
+                ' (SELECT id FROM responses ORDER BY last_used LIMIT ?)', (batch,),
+            )
+            self._stats['evictions'] += batch
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Counters since startup plus current table size, for /health."""
+        with self._lock:
+            count, total = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM responses',
+            ).fetchone()
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['entries'] = count
+        stats['bytes'] = total
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
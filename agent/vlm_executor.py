@@ -10,9 +10,11 @@ sequences locally (click, type, tab, enter) without additional VLM calls.
 Main loop structure (per iteration) for concurrent cursor safety:
 
   1. [lock]    Restore cursor + execute pending action    [unlock]
-  2. [no lock] Settle delay (page reacts to action)
+  2. [no lock] Settle (fixed delay, or adaptive: poll until visually stable)
   3. [lock]    Restore cursor + take screenshot           [unlock]
-  4. [no lock] VLM inference
+  4. [no lock] VLM inference (skipped if the page is perceptually unchanged;
+               optionally two-tier: low-res triage, full-res grounding
+               only when the page needs an interaction)
   5. [no lock] Parse result, resolve credentials, set pending action
   6. Back to 1
 
@@ -20,41 +22,83 @@ GUI actions (click, type, paste, scroll) are serialized via gui_lock so
 multiple concurrent jobs don't interleave physical input. Cursor restore
 and screenshot capture are grouped under one lock acquisition so another
 job cannot displace the cursor between restore and capture.
+
+run_async() is a coroutine: the [lock] sections run on the small GUI
+thread pool (agent.gui_lock.in_gui_thread), VLM calls on a worker thread
+for their duration, and settle delays and OTP/credential waits are plain
+awaits. A job parked on an OTP for minutes costs no thread. run() wraps
+it for synchronous callers (CLI, tests).
+
+Abort is cooperative: a CancelToken (agent.cancel) is checked at every
+phase boundary and inside long GUI sections, and every await (settle,
+VLM call, OTP wait) ends as soon as it fires. The in-flight VLM request
+is closed, Chrome is shut and a failed 'Job aborted' result returned.
+
+Each iteration's time is broken down (GUI lock wait, action, settle,
+capture, crop, VLM encode/network/server/parse, tokens, user waits) by
+_StepTimer into ExecutionResult.step_results, which the server reports
+with the result for the action log.
+
+Chrome, the screen, input devices and the clipboard are reached only
+through module-level names (browser, ss, mouse, keyboard, scroll_mod,
+player, focus_window_by_pid, focus_window, _clipboard_copy), which
+set_desktop() points at another implementation, e.g. the simulator in
+agent.desktop_sim (see agent.desktop).
 """
 
 from __future__ import annotations
 
 import asyncio
 import calendar
+import contextlib
 import hashlib
 import logging
 import os
 import random
-import subprocess
 import time
 from datetime import date
 from typing import Callable
 
 from agent import browser
 from agent import screenshot as ss
+from agent.cancel import CancelToken, JobCancelled
 from agent.config import (
     ACCOUNT_URL_JUMP, ACCOUNT_URLS, ACCOUNT_ZOOM_DEFAULT,
     ACCOUNT_ZOOM_STEPS, PRE_LOGIN_SCROLL, SERVICE_URLS,
     TOTAL_EXECUTION_TIMEOUT,
 )
-from agent.debug_trace import DebugTrace
-from agent.gui_lock import gui_lock
-from agent.input import coords, keyboard, mouse, scroll as scroll_mod
-from agent.input.window import focus_window_by_pid
+from agent.debug_trace import DebugTrace, get_debug_trace_config
+from agent.desktop import Desktop, macos as macos_desktop
+from agent.desktop import clipboard_copy as _clipboard_copy
+from agent.flow_replay import FlowReplay, FlowStore
+from agent.frame_tracker import (
+    FrameTracker, get_frame_tracker_config, hamming, is_passive,
+)
+from agent.gui_lock import (
+    GuiPriority, gui_job, gui_lock, gui_priority, gui_timing, in_gui_thread,
+)
+from agent.input import coords, keyboard, mouse, player, scroll as scroll_mod
+from agent.input.plan import InputPlan
+from agent.input.window import focus_window, focus_window_by_pid
 from agent.playbook import ExecutionResult
 from agent.profile import NORMAL, HumanProfile
+from agent.recording.action_plan import (
+    ActionPlan, build_plan_prompt, get_plan_config, plan_steps,
+)
 from agent.recording.prompts import (
     build_cancel_prompt,
     build_resume_prompt,
     build_signin_prompt,
 )
+from agent.recording.triage import (
+    TRIAGE_PHASES, build_triage_prompt, get_triage_config, resolve as resolve_triage,
+    triage_ready,
+)
 from agent.recording.vlm_client import VLMClient
-from agent.screenshot import crop_browser_chrome
+from agent.screenshot import Frame, crop_browser_chrome_frame
+from agent.session_pool import SessionManager
+from agent.settle import SettleResult, get_settle_config, wait_for_stable
+from agent.vlm_cache import ResponseCache, context_key
 
 log = logging.getLogger(__name__)
 
@@ -92,19 +136,86 @@ def _resolve_credential(
     return text_to_type, text_to_type, False
 
 
+# ---------------------------------------------------------------------------
+# Streaming readiness: which fields each phase needs before acting
+# ---------------------------------------------------------------------------
+
+_SIGNIN_CODE_PAGES = frozenset({
+    'verification_code', 'email_code_single', 'email_code_multi',
+    'phone_code_single', 'phone_code_multi',
+})
+_SIGNIN_TERMINAL_PAGES = frozenset({
+    'credential_error', 'signed_in', 'profile_select', 'spinner',
+    'captcha', 'email_link',
+})
+
+# Cancel/resume: fields read for every action, then per-action extras.
+# billing_end_date is always required because mid-flow screens are where
+# the executor captures it.
+_ACTION_BASE_FIELDS = ('state', 'action', 'completed', 'billing_end_date')
+_ACTION_EXTRA_FIELDS: dict[str, tuple[str, ...]] = {
+    'click': ('click_point', 'target_description'),
+    'type_text': ('text_to_type', 'click_point'),
+    'press_key': ('key_to_press',),
+}
+
+
+def _signin_ready(fields: dict) -> bool:
+    """True once a streamed sign-in response has everything the handler reads."""
+    page_type = fields.get('page_type')
+    if not page_type:
+        return False
+    if page_type in _SIGNIN_TERMINAL_PAGES:
+        return True
+    if page_type in _SIGNIN_CODE_PAGES:
+        needed = ('code_point', 'button_point')
+    elif page_type == 'unknown':
+        needed = ('actions',)
+    else:
+        needed = ('email_point', 'password_point', 'button_point')
+    return all(k in fields for k in needed)
+
+
+def _action_ready(fields: dict) -> bool:
+    """True once a streamed cancel/resume response has its action's fields."""
+    if not all(k in fields for k in _ACTION_BASE_FIELDS):
+        return False
+    extra = _ACTION_EXTRA_FIELDS.get(fields['action'], ())
+    return all(k in fields for k in extra)
+
+
+def _plan_action_ready(fields: dict) -> bool:
+    """_action_ready, and a click's next_steps have arrived (plan mode)."""
+    if not _action_ready(fields):
+        return False
+    return fields['action'] != 'click' or 'next_steps' in fields
+
+
 # ---------------------------------------------------------------------------
 # Stuck detection
 # ---------------------------------------------------------------------------
 
 class _StuckDetector:
-    """Detect repeated identical state/action or screenshot hashes."""
+    """Detect repeated identical state/action or screenshot hashes.
 
-    def __init__(self, threshold: int = 3) -> None:
+    Screenshots may be Frames (compared by perceptual hash, within
+    max_distance bits, so a spinner or blinking caret still counts as
+    the same page) or base64 strings (exact MD5 of a prefix). Frames
+    that can't be decoded fall back to their exact capture digest.
+    """
+
+    def __init__(self, threshold: int = 3, max_distance: int = 0) -> None:
         self.threshold = threshold
+        self.max_distance = max_distance
         self._history: list[tuple[str, str]] = []
-        self._screenshot_hashes: list[str] = []
+        self._screenshot_hashes: list[str | int] = []
+
+    def _same(self, a: str | int, b: str | int) -> bool:
+        if isinstance(a, int) and isinstance(b, int):
+            return hamming(a, b) <= self.max_distance
+        return a == b
 
-    def check(self, state: str, action: str, screenshot_b64: str) -> bool:
+    def check(self, state: str, action: str, screenshot: str | Frame) -> bool:
         if action != 'wait':
             entry = (state, action)
             self._history.append(entry)
@@ -113,11 +224,16 @@ class _StuckDetector:
                 if all(e == recent[0] for e in recent):
                     return True
 
-        img_hash = hashlib.md5(screenshot_b64[:10000].encode()).hexdigest()
+        if isinstance(screenshot, Frame):
+            img_hash = screenshot.dhash
+            if img_hash is None:
+                img_hash = screenshot.digest
+        else:
+            img_hash = hashlib.md5(screenshot[:10000].encode()).hexdigest()
         self._screenshot_hashes.append(img_hash)
         if len(self._screenshot_hashes) >= self.threshold:
             recent_hashes = self._screenshot_hashes[-self.threshold:]
-            if all(h == recent_hashes[0] for h in recent_hashes):
+            if all(self._same(h, recent_hashes[0]) for h in recent_hashes):
                 return True
 
         return False
@@ -127,48 +243,135 @@ class _StuckDetector:
         self._screenshot_hashes.clear()
 
 
+# ---------------------------------------------------------------------------
+# Step timing
+# ---------------------------------------------------------------------------
+
+class _StepTimer:
+    """Where one loop iteration's time went (one ExecutionResult.step_results entry).
+
+    Chrome launch and the first navigation are recorded as a 'setup'
+    step with iteration None.
+
+    phase(name) adds the block's wall time to `<name>_ms`, less any
+    nested phase and less time spent waiting for gui_lock, which is
+    reported once for the whole step as gui_wait_ms. Phases may nest
+    (a navigation's settle counts as settle, not action). Whatever no
+    phase covers (credential lookup, decision logic) is total_ms minus
+    the phases.
+    """
+
+    def __init__(self, iteration: int | None, phase: str | None = None) -> None:
+        self._t0 = time.monotonic()
+        self._gui = gui_timing()
+        self._ms: dict[str, float] = {}
+        self._inner = 0.0       # elapsed of nested phases, for the enclosing one
+        self._inner_wait = 0.0  # GUI wait inside those nested phases
+        self.record: dict = {'iteration': iteration}
+        if phase is not None:
+            self.record['phase'] = phase
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        t0 = time.monotonic()
+        wait0 = self._gui['wait_s']
+        outer, outer_wait = self._inner, self._inner_wait
+        self._inner = self._inner_wait = 0.0
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - t0
+            waited = self._gui['wait_s'] - wait0
+            own = elapsed - self._inner - (waited - self._inner_wait)
+            self._ms[name] = self._ms.get(name, 0.0) + max(own, 0.0) * 1000
+            self._inner, self._inner_wait = outer + elapsed, outer_wait + waited
+
+    def add_vlm(self, info: dict) -> None:
+        """Record the VLM call's client timings and token usage."""
+        timings = info.get('last_timings') or {}
+        usage = info.get('last_usage') or {}
+        for key in ('encode_ms', 'network_ms', 'parse_ms'):
+            if timings.get(key) is not None:
+                self.record[key] = round(timings[key])
+        server_ms = (usage.get('prompt_ms') or 0) + (usage.get('gen_ms') or 0)
+        if server_ms:
+            self.record['server_ms'] = round(server_ms)
+        for key in ('prompt_tokens', 'cached_tokens', 'completion_tokens'):
+            if usage.get(key) is not None:
+                self.record[key] = usage[key]
+
+    def finish(self) -> dict:
+        record = dict(self.record)
+        for name, ms in self._ms.items():
+            record[f'{name}_ms'] = round(ms)
+        record['gui_wait_ms'] = round(self._gui['wait_s'] * 1000)
+        record['gui_hold_ms'] = round(self._gui['hold_s'] * 1000)
+        record['total_ms'] = round((time.monotonic() - self._t0) * 1000)
+        return record
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _clipboard_copy(text: str) -> None:
-    """Copy text to the macOS clipboard via pbcopy."""
-    try:
-        subprocess.run(
-            ['pbcopy'],
-            input=text.encode(),
-            check=True,
-            timeout=5,
-        )
-    except (OSError, subprocess.TimeoutExpired) as exc:
-        log.warning('pbcopy failed: %s', exc)
+def set_desktop(desktop: Desktop | None) -> None:
+    """Drive desktop instead of the Mac's Chrome, screen and input (None: macOS).
+
+    Process-wide, like window_registry.set_backend(): every executor in
+    the process uses the same desktop. See agent.desktop.
+    """
+    global browser, ss, mouse, keyboard, scroll_mod, player
+    global focus_window_by_pid, focus_window, _clipboard_copy
+    desktop = desktop or macos_desktop()
+    browser = desktop.browser
+    ss = desktop.screenshot
+    mouse = desktop.mouse
+    keyboard = desktop.keyboard
+    scroll_mod = desktop.scroll
+    player = desktop.player
+    focus_window_by_pid = desktop.focus_window_by_pid
+    focus_window = desktop.focus_window
+    _clipboard_copy = desktop.clipboard_copy
+
+
+def _plan_credential(value: str) -> InputPlan | None:
+    """Choose how a credential is entered: None to paste, else a typing plan.
+
+    Call before taking gui_lock; _enter_credential replays the choice.
+    """
+    if random.random() < 0.4:
+        return None
+    return keyboard.plan_type(value, speed='medium', accuracy='high')
 
 
-def _enter_credential(value: str) -> bool:
-    """Type or paste a credential value. Returns True if paste was used.
+def _enter_credential(value: str, typing: InputPlan | None) -> bool:
+    """Paste a credential, or replay its typing plan. Returns True if pasted.
 
     MUST be called while holding gui_lock.
     """
-    if random.random() < 0.4:
+    if typing is None:
         _clipboard_copy(value)
         keyboard.hotkey('command', 'v')
         time.sleep(0.15)
         return True
-    else:
-        keyboard.type_text(value, speed='medium', accuracy='high')
-        return False
+    player.play(typing)
+    return False
 
 
-def _simulate_app_switch(session) -> None:
-    """Move mouse toward the dock and defocus Chrome.
-
-    MUST be called while holding gui_lock.
-    """
-    from agent.input.window import focus_window
+def _plan_app_switch(session, start=None) -> InputPlan:
+    """Plan the mouse move toward the dock that precedes an app switch."""
     bounds = session.bounds
     dock_x = bounds.get('x', 0) + bounds.get('width', 1280) // 2
     dock_y = bounds.get('y', 0) + bounds.get('height', 900) + 60
-    mouse.move_to(dock_x, dock_y, fast=False)
+    return mouse.plan_move(dock_x, dock_y, fast=False, start=start)
+
+
+def _simulate_app_switch(plan: InputPlan) -> None:
+    """Replay the move toward the dock (_plan_app_switch) and defocus Chrome.
+
+    MUST be called while holding gui_lock.
+    """
+    player.play(plan)
     focus_window('Finder')
 
 
@@ -231,11 +434,13 @@ def _next_month_date(today: date | None = None) -> date:
     return date(year, month, min(today.day, last_day))
 
 
-def _click_bbox(bbox, session, chrome_offset: int = 0) -> None:
-    """Click inside a bbox with inset and center-biased Gaussian randomization.
+def _plan_click_bbox(bbox, session, chrome_offset: int = 0, start=None) -> InputPlan:
+    """Plan a click inside a bbox with inset and center-biased Gaussian randomization.
 
     Accepts [x1, y1, x2, y2] bounding box or [x, y] point coordinate.
-    MUST be called while holding gui_lock.
+    start: expected cursor position at replay (default: current), e.g.
+    the target of the plan replayed just before.
+    Call before taking gui_lock; replay with player.play while holding it.
     """
     if len(bbox) == 2:
         # Point coordinate: click with small Gaussian jitter (~16x16 target)
@@ -252,7 +457,7 @@ def _click_bbox(bbox, session, chrome_offset: int = 0) -> None:
               'display_scale=%.2f -> screen=(%.1f, %.1f)',
               cx, cy, chrome_offset, session.bounds,
               coords._get_display_scale(), sx, sy)
-    mouse.click(sx, sy)
+    return mouse.plan_click(sx, sy, start=start)
 
 
 def _bbox_to_screen(bbox, session, chrome_offset: int = 0):
@@ -274,7 +479,7 @@ def _restore_cursor(screen_bbox, session) -> bool:
     Each concurrent job tracks where it last clicked (in screen coordinates).
     Before screenshots and action execution, we check whether the cursor is
     still inside that box. If another job moved it away, we re-enter the box
-    at a random point (center-biased Gaussian, matching _click_bbox
+    at a random point (center-biased Gaussian, matching _plan_click_bbox
     distribution) so hover menus reappear.
 
     MUST be called while holding gui_lock. The caller is responsible for
@@ -293,23 +498,132 @@ def _restore_cursor(screen_bbox, session) -> bool:
     return True
 
 
+# ---------------------------------------------------------------------------
+# GUI sections (run via in_gui_thread; each takes gui_lock itself)
+# ---------------------------------------------------------------------------
+
+def _perform_action(pending_action: dict, session, last_click_screen_bbox):
+    """Phase 1: restore the cursor and execute a pending action.
+
+    Returns the new last-clicked screen bbox.
+    """
+    pa_type = pending_action['type']
+    # Plan the input before taking the lock; the lock only covers replay
+    plan = None
+    if pa_type == 'click':
+        plan = _plan_click_bbox(pending_action['bbox'], session,
+                                chrome_offset=pending_action['chrome_offset'])
+    elif pa_type == 'type_text':
+        plan = _plan_credential(pending_action['text'])
+    elif pa_type in ('scroll_down', 'scroll_up'):
+        plan = scroll_mod.plan_scroll(pending_action['direction'],
+                                      pending_action['scroll_clicks'])
+    with gui_lock:
+        if last_click_screen_bbox is not None:
+            if _restore_cursor(last_click_screen_bbox, session):
+                time.sleep(0.2)
+        focus_window_by_pid(session.pid)
+
+        if pa_type == 'click':
+            player.play(plan)
+            last_click_screen_bbox = _bbox_to_screen(
+                pending_action['bbox'], session,
+                chrome_offset=pending_action['chrome_offset'],
+            )
+        elif pa_type == 'type_text':
+            _enter_credential(pending_action['text'], plan)
+        elif pa_type in ('scroll_down', 'scroll_up'):
+            player.play(plan)
+            last_click_screen_bbox = None
+        elif pa_type == 'press_key':
+            keyboard.press_key(pending_action['key'])
+    return last_click_screen_bbox
+
+
+def _auto_type(value: str, session) -> None:
+    """Select the clicked field's contents and enter a credential."""
+    typing = _plan_credential(value)
+    with gui_lock:
+        focus_window_by_pid(session.pid)
+        keyboard.hotkey('command', 'a')
+        time.sleep(0.1)
+        _enter_credential(value, typing)
+
+
+def _press_key(key: str, session) -> None:
+    with gui_lock:
+        focus_window_by_pid(session.pid)
+        keyboard.press_key(key)
+
+
+def _capture(session, last_click_screen_bbox, job_id: str) -> Frame:
+    """Phase 3: restore the cursor and capture, under one lock acquisition.
+
+    Raises RuntimeError if the Chrome window is gone.
+    """
+    with gui_lock:
+        if last_click_screen_bbox is not None:
+            if _restore_cursor(last_click_screen_bbox, session):
+                log.debug('Job %s: cursor restored before screenshot', job_id)
+                time.sleep(0.3)
+        browser.get_session_window(session)
+        return ss.capture_frame(session.window_id)
+
+
+def _prepare_page(raw_frame: Frame) -> tuple[Frame, int]:
+    """Crop the browser chrome and hash the page (CPU work, off the loop)."""
+    page, chrome_height_px = crop_browser_chrome_frame(raw_frame)
+    page.dhash  # noqa: B018 - cached on the Frame for reuse/cache lookups
+    return page, chrome_height_px
+
+
 # ---------------------------------------------------------------------------
 # VLMExecutor
 # ---------------------------------------------------------------------------
 
+# Per-call client attributes recorded in the debug trace.
+_VLM_LAST_ATTRS = (
+    'last_sent_image_b64', 'last_image_budget', 'last_stream_stats',
+    'last_usage', 'last_backend', 'last_timings',
+)
+
+
 class VLMExecutor:
     """Production executor: drives Chrome via VLM screenshot analysis.
 
     Args:
-        vlm: VLMClient instance for screenshot analysis.
+        vlm: VLMClient (or VLMPool) for screenshot analysis.
         profile: Human behavioral profile for timing.
         otp_callback: Async callable(job_id, service) -> str|None.
             Called when the VLM detects an OTP/verification code page.
         credential_callback: Async callable(job_id, service, credential_name) -> str|None.
             Called when a credential (e.g. CVV) is needed but not in the credentials dict.
-        loop: Event loop for scheduling async callbacks from
-            the synchronous executor thread.
-        settle_delay: Seconds to wait after each action for page to settle.
+        loop: Event loop the callbacks belong to. None (or the loop
+            running run_async) awaits them directly; another loop is
+            reached via run_coroutine_threadsafe.
+        settle_delay: Seconds to wait after each action for page to settle
+            (fixed mode).
+        settle_mode: 'fixed' (sleep settle_delay) or 'adaptive' (poll
+            low-res captures until the page is visually stable, bounded
+            by SETTLE_MIN/SETTLE_MAX). Defaults to SETTLE_MODE env.
+        frame_reuse: Skip inference when the page is perceptually
+            unchanged since the last VLM call in the same phase.
+            Defaults to FRAME_REUSE env.
+        response_cache: Shared cross-job ResponseCache, or None to always
+            ask the VLM (unless the page is unchanged within this job).
+        flows: Shared FlowStore of learned flows. Jobs replay a verified
+            flow for their service/action/plan until the page diverges,
+            and successful jobs are recorded into it. None disables.
+        two_tier: Run a low-res triage pass first and the full grounding
+            prompt only when the page needs an interaction. Defaults to
+            VLM_TWO_TIER env.
+        action_plans: Let cancel/resume responses list follow-on clicks
+            on the same screenshot; each runs after a local check of its
+            target instead of an inference. Defaults to VLM_ACTION_PLANS
+            env.
+        sessions: Shared SessionManager to take Chrome from (warm pool)
+            and hand it back to for background teardown. None launches
+            and closes Chrome inline.
         max_steps: Maximum VLM analysis steps before aborting.
     """
 
@@ -323,6 +637,13 @@ class VLMExecutor:
         settle_delay: float | None = None,
         max_steps: int = 60,
         debug: bool = True,
+        settle_mode: str | None = None,
+        frame_reuse: bool | None = None,
+        response_cache: ResponseCache | None = None,
+        two_tier: bool | None = None,
+        sessions: SessionManager | None = None,
+        flows: FlowStore | None = None,
+        action_plans: bool | None = None,
     ) -> None:
         self.vlm = vlm
         self.profile = profile or NORMAL
@@ -333,9 +654,27 @@ class VLMExecutor:
             self.settle_delay = settle_delay
         else:
             self.settle_delay = float(os.environ.get('SETTLE_DELAY', '2.5'))
+        self._settle_cfg = get_settle_config()
+        if settle_mode is not None:
+            self._settle_cfg['mode'] = settle_mode
+        self._frame_cfg = get_frame_tracker_config()
+        if frame_reuse is not None:
+            self._frame_cfg['reuse'] = frame_reuse
+        self._cache = response_cache
+        self._flows = flows
+        self._triage_cfg = get_triage_config()
+        if two_tier is not None:
+            self._triage_cfg['enabled'] = two_tier
+        self._plan_cfg = get_plan_config()
+        if action_plans is not None:
+            self._plan_cfg['enabled'] = action_plans
+        self._sessions = sessions
         self.max_steps = max_steps
         self._debug = debug
         self._otp_was_used = False
+        self._settle_log: list[dict] = []
+        self._step: _StepTimer | None = None
+        self._cancel = CancelToken()
 
     def run(
         self,
@@ -345,6 +684,24 @@ class VLMExecutor:
         job_id: str = '',
         plan_tier: str = '',
         user_npub: str = '',
+        cancel: CancelToken | None = None,
+    ) -> ExecutionResult:
+        """Blocking wrapper around run_async() for synchronous callers.
+
+        Must not be called from a thread with a running event loop.
+        """
+        return asyncio.run(self.run_async(
+            service, action, credentials, job_id, plan_tier, user_npub, cancel))
+
+    async def run_async(
+        self,
+        service: str,
+        action: str,
+        credentials: dict[str, str],
+        job_id: str = '',
+        plan_tier: str = '',
+        user_npub: str = '',
+        cancel: CancelToken | None = None,
     ) -> ExecutionResult:
         """Execute a cancel/resume flow for the given service.
 
@@ -355,15 +712,38 @@ class VLMExecutor:
             job_id: Job identifier for logging and OTP requests.
             plan_tier: Plan tier for resume flows (e.g. 'premium').
             user_npub: User npub for debug trace metadata.
+            cancel: Token that aborts the flow (POST /abort). When it
+                fires the run ends within one await, closes Chrome and
+                returns a failed 'Job aborted' result.
 
         Returns:
             ExecutionResult with success/failure, duration, billing_date, etc.
         """
         t0 = time.monotonic()
         inference_count = 0
+        inferences_reused = 0
+        inferences_triaged = 0
+        inferences_cached = 0
+        inferences_planned = 0
+        replay = (FlowReplay(self._flows, service, action, plan_tier)
+                  if self._flows is not None else None)
         step_count = 0
+        self._settle_log = []
+        self._cancel = cancel or CancelToken()
+        # Attributes this task's GUI lock waits and holds to the job
+        gui_job.set(job_id or None)
+        step_results: list[dict] = []
+        self._step = None
+
+        def _end_step() -> None:
+            if self._step is not None:
+                step_results.append(self._step.finish())
+                self._step = None
 
         def _result(success: bool, error_message: str = '', **kw) -> ExecutionResult:
+            _end_step()
+            if replay is not None:
+                replay.finish(success)
             return ExecutionResult(
                 job_id=job_id,
                 service=service,
@@ -372,16 +752,21 @@ class VLMExecutor:
                 duration_seconds=time.monotonic() - t0,
                 step_count=step_count,
                 inference_count=inference_count,
+                inferences_reused=inferences_reused,
+                inferences_cached=inferences_cached,
+                inferences_triaged=inferences_triaged,
+                inferences_planned=inferences_planned,
+                inferences_replayed=replay.hits if replay is not None else 0,
+                replay_hit_rate=replay.hit_rate if replay is not None else None,
                 error_message=error_message,
                 otp_required=self._otp_was_used,
+                step_results=step_results,
                 **kw,
             )
 
         if service not in SERVICE_URLS:
             return _result(False, f'Unknown service: {service}')
 
-        DebugTrace.prune_old()
-
         start_url = SERVICE_URLS[service]
         session = None
         billing_date = None
@@ -390,25 +775,36 @@ class VLMExecutor:
         if user_npub:
             trace_meta['user_npub'] = user_npub
         trace = DebugTrace(job_id, enabled=self._debug and bool(job_id),
-                           metadata=trace_meta)
+                           metadata=trace_meta,
+                           ring_size=get_debug_trace_config()['ring_steps'])
 
         try:
-            # Launch Chrome (create_session handles its own gui_lock internally)
-            session = browser.create_session()
+            self._step = _StepTimer(None, phase='setup')
+
+            # Launch Chrome, or take a pre-launched one from the pool
+            # (create_session handles its own gui_lock internally)
+            with self._phase('launch'):
+                session = await self._launch()
             log.info('Chrome launched (PID %d) for job %s', session.pid, job_id)
 
             # Navigate to login page (navigate handles its own gui_lock internally)
-            browser.navigate(session, start_url, fast=True)
+            with self._phase('action'):
+                await self._navigate(session, start_url, fast=True)
             step_count += 1
 
             # Optional pre-login scroll: push distracting nav elements
             # out of view so the VLM focuses on the main CTA.
             pre_scroll = PRE_LOGIN_SCROLL.get(service, 0)
             if pre_scroll:
-                time.sleep(0.5)
-                with gui_lock:
-                    focus_window_by_pid(session.pid)
-                    scroll_mod.scroll('down', pre_scroll)
+                await self._cancel.sleep(0.5)
+
+                def _pre_scroll():
+                    plan = scroll_mod.plan_scroll('down', pre_scroll)
+                    with gui_priority(GuiPriority.NAVIGATE), gui_lock:
+                        focus_window_by_pid(session.pid)
+                        player.play(plan)
+                with self._phase('action'), gui_priority(GuiPriority.NAVIGATE):
+                    await in_gui_thread(_pre_scroll)
 
             # Build prompt chain
             prompts = [build_signin_prompt(service)]
@@ -421,22 +817,37 @@ class VLMExecutor:
                 labels.append('resume')
             else:
                 return _result(False, f'Unknown action: {action}')
+            if self._plan_cfg['enabled']:
+                prompts[1] = build_plan_prompt(prompts[1], self._plan_cfg['max_steps'])
 
             prompt_idx = 0
-            stuck = _StuckDetector()
+            stuck = _StuckDetector(
+                max_distance=self._frame_cfg['stuck_distance'])
+            frames = FrameTracker(
+                enabled=self._frame_cfg['reuse'],
+                unchanged_distance=self._frame_cfg['unchanged_distance'],
+                max_reuse=self._frame_cfg['max_reuse'],
+                reuse_active=self._frame_cfg['reuse_active'],
+            )
             last_click_screen_bbox = None
             pending_action = None
             used_account_fallback = False
             last_typed_cred_key = None
             captured_billing_date = None
+            action_plan: ActionPlan | None = None
             consecutive_vlm_errors = 0
+            vlm_info: dict = {}  # client's last_* of the latest VLM call
 
             for iteration in range(self.max_steps):
+                _end_step()
+                self._step = _StepTimer(iteration)
+
                 # Wall-clock timeout guard
                 if time.monotonic() - t0 > TOTAL_EXECUTION_TIMEOUT:
                     error_message = f'Total execution timeout ({TOTAL_EXECUTION_TIMEOUT}s) exceeded'
                     log.warning('Job %s: %s', job_id, error_message)
                     return _result(False, error_message)
+                self._cancel.raise_if_cancelled()
 
                 # -------------------------------------------------------
                 # Phase 1 [lock]: Execute pending action from previous
@@ -444,66 +855,45 @@ class VLMExecutor:
                 # -------------------------------------------------------
                 if pending_action is not None:
                     pa_type = pending_action['type']
+                    self._step.record['action'] = pa_type
                     if pa_type != 'wait':
-                        with gui_lock:
-                            if last_click_screen_bbox is not None:
-                                if _restore_cursor(last_click_screen_bbox, session):
-                                    time.sleep(0.2)
-                            focus_window_by_pid(session.pid)
-
-                            if pa_type == 'click':
-                                _click_bbox(
-                                    pending_action['bbox'], session,
-                                    chrome_offset=pending_action['chrome_offset'],
-                                )
-                                last_click_screen_bbox = _bbox_to_screen(
-                                    pending_action['bbox'], session,
-                                    chrome_offset=pending_action['chrome_offset'],
-                                )
-                            elif pa_type == 'type_text':
-                                _enter_credential(pending_action['text'])
-                            elif pa_type in ('scroll_down', 'scroll_up'):
-                                scroll_mod.scroll(
-                                    pending_action['direction'],
-                                    pending_action['scroll_clicks'],
-                                )
-                                last_click_screen_bbox = None
-                            elif pa_type == 'press_key':
-                                keyboard.press_key(pending_action['key'])
-
-                        step_count += 1
-
-                        # Auto-type after click (separate lock acquisition)
-                        if pa_type == 'click' and pending_action.get('auto_value'):
-                            time.sleep(0.3)
-                            with gui_lock:
-                                focus_window_by_pid(session.pid)
-                                keyboard.hotkey('command', 'a')
-                                time.sleep(0.1)
-                                _enter_credential(pending_action['auto_value'])
+                        with self._phase('action'):
+                            last_click_screen_bbox = await in_gui_thread(
+                                _perform_action, pending_action, session,
+                                last_click_screen_bbox,
+                            )
                             step_count += 1
 
-                        # Phase 2 [no lock]: Settle delay
-                        time.sleep(self.settle_delay)
-
-                        # After profile selection, jump to account page
-                        # instead of making the VLM find the account icon.
-                        if (pa_type == 'click'
-                                and pending_action.get('is_profile_click')
-                                and not used_account_fallback):
-                            account_url = ACCOUNT_URLS.get(service)
-                            if account_url:
-                                time.sleep(self.settle_delay)
-                                browser.navigate(session, account_url)
-                                zoom = ACCOUNT_ZOOM_STEPS.get(
-                                    service, ACCOUNT_ZOOM_DEFAULT)
-                                if zoom:
-                                    browser.zoom_out(session, steps=zoom)
-                                used_account_fallback = True
+                            # Auto-type after click (separate lock acquisition)
+                            if pa_type == 'click' and pending_action.get('auto_value'):
+                                await self._cancel.sleep(0.3)
+                                await in_gui_thread(
+                                    _auto_type, pending_action['auto_value'], session)
                                 step_count += 1
-                                last_click_screen_bbox = None
-                                log.info('Job %s: post-profile jump to %s',
-                                         job_id, account_url)
+
+                            # Phase 2 [no lock]: Settle
+                            await self._settle(session, label=pa_type)
+
+                            # After profile selection, jump to account page
+                            # instead of making the VLM find the account icon.
+                            if (pa_type == 'click'
+                                    and pending_action.get('is_profile_click')
+                                    and not used_account_fallback):
+                                account_url = ACCOUNT_URLS.get(service)
+                                if account_url:
+                                    # Adaptive mode returns almost at once here:
+                                    # the page already settled above.
+                                    await self._settle(session, label='profile')
+                                    await self._navigate(session, account_url)
+                                    zoom = ACCOUNT_ZOOM_STEPS.get(
+                                        service, ACCOUNT_ZOOM_DEFAULT)
+                                    if zoom:
+                                        await self._zoom_out(session, zoom)
+                                    used_account_fallback = True
+                                    step_count += 1
+                                    last_click_screen_bbox = None
+                                    log.info('Job %s: post-profile jump to %s',
+                                             job_id, account_url)
 
                     pending_action = None
 
@@ -513,15 +903,11 @@ class VLMExecutor:
                 # another job from displacing the cursor between restore
                 # and capture.
                 # -------------------------------------------------------
+                self._cancel.raise_if_cancelled()
                 try:
-                    with gui_lock:
-                        if last_click_screen_bbox is not None:
-                            if _restore_cursor(last_click_screen_bbox, session):
-                                log.debug('Job %s: cursor restored before screenshot',
-                                          job_id)
-                                time.sleep(0.3)
-                        browser.get_session_window(session)
-                        raw_b64 = ss.capture_to_base64(session.window_id)
+                    with self._phase('capture'):
+                        raw_frame = await in_gui_thread(
+                            _capture, session, last_click_screen_bbox, job_id)
                 except RuntimeError as exc:
                     error_message = f'Chrome window lost: {exc}'
                     log.warning('Job %s: %s', job_id, error_message)
@@ -531,62 +917,164 @@ class VLMExecutor:
                 # than a cached Quartz value. screencapture captures at
                 # physical pixel resolution; bounds are in screen points.
                 try:
-                    raw_w, _ = ss.png_dimensions(raw_b64)
+                    raw_w, _ = raw_frame.size
                     bounds_w = session.bounds.get('width', 1)
                     effective_scale = raw_w / bounds_w if bounds_w else 1.0
                     coords.set_display_scale(effective_scale)
                 except (ValueError, Exception):
                     pass  # keep existing override (tests use non-PNG stubs)
 
-                screenshot_b64, chrome_height_px = crop_browser_chrome(raw_b64)
+                # page is a cached view on raw_frame: the capture is decoded
+                # once and encoded once (by the VLM client) per step.
+                with self._phase('crop'):
+                    page, chrome_height_px = await asyncio.to_thread(_prepare_page, raw_frame)
 
                 # -------------------------------------------------------
-                # Phase 4 [no lock]: VLM inference
+                # Phase 4 [no lock]: VLM inference, skipped when the last
+                # response planned a step whose target is unchanged, the
+                # page is perceptually unchanged since the last call, the
+                # next step of a learned flow matches, or a matching
+                # response is in the cross-job cache.
                 # -------------------------------------------------------
                 current_prompt = prompts[prompt_idx]
                 current_label = labels[prompt_idx]
+                self._step.record['phase'] = current_label
+                inference_source = 'vlm'
+                cache_ctx = None
+                tiers = None
+
+                cached = action_plan.next(page) if action_plan else None
+                if cached is not None:
+                    inference_source = 'plan'
+                    inferences_planned += 1
+                    frames.record(page, current_label, *cached)
+                    log.debug('Job %s: plan step %s (target diff %.3f)',
+                              job_id, cached[0]['state'], action_plan.last_diff)
+                else:
+                    if action_plan is not None and action_plan.abandoned:
+                        log.info('Job %s: plan abandoned, target changed (diff %.3f)',
+                                 job_id, action_plan.last_diff)
+                    action_plan = None
+                    cached = frames.reusable(page, current_label)
+                    if cached is not None:
+                        inference_source = 'reused'
+                        inferences_reused += 1
+                        log.debug('Job %s: page unchanged (distance %d), reusing %s response',
+                                  job_id, frames.last_distance, current_label)
+                        if is_passive(current_label, cached[0]):
+                            # Spinner / wait: nothing to act on, just wait again.
+                            self._step.record['source'] = inference_source
+                            await self._settle(session, label='unchanged')
+                            continue
+                    else:
+                        if replay is not None:
+                            cached = replay.lookup(page, current_label)
+                        if cached is not None:
+                            inference_source = 'replay'
+                            frames.record(page, current_label, *cached)
+                            log.debug('Job %s: %s step %d replayed from flow %s',
+                                      job_id, current_label, replay.hits, replay.flow_id)
+                        else:
+                            cache_ctx = self._cache_context(
+                                service, current_label, current_prompt, page)
+                            if cache_ctx is not None:
+                                cached = await asyncio.to_thread(
+                                    self._cache.get, cache_ctx, page.dhash)
+                            if cached is not None:
+                                inference_source = 'cache'
+                                inferences_cached += 1
+                                frames.record(page, current_label, *cached)
+                                log.debug('Job %s: %s response served from cache',
+                                          job_id, current_label)
+
+                self._step.record['source'] = inference_source
+                if cached is not None:
+                    response, scale_factor = cached
+                    vlm_response_ms = 0
+                else:
+                    try:
+                        vlm_t0 = time.monotonic()
+                        with self._phase('vlm'):
+                            response, scale_factor, tiers = await self._cancel.wait_for(
+                                asyncio.to_thread(
+                                    self._infer_recorded, vlm_info,
+                                    page, service, current_label, current_prompt,
+                                    billing_known=bool(captured_billing_date),
+                                ))
+                        vlm_response_ms = round((time.monotonic() - vlm_t0) * 1000)
+                        self._step.add_vlm(vlm_info)
+                        inference_count += 1
+                        consecutive_vlm_errors = 0
+                        triaged = tiers is not None and tiers['resolved_by'] == 'triage'
+                        if triaged:
+                            inferences_triaged += 1
+                        frames.record(page, current_label, response, scale_factor)
+                        # Triage answers are never cached: a cached 'done'
+                        # could skip another job's billing-date read.
+                        if cache_ctx is not None and not triaged:
+                            await asyncio.to_thread(
+                                self._cache.put, cache_ctx, page.dhash, service,
+                                current_label, response, scale_factor,
+                                secrets=tuple(str(v) for v in credentials.values() if v),
+                            )
+                    except JobCancelled:
+                        raise
+                    except Exception as exc:
+                        consecutive_vlm_errors += 1
+                        log.warning('VLM error on iteration %d (%d consecutive): %s',
+                                    iteration, consecutive_vlm_errors, exc)
+                        sent_b64 = vlm_info.get('last_sent_image_b64') or ''
+                        await self._trace_step(
+                            trace, iteration, page, None,
+                            phase=current_label,
+                            sent_image_b64=sent_b64,
+                            prompt=current_prompt)
+                        if consecutive_vlm_errors >= 3:
+                            error_message = f'VLM returned unparseable output {consecutive_vlm_errors} times'
+                            log.warning('Job %s: %s', job_id, error_message)
+                            return _result(False, error_message)
+                        continue
 
-                try:
-                    vlm_t0 = time.monotonic()
-                    response, scale_factor = self.vlm.analyze(
-                        screenshot_b64, current_prompt,
-                    )
-                    vlm_response_ms = round((time.monotonic() - vlm_t0) * 1000)
-                    inference_count += 1
-                    consecutive_vlm_errors = 0
-                except Exception as exc:
-                    consecutive_vlm_errors += 1
-                    log.warning('VLM error on iteration %d (%d consecutive): %s',
-                                iteration, consecutive_vlm_errors, exc)
-                    sent_b64 = getattr(self.vlm, 'last_sent_image_b64', '')
-                    trace.save_step(iteration, screenshot_b64, None,
-                                    phase=current_label,
-                                    sent_image_b64=sent_b64,
-                                    prompt=current_prompt)
-                    if consecutive_vlm_errors >= 3:
-                        error_message = f'VLM returned unparseable output {consecutive_vlm_errors} times'
-                        log.warning('Job %s: %s', job_id, error_message)
-                        return _result(False, error_message)
-                    continue
-
-                sent_b64 = getattr(self.vlm, 'last_sent_image_b64', '')
-                trace.save_step(iteration, screenshot_b64, response,
-                                phase=current_label,
-                                scale_factor=scale_factor,
-                                diagnostics={
-                                    'window_bounds': dict(session.bounds),
-                                    'display_scale': coords._get_display_scale(),
-                                    'chrome_offset_px': chrome_height_px,
-                                    'vlm_scale_factor': scale_factor,
-                                    'vlm_max_width': self.vlm._max_image_width,
-                                    'vlm_coord_normalize': self.vlm._normalized_coords,
-                                    'vlm_coord_yx': self.vlm._coord_yx,
-                                    'vlm_coord_square_pad': self.vlm._coord_square_pad,
-                                    'vlm_response_ms': vlm_response_ms,
-                                    'last_click_screen_bbox': last_click_screen_bbox,
-                                },
-                                sent_image_b64=sent_b64,
-                                prompt=current_prompt)
+                if replay is not None and inference_source != 'reused':
+                    replay.observe(page, current_label, response, scale_factor,
+                                   inference_source,
+                                   secrets=tuple(str(v) for v in credentials.values() if v))
+
+                sent_b64 = ((vlm_info.get('last_sent_image_b64') or '')
+                            if inference_source not in ('cache', 'replay', 'plan') else '')
+                with self._phase('trace'):
+                    await self._trace_step(
+                        trace, iteration, page, response,
+                        phase=current_label,
+                        scale_factor=scale_factor,
+                        diagnostics={
+                            'window_bounds': dict(session.bounds),
+                            'display_scale': coords._get_display_scale(),
+                            'chrome_offset_px': chrome_height_px,
+                            'capture': raw_frame.capture,
+                            'vlm_scale_factor': scale_factor,
+                            'vlm_max_width': self.vlm._max_image_width,
+                            'vlm_image_budget': (
+                                str(vlm_info.get('last_image_budget'))
+                                if inference_source == 'vlm' else None),
+                            'vlm_coord_normalize': self.vlm._normalized_coords,
+                            'vlm_coord_yx': self.vlm._coord_yx,
+                            'vlm_coord_square_pad': self.vlm._coord_square_pad,
+                            'vlm_response_ms': vlm_response_ms,
+                            'inference_source': inference_source,
+                            'vlm_stream': (vlm_info.get('last_stream_stats')
+                                           if inference_source == 'vlm' else None),
+                            'vlm_usage': (vlm_info.get('last_usage')
+                                          if inference_source == 'vlm' else None),
+                            'vlm_backend': (vlm_info.get('last_backend')
+                                            if inference_source == 'vlm' else None),
+                            'vlm_tiers': tiers,
+                            'frame_distance': frames.last_distance,
+                            'last_click_screen_bbox': last_click_screen_bbox,
+                            'settle': self._settle_log[-1] if self._settle_log else None,
+                        },
+                        sent_image_b64=sent_b64,
+                        prompt=current_prompt)
 
                 # -------------------------------------------------------
                 # Phase 5 [no lock]: Parse result, resolve credentials,
@@ -597,16 +1085,21 @@ class VLMExecutor:
                 if current_label == 'sign-in':
                     page_type = response.get('page_type', 'unknown')
 
-                    if stuck.check(page_type, page_type, screenshot_b64):
+                    if stuck.check(page_type, page_type, page):
+                        if inference_source == 'cache':
+                            await asyncio.to_thread(self._cache.discard, cache_ctx, page.dhash)
+                        elif inference_source == 'replay':
+                            replay.diverge()
                         error_message = f'Stuck during sign-in (page_type={page_type} repeated)'
                         log.warning('Job %s: %s', job_id, error_message)
                         return _result(False, error_message)
 
-                    result = self._execute_signin_page(
-                        response, scale_factor, session,
-                        screenshot_b64, chrome_height_px,
-                        credentials, job_id, service,
-                    )
+                    with self._phase('action'):
+                        result = await self._execute_signin_page(
+                            response, scale_factor, session,
+                            page, chrome_height_px,
+                            credentials, job_id, service,
+                        )
                     step_count += 1
 
                     if result == 'done':
@@ -621,10 +1114,11 @@ class VLMExecutor:
                             # menus. Saves inference calls and bandwidth.
                             account_url = ACCOUNT_URLS.get(service)
                             if account_url and ACCOUNT_URL_JUMP.get(service, True):
-                                browser.navigate(session, account_url)
-                                zoom = ACCOUNT_ZOOM_STEPS.get(service, ACCOUNT_ZOOM_DEFAULT)
-                                if zoom:
-                                    browser.zoom_out(session, steps=zoom)
+                                with self._phase('action'):
+                                    await self._navigate(session, account_url)
+                                    zoom = ACCOUNT_ZOOM_STEPS.get(service, ACCOUNT_ZOOM_DEFAULT)
+                                    if zoom:
+                                        await self._zoom_out(session, zoom)
                                 used_account_fallback = True
                                 step_count += 1
                                 log.info('Job %s: navigated to %s',
@@ -690,22 +1184,27 @@ class VLMExecutor:
                     log.warning('Job %s: %s', job_id, error_message)
                     return _result(False, error_message)
 
-                if stuck.check(state, vlm_action, screenshot_b64):
+                if stuck.check(state, vlm_action, page):
+                    if inference_source == 'cache':
+                        await asyncio.to_thread(self._cache.discard, cache_ctx, page.dhash)
+                    elif inference_source == 'replay':
+                        replay.diverge()
                     account_url = ACCOUNT_URLS.get(service)
                     if account_url and not used_account_fallback:
                         log.info('Job %s: stuck, navigating to %s',
                                  job_id, account_url)
-                        browser.navigate(session, account_url)
-                        zoom = ACCOUNT_ZOOM_STEPS.get(service, ACCOUNT_ZOOM_DEFAULT)
-                        if zoom:
-                            browser.zoom_out(session, steps=zoom)
-                        # Dismiss any "Leave page?" beforeunload dialog
-                        with gui_lock:
-                            focus_window_by_pid(session.pid)
-                            keyboard.press_key('return')
-                        time.sleep(self.settle_delay)
+                        with self._phase('action'):
+                            await self._navigate(session, account_url)
+                            zoom = ACCOUNT_ZOOM_STEPS.get(service, ACCOUNT_ZOOM_DEFAULT)
+                            if zoom:
+                                await self._zoom_out(session, zoom)
+                            # Dismiss any "Leave page?" beforeunload dialog
+                            await in_gui_thread(_press_key, 'return', session)
+                            await self._settle(session, label='fallback')
                         used_account_fallback = True
                         stuck.reset()
+                        frames.reset()
+                        action_plan = None
                         last_click_screen_bbox = None
                         pending_action = None
                         last_typed_cred_key = None
@@ -729,7 +1228,7 @@ class VLMExecutor:
                         )
                         if not actual_value and template.startswith('{'):
                             cred_key = template.strip('{}')
-                            value = self._request_credential(job_id, service, cred_key)
+                            value = await self._request_credential(job_id, service, cred_key)
                             if value:
                                 credentials[cred_key] = value
                                 actual_value = value
@@ -745,6 +1244,15 @@ class VLMExecutor:
                             and 'add' not in target_desc.lower()
                         ),
                     }
+                    # Follow-on clicks on this screenshot, checked locally
+                    # next iteration instead of inferring again
+                    if (self._plan_cfg['enabled']
+                            and inference_source in ('vlm', 'cache')):
+                        steps = plan_steps(response, self._plan_cfg['max_steps'])
+                        if steps:
+                            action_plan = ActionPlan(
+                                page, steps, scale_factor, state=state,
+                                max_diff=self._plan_cfg['region_diff'])
 
                 elif vlm_action == 'type_text':
                     template, actual_value, _ = _resolve_credential(
@@ -752,7 +1260,7 @@ class VLMExecutor:
                     )
                     cred_key = template.strip('{}') if template.startswith('{') else None
                     if not actual_value and cred_key:
-                        value = self._request_credential(job_id, service, cred_key)
+                        value = await self._request_credential(job_id, service, cred_key)
                         if value:
                             credentials[cred_key] = value
                             actual_value = value
@@ -814,27 +1322,242 @@ class VLMExecutor:
             # Should not reach here (loop exits via return or break)
             return _result(False, error_message or 'Unexpected loop exit')
 
+        except JobCancelled:
+            log.info('Job %s: aborted (%s)', job_id, self._cancel.reason)
+            return _result(False, 'Job aborted')
+
         finally:
             _zero_credentials(credentials)
-
-            # Close Chrome
-            if session is not None:
+            # Failed, aborted or crashed: archive the recorded steps in the
+            # background (a successful job already dropped them)
+            trace.flush(error_message)
+
+            replayed = replay.hits if replay is not None else 0
+            if inferences_reused or inferences_cached or replayed or inferences_planned:
+                log.info('Job %s: inferences skipped: %d unchanged-page, %d cached, '
+                         '%d replayed, %d planned', job_id, inferences_reused,
+                         inferences_cached, replayed, inferences_planned)
+            if inferences_triaged:
+                log.info('Job %s: %d of %d inferences resolved by low-res triage',
+                         job_id, inferences_triaged, inference_count)
+
+            if self._settle_log:
+                log.info('Job %s: settle total %.1fs over %d waits (mode=%s)',
+                         job_id,
+                         sum(e['settle_ms'] for e in self._settle_log) / 1000,
+                         len(self._settle_log), self._settle_cfg['mode'])
+
+            # Close Chrome. Also runs when the task is cancelled (/abort).
+            # With a session manager the kill and profile cleanup happen
+            # in the background, after the result is reported.
+            if session is not None and self._sessions is not None:
+                self._sessions.release(session)
+                log.info('Chrome released for job %s', job_id)
+            elif session is not None:
                 try:
-                    browser.close_session(session)
+                    await asyncio.to_thread(browser.close_session, session)
                     log.info('Chrome closed for job %s', job_id)
                 except Exception as exc:
                     log.warning('Failed to close Chrome for job %s: %s', job_id, exc)
 
+    async def _launch(self):
+        """Launch Chrome, or take a pre-launched one from the session pool.
+
+        The launch is shielded: if the job is aborted or shut down while
+        Chrome starts, the session is released (or closed) once it is
+        ready instead of leaking Chrome and its profile.
+        """
+        if self._sessions is not None:
+            launch = asyncio.ensure_future(asyncio.to_thread(self._sessions.acquire))
+        else:
+            launch = asyncio.ensure_future(asyncio.to_thread(browser.create_session))
+        try:
+            return await asyncio.shield(launch)
+        except asyncio.CancelledError:
+            launch.add_done_callback(self._discard_launch)
+            raise
+
+    def _discard_launch(self, launch: asyncio.Future) -> None:
+        """Done-callback: tear down a session whose job was cancelled."""
+        if launch.cancelled() or launch.exception() is not None:
+            return
+        session = launch.result()
+        if self._sessions is not None:
+            self._sessions.release(session)
+        else:
+            launch.get_loop().run_in_executor(None, browser.close_session, session)
+        log.info('Chrome (PID %d) launched after the job was cancelled; closing it',
+                 session.pid)
+
+    @staticmethod
+    async def _trace_step(trace: DebugTrace, *args, **kwargs) -> None:
+        """Record a step in the debug trace.
+
+        A flight recorder only keeps it in memory; a write-through trace
+        writes files, so that runs on a worker thread.
+        """
+        if trace.buffered:
+            trace.save_step(*args, **kwargs)
+        else:
+            await asyncio.to_thread(trace.save_step, *args, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Inference
+    # ------------------------------------------------------------------
+
+    def _infer(
+        self, page: Frame, service: str, label: str, prompt: str,
+        billing_known: bool,
+    ) -> tuple[dict, float, dict | None]:
+        """Run one step's VLM inference.
+
+        Single-tier: the grounding prompt only; tiers is None. Two-tier:
+        a low-res triage pass first, then grounding unless the triage
+        answer can be acted on directly (see agent.recording.triage).
+        tiers records both passes' timings for the debug trace.
+
+        Raises whatever the VLM raises; an unparseable triage answer
+        escalates to grounding instead.
+        """
+        n_plan_steps = 0
+        if label == 'sign-in':
+            ready = _signin_ready
+        elif self._plan_cfg['enabled']:
+            ready = _plan_action_ready
+            n_plan_steps = self._plan_cfg['max_steps']
+        else:
+            ready = _action_ready
+        if not self._triage_cfg['enabled']:
+            response, scale_factor = self.vlm.analyze(
+                page, prompt, ready=ready, phase=label, service=service,
+                cancel=self._cancel, plan_steps=n_plan_steps)
+            return response, scale_factor, None
+
+        tiers = {'triage': None, 'triage_ms': None, 'grounding_ms': None,
+                 'resolved_by': 'grounding'}
+        t0 = time.monotonic()
+        resolved = None
+        try:
+            triage, scale_factor = self.vlm.analyze(
+                page, build_triage_prompt(label, service), ready=triage_ready,
+                phase=TRIAGE_PHASES[label], service=service, cancel=self._cancel)
+            tiers['triage'] = triage
+            resolved = resolve_triage(label, triage, billing_known)
+        except ValueError as exc:
+            log.debug('Triage output unparseable, escalating to grounding: %s', exc)
+        tiers['triage_ms'] = round((time.monotonic() - t0) * 1000)
+        if resolved is not None:
+            tiers['resolved_by'] = 'triage'
+            return resolved, scale_factor, tiers
+
+        t1 = time.monotonic()
+        response, scale_factor = self.vlm.analyze(
+            page, prompt, ready=ready, phase=label, service=service,
+            cancel=self._cancel, plan_steps=n_plan_steps)
+        tiers['grounding_ms'] = round((time.monotonic() - t1) * 1000)
+        return response, scale_factor, tiers
+
+    def _infer_recorded(self, info: dict, *args, **kwargs) -> tuple[dict, float, dict | None]:
+        """_infer for a worker thread: copies the client's last_* into info.
+
+        The client keeps them per thread, so they must be read on the
+        thread that made the call.
+        """
+        try:
+            return self._infer(*args, **kwargs)
+        finally:
+            for name in _VLM_LAST_ATTRS:
+                info[name] = getattr(self.vlm, name, None)
+
+    # ------------------------------------------------------------------
+    # Response cache
+    # ------------------------------------------------------------------
+
+    def _cache_context(
+        self, service: str, phase: str, prompt: str, page: Frame,
+    ) -> str | None:
+        """Cache key context for this step, or None if caching doesn't apply."""
+        if self._cache is None or not self._cache.enabled_for(service, phase):
+            return None
+        if page.dhash is None:
+            return None
+        return context_key(prompt, self.vlm.cache_identity, page.image.size)
+
+    # ------------------------------------------------------------------
+    # Settle
+    # ------------------------------------------------------------------
+
+    def _phase(self, name: str):
+        """Time a section of the current step (no-op outside the loop)."""
+        if self._step is None:
+            return contextlib.nullcontext()
+        return self._step.phase(name)
+
+    async def _settle(self, session, scale: float = 1.0, label: str = '',
+                      min_wait: float | None = None) -> SettleResult:
+        """Wait for the page to react to the last action.
+
+        Fixed mode sleeps settle_delay * scale. Adaptive mode polls
+        low-res captures (on the GUI threads) until consecutive frames
+        are stable, with the upper bound multiplied by scale (e.g. 2x
+        after OTP entry). Every settle is recorded in self._settle_log.
+        """
+        with self._phase('settle'):
+            cfg = self._settle_cfg
+            if cfg['mode'] != 'adaptive':
+                delay = self.settle_delay * scale
+                await self._cancel.sleep(delay)
+                result = SettleResult(delay, False, 0)
+            else:
+                result = await wait_for_stable(
+                    lambda: in_gui_thread(ss.capture_thumbnail, session.window_id),
+                    min_wait=cfg['min_wait'] if min_wait is None else min_wait,
+                    max_wait=cfg['max_wait'] * scale,
+                    interval=cfg['interval'],
+                    threshold=cfg['threshold'],
+                    stable_frames=cfg['stable_frames'],
+                    sleep=self._cancel.sleep,
+                )
+                log.debug('Settle (%s): %.2fs stable=%s polls=%d',
+                          label, result.elapsed, result.stable, result.polls)
+            entry = result.as_dict()
+            entry['label'] = label
+            self._settle_log.append(entry)
+        return result
+
+    async def _zoom_out(self, session, steps: int) -> None:
+        """browser.zoom_out on a GUI thread, admitted at navigation priority."""
+        with gui_priority(GuiPriority.NAVIGATE):
+            await in_gui_thread(browser.zoom_out, session, steps=steps)
+
+    async def _navigate(self, session, url: str, fast: bool = False) -> None:
+        """browser.navigate with the page-load wait awaited here.
+
+        Fixed mode keeps browser.navigate's post-Enter delay; adaptive
+        mode routes it through _settle.
+        """
+        with gui_priority(GuiPriority.NAVIGATE):
+            await in_gui_thread(browser.navigate, session, url, fast=fast,
+                                settle=lambda: None)
+        if self._settle_cfg['mode'] != 'adaptive':
+            with self._phase('settle'):
+                await self._cancel.sleep(2.0 if fast else 2.5)
+            return
+        # Longer floor: the old page stays visually stable for a moment
+        # after Enter, before the navigation starts painting.
+        await self._settle(session, label='navigate',
+                           min_wait=self._settle_cfg['nav_min_wait'])
+
     # ------------------------------------------------------------------
     # Sign-in page dispatch
     # ------------------------------------------------------------------
 
-    def _execute_signin_page(
+    async def _execute_signin_page(
         self,
         response: dict,
         scale_factor: float,
         session,
-        screenshot_b64: str,
+        page: Frame,
         chrome_offset: int,
         credentials: dict[str, str],
         job_id: str,
@@ -844,9 +1567,10 @@ class VLMExecutor:
 
         Returns: 'continue', 'done', 'need_human', 'captcha', or 'credential_invalid'.
 
-        GUI actions within each page type are wrapped in gui_lock.
-        OTP requests happen OUTSIDE the lock so the lock is free for
-        other concurrent jobs during the (potentially minutes-long) wait.
+        GUI actions within each page type are wrapped in gui_lock and run
+        on the GUI threads. OTP requests happen OUTSIDE the lock so the
+        lock is free for other concurrent jobs during the (potentially
+        minutes-long) wait, which holds no thread.
         """
 
         def scale(pt):
@@ -886,29 +1610,41 @@ class VLMExecutor:
                          'email_code_multi', 'phone_code_single',
                          'phone_code_multi'):
             # OTP wait: no GUI lock held (other jobs can use GUI freely)
-            code = self._request_otp(job_id, service)
+            code = await self._request_otp(job_id, service)
             if not code:
                 return 'need_human'
 
-            # Enter OTP code: acquire lock, focus, paste, submit
-            with gui_lock:
-                focus_window_by_pid(session.pid)
-                _clipboard_copy(code)
-
+            # Enter OTP code: acquire lock (ahead of other jobs' clicks and
+            # navigations, the code may be about to expire), focus, paste, submit
+            def _enter_code():
+                code_click = button_click = None
                 if code_pt:
-                    _click_bbox(code_pt, session, chrome_offset=chrome_offset)
-                    time.sleep(0.5)
-                keyboard.hotkey('command', 'v')
-                time.sleep(0.3)
-
+                    code_click = _plan_click_bbox(code_pt, session,
+                                                  chrome_offset=chrome_offset)
                 if button_pt:
+                    button_click = _plan_click_bbox(
+                        button_pt, session, chrome_offset=chrome_offset,
+                        start=code_click.target if code_click else None)
+                with gui_priority(GuiPriority.OTP), gui_lock:
+                    focus_window_by_pid(session.pid)
+                    _clipboard_copy(code)
+
+                    if code_click:
+                        player.play(code_click)
+                        time.sleep(0.5)
+                    keyboard.hotkey('command', 'v')
                     time.sleep(0.3)
-                    _click_bbox(button_pt, session, chrome_offset=chrome_offset)
-                else:
-                    time.sleep(0.2)
-                    keyboard.press_key('enter')
+
+                    if button_click:
+                        time.sleep(0.3)
+                        player.play(button_click)
+                    else:
+                        time.sleep(0.2)
+                        keyboard.press_key('enter')
+            with gui_priority(GuiPriority.OTP):
+                await in_gui_thread(_enter_code)
             # Settle outside gui_lock: OTP verification takes time
-            time.sleep(self.settle_delay * 2)
+            await self._settle(session, scale=2.0, label='otp')
             return 'continue'
 
         # Unknown state with recovery actions
@@ -916,15 +1652,22 @@ class VLMExecutor:
             actions = response.get('actions') or []
             if not actions:
                 return 'need_human'
-            with gui_lock:
-                focus_window_by_pid(session.pid)
+
+            def _recover():
+                clicks = []
                 for act in actions:
-                    act_type = act.get('action', '')
                     pt = scale(act.get('point'))
-                    if act_type in ('click', 'dismiss') and pt:
-                        _click_bbox(pt, session, chrome_offset=chrome_offset)
+                    if act.get('action', '') in ('click', 'dismiss') and pt:
+                        clicks.append(_plan_click_bbox(
+                            pt, session, chrome_offset=chrome_offset,
+                            start=clicks[-1].target if clicks else None))
+                with gui_lock:
+                    focus_window_by_pid(session.pid)
+                    for plan in clicks:
+                        player.play(plan)
                         time.sleep(0.3)
-            time.sleep(self.settle_delay)
+            await in_gui_thread(_recover)
+            await self._settle(session, label='recovery')
             return 'continue'
 
         # --- Credential entry: driven by available coordinates ---
@@ -933,50 +1676,73 @@ class VLMExecutor:
         # wasted steps from misclassification.
 
         if email_pt or password_pt:
-            with gui_lock:
-                focus_window_by_pid(session.pid)
-                email_pasted = False
-
+            def _fill_credentials():
+                # Plan every move and keystroke up front, each path starting
+                # where the previous one ends; the lock only covers replay.
+                email_val = credentials.get('email', '')
+                email_click = email_typing = switch = password_click = None
+                cursor = None
                 if email_pt:
-                    _click_bbox(email_pt, session, chrome_offset=chrome_offset)
-                    time.sleep(0.3)
-                    keyboard.hotkey('command', 'a')
-                    time.sleep(0.1)
-                    email_val = credentials.get('email', '')
+                    email_click = _plan_click_bbox(email_pt, session,
+                                                   chrome_offset=chrome_offset)
+                    cursor = email_click.target
                     if email_val:
-                        email_pasted = _enter_credential(email_val)
-
+                        email_typing = _plan_credential(email_val)
+                email_pasted = bool(email_pt and email_val and email_typing is None)
                 if password_pt:
                     if email_pasted:
-                        # Simulate password manager: app switch, wait, refocus
-                        time.sleep(random.uniform(0.3, 0.6))
-                        _simulate_app_switch(session)
-                        time.sleep(random.uniform(2.0, 4.0))
-                        focus_window_by_pid(session.pid)
-                    _click_bbox(password_pt, session,
-                                chrome_offset=chrome_offset)
+                        switch = _plan_app_switch(session, start=cursor)
+                        cursor = switch.target
+                    password_click = _plan_click_bbox(
+                        password_pt, session, chrome_offset=chrome_offset,
+                        start=cursor)
+
+                with gui_lock:
+                    focus_window_by_pid(session.pid)
+
+                    if email_click:
+                        player.play(email_click)
+                        time.sleep(0.3)
+                        keyboard.hotkey('command', 'a')
+                        time.sleep(0.1)
+                        if email_val:
+                            _enter_credential(email_val, email_typing)
+
+                    if password_click:
+                        if switch:
+                            # Simulate password manager: app switch, wait, refocus
+                            time.sleep(random.uniform(0.3, 0.6))
+                            _simulate_app_switch(switch)
+                            time.sleep(random.uniform(2.0, 4.0))
+                            self._cancel.raise_if_cancelled()
+                            focus_window_by_pid(session.pid)
+                        player.play(password_click)
+                        time.sleep(0.2)
+                        keyboard.hotkey('command', 'a')
+                        time.sleep(0.1)
+                        pass_val = credentials.get('pass', '')
+                        if pass_val:
+                            _clipboard_copy(pass_val)
+                            keyboard.hotkey('command', 'v')
+                            time.sleep(0.15)
+
+                    # Submit: always press Enter after filling fields.
+                    # More reliable than clicking button_pt, which the VLM
+                    # can misidentify (e.g. "Sign up" instead of "Sign In").
                     time.sleep(0.2)
-                    keyboard.hotkey('command', 'a')
-                    time.sleep(0.1)
-                    pass_val = credentials.get('pass', '')
-                    if pass_val:
-                        _clipboard_copy(pass_val)
-                        keyboard.hotkey('command', 'v')
-                        time.sleep(0.15)
-
-                # Submit: always press Enter after filling fields.
-                # More reliable than clicking button_pt, which the VLM
-                # can misidentify (e.g. "Sign up" instead of "Sign In").
-                time.sleep(0.2)
-                keyboard.press_key('enter')
-            time.sleep(self.settle_delay)
+                    keyboard.press_key('enter')
+            await in_gui_thread(_fill_credentials)
+            await self._settle(session, label='credentials')
             return 'continue'
 
         if button_pt:
-            with gui_lock:
-                focus_window_by_pid(session.pid)
-                _click_bbox(button_pt, session, chrome_offset=chrome_offset)
-            time.sleep(self.settle_delay)
+            def _click_button():
+                plan = _plan_click_bbox(button_pt, session, chrome_offset=chrome_offset)
+                with gui_lock:
+                    focus_window_by_pid(session.pid)
+                    player.play(plan)
+            await in_gui_thread(_click_button)
+            await self._settle(session, label='button')
             return 'continue'
 
         # Fallback
@@ -984,54 +1750,65 @@ class VLMExecutor:
         return 'continue'
 
     # ------------------------------------------------------------------
-    # OTP bridge
+    # OTP / credential bridge
     # ------------------------------------------------------------------
 
-    def _request_otp(self, job_id: str, service: str) -> str | None:
+    async def _await_callback(self, coro, timeout: float):
+        """Await a callback coroutine on its own loop.
+
+        Runs it directly when self._loop is None or is the loop running
+        this executor (the server case). A different loop (e.g. a CLI
+        thread running one for input()) gets it via
+        run_coroutine_threadsafe. Either way the wait holds no thread
+        and ends with JobCancelled when the job is aborted.
+        """
+        running = asyncio.get_running_loop()
+        with self._phase('user_wait'):
+            if self._loop is None or self._loop is running:
+                return await self._cancel.wait_for(asyncio.wait_for(coro, timeout=timeout))
+            future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+            try:
+                return await self._cancel.wait_for(
+                    asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout))
+            finally:
+                future.cancel()
+
+    async def _request_otp(self, job_id: str, service: str) -> str | None:
         """Request OTP code via the async callback.
 
-        Bridges async server.request_otp from the synchronous executor thread.
-        This call blocks until the user provides the OTP (up to 15 min).
-        It does NOT hold gui_lock, so other jobs can use the GUI freely.
+        Waits until the user provides the OTP (up to 15 min). It does NOT
+        hold gui_lock, so other jobs can use the GUI freely.
         """
         self._otp_was_used = True
-        if self._otp_callback is None or self._loop is None:
+        if self._otp_callback is None:
             log.warning('OTP needed but no callback configured')
             return None
 
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self._otp_callback(job_id, service),
-                self._loop,
-            )
-            return future.result(timeout=900)  # 15 min, matching server timeout
+            # 15 min, matching server timeout
+            return await self._await_callback(self._otp_callback(job_id, service), 900)
+        except (asyncio.CancelledError, JobCancelled):
+            raise
         except Exception as exc:
             log.error('OTP callback failed: %s', exc)
             return None
 
-    # ------------------------------------------------------------------
-    # Credential bridge
-    # ------------------------------------------------------------------
-
-    def _request_credential(
+    async def _request_credential(
         self, job_id: str, service: str, credential_name: str,
     ) -> str | None:
         """Request a missing credential via the async callback.
 
-        Same bridge pattern as _request_otp: schedules the async callback
-        on the event loop from the synchronous executor thread.
-        Does NOT hold gui_lock.
+        Same bridge as _request_otp. Does NOT hold gui_lock.
         """
-        if self._credential_callback is None or self._loop is None:
+        if self._credential_callback is None:
             log.warning('Credential %s needed but no callback configured', credential_name)
             return None
 
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self._credential_callback(job_id, service, credential_name),
-                self._loop,
-            )
-            return future.result(timeout=900)  # 15 min
+            return await self._await_callback(
+                self._credential_callback(job_id, service, credential_name), 900)  # 15 min
+        except (asyncio.CancelledError, JobCancelled):
+            raise
         except Exception as exc:
             log.error('Credential callback failed for %s: %s', credential_name, exc)
             return None
@@ -149,7 +149,8 @@ class AgentCallbackServer:
             "success": bool,
             "access_end_date": str | null,
             "error": str | null,
-            "duration_seconds": int
+            "duration_seconds": int,
+            "step_timings": {"totals": dict, "steps": [dict]} (optional)
         }
         """
         try:
@@ -172,6 +173,8 @@ class AgentCallbackServer:
                     "inference_count": data.get("inference_count", 0),
                     "otp_required": data.get("otp_required", False),
                 }
+                if data.get("step_timings"):
+                    stats["step_timings"] = data["step_timings"]
                 await self._result_callback(
                     job_id,
                     success,
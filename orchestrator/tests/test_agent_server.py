@@ -274,6 +274,42 @@ async def test_result_callback_null_error_code(aio_client: AioTestClient) -> Non
     assert received == [None]
 
 
+@pytest.mark.asyncio
+async def test_result_callback_passes_step_timings(aio_client: AioTestClient) -> None:
+    """POST /callback/result forwards step_timings in stats, omits it when absent."""
+    received = []
+
+    async def on_result(
+        job_id: str,
+        success: bool,
+        access_end_date: str | None,
+        error: str | None,
+        duration_seconds: int,
+        error_code: str | None,
+        stats: dict | None = None,
+    ) -> None:
+        received.append(stats)
+
+    aio_client.app[_server_key].set_result_callback(on_result)
+
+    timings = {
+        "totals": {"steps": 2, "vlm_ms": 4100, "settle_ms": 2500},
+        "steps": [
+            {"iteration": None, "phase": "setup", "total_ms": 3000},
+            {"iteration": 0, "phase": "sign-in", "vlm_ms": 4100, "total_ms": 7000},
+        ],
+    }
+    for body in (
+        {"job_id": "j1", "success": True, "duration_seconds": 10, "step_timings": timings},
+        {"job_id": "j2", "success": True, "duration_seconds": 10},
+    ):
+        resp = await aio_client.post("/callback/result", json=body)
+        assert resp.status == 200
+
+    assert received[0]["step_timings"] == timings
+    assert "step_timings" not in received[1]
+
+
 @pytest.mark.asyncio
 async def test_result_missing_fields(aio_client: AioTestClient) -> None:
     """POST /callback/result with missing job_id returns 400."""
@@ -0,0 +1,7 @@
+-- Per-step timing breakdown on action_logs (agent step timings).
+--
+-- Apply BEFORE deploying the web build that writes step_timings in
+-- POST /api/agent/jobs/[id]/action-log: that INSERT names the column
+-- and fails on a database without it. Idempotent; safe to re-run.
+
+ALTER TABLE action_logs ADD COLUMN IF NOT EXISTS step_timings JSONB;  -- {totals: {...}, steps: [{iteration, phase, *_ms, ...}]}
@@ -214,6 +214,7 @@ CREATE TABLE action_logs (
     error_code       TEXT DEFAULT NULL,
     error_message    TEXT,
     screenshots      JSONB,
+    step_timings     JSONB,  -- {totals: {...}, steps: [{iteration, phase, *_ms, ...}]}
     created_at       TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
@@ -54,7 +54,10 @@ class TTSAgent:
         self._extracting = False  # one-at-a-time guard for Chrome
 
     async def start(self) -> None:
-        """Start the HTTP server."""
+        """Start the HTTP server and warm the Chrome pool."""
+        from tts_agent.text_extractor import get_session_manager
+        get_session_manager().start()
+
         self._app.router.add_post("/extract", self._handle_extract)
         self._app.router.add_post("/synthesize", self._handle_synthesize)
         self._app.router.add_get("/health", self._handle_health)
@@ -73,6 +76,8 @@ class TTSAgent:
         if self._runner:
             await self._runner.cleanup()
             self._runner = None
+        from tts_agent.text_extractor import get_session_manager
+        await asyncio.to_thread(get_session_manager().shutdown)
         log.info("TTS Agent stopped")
 
     # ------------------------------------------------------------------
@@ -188,10 +193,12 @@ class TTSAgent:
 
     async def _handle_health(self, request: web.Request) -> web.Response:
         """GET /health"""
+        from tts_agent.text_extractor import get_session_manager
         return web.json_response({
             "ok": True,
             "version": GIT_HASH,
             "extracting": self._extracting,
+            "chrome": get_session_manager().stats(),
         })
 
 
@@ -12,6 +12,9 @@ interface ActionLogBody {
   otp_required: boolean;
   error_code: string | null;
   error_message: string | null;
+  // Per-job totals and per-step timing records from the agent executor.
+  // Column added by scripts/migrate-action-log-step-timings.sql.
+  step_timings?: { totals: Record<string, number>; steps: object[] } | null;
 }
 
 export const POST = withAgentAuth(
@@ -39,8 +42,8 @@ export const POST = withAgentAuth(
       `INSERT INTO action_logs (
         job_id, user_id, service_id, flow_type, success,
         duration_seconds, step_count, inference_count,
-        otp_required, error_code, error_message
-      ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)`,
+        otp_required, error_code, error_message, step_timings
+      ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)`,
       [
         jobId,
         job.user_id,
@@ -53,6 +56,7 @@ export const POST = withAgentAuth(
         data.otp_required ?? false,
         data.error_code ?? null,
         data.error_message ?? null,
+        data.step_timings ? JSON.stringify(data.step_timings) : null,
       ]
     );
 